@@ -0,0 +1,77 @@
+"""Бенчмарк графика истории: ряд для экрана из сводок и LTTB против чтения всех записей.
+
+Временная база заполняется поминутными записями одного города за --days дней. Для
+периодов разной длины (сутки, месяц, год, вся история) ряд на --width точек строится
+так же, как в GUI (HistoryManager.get_chart_series: записи или часовые/суточные сводки
+и прореживание LTTB), и для сравнения — чтением всех записей периода и тем же LTTB.
+Время ответа на периоде в годы и определяет, остается ли масштабирование графика плавным.
+
+Запуск:
+    uv run python -m benchmarks.bench_chart --days 730 --width 1000
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from benchmarks.bench_suite import open_database
+from src.gui.constants import CHART_SOURCES
+from src.gui.history_manager import HistoryManager, from_seconds, to_seconds
+from src.utils.downsample import lttb
+
+SPANS = (("сутки", 1), ("месяц", 30), ("год", 365))
+
+
+def best_ms(func, repeat: int) -> float:
+    """Лучшее время вызова в мс из repeat попыток (вызовы на всей истории длятся секунды)."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def series_from_records(db, since: float, until: float, points: int) -> tuple[list[float], list[float]]:
+    """Ряд без сводок: все записи периода и LTTB."""
+    timestamps, values = db.get_history_series("Moscow", "temperature", from_seconds(since), from_seconds(until))
+    return lttb([to_seconds(timestamp) for timestamp in timestamps], values, points)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="График истории: сводки и LTTB против чтения всех записей")
+    parser.add_argument("--days", type=int, default=730, help="Дней поминутной истории")
+    parser.add_argument("--width", type=int, default=1000, help="Точек графика (ширина в пикселях)")
+    parser.add_argument("--repeat", type=int, default=3, help="Попыток замера")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = args.days * 24 * 60
+        started = time.perf_counter()
+        db = open_database(Path(tmp), "chart", rows)
+        print(f"📦 История: {rows} записей за {args.days} дн. (заполнение {time.perf_counter() - started:.1f} с)")
+
+        first, last = HistoryManager.get_chart_bounds("Moscow")
+        spans = [(name, days) for name, days in SPANS if days < args.days] + [("вся история", args.days)]
+        print(
+            f"\n{'период':>12} {'источник':>16} {'точек':>7} {'график, мс':>11} {'все записи, мс':>15} "
+            f"{'ускорение':>10}"
+        )
+        for name, days in spans:
+            since = max(last - timedelta(days=days).total_seconds(), first)
+            xs, _, source = HistoryManager.get_chart_series("Moscow", "temperature", since, last, args.width)
+            chart_ms = best_ms(
+                lambda since=since: HistoryManager.get_chart_series("Moscow", "temperature", since, last, args.width),
+                args.repeat,
+            )
+            records_ms = best_ms(lambda since=since: series_from_records(db, since, last, args.width), args.repeat)
+            print(
+                f"{name:>12} {CHART_SOURCES[source]:>16} {len(xs):>7} {chart_ms:>11.1f} {records_ms:>15.1f} "
+                f"{records_ms / chart_ms:>9.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Замер очереди доставки уведомлений: сколько стоит publish() и с какой скоростью получатели разбирают очередь.
+
+Получатели — вебхук встроенного поддельного API (benchmarks.mock_owm_server) с задержкой
+ответа и долей ошибок 500, и файл JSONL во временном каталоге. Для сравнения сначала
+измеряется синхронная доставка одного уведомления вебхуку: столько стоил бы каждый
+запрос погоды без очереди.
+
+Запуск:
+    uv run python -m benchmarks.bench_dispatch --events 5000 --latency-ms 20 --error-rate 0.05
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.mock_owm_server import MockOwmServer, add_settings_arguments, settings_from_args
+from src.notifications.dispatch import NotificationDispatcher
+from src.notifications.sinks import JsonlSink, NotificationEvent, WebhookSink
+from src.utils import metrics
+
+
+def make_event(index: int) -> NotificationEvent:
+    """Уведомление, похожее на выдаваемые базовыми правилами."""
+    return NotificationEvent(
+        rule_id=11,
+        rule_name="Высокая влажность",
+        priority=3,
+        icon="💧",
+        city=f"City {index % 50}",
+        message=f"💧 Высокая влажность ({80 + index % 20}%). Одежда сохнет медленно",
+        history_id=index,
+        created_at=datetime.now(),
+    )
+
+
+def quantiles_us(values: list[float]) -> str:
+    """p50/p99/макс в микросекундах."""
+    q = statistics.quantiles(values, n=100, method="inclusive")
+    return f"p50 {q[49] * 1e6:.1f} мкс, p99 {q[98] * 1e6:.1f} мкс, макс {max(values) * 1e6:.0f} мкс"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Замер очереди доставки уведомлений")
+    parser.add_argument("--events", type=int, default=5000, help="Сколько уведомлений опубликовать")
+    parser.add_argument("--per-record", type=int, default=3, help="Уведомлений в одном publish() (на одну запись)")
+    parser.add_argument("--queue-size", type=int, default=1000, help="Емкость очереди получателя")
+    parser.add_argument("--batch-size", type=int, default=100, help="Максимальный размер пачки")
+    parser.add_argument("--sync-samples", type=int, default=20, help="Замеров синхронной доставки")
+    add_settings_arguments(parser)
+    parser.set_defaults(latency_ms=20.0)
+    args = parser.parse_args()
+
+    metrics.enable_metrics(Path(tempfile.mkdtemp()))  # Счетчики нужны для отчета, состояние — во временный каталог
+    server = MockOwmServer(settings=settings_from_args(args))
+    server.start()
+    webhook_url = f"http://127.0.0.1:{server.server_address[1]}/webhook"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            sync_sink = WebhookSink(webhook_url)
+            sync_times = []
+            for i in range(args.sync_samples):
+                t0 = time.perf_counter()
+                try:
+                    sync_sink.deliver([make_event(i)])
+                except Exception:  # noqa: S112 - ошибки 500 поддельного API тоже занимают время запроса
+                    continue
+                finally:
+                    sync_times.append(time.perf_counter() - t0)
+            sync_sink.close()
+            print(f"🐌 Синхронная доставка вебхуку: p50 {statistics.median(sync_times) * 1000:.1f} мс на запись")
+
+            jsonl_path = Path(tmp_dir) / "notifications.jsonl"
+            server.webhook_batches = server.webhook_notifications = 0
+            dispatcher = NotificationDispatcher(
+                [WebhookSink(webhook_url), JsonlSink(jsonl_path)],
+                queue_size=args.queue_size,
+                batch_size=args.batch_size,
+                retry_delay=0.05,
+            )
+
+            publish_times = []
+            dropped = 0
+            started = time.perf_counter()
+            for i in range(0, args.events, args.per_record):
+                events = [make_event(j) for j in range(i, min(i + args.per_record, args.events))]
+                t0 = time.perf_counter()
+                dropped += dispatcher.publish(events)
+                publish_times.append(time.perf_counter() - t0)
+            published = time.perf_counter() - started
+
+            dispatcher.close(timeout=60)
+            drained = time.perf_counter() - started
+        finally:
+            server.stop()
+
+        jsonl_lines = sum(1 for _ in jsonl_path.open(encoding="utf-8")) if jsonl_path.exists() else 0
+
+    state = metrics.REGISTRY.snapshot()["counters"]
+
+    def counter_value(name: str, sink: str) -> float:
+        values = state.get(name, {}).get("values", [])
+        return sum(value for labels, value in values if labels.get("sink") == sink)
+
+    print(f"⚡ publish(): {quantiles_us(publish_times)} ({len(publish_times)} вызовов за {published:.2f} с)")
+    print(f"📦 Очереди разобраны за {drained:.2f} с, отброшено при переполнении: {dropped}")
+    print(f"\n{'Получатель':<10} {'доставлено':>11} {'отброшено':>10} {'повторов':>9} {'ошибок':>7} {'увед/с':>9}")
+    for sink in ("webhook", "jsonl"):
+        delivered = counter_value("notifications_delivered_total", sink)
+        print(
+            f"{sink:<10} {delivered:>11g} {counter_value('notifications_dropped_total', sink):>10g} "
+            f"{counter_value('notification_retries_total', sink):>9g} "
+            f"{counter_value('notifications_failed_total', sink):>7g} {delivered / drained:>9.0f}"
+        )
+    print(f"\n📨 Вебхук получил {server.webhook_notifications} уведомлений в {server.webhook_batches} пачках")
+    print(f"📝 В JSONL записано строк: {jsonl_lines}")
+
+
+if __name__ == "__main__":
+    main()
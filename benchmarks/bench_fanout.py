@@ -0,0 +1,143 @@
+"""Бенчмарк рассылки подписчикам: индекс наборов правил по городам против проверки каждого пользователя.
+
+Пользователи подписаны на несколько городов. В сценарии "личные" у каждого свой набор
+правил со своими порогами, в сценарии "общие" пользователи выбирают один из нескольких
+общих наборов. Прежний способ — для каждого пользователя и каждого его города проверить
+все правила его набора: стоимость растет как пользователи × правила. SubscriptionIndex
+проверяет наблюдение города один раз и раздает сработавшие правила подписчикам.
+Перед замером проверяется, что оба способа выдают одинаковые уведомления.
+
+Запуск:
+    uv run python -m benchmarks.bench_fanout --users 100 1000 10000 --cities 50
+"""
+
+import argparse
+import random
+import time
+from dataclasses import replace
+
+from benchmarks.bench_rule_index import make_observations, make_rules
+from src.database.models import NotificationRule
+from src.notifications.evaluator import ConditionEvaluator
+from src.notifications.subscriptions import SubscriptionIndex
+
+RULES_PER_SET = 16
+SHARED_RULE_SETS = 10
+
+
+def make_rule_sets(count: int, rng: random.Random) -> dict[int, list[NotificationRule]]:
+    """Наборы правил с разными порогами; id правил уникальны во всех наборах."""
+    rule_sets = {}
+    for rule_set_id in range(1, count + 1):
+        offset = (rule_set_id - 1) * RULES_PER_SET
+        rules = [replace(rule, id=rule.id + offset, rule_set_id=rule_set_id) for rule in make_rules(RULES_PER_SET, rng)]
+        rules.sort(key=lambda rule: (rule.priority, rule.id))
+        rule_sets[rule_set_id] = rules
+    return rule_sets
+
+
+def make_subscriptions(
+    users: int, cities: list[str], per_user: int, rule_set_of_user: list[int], rng: random.Random
+) -> dict[str, dict[int, list[int]]]:
+    """Подписки в формате DatabaseManager.get_subscriptions: город -> набор -> пользователи."""
+    subscriptions: dict[str, dict[int, list[int]]] = {}
+    for user_id in range(1, users + 1):
+        for city in rng.sample(cities, per_user):
+            subscriptions.setdefault(city, {}).setdefault(rule_set_of_user[user_id - 1], []).append(user_id)
+    return subscriptions
+
+
+def per_user_fanout(
+    subscriptions: dict[str, dict[int, list[int]]],
+    rule_sets: dict[int, list[NotificationRule]],
+    observations: dict[str, dict],
+) -> list[tuple[int, int, str]]:
+    """Прежний способ: каждый пользователь проверяет все правила своего набора для каждого своего города."""
+    issued = []
+    for city, sets in subscriptions.items():
+        weather_data = observations[city]
+        for rule_set_id, user_ids in sets.items():
+            for user_id in user_ids:
+                for rule in rule_sets[rule_set_id]:
+                    if ConditionEvaluator.evaluate(rule, weather_data):
+                        issued.append((user_id, rule.id, ConditionEvaluator.format_message(rule, weather_data)))
+    return issued
+
+
+def indexed_fanout(index: SubscriptionIndex, observations: dict[str, dict]) -> list[tuple[int, int, str]]:
+    """Как NotificationEngine.process_subscriptions: одна проверка города, сообщение — одно на шаблон."""
+    issued = []
+    for city, rule_index in index.city_indexes.items():
+        weather_data = observations[city]
+        messages: dict[str, str] = {}
+        for rule in rule_index.match(weather_data):
+            message = messages.get(rule.message_template)
+            if message is None:
+                message = messages[rule.message_template] = ConditionEvaluator.format_message(rule, weather_data)
+            issued.extend((user_id, rule.id, message) for user_id in index.subscribers(city, rule))
+    return issued
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Рассылка подписчикам: индекс против проверки каждого пользователя")
+    parser.add_argument("--users", type=int, nargs="+", default=[100, 1000, 10000], help="Количество пользователей")
+    parser.add_argument("--cities", type=int, default=50, help="Количество городов")
+    parser.add_argument("--per-user", type=int, default=3, help="Подписок на одного пользователя")
+    parser.add_argument("--rounds", type=int, default=5, help="Опросов всех городов для замера")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)  # noqa: S311 - воспроизводимые синтетические данные
+    cities = [f"City {i}" for i in range(args.cities)]
+    rounds = []
+    for _ in range(args.rounds):
+        observations = make_observations(args.cities, rng)
+        rounds.append(
+            {city: {**weather_data, "city": city} for city, weather_data in zip(cities, observations, strict=True)}
+        )
+
+    print(
+        f"{'Наборы':<8} {'польз.':>7} {'правил':>8} {'индексов':>9} {'уведомл.':>9} {'построение, мс':>15} "
+        f"{'перебор, мс':>12} {'индекс, мс':>11} {'ускорение':>10}"
+    )
+    for scenario in ("личные", "общие"):
+        for users in args.users:
+            if scenario == "личные":
+                rule_sets = make_rule_sets(users, rng)
+                rule_set_of_user = list(range(1, users + 1))
+            else:
+                rule_sets = make_rule_sets(SHARED_RULE_SETS, rng)
+                rule_set_of_user = [rng.randint(1, SHARED_RULE_SETS) for _ in range(users)]
+            subscriptions = make_subscriptions(users, cities, args.per_user, rule_set_of_user, rng)
+
+            t0 = time.perf_counter()
+            index = SubscriptionIndex(subscriptions, rule_sets)
+            build_ms = (time.perf_counter() - t0) * 1000
+
+            for observations in rounds:
+                expected = sorted(per_user_fanout(subscriptions, rule_sets, observations))
+                if sorted(indexed_fanout(index, observations)) != expected:
+                    raise AssertionError("Рассылка по индексу расходится с проверкой каждого пользователя")
+
+            t0 = time.perf_counter()
+            issued = sum(len(per_user_fanout(subscriptions, rule_sets, observations)) for observations in rounds)
+            linear_ms = (time.perf_counter() - t0) / len(rounds) * 1000
+
+            t0 = time.perf_counter()
+            for observations in rounds:
+                indexed_fanout(index, observations)
+            index_ms = (time.perf_counter() - t0) / len(rounds) * 1000
+
+            print(
+                f"{scenario:<8} {users:>7} {users * args.per_user * RULES_PER_SET:>8} {index.index_count:>9} "
+                f"{issued / len(rounds):>9.0f} {build_ms:>15.1f} {linear_ms:>12.2f} {index_ms:>11.2f} "
+                f"{linear_ms / index_ms:>9.1f}x"
+            )
+
+    print(f"\nℹ️ Время на один опрос {args.cities} городов. Правил — проверок правил при переборе")
+    print("   (пользователи × подписки × правила набора). Индекс проверяет город один раз, поэтому с общими")
+    print("   наборами его время растет только с количеством выданных уведомлений.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Бенчмарк погоды по координатам: кэш ячеек сетки и поиск ближайшего наблюдения.
+
+Первая часть: поток запросов мобильных клиентов — координаты, рассеянные вокруг
+нескольких точек, — проходит через WeatherService.get_weather_at со встроенным
+поддельным API. Число запросов к API сравнивается с числом разных координат: без
+кэша ячеек каждая точка была бы отдельным запросом.
+
+Вторая часть: поиск ближайшего наблюдения среди --rows наблюдений с координатами —
+по индексу сетки (DatabaseManager.find_nearest_record) против перебора всех координат.
+Перед замером проверяется, что ответы совпадают.
+
+Запуск:
+    uv run python -m benchmarks.bench_geo --requests 5000 --hotspots 10 --cell 0.05
+"""
+
+import argparse
+import contextlib
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_suite import measure
+from benchmarks.mock_owm_server import MockOwmServer, MockSettings
+from src.utils import metrics
+from src.utils.geo import KM_PER_DEGREE, distance_km, grid_cell
+
+# Область, в которой лежат точки: широта и долгота
+REGION = ((40.0, 60.0), (20.0, 50.0))
+
+
+def random_point(rng: random.Random) -> tuple[float, float]:
+    (lat_min, lat_max), (lon_min, lon_max) = REGION
+    return rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max)
+
+
+def mobile_points(rng: random.Random, requests: int, hotspots: int, spread_km: float) -> list[tuple[float, float]]:
+    """Координаты запросов: нормальный разброс spread_km вокруг случайных точек скопления."""
+    centers = [random_point(rng) for _ in range(hotspots)]
+    spread = spread_km / KM_PER_DEGREE
+    points = []
+    for _ in range(requests):
+        latitude, longitude = rng.choice(centers)
+        points.append((round(latitude + rng.gauss(0, spread), 6), round(longitude + rng.gauss(0, spread), 6)))
+    return points
+
+
+def run_requests(service, points: list[tuple[float, float]]) -> list[float]:
+    """Запрашивает погоду для каждой точки и возвращает задержки в мс."""
+    latencies = []
+    # Сервис печатает строки на каждое сохранение — в отчете они только мешают
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        for latitude, longitude in points:
+            started = time.perf_counter()
+            service.get_weather_at(latitude, longitude)
+            latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def fill_locations(db, rows: int, rng: random.Random) -> None:
+    """Заполняет историю наблюдениями со случайными координатами в REGION."""
+    from src.database.db_manager import GEO_INDEX_CELL_DEGREES
+
+    description_id = db.get_or_create_description("ясно").id
+    points = [random_point(rng) for _ in range(rows)]
+    with db._get_connection() as conn:
+        first_id = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM weather_history").fetchone()[0]) + 1
+        conn.executemany(
+            """
+            INSERT INTO weather_history
+            (id, city, timestamp, temperature, feels_like, humidity, pressure, description_id, wind_speed)
+            VALUES (?, 'Point', '2020-01-01 00:00:00', 10, 8, 60, 1010, ?, 3)
+            """,
+            ((first_id + i, description_id) for i in range(rows)),
+        )
+        conn.executemany(
+            """
+            INSERT INTO weather_locations (history_id, latitude, longitude, cell_lat, cell_lon, timestamp)
+            VALUES (?, ?, ?, ?, ?, '2020-01-01 00:00:00')
+            """,
+            (
+                (first_id + i, lat, lon, *grid_cell(lat, lon, GEO_INDEX_CELL_DEGREES))
+                for i, (lat, lon) in enumerate(points)
+            ),
+        )
+
+
+def nearest_by_scan(db, latitude: float, longitude: float, radius_km: float) -> int | None:
+    """Ближайшее наблюдение перебором всех координат: id записи или None."""
+    with db._get_connection() as conn:
+        rows = conn.execute("SELECT history_id, latitude, longitude FROM weather_locations").fetchall()
+    candidates = ((distance_km(latitude, longitude, lat, lon), -history_id) for history_id, lat, lon in rows)
+    best = min(candidates, default=None)
+    return -best[1] if best is not None and best[0] <= radius_km else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Погода по координатам: кэш ячеек сетки и поиск ближайшего")
+    parser.add_argument("--requests", type=int, default=5000, help="Запросов погоды по координатам")
+    parser.add_argument("--hotspots", type=int, default=10, help="Точек скопления клиентов")
+    parser.add_argument("--spread-km", type=float, default=1.0, help="Разброс координат вокруг точки, км")
+    parser.add_argument("--cell", type=float, default=0.05, help="Шаг сетки кэша в градусах")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Задержка поддельного API, мс")
+    parser.add_argument("--rows", type=int, default=100_000, help="Наблюдений с координатами для поиска ближайшего")
+    parser.add_argument("--radius-km", type=float, default=5.0, help="Радиус поиска ближайшего наблюдения, км")
+    parser.add_argument("--repeat", type=int, default=5, help="Серий замера поиска")
+    args = parser.parse_args()
+
+    rng = random.Random(42)  # noqa: S311 - воспроизводимые координаты
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # База задается до создания сервиса: движок уведомлений берет общий менеджер БД
+        os.environ["WEATHER_DB_PATH"] = str(Path(tmp_dir) / "geo.db")
+
+        from src.core.config_loader import Config
+        from src.core.weather_service import WeatherService
+
+        server = MockOwmServer(settings=MockSettings(latency_ms=args.latency_ms))
+        server.start()
+        try:
+            config = Config(api_key="geo-test", base_url=f"{server.base_url}/weather", geo_cell_degrees=args.cell)
+            metrics.enable_metrics(Path(tempfile.mkdtemp()))  # Источники ответов считает geo_lookups_total
+            service = WeatherService(config)
+            points = mobile_points(rng, args.requests, args.hotspots, args.spread_km)
+            latencies = run_requests(service, points)
+        finally:
+            server.stop()
+
+        counters = metrics.REGISTRY.snapshot()["counters"]["geo_lookups_total"]["values"]
+        sources = {labels["source"]: int(value) for labels, value in counters}
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(f"📍 Запросов: {len(points)}, разных координат: {len(set(points))}, ячеек: {len(service.geo_cache)}")
+        print(
+            f"🌐 Запросов к API: {sources.get('api', 0)}, из кэша: {sources.get('cache', 0)}, "
+            f"из истории: {sources.get('history', 0)}"
+        )
+        print(f"⏱️ Задержка: p50 {quantiles[49]:.3f} мс, p99 {quantiles[98]:.1f} мс")
+
+        db = service.notification_engine.db_manager
+        fill_locations(db, args.rows, rng)
+        queries = [random_point(rng) for _ in range(50)]
+        for latitude, longitude in queries:
+            found = db.find_nearest_record(latitude, longitude, args.radius_km)
+            if (found[0].id if found else None) != nearest_by_scan(db, latitude, longitude, args.radius_km):
+                raise AssertionError("Поиск по индексу сетки расходится с перебором")
+
+        query = itertools.cycle(queries)
+        index_us = measure(lambda: db.find_nearest_record(*next(query), args.radius_km), args.repeat)
+        scan_us = measure(lambda: nearest_by_scan(db, *next(query), args.radius_km), args.repeat)
+        print(f"\n🔎 Ближайшее из {args.rows} наблюдений в радиусе {args.radius_km:g} км")
+        print(f"{'перебор, мкс':>14} {'индекс сетки, мкс':>18} {'ускорение':>10}")
+        print(f"{scan_us:>14.1f} {index_us:>18.1f} {scan_us / index_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
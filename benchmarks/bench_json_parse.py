@@ -0,0 +1,112 @@
+"""Бенчмарк декодирования ответов API из байтов тела для всех установленных JSON-бэкендов.
+
+Сравнивает три формы ответа: текущая погода (/weather), группа городов (/group)
+и прогноз на 5 дней (/forecast, 40 точек).
+
+Запуск:
+    uv run python -m benchmarks.bench_json_parse --iterations 20000
+"""
+
+import argparse
+import json
+import time
+
+from src.core.json_backend import available_backends, get_json_backend
+
+DESCRIPTIONS = ["ясно", "облачно с прояснениями", "небольшой дождь", "снег", "туман"]
+
+
+def make_current(index: int = 0) -> dict:
+    """Ответ /weather в полном виде, включая поля, которые приложение не использует."""
+    return {
+        "coord": {"lon": 37.6156, "lat": 55.7522},
+        "weather": [{"id": 800, "main": "Clear", "description": DESCRIPTIONS[index % 5], "icon": "01d"}],
+        "base": "stations",
+        "main": {
+            "temp": -3.5 + index % 20,
+            "feels_like": -7.2 + index % 20,
+            "temp_min": -4.1,
+            "temp_max": -2.8,
+            "pressure": 1012 + index % 10,
+            "humidity": 60 + index % 30,
+            "sea_level": 1012,
+            "grnd_level": 993,
+        },
+        "visibility": 10000,
+        "wind": {"speed": 4.1 + index % 5, "deg": 230, "gust": 9.3},
+        "clouds": {"all": 0},
+        "dt": 1735725600 + index * 60,
+        "sys": {"type": 2, "id": 2000314, "country": "RU", "sunrise": 1735710000, "sunset": 1735734000},
+        "timezone": 10800,
+        "id": 524901 + index,
+        "name": f"City {index}",
+        "cod": 200,
+    }
+
+
+def make_group(cities: int) -> dict:
+    """Ответ /group для нескольких городов."""
+    return {"cnt": cities, "list": [make_current(i) for i in range(cities)]}
+
+
+def make_forecast(points: int = 40) -> dict:
+    """Ответ /forecast: точки с шагом 3 часа."""
+    items = []
+    for i in range(points):
+        item = make_current(i)
+        items.append(
+            {
+                "dt": 1735725600 + i * 10800,
+                "main": item["main"],
+                "weather": item["weather"],
+                "clouds": item["clouds"],
+                "wind": item["wind"],
+                "visibility": 10000,
+                "pop": (i % 10) / 10,
+                "sys": {"pod": "d"},
+                "dt_txt": "2025-01-01 12:00:00",
+            }
+        )
+    return {
+        "cod": "200",
+        "message": 0,
+        "cnt": points,
+        "list": items,
+        "city": {"id": 524901, "name": "Moscow", "country": "RU", "timezone": 10800},
+    }
+
+
+def measure(decode, raw: bytes, iterations: int) -> float:
+    """Возвращает среднее время декодирования одного ответа в микросекундах."""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        decode(raw)
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000, help="Повторов для ответа /weather")
+    parser.add_argument("--group-size", type=int, default=20, help="Городов в ответе /group")
+    args = parser.parse_args()
+
+    payloads = [
+        ("weather", json.dumps(make_current()).encode(), "decode_weather", args.iterations),
+        ("group", json.dumps(make_group(args.group_size)).encode(), "decode_group", args.iterations // 10),
+        ("forecast", json.dumps(make_forecast()).encode(), "decode_forecast", args.iterations // 20),
+    ]
+
+    backends = [get_json_backend(name) for name in available_backends()]
+    print(f"Бэкенды: {', '.join(b.name for b in backends)}")
+
+    for label, raw, method, iterations in payloads:
+        print(f"\n{label} ({len(raw)} байт, повторов: {max(iterations, 1)})")
+        baseline = None
+        for backend in backends[::-1]:  # json первым — он база для сравнения
+            micros = measure(getattr(backend, method), raw, max(iterations, 1))
+            baseline = baseline or micros
+            print(f"  {backend.name:<8} {micros:10.1f} мкс/ответ  x{baseline / micros:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Сквозная нагрузка на WeatherService с заданной частотой запросов.
+
+Запросы планируются по открытой модели: i-й запрос должен стартовать в момент i / rate,
+и задержка считается от запланированного момента. Если сервис не успевает, очередь
+растет и это видно в задержке, а не скрывается уменьшением частоты.
+
+Каждый запрос проходит те же этапы, что WeatherService.get_weather_with_notifications:
+    http    — запрос к API (OpenWeatherMapApiClient.fetch_weather_raw)
+    decode  — разбор тела ответа (JSON-бэкенд сервиса)
+    process — сохранение в историю, проверка правил и уведомления (process_weather_data)
+
+Без --url поднимается встроенный поддельный API (benchmarks.mock_owm_server),
+база данных — временная. --hedge-percentile и --breaker-error-rate включают дублирование
+запросов и circuit breaker клиента API: хвост задержки при редких зависаниях API
+(--stall-rate) сравнивается с запуском без них.
+
+Запуск:
+    uv run python -m benchmarks.bench_load --rate 50 --duration 20 --latency-ms 80 --jitter-ms 40 --rate-limit 0.02
+    uv run python -m benchmarks.bench_load --rate 20 --latency-ms 80 --stall-rate 0.02 --hedge-percentile 95
+"""
+
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from benchmarks.mock_owm_server import MockOwmServer, add_settings_arguments, settings_from_args
+from src.utils import metrics
+
+STAGES = ("http", "decode", "process", "total")
+
+
+@dataclass
+class LoadResults:
+    """Собранные замеры (мс) и ошибки. Дополняется из нескольких потоков под блокировкой."""
+
+    timings: dict[str, list[float]] = field(default_factory=lambda: {stage: [] for stage in STAGES})
+    errors: Counter = field(default_factory=Counter)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, timings: dict[str, float]) -> None:
+        with self.lock:
+            for stage, value in timings.items():
+                self.timings[stage].append(value)
+
+    def add_error(self, kind: str) -> None:
+        with self.lock:
+            self.errors[kind] += 1
+
+
+def describe_error(error: Exception) -> str:
+    """Короткое имя ошибки для сводки: HTTP-статус или класс исключения."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        return f"HTTP {response.status_code}"
+    return type(error).__name__
+
+
+def run_load(service, rate: float, duration: float, concurrency: int) -> tuple[LoadResults, int, float]:
+    """Подает запросы с частотой rate в течение duration секунд.
+
+    Returns:
+        Кортеж (результаты, отправлено запросов, фактическая длительность в секундах)
+    """
+    results = LoadResults()
+    total_requests = int(rate * duration)
+    next_index = iter(range(total_requests))
+    index_lock = threading.Lock()
+    started = time.perf_counter()
+
+    def worker() -> None:
+        while True:
+            with index_lock:
+                index = next(next_index, None)
+            if index is None:
+                return
+
+            scheduled = started + index / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            try:
+                t0 = time.perf_counter()
+                raw_body = service.api_client.fetch_weather_raw()
+                t1 = time.perf_counter()
+                weather_data = service.json_backend.decode_weather(raw_body)
+                t2 = time.perf_counter()
+                service.process_weather_data(weather_data, int((t2 - t0) * 1000))
+                t3 = time.perf_counter()
+            except Exception as e:
+                results.add_error(describe_error(e))
+                continue
+
+            results.add(
+                {
+                    "http": (t1 - t0) * 1000,
+                    "decode": (t2 - t1) * 1000,
+                    "process": (t3 - t2) * 1000,
+                    "total": (t3 - scheduled) * 1000,  # От запланированного старта, включая ожидание в очереди
+                }
+            )
+
+    threads = [threading.Thread(target=worker, name=f"load-{i}") for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results, total_requests, time.perf_counter() - started
+
+
+def print_report(results: LoadResults, sent: int, elapsed: float) -> None:
+    """Печатает перцентили по этапам, пропускную способность, долю ошибок, дубли и переходы breaker."""
+    succeeded = len(results.timings["total"])
+    failed = sum(results.errors.values())
+
+    print(f"\n📊 Запросов: {sent}, успешно: {succeeded}, ошибок: {failed} ({failed / max(sent, 1):.1%})")
+    print(f"⏱️ {elapsed:.1f} с, пропускная способность {succeeded / elapsed:.1f} запр/с")
+
+    print(f"\n{'Этап':<10} {'p50, мс':>10} {'p95, мс':>10} {'p99, мс':>10} {'макс, мс':>10}")
+    for stage in STAGES:
+        values = results.timings[stage]
+        if len(values) < 2:
+            print(f"{stage:<10} {'—':>10}")
+            continue
+        q = statistics.quantiles(values, n=100, method="inclusive")
+        print(f"{stage:<10} {q[49]:10.2f} {q[94]:10.2f} {q[98]:10.2f} {max(values):10.2f}")
+
+    if results.errors:
+        print("\n❌ Ошибки:")
+        for kind, count in results.errors.most_common():
+            print(f"  {kind}: {count}")
+
+    counters = metrics.REGISTRY.snapshot()["counters"]
+    for name, title in (
+        ("http_hedges_total", "🔁 Дублирующие запросы (чей ответ пришел первым)"),
+        ("circuit_breaker_transitions_total", "🔌 Переходы circuit breaker"),
+        ("circuit_breaker_rejected_total", "⛔ Отклонено circuit breaker"),
+    ):
+        if name in counters:
+            values = ", ".join(
+                f"{next(iter(labels.values()), 'всего')}: {value:g}" for labels, value in counters[name]["values"]
+            )
+            print(f"\n{title}: {values}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сквозная нагрузка на WeatherService")
+    parser.add_argument("--rate", type=float, default=20.0, help="Запросов в секунду")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность, с")
+    parser.add_argument("--concurrency", type=int, default=16, help="Потоков, отправляющих запросы")
+    parser.add_argument("--url", help="Адрес API без эндпоинта, например http://127.0.0.1:8765/data/2.5")
+    parser.add_argument("--db", type=Path, help="База данных (по умолчанию временная)")
+    parser.add_argument("--verbose", action="store_true", help="Показывать сообщения сервиса по каждому запросу")
+    parser.add_argument("--hedge-percentile", type=float, default=0.0, help="Дублировать запросы после перцентиля")
+    parser.add_argument("--breaker-error-rate", type=float, default=0.0, help="Порог ошибок circuit breaker (0..1)")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # База задается до создания сервиса: движок уведомлений берет общий менеджер БД
+        os.environ["WEATHER_DB_PATH"] = str(args.db or Path(tmp_dir) / "load.db")
+
+        from src.core.config_loader import Config
+        from src.core.weather_service import WeatherService
+
+        server = None
+        base_url = args.url
+        if base_url is None:
+            server = MockOwmServer(settings=settings_from_args(args))
+            server.start()
+            base_url = server.base_url
+            print(f"🌐 Встроенный поддельный API: {base_url}")
+
+        try:
+            config = Config(
+                api_key="load-test",
+                base_url=f"{base_url}/weather",
+                forecast_url=f"{base_url}/forecast",
+                hedge_percentile=args.hedge_percentile,
+                breaker_error_rate=args.breaker_error_rate,
+            )
+            metrics.enable_metrics(Path(tempfile.mkdtemp()))  # Счетчики дублей и breaker нужны для отчета
+            service = WeatherService(config)
+            print(f"🚀 {args.rate:g} запр/с в течение {args.duration:g} с, потоков: {args.concurrency}")
+            # Сервис печатает строки на каждый запрос — при нагрузке это только мешает отчету
+            with (
+                open(os.devnull, "w", encoding="utf-8") as devnull,
+                contextlib.redirect_stdout(sys.stdout if args.verbose else devnull),
+            ):
+                report = run_load(service, args.rate, args.duration, args.concurrency)
+            print_report(*report)
+        finally:
+            if server is not None:
+                server.stop()
+
+
+if __name__ == "__main__":
+    main()
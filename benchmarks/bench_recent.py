@@ -0,0 +1,104 @@
+"""Бенчмарк последних наблюдений: кольцевые буферы в памяти против чтения из SQLite.
+
+Временная база заполняется записями нескольких городов (одна запись в минуту на город).
+Одни и те же запросы выполняются через DatabaseManager с буферами и без них:
+последние записи истории, последние записи города и ряд значений города за период.
+Перед замером проверяется, что ответы совпадают.
+
+Запуск:
+    uv run python -m benchmarks.bench_recent --rows 100000 --cities 10
+"""
+
+import argparse
+import tempfile
+from dataclasses import replace
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from benchmarks.bench_suite import measure
+from src.database.db_manager import DatabaseManager
+from src.database.models import WeatherRecord
+from src.database.recent import ObservationRing
+
+START = datetime(2020, 1, 1)
+
+
+def fill_cities(db: DatabaseManager, rows: int, cities: list[str]) -> datetime:
+    """Заполняет базу записями городов по очереди и возвращает время последней записи."""
+    description_id = db.get_or_create_description("облачно с прояснениями").id
+    with db._get_connection() as conn:
+        conn.executemany(
+            """
+            INSERT INTO weather_history
+            (city, timestamp, temperature, feels_like, humidity, pressure, description_id, wind_speed,
+             response_time_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (
+                    cities[i % len(cities)],
+                    (START + timedelta(minutes=i // len(cities))).strftime("%Y-%m-%d %H:%M:%S"),
+                    (i % 400) / 10 - 15,
+                    (i % 400) / 10 - 17,
+                    40 + i % 60,
+                    990 + i % 40,
+                    description_id,
+                    (i % 150) / 10,
+                    100 + i % 300,
+                )
+                for i in range(rows)
+            ),
+        )
+    return START + timedelta(minutes=(rows - 1) // len(cities))
+
+
+def comparable(result: list[WeatherRecord] | tuple) -> list[WeatherRecord] | tuple:
+    """Ответ без created_at: в буфере время создания строки не хранится."""
+    if isinstance(result, tuple):
+        return result
+    return [replace(record, created_at=None) for record in result]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Последние наблюдения: буферы в памяти против SQLite")
+    parser.add_argument("--rows", type=int, default=100_000, help="Записей в истории")
+    parser.add_argument("--cities", type=int, default=10, help="Количество городов")
+    parser.add_argument("--repeat", type=int, default=5, help="Серий замера")
+    args = parser.parse_args()
+
+    cities = [f"City {i}" for i in range(args.cities)]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "recent.db"
+        buffered = DatabaseManager(str(db_path))
+        latest = fill_cities(buffered, args.rows, cities)
+        direct = DatabaseManager(str(db_path))
+        direct.recent = None
+
+        city = cities[0]
+        since = latest - timedelta(hours=3)
+        cases = [
+            ("get_recent_records(10)", lambda db: db.get_recent_records(10)),
+            ("get_recent_records(100)", lambda db: db.get_recent_records(100)),
+            ("get_recent_city_records(100)", lambda db: db.get_recent_city_records(city, 100)),
+            ("get_recent_series(3 ч)", lambda db: db.get_recent_series(city, "temperature", since)),
+        ]
+
+        print(f"{'Запрос':<30} {'SQLite, мкс':>12} {'память, мкс':>12} {'ускорение':>10}")
+        for name, call in cases:
+            if comparable(call(buffered)) != comparable(call(direct)):
+                raise AssertionError(f"{name}: ответ из памяти расходится с SQLite")
+            sqlite_us = measure(lambda call=call: call(direct), args.repeat)
+            memory_us = measure(lambda call=call: call(buffered), args.repeat)
+            print(f"{name:<30} {sqlite_us:>12.1f} {memory_us:>12.1f} {sqlite_us / memory_us:>9.1f}x")
+
+        for other in cities:
+            buffered.get_recent_city_records(other, 1)
+        capacity, slot = buffered.recent.capacity, ObservationRing.memory_per_slot()
+        print(
+            f"\nℹ️ Буфер: {capacity} наблюдений × {slot} байт = {capacity * slot / 1024:.1f} КБ "
+            f"на город; всего {buffered.recent.memory_bytes() / 1024:.0f} КБ для {args.cities} городов и общего буфера"
+        )
+
+
+if __name__ == "__main__":
+    main()
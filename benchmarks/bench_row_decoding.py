@@ -0,0 +1,122 @@
+"""Бенчмарк декодирования строк истории: sqlite3.Row + именованные поля против позиционного декодирования.
+
+Запуск:
+    uv run python -m benchmarks.bench_row_decoding --rows 1000000
+"""
+
+import argparse
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from dataclasses import field, fields, make_dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from src.database.db_manager import DatabaseManager
+from src.database.models import WeatherRecord
+
+# Прежнее представление записи: обычный @dataclass без __slots__
+LegacyWeatherRecord = make_dataclass(
+    "LegacyWeatherRecord",
+    [(f.name, f.type, field(default=f.default)) for f in fields(WeatherRecord)],
+)
+
+
+def fill_database(db: DatabaseManager, rows: int) -> None:
+    """Заполняет базу синтетическими записями."""
+    start = datetime(2020, 1, 1)
+    descriptions = [
+        db.get_or_create_description(text).id
+        for text in ["ясно", "облачно с прояснениями", "небольшой дождь", "снег", "туман"]
+    ]
+    with db._get_connection() as conn:
+        conn.executemany(
+            """
+            INSERT INTO weather_history
+            (city, timestamp, temperature, feels_like, humidity, pressure, description_id, wind_speed,
+             response_time_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (
+                    "Moscow",
+                    (start + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S"),
+                    (i % 400) / 10 - 15,
+                    (i % 400) / 10 - 17,
+                    40 + i % 60,
+                    990 + i % 40,
+                    descriptions[i % len(descriptions)],
+                    (i % 150) / 10,
+                    100 + i % 300,
+                )
+                for i in range(rows)
+            ),
+        )
+
+
+def read_legacy(db_path: Path) -> list:
+    """Чтение как до оптимизации: SELECT *, sqlite3.Row и сборка по именам колонок."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        cursor = conn.execute("""
+            SELECT h.*, d.text AS description FROM weather_history h
+            JOIN weather_descriptions d ON d.id = h.description_id
+            ORDER BY h.timestamp DESC
+        """)
+        records = []
+        for row in cursor.fetchall():
+            records.append(
+                LegacyWeatherRecord(
+                    id=row["id"],
+                    city=row["city"],
+                    timestamp=datetime.fromisoformat(row["timestamp"]),
+                    temperature=row["temperature"],
+                    feels_like=row["feels_like"],
+                    humidity=row["humidity"],
+                    pressure=row["pressure"],
+                    description=row["description"],
+                    wind_speed=row["wind_speed"],
+                    response_time_ms=row["response_time_ms"],
+                    created_at=datetime.fromisoformat(row["created_at"]) if row["created_at"] else None,
+                )
+            )
+        return records
+    finally:
+        conn.close()
+
+
+def measure(name: str, reader, rows: int) -> None:
+    """Измеряет скорость чтения и объем памяти на запись."""
+    started = time.perf_counter()
+    records = reader()
+    elapsed = time.perf_counter() - started
+    del records
+
+    tracemalloc.start()
+    records = reader()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+
+    print(f"{name:<28} {rows / elapsed:>14,.0f} строк/с {current / rows:>10.1f} байт/запись")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк декодирования строк weather_history")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Количество строк в таблице")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "bench.db"
+        db = DatabaseManager(str(db_path))
+        print(f"Заполняем базу: {args.rows:,} строк...")
+        fill_database(db, args.rows)
+
+        measure("sqlite3.Row + @dataclass", lambda: read_legacy(db_path), args.rows)
+        measure("позиционно + slots", lambda: db.get_recent_records(limit=0), args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Бенчмарк индекса правил (RuleIndex) против перебора всех правил ConditionEvaluator.
+
+Правила генерируются как у множества пользователей со своими порогами: все числовые
+условия и операторы, "contains" по описанию со словами из общего словаря, немного
+правил вне индекса ("eq" по описанию). Перед замером для каждого наблюдения проверяется,
+что индекс возвращает те же правила в том же порядке, что и перебор.
+
+Запуск:
+    uv run python -m benchmarks.bench_rule_index --sizes 10 1000 100000
+"""
+
+import argparse
+import random
+import time
+
+from src.database.models import NotificationRule
+from src.notifications.evaluator import ConditionEvaluator
+from src.notifications.rule_index import RuleIndex
+
+# Условие -> диапазон порогов (давление в мм рт. ст., как в правилах)
+NUMERIC_RANGES = {
+    "temperature": (-30, 35),
+    "feels_like": (-35, 30),
+    "humidity": (10, 100),
+    "wind_speed": (0, 25),
+    "pressure": (720, 790),
+    "temperature_humidity": (0, 40),
+}
+OPERATORS = ("gt", "gte", "lt", "lte", "eq")
+DESCRIPTIONS = (
+    "ясно",
+    "облачно с прояснениями",
+    "небольшой дождь",
+    "сильный дождь",
+    "ливень",
+    "снег",
+    "снег с дождем",
+    "туман",
+    "гроза",
+    "пасмурно",
+)
+KEYWORDS = ("дождь", "ливень", "снег", "туман", "гроза", "ясно", "облачно", "пасмурно", "прояснениями", "сильный")
+
+
+def make_rules(count: int, rng: random.Random) -> list[NotificationRule]:
+    """Синтетические правила в порядке (приоритет, id), как их возвращает база данных."""
+    rules = []
+    for rule_id in range(1, count + 1):
+        roll = rng.random()
+        if roll < 0.2:
+            condition_type, operator, threshold = "description", "contains", rng.choice(KEYWORDS)
+        elif roll < 0.21:
+            condition_type, operator, threshold = "description", "eq", rng.choice(DESCRIPTIONS)
+        else:
+            condition_type = rng.choice(tuple(NUMERIC_RANGES))
+            operator = rng.choice(OPERATORS)
+            low, high = NUMERIC_RANGES[condition_type]
+            # Для "eq" целые пороги, иначе правило почти никогда не сработает
+            threshold = str(rng.randint(low, high) if operator == "eq" else round(rng.uniform(low, high), 1))
+        rules.append(
+            NotificationRule(
+                id=rule_id,
+                name=f"Правило {rule_id}",
+                condition_type=condition_type,
+                operator=operator,
+                threshold_value=threshold,
+                message_template="{city}: {temperature}°C",
+                priority=rng.randint(1, 3),
+            )
+        )
+    rules.sort(key=lambda rule: (rule.priority, rule.id))
+    return rules
+
+
+def make_observations(count: int, rng: random.Random) -> list[dict]:
+    """Наблюдения погоды в формате, который получает движок уведомлений."""
+    return [
+        {
+            "city": "Moscow",
+            "temperature": round(rng.uniform(-25, 30), 1),
+            "feels_like": round(rng.uniform(-30, 28), 1),
+            "humidity": rng.randint(20, 100),
+            "pressure": rng.randint(970, 1040),
+            "description": rng.choice(DESCRIPTIONS),
+            "wind_speed": round(rng.uniform(0, 20), 1),
+        }
+        for _ in range(count)
+    ]
+
+
+def linear_match(rules: list[NotificationRule], weather_data: dict) -> list[NotificationRule]:
+    """Прежний способ: каждое правило проверяется по очереди."""
+    return [rule for rule in rules if ConditionEvaluator.evaluate(rule, weather_data)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Индекс правил против перебора")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000], help="Количество правил")
+    parser.add_argument("--observations", type=int, default=200, help="Наблюдений погоды для индекса")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)  # noqa: S311 - воспроизводимые синтетические данные
+    observations = make_observations(args.observations, rng)
+
+    print(
+        f"{'Правил':>8} {'сработало':>10} {'построение, мс':>15} {'перебор, мкс':>13} {'индекс, мкс':>12} "
+        f"{'ускорение':>10}"
+    )
+    for size in args.sizes:
+        rules = make_rules(size, rng)
+
+        t0 = time.perf_counter()
+        index = RuleIndex(rules)
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        # Перебор на 100 000 правил занимает десятые доли секунды: меньше наблюдений, но не меньше 3
+        linear_observations = observations[: max(3, min(len(observations), 2_000_000 // size))]
+        for weather_data in linear_observations:
+            expected = [rule.id for rule in linear_match(rules, weather_data)]
+            actual = [rule.id for rule in index.match(weather_data)]
+            if actual != expected:
+                raise AssertionError(f"Индекс расходится с перебором на {weather_data}")
+
+        t0 = time.perf_counter()
+        fired = 0
+        for weather_data in linear_observations:
+            fired += len(linear_match(rules, weather_data))
+        linear_us = (time.perf_counter() - t0) / len(linear_observations) * 1e6
+
+        t0 = time.perf_counter()
+        for weather_data in observations:
+            index.match(weather_data)
+        index_us = (time.perf_counter() - t0) / len(observations) * 1e6
+
+        print(
+            f"{size:>8} {fired / len(linear_observations):>10.0f} {build_ms:>15.2f} "
+            f"{linear_us:>13.1f} {index_us:>12.1f} {linear_us / index_us:>9.1f}x"
+        )
+
+    print("\nℹ️ Время на одно наблюдение. Индекс возвращает все сработавшие правила, поэтому его время")
+    print("   растет с их количеством; перебор всегда проверяет все правила.")
+
+
+if __name__ == "__main__":
+    main()
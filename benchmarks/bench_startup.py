@@ -0,0 +1,106 @@
+"""Регрессионный бенчмарк времени запуска (python -X importtime) для CLI и GUI.
+
+Каждый сценарий импортируется в отдельном процессе. В бюджет идут только модули,
+которых нет в пустом запуске интерпретатора (python -c pass, замер в том же прогоне):
+encodings, site и остальная загрузка самого Python от проекта не зависят.
+Скрипт завершается с кодом 1, если время импорта превышает бюджет или загружен
+запрещенный модуль.
+
+Запуск:
+    uv run python -m benchmarks.bench_startup
+"""
+
+import argparse
+import subprocess  # noqa: S404
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+@dataclass
+class StartupScenario:
+    """Сценарий запуска: импортируемый модуль, бюджет и запрещенные пакеты."""
+
+    name: str
+    module: str
+    budget_ms: float
+    forbidden: tuple[str, ...] = ()
+
+
+SCENARIOS = [
+    # Сама точка входа только разбирает аргументы
+    StartupScenario("main", "src.main", budget_ms=20, forbidden=("PyQt6", "requests", "src.cli", "src.gui")),
+    StartupScenario("cli", "src.cli", budget_ms=250, forbidden=("PyQt6", "src.gui")),
+    StartupScenario("gui", "src.gui.main_window", budget_ms=600),
+]
+
+
+def measure_import(module: str | None, baseline: frozenset[str] = frozenset()) -> tuple[float, set[str]]:
+    """Импортирует модуль в отдельном процессе и возвращает (время в мс, загруженные модули).
+
+    Args:
+        module: Импортируемый модуль; None — пустой запуск интерпретатора
+        baseline: Модули пустого запуска: их время не учитывается
+    """
+    statement = "pass" if module is None else f"import {module}"
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        last_line = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else ""
+        raise RuntimeError(f"не удалось импортировать {module}: {last_line}")
+
+    total_us = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        # Формат: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _cumulative, name = line.removeprefix("import time:").split("|")
+        name = name.strip()
+        modules.add(name)
+        if name not in baseline:
+            total_us += int(self_us)
+    return total_us / 1000, modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Проверка бюджета времени импорта")
+    parser.add_argument("--repeat", type=int, default=5, help="Количество замеров (берется минимум)")
+    args = parser.parse_args()
+
+    _, baseline = measure_import(None)
+    baseline = frozenset(baseline)
+
+    failed = False
+    for scenario in SCENARIOS:
+        try:
+            samples = [measure_import(scenario.module, baseline) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"⚠️  {scenario.name:<5} пропущен: {e}")
+            continue
+
+        elapsed_ms = min(sample[0] for sample in samples)
+        modules = samples[0][1]
+        leaked = sorted(
+            name for name in modules if any(name == f or name.startswith(f"{f}.") for f in scenario.forbidden)
+        )
+
+        ok = elapsed_ms <= scenario.budget_ms and not leaked
+        failed = failed or not ok
+        status = "✅" if ok else "❌"
+        print(f"{status} {scenario.name:<5} {elapsed_ms:8.1f} мс (бюджет {scenario.budget_ms:.0f} мс)")
+        if leaked:
+            print(f"   Загружены запрещенные модули: {', '.join(leaked)}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
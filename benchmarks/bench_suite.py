@@ -0,0 +1,256 @@
+"""Набор микробенчмарков горячих путей: разбор ответа, правила, база данных, история и экспорт.
+
+Каждый замер выполняется на временной базе. Результаты (мкс на операцию) пишутся в JSON
+и сравниваются с сохраненной базовой линией: замедление больше порога считается регрессией,
+и скрипт завершается с кодом 1.
+
+Запуск:
+    uv run python -m benchmarks.bench_suite                  # замер и сравнение с baseline.json
+    uv run python -m benchmarks.bench_suite --save-baseline  # обновить базовую линию
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+from collections.abc import Callable
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+from benchmarks.bench_json_parse import make_current
+from benchmarks.bench_row_decoding import fill_database
+from src.core.data_parser import parse_openweathermap_response
+from src.database.db_manager import DatabaseManager, get_db_manager
+from src.database.models import WeatherRecord
+from src.notifications.evaluator import ConditionEvaluator
+
+BENCH_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "latest.json"
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+EXPORT_ROWS = 10_000
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    """Возвращает лучшее время одной операции в микросекундах.
+
+    Количество повторов в серии подбирается автоматически (серия не короче 0.2 с),
+    из нескольких серий берется минимум — он меньше всего зависит от фоновой нагрузки.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1_000_000
+
+
+def open_database(tmp_dir: Path, name: str, rows: int) -> DatabaseManager:
+    """Создает временную базу с rows записями и делает ее общей (get_db_manager)."""
+    db_path = tmp_dir / f"{name}.db"
+    os.environ["WEATHER_DB_PATH"] = str(db_path)
+    get_db_manager.cache_clear()
+    db = get_db_manager()
+    fill_database(db, rows)
+    return db
+
+
+Case = tuple[str, Callable[[], object], int]  # (имя замера, операция, серий замера)
+
+
+def parser_cases(repeat: int) -> list[Case]:
+    """Разбор ответа /weather из словаря."""
+    payload = make_current()
+    return [("parse_openweathermap_response", partial(parse_openweathermap_response, payload), repeat)]
+
+
+def rule_cases(db: DatabaseManager, repeat: int) -> list[Case]:
+    """Проверка и форматирование всех базовых правил для одной записи."""
+    rules = db.get_active_notification_rules()
+    description = db.get_or_create_description("небольшой дождь")
+    weather_data = {
+        "city": "Moscow",
+        "temperature": -3.5,
+        "feels_like": -8.0,
+        "humidity": 85,
+        "pressure": 960,
+        "description": description.text_lower,
+        "description_entry": description,
+        "wind_speed": 12.0,
+    }
+    evaluator = ConditionEvaluator()
+
+    def evaluate_all() -> None:
+        for rule in rules:
+            evaluator.evaluate(rule, weather_data)
+
+    def format_all() -> None:
+        for rule in rules:
+            evaluator.format_message(rule, weather_data)
+
+    return [
+        (f"evaluate_all_rules[{len(rules)}]", evaluate_all, repeat),
+        (f"format_message_all_rules[{len(rules)}]", format_all, repeat),
+    ]
+
+
+def database_cases(tmp_dir: Path, sizes: list[int], repeat: int) -> list[Case]:
+    """Сохранение и чтение истории при разном размере таблицы."""
+    cases = []
+    for size in sizes:
+        db = open_database(tmp_dir, f"history_{size}", size)
+        record = WeatherRecord(
+            city="Moscow",
+            timestamp=datetime(2030, 1, 1),
+            temperature=-3.5,
+            feels_like=-8.0,
+            humidity=85,
+            pressure=1000,
+            description="небольшой дождь",
+            wind_speed=4.0,
+        )
+        cases += [
+            # Каждое сохранение — отдельная транзакция с записью на диск, одной серии достаточно
+            (f"save_weather_record[{size}]", partial(db.save_weather_record, record), 1),
+            (f"get_recent_records_10[{size}]", partial(db.get_recent_records, limit=10), repeat),
+            (f"get_recent_records_100[{size}]", partial(db.get_recent_records, limit=100), repeat),
+        ]
+    return cases
+
+
+def history_cases(tmp_dir: Path, export_file: str, repeat: int) -> list[Case]:
+    """Форматирование истории и экспорт в CSV (модуль GUI без Qt).
+
+    HistoryManager работает с общей базой, поэтому эта база открывается последней.
+    """
+    from src.gui.history_manager import HistoryManager
+
+    open_database(tmp_dir, "export", EXPORT_ROWS)
+    return [
+        ("get_recent_history_100", partial(HistoryManager.get_recent_history, limit=100), repeat),
+        (f"export_to_csv[{EXPORT_ROWS}]", partial(HistoryManager.export_to_csv, export_file), 1),
+    ]
+
+
+def run_suite(
+    sizes: list[int], repeat: int, baseline: dict[str, float] | None = None, threshold: float = 0.5
+) -> dict[str, float]:
+    """Выполняет все замеры и возвращает {имя замера: мкс на операцию}.
+
+    Замеры, которые медленнее базовой линии больше чем на threshold, повторяются один раз
+    и берется лучший результат: так кратковременная фоновая нагрузка не дает ложных регрессий.
+    """
+    results: dict[str, float] = {}
+    previous_db_path = os.environ.get("WEATHER_DB_PATH")
+    export_file = f"bench_export_{os.getpid()}.csv"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        try:
+            cases = parser_cases(repeat)
+            cases += rule_cases(open_database(tmp_dir, "rules", 0), repeat)
+            cases += database_cases(tmp_dir, sizes, repeat)
+            cases += history_cases(tmp_dir, export_file, repeat)
+
+            for name, func, case_repeat in cases:
+                results[name] = measure(func, case_repeat)
+
+            for name, func, case_repeat in cases:
+                base = (baseline or {}).get(name)
+                if base is not None and results[name] > base * (1 + threshold):
+                    print(f"🔁 Перепроверка: {name}")
+                    results[name] = min(results[name], measure(func, case_repeat))
+        finally:
+            from src.gui.history_manager import HistoryManager
+
+            (HistoryManager._get_export_directory() / export_file).unlink(missing_ok=True)
+            get_db_manager.cache_clear()
+            if previous_db_path is None:
+                os.environ.pop("WEATHER_DB_PATH", None)
+            else:
+                os.environ["WEATHER_DB_PATH"] = previous_db_path
+
+    return results
+
+
+def environment() -> dict[str, str]:
+    """Описание окружения: сравнивать результаты имеет смысл только на той же машине."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def compare(results: dict[str, float], baseline: dict, threshold: float) -> bool:
+    """Печатает сравнение с базовой линией. Возвращает True, если регрессий нет."""
+    if baseline.get("environment") != environment():
+        print("⚠️ Базовая линия снята в другом окружении, сравнение приблизительное")
+
+    ok = True
+    base_results = baseline.get("results", {})
+    print(f"\n{'Замер':<40} {'мкс/оп':>12} {'база':>12} {'изм.':>8}")
+    for name, micros in results.items():
+        base = base_results.get(name)
+        if base is None:
+            print(f"{name:<40} {micros:12.2f} {'—':>12} {'новый':>8}")
+            continue
+        change = micros / base - 1
+        regressed = change > threshold
+        ok = ok and not regressed
+        mark = "❌" if regressed else "  "
+        print(f"{name:<40} {micros:12.2f} {base:12.2f} {change:+7.0%} {mark}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Микробенчмарки горячих путей с проверкой регрессий")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, DEFAULT_SIZES)),
+        help="Размеры таблицы истории через запятую (по умолчанию 1000,10000,100000)",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Серий замера (берется лучшая)")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="Файл результатов JSON")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Файл базовой линии JSON")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Допустимое замедление (0.5 = 50%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="Записать результаты как базовую линию")
+    args = parser.parse_args()
+
+    baseline = None
+    if not args.save_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    print(f"⏱️ Замеры на временных базах: {', '.join(map(str, sizes))} записей")
+    results = run_suite(sizes, args.repeat, baseline and baseline.get("results"), args.threshold)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "unit": "us_per_op",
+        "results": results,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"💾 Результаты: {args.output}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"📌 Базовая линия обновлена: {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"⚠️ Базовая линия не найдена ({args.baseline}), сравнение пропущено")
+        return
+
+    if not compare(results, baseline, args.threshold):
+        print(f"\n❌ Есть замедления больше {args.threshold:.0%}")
+        sys.exit(1)
+    print("\n✅ Регрессий нет")
+
+
+if __name__ == "__main__":
+    main()
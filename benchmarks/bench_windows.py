@@ -0,0 +1,123 @@
+"""Бенчмарк условий на тенденцию: скользящие окна в памяти против запроса истории на каждое наблюдение.
+
+Временная база заполняется наблюдениями одного города (одно в --step-minutes минут).
+Для каждого из --observations следующих наблюдений нужны значения условий окон:
+изменение давления за 3 часа, отклонение температуры от среднего за 7 дней и т. д.
+Окна WindowStatistics обновляются за O(1) на наблюдение; для сравнения те же значения
+считаются по ряду из weather_history, прочитанному заново для каждого наблюдения.
+Перед замером проверяется, что значения совпадают.
+
+Запуск:
+    uv run python -m benchmarks.bench_windows --days 30 --step-minutes 10
+"""
+
+import argparse
+import math
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from src.database.db_manager import DatabaseManager
+from src.notifications.windows import WindowStatistics, parse_window_condition, sample_value
+
+START = datetime(2020, 1, 1)
+CITY = "Москва"
+CONDITIONS = ("pressure:delta:3h", "temperature:anomaly:7d", "temperature:min:1d", "wind_speed:max:6h")
+
+
+def observation(i: int, step: timedelta) -> dict:
+    """Наблюдение номер i: суточный ход температуры и медленные волны давления."""
+    return {
+        "city": CITY,
+        "timestamp": START + i * step,
+        "temperature": round(10 + 8 * math.sin(i / 72) + (i % 7) / 10, 1),
+        "feels_like": 8.0,
+        "humidity": 60,
+        "pressure": round(1013 + 15 * math.sin(i / 500) + (i % 5) / 10, 1),
+        "wind_speed": round(3 + (i % 40) / 10, 1),
+    }
+
+
+def fill_history(db: DatabaseManager, observations: list[dict]) -> None:
+    description_id = db.get_or_create_description("ясно").id
+    with db._get_connection() as conn:
+        conn.executemany(
+            """
+            INSERT INTO weather_history
+            (city, timestamp, temperature, feels_like, humidity, pressure, description_id, wind_speed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (
+                    CITY,
+                    o["timestamp"].strftime("%Y-%m-%d %H:%M:%S"),
+                    *(o[field] for field in ("temperature", "feels_like", "humidity", "pressure")),
+                    description_id,
+                    o["wind_speed"],
+                )
+                for o in observations
+            ),
+        )
+
+
+def values_from_history(db: DatabaseManager, timestamp: datetime, conditions: dict) -> dict[str, float]:
+    """Значения условий по ряду из истории: один запрос на условие."""
+    values = {}
+    for condition_type, spec in conditions.items():
+        _, series = db.get_history_series(CITY, spec.field, timestamp - timedelta(seconds=spec.seconds), timestamp)
+        samples = [sample_value(spec.field, value) for value in series]
+        mean = sum(samples) / len(samples)
+        values[condition_type] = {
+            "mean": mean,
+            "min": min(samples),
+            "max": max(samples),
+            "delta": samples[-1] - samples[0],
+            "anomaly": samples[-1] - mean,
+        }[spec.stat]
+    return values
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Условия на тенденцию: окна в памяти против запросов истории")
+    parser.add_argument("--days", type=int, default=30, help="Дней истории до замера")
+    parser.add_argument("--step-minutes", type=int, default=10, help="Интервал между наблюдениями, мин")
+    parser.add_argument("--observations", type=int, default=500, help="Новых наблюдений в замере")
+    args = parser.parse_args()
+
+    step = timedelta(minutes=args.step_minutes)
+    history_rows = args.days * 24 * 60 // args.step_minutes
+    observations = [observation(i, step) for i in range(history_rows + args.observations)]
+    conditions = {condition_type: parse_window_condition(condition_type) for condition_type in CONDITIONS}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(str(Path(tmp) / "windows.db"))
+        fill_history(db, observations)
+        new = observations[history_rows:]
+
+        windows = WindowStatistics(db)
+        started = time.perf_counter()
+        restored = windows.observe(CITY, new[0]["timestamp"], new[0], conditions)
+        restore_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        incremental = [windows.observe(CITY, o["timestamp"], o, conditions) for o in new[1:]]
+        windows_us = (time.perf_counter() - started) / len(incremental) * 1_000_000
+
+        started = time.perf_counter()
+        direct = [values_from_history(db, o["timestamp"], conditions) for o in new[1:]]
+        history_us = (time.perf_counter() - started) / len(direct) * 1_000_000
+
+        expected_restored = values_from_history(db, new[0]["timestamp"], conditions)
+        for got, expected in zip([restored, *incremental], [expected_restored, *direct], strict=True):
+            if any(not math.isclose(got[c], expected[c], abs_tol=1e-6) for c in CONDITIONS):
+                raise AssertionError("Значения окон расходятся с рядом из истории")
+
+    print(f"📈 История: {history_rows} наблюдений, новых наблюдений: {len(new)}, условий: {len(CONDITIONS)}")
+    print(f"🔁 Восстановление окон из истории (один раз): {restore_ms:.1f} мс")
+    print(f"{'запросы истории, мкс':>22} {'окна в памяти, мкс':>20} {'ускорение':>10}")
+    print(f"{history_us:>22.1f} {windows_us:>20.1f} {history_us / windows_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
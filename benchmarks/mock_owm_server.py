@@ -0,0 +1,200 @@
+"""Локальная замена OpenWeatherMap API для замеров без ключа и сети.
+
+Отдает правдоподобные ответы /weather, /group и /forecast (по последнему сегменту пути),
+поэтому в .env достаточно заменить хост:
+
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8765/data/2.5/weather
+    OPENWEATHER_FORECAST_URL=http://127.0.0.1:8765/data/2.5/forecast
+
+Задержка, доля ошибок 500 и доля ответов 429 настраиваются, как и доля редких
+зависаний на несколько секунд (хвост задержки, против которого дублируются запросы).
+
+POST /webhook принимает пачки уведомлений от WebhookSink (с той же задержкой и долей
+ошибок 500) и считает их — для проверки доставки без внешнего сервиса:
+
+    NOTIFICATION_SINKS=webhook
+    NOTIFICATION_WEBHOOK_URL=http://127.0.0.1:8765/webhook
+
+Запуск:
+    uv run python -m benchmarks.mock_owm_server --latency-ms 80 --jitter-ms 40 --error-rate 0.01 --rate-limit 0.02
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.bench_json_parse import make_current, make_forecast, make_group
+
+
+@dataclass
+class MockSettings:
+    """Поведение сервера."""
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0  # Равномерная добавка 0..jitter_ms к задержке
+    error_rate: float = 0.0  # Доля ответов 500
+    rate_limit: float = 0.0  # Доля ответов 429
+    stall_rate: float = 0.0  # Доля запросов /weather, /group и /forecast, зависающих на stall_ms
+    stall_ms: float = 3000.0
+    group_size: int = 20
+
+
+class MockOwmHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов: настройки берутся из сервера."""
+
+    server: "MockOwmServer"
+
+    def do_GET(self) -> None:
+        settings = self.server.settings
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        endpoint = url.path.rstrip("/").rsplit("/", 1)[-1]
+
+        delay = settings.latency_ms + random.uniform(0, settings.jitter_ms)  # noqa: S311
+        if random.random() < settings.stall_rate:  # noqa: S311
+            delay += settings.stall_ms
+        if delay:
+            time.sleep(delay / 1000)
+
+        roll = random.random()  # noqa: S311
+        if roll < settings.rate_limit:
+            self._send_json(
+                HTTPStatus.TOO_MANY_REQUESTS,
+                {"cod": 429, "message": "Your account is temporary blocked due to exceeding of requests limitation"},
+                headers={"Retry-After": "1"},
+            )
+            return
+        if roll < settings.rate_limit + settings.error_rate:
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"cod": 500, "message": "Internal error"})
+            return
+
+        index = random.randrange(1000)  # noqa: S311 - разные температуры и описания в ответах
+        city = params.get("q", ["Moscow"])[0]
+        if endpoint == "weather":
+            payload = {**make_current(index), "name": city}
+        elif endpoint == "group":
+            payload = make_group(settings.group_size)
+        elif endpoint == "forecast":
+            payload = make_forecast()
+            payload["city"]["name"] = city
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"cod": "404", "message": "Not found"})
+            return
+
+        self._send_json(HTTPStatus.OK, payload)
+
+    def do_POST(self) -> None:
+        settings = self.server.settings
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urlparse(self.path).path.rstrip("/").rsplit("/", 1)[-1] != "webhook":
+            self._send_json(HTTPStatus.NOT_FOUND, {"cod": "404", "message": "Not found"})
+            return
+
+        delay = settings.latency_ms + random.uniform(0, settings.jitter_ms)  # noqa: S311
+        if delay:
+            time.sleep(delay / 1000)
+        if random.random() < settings.error_rate:  # noqa: S311
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"cod": 500, "message": "Internal error"})
+            return
+
+        received = len(json.loads(body)["notifications"])
+        with self.server.webhook_lock:
+            self.server.webhook_batches += 1
+            self.server.webhook_notifications += received
+        self._send_json(HTTPStatus.OK, {"received": received})
+
+    def _send_json(self, status: HTTPStatus, payload: dict, headers: dict[str, str] | None = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """Не пишет каждую строку доступа в stderr: при нагрузке это тысячи строк в секунду."""
+
+
+class MockOwmServer(ThreadingHTTPServer):
+    """HTTP-сервер с поддельным API. Каждый запрос обрабатывается в своем потоке."""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, settings: MockSettings | None = None):
+        """Создает сервер. port=0 — выбрать свободный порт."""
+        super().__init__((host, port), MockOwmHandler)
+        self.settings = settings or MockSettings()
+        self.webhook_lock = threading.Lock()
+        self.webhook_batches = 0
+        self.webhook_notifications = 0
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        """Адрес вида http://127.0.0.1:PORT/data/2.5 (без эндпоинта)."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/data/2.5"
+
+    def start(self) -> None:
+        """Запускает сервер в фоновом потоке."""
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-owm", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Останавливает сервер и освобождает порт."""
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser) -> None:
+    """Добавляет параметры поведения сервера (используются и генератором нагрузки)."""
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Задержка ответа, мс")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Случайная добавка к задержке 0..N мс")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 500 (0..1)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Доля ответов 429 (0..1)")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Доля зависающих запросов (0..1)")
+    parser.add_argument("--stall-ms", type=float, default=3000.0, help="Длительность зависания, мс")
+
+
+def settings_from_args(args: argparse.Namespace) -> MockSettings:
+    """Собирает MockSettings из разобранных аргументов."""
+    return MockSettings(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        stall_rate=args.stall_rate,
+        stall_ms=args.stall_ms,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Локальная замена OpenWeatherMap API")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес (по умолчанию 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Порт (по умолчанию 8765)")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockOwmServer(args.host, args.port, settings_from_args(args))
+    print(f"🌐 Поддельный API: {server.base_url}/weather, /group, /forecast (Ctrl+C — остановить)")
+    print(f"📨 Вебхук уведомлений: http://{args.host}:{server.server_address[1]}/webhook")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Остановлен")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,17 @@
 """Консольная версия приложения."""
 
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
 from requests.exceptions import RequestException
 
+from src.core.daemon_client import DaemonError, get_daemon_client
 from src.core.weather_service import WeatherService
+from src.database.db_manager import get_db_manager
 from src.utils.pressure_converter import convert_pressure_to_mmhg
+from src.utils.time_format import format_age
 
 
 def display_weather_cli(weather_data, notifications: list[str] | None = None) -> None:
@@ -19,6 +27,8 @@ def display_weather_cli(weather_data, notifications: list[str] | None = None) ->
     print(f"☁️ Описание:        {weather_data.description}")
     print(f"💨 Скорость ветра:  {weather_data.wind_speed:.1f} м/с")
     print("=" * 50)
+    if weather_data.age_seconds is not None:
+        print(f"🕒 Наблюдение из истории {format_age(weather_data.age_seconds)} назад, погода обновляется в фоне")
 
     if notifications:
         print(f"\n🔔 АКТИВНЫЕ РЕКОМЕНДАЦИИ ({len(notifications)}):")
@@ -27,21 +37,69 @@ def display_weather_cli(weather_data, notifications: list[str] | None = None) ->
             print(f"  {i}. {notification}")
 
 
-def main() -> None:
-    """Запуск консольной версии."""
+def run_weather(latitude: float | None = None, longitude: float | None = None) -> None:
+    """Получает текущую погоду (в городе по умолчанию или по координатам) и выводит ее с рекомендациями."""
     print("=" * 50)
     print("🌤️  Weather Parser Notifier (CLI Version)")
     print("=" * 50)
 
+    if (latitude is None) != (longitude is None):
+        print("\n❌ Координаты задаются вместе: --lat и --lon")
+        return
+
+    # Если запущен демон, погода берется из его кэша без настройки сервиса и запроса к API
+    client = get_daemon_client()
+    if client is not None:
+        try:
+            weather_data, _, notifications, cached = client.get_weather(latitude=latitude, longitude=longitude)
+        except DaemonError as e:
+            print(f"\n❌ Ошибка демона погоды: {e}")
+            return
+        except OSError as e:
+            print(f"⚠️ Демон погоды недоступен ({e}), запрашиваю погоду напрямую")
+        else:
+            print("⚡ Погода из кэша демона" if cached else "⚡ Погода получена демоном")
+            display_weather_cli(weather_data, notifications)
+            return
+
     try:
         service = WeatherService()
         print("🔧 Загрузка настроек приложения погоды...")
         print("🌍 Запрашиваю погоду на сервере OpenWeather...")
         print("🔍 Обработка и подготовка данных для вывода...")
 
-        # Используем новый метод с уведомлениями
-        weather_data, notifications = service.get_weather_with_notifications()
+        if latitude is not None:
+            weather_data, _, notifications, cached = service.get_weather_at(latitude, longitude)
+            if cached:
+                print("⚡ Погода ячейки сетки уже получена недавно, запрос к API не понадобился")
+        else:
+            # Используем новый метод с уведомлениями
+            weather_data, notifications = service.get_weather_with_notifications()
         display_weather_cli(weather_data, notifications)
+        # Погода из истории: свежая сохраняется в фоне, выход ждет ее сохранения
+        service.wait_for_refreshes()
+
+    except ValueError as e:
+        print(f"\n❌ Ошибка конфигурации или данных: {e}")
+    except RequestException as e:
+        print(f"\n❌ Ошибка при обращении к серверу погоды: {e}")
+    except Exception as e:
+        print(f"\n❌ Неожиданная ошибка: {e}")
+
+
+def run_forecast(args: argparse.Namespace) -> None:
+    """Получает прогноз и выводит предупреждения на ближайшие часы."""
+    try:
+        service = WeatherService()
+        print("🌍 Запрашиваю прогноз на сервере OpenWeather...")
+        forecast, alerts = service.get_forecast_with_notifications(hours=args.hours)
+
+        print(f"\n🔮 ПРОГНОЗ ДЛЯ ГОРОДА {forecast.city.upper()} НА {args.hours} Ч.")
+        print("=" * 50)
+        if not alerts:
+            print("✅ Предупреждений нет")
+        for i, alert in enumerate(alerts, 1):
+            print(f"  {i}. {alert}")
 
     except ValueError as e:
         print(f"\n❌ Ошибка конфигурации или данных: {e}")
@@ -51,5 +109,321 @@ def main() -> None:
         print(f"\n❌ Неожиданная ошибка: {e}")
 
 
+def run_ingest(args: argparse.Namespace) -> None:
+    """Загружает архивы ответов API в историю."""
+    # Импорт здесь: пул процессов и разбор архивов не нужны остальным командам
+    from src.core.ingest import ArchiveIngestor
+
+    ingestor = ArchiveIngestor(
+        workers=args.workers,
+        batch_rows=args.batch_size,
+        with_notifications=args.with_notifications,
+    )
+    stats = ingestor.ingest(args.paths, restart=args.restart)
+
+    print("=" * 50)
+    print(f"📦 Файлов: {stats.files}, записей: {stats.rows}, ошибок разбора: {stats.errors}")
+    print(f"⏱️ {stats.elapsed:.1f} с, {stats.rows_per_second:.0f} записей/с")
+
+
+def run_stats(args: argparse.Namespace) -> None:
+    """Выводит накопленные метрики этапов запроса."""
+    from src.utils import metrics
+
+    if args.reset:
+        for filename in (metrics.STATE_FILENAME, metrics.PROMETHEUS_FILENAME):
+            (metrics.METRICS_DIR / filename).unlink(missing_ok=True)
+        print("🧹 Метрики сброшены")
+        return
+
+    state = metrics.load_state()
+    if not state["counters"] and not state["histograms"]:
+        print("ℹ️ Метрик нет. Включите сбор: METRICS_ENABLED=true в .env")
+        return
+
+    if args.prometheus:
+        print(metrics.render_prometheus(state), end="")
+        return
+
+    print(f"\n{'Этап':<28} {'кол-во':>8} {'сред., мс':>10} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}")
+    print("-" * 78)
+    for name, data in sorted(state["histograms"].items()):
+        count = sum(data["counts"])
+        p50, p95, p99 = (
+            metrics.estimate_quantile(data["buckets"], data["counts"], q) * 1000 for q in (0.5, 0.95, 0.99)
+        )
+        print(f"{name:<28} {count:>8} {data['sum'] / count * 1000:>10.2f} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f}")
+
+    print(f"\n{'Счетчик':<28} {'метки':<24} {'значение':>10}")
+    print("-" * 64)
+    for name, data in sorted(state["counters"].items()):
+        for labels, value in data["values"]:
+            label_text = ", ".join(f"{k}={v}" for k, v in labels.items()) or "—"
+            print(f"{name:<28} {label_text:<24} {value:>10g}")
+
+    print("\nℹ️ Перцентили оценены по корзинам гистограмм")
+
+
+def run_rules(args: argparse.Namespace) -> None:
+    """Показывает правила с порогами, паузами и гистерезисом, при необходимости меняет их."""
+    db_manager = get_db_manager()
+
+    rule_set_id = None
+    if args.rule_set is not None:
+        rule_set_id = db_manager.find_rule_set(args.rule_set)
+        if rule_set_id is None:
+            print(f"❌ Набор правил {args.rule_set} не найден")
+            return
+
+    if args.rule_id is not None:
+        if args.cooldown is None and args.hysteresis is None and args.threshold is None and args.active is None:
+            print("❌ Укажите --threshold, --cooldown, --hysteresis, --enable или --disable")
+            return
+        if args.city is not None and (args.threshold is not None or args.active is not None):
+            print("❌ Порог и включение задаются для всех городов, --city — только с --cooldown и --hysteresis")
+            return
+        found = True
+        if args.cooldown is not None or args.hysteresis is not None:
+            found = db_manager.set_rule_cooldown(args.rule_id, args.cooldown, args.hysteresis, city=args.city)
+        if found and args.threshold is not None:
+            found = db_manager.set_rule_threshold(args.rule_id, args.threshold)
+        if found and args.active is not None:
+            found = db_manager.set_rule_active(args.rule_id, args.active)
+        if not found:
+            print(f"❌ Правило {args.rule_id} не найдено")
+            return
+        print(f"✅ Правило {args.rule_id} обновлено" + (f" для города {args.city}" if args.city else ""))
+
+    rules = (
+        db_manager.get_active_notification_rules()
+        if rule_set_id is None
+        else db_manager.get_rule_set_rules(rule_set_id)
+    )
+    city_settings = db_manager.get_rule_city_settings()
+    print(f"\n{'ID':>3} {'Правило':<22} {'порог':>8} {'пауза, мин':>10} {'гистерезис':>10}")
+    print("-" * 57)
+    for rule in rules:
+        print(
+            f"{rule.id:>3} {rule.name:<22} {rule.threshold_value:>8} {rule.cooldown_minutes:>10} {rule.hysteresis:>10g}"
+        )
+        for (rule_id, city), (cooldown, hysteresis) in sorted(city_settings.items()):
+            if rule_id == rule.id:
+                cooldown_text = "—" if cooldown is None else str(cooldown)
+                hysteresis_text = "—" if hysteresis is None else f"{hysteresis:g}"
+                print(f"{'':>3}   └ {city:<18} {'':>8} {cooldown_text:>10} {hysteresis_text:>10}")
+
+    if rule_set_id is None:
+        inactive = db_manager.get_inactive_notification_rules()
+        if inactive:
+            print("\nВыключены (включить: weather-cli rules ID --enable):")
+            for rule in inactive:
+                print(f"{rule.id:>3} {rule.name:<22} {rule.condition_type} {rule.operator} {rule.threshold_value}")
+
+
+def run_subscribe(args: argparse.Namespace) -> None:
+    """Подписывает пользователя на город, отменяет подписку или показывает все подписки."""
+    db_manager = get_db_manager()
+
+    if args.user is not None:
+        if args.city is None:
+            print("❌ Укажите город")
+            return
+        user_id = db_manager.get_or_create_user(args.user)
+        if args.remove:
+            removed = db_manager.unsubscribe(user_id, args.city)
+            print(f"🗑️ Отменено подписок: {removed}")
+        else:
+            # Без --rule-set у пользователя свой набор: копия общих правил, пороги меняются командой rules
+            rule_set_id = db_manager.get_or_create_rule_set(args.rule_set or args.user, user_id)
+            if db_manager.subscribe(user_id, args.city, rule_set_id):
+                print(f"✅ {args.user} подписан на {args.city} (набор правил {args.rule_set or args.user})")
+            else:
+                print("ℹ️ Подписка уже есть")
+
+    subscriptions = db_manager.get_user_subscriptions()
+    if not subscriptions:
+        print("ℹ️ Подписок нет. Добавьте: weather-cli subscribe ПОЛЬЗОВАТЕЛЬ ГОРОД")
+        return
+    print(f"\n{'Пользователь':<20} {'Город':<20} {'Набор правил':<20}")
+    print("-" * 62)
+    for user, city, rule_set in subscriptions:
+        print(f"{user:<20} {city:<20} {rule_set:<20}")
+
+
+def run_poll() -> None:
+    """Опрашивает города подписок и выводит уведомления подписчиков."""
+    try:
+        service = WeatherService()
+        print("🌍 Запрашиваю погоду для городов подписок...")
+        cities, issued = service.poll_subscriptions()
+    except ValueError as e:
+        print(f"\n❌ Ошибка конфигурации или данных: {e}")
+        return
+
+    if not cities:
+        print("ℹ️ Подписок нет. Добавьте: weather-cli subscribe ПОЛЬЗОВАТЕЛЬ ГОРОД")
+        return
+
+    users = get_db_manager().get_users()
+    print(f"✅ Опрошено городов: {cities}, уведомлений: {len(issued)}")
+    for notification in issued:
+        print(f"  👤 {users.get(notification.user_id, notification.user_id)}: {notification.message}")
+
+
+def run_daemon(args: argparse.Namespace) -> None:
+    """Запускает демон погоды на localhost."""
+    from urllib.parse import urlsplit
+
+    from src.core.daemon import WeatherDaemon
+    from src.core.daemon_client import DEFAULT_DAEMON_URL
+
+    try:
+        service = WeatherService()
+        url = urlsplit(service.config.daemon_url or DEFAULT_DAEMON_URL)
+        host = url.hostname or "127.0.0.1"
+        port = args.port if args.port is not None else url.port or 80
+        refresh_seconds = args.refresh or service.config.daemon_refresh_seconds
+        daemon = WeatherDaemon(service, host, port, refresh_seconds)
+    except ValueError as e:
+        print(f"❌ Ошибка конфигурации: {e}")
+        return
+    except OSError as e:
+        print(f"❌ Не удалось запустить демон: {e}")
+        return
+
+    print(f"🛰️ Демон погоды: http://{host}:{daemon.server_address[1]} (кэш {refresh_seconds} с, Ctrl+C — остановить)")
+    daemon.serve()
+    print("👋 Демон погоды остановлен")
+
+
+def run_check_counters(args: argparse.Namespace) -> None:
+    """Сверяет счетчики строк с фактическими данными и пересчитывает их при расхождении."""
+    print("🔍 Проверка счетчиков строк (полное сканирование таблиц)...")
+    mismatches = get_db_manager().check_row_counters(repair=not args.dry_run)
+
+    if not mismatches:
+        print("✅ Счетчики согласованы с данными")
+        return
+
+    print(f"⚠️ Найдено расхождений: {len(mismatches)}")
+    for table, city, stored, actual in mismatches:
+        scope = f"{table} [{city}]" if city else table
+        print(f"  {scope}: счетчик {stored}, фактически {actual}")
+    print("ℹ️ Счетчики не изменены (--dry-run)" if args.dry_run else "🔧 Счетчики пересчитаны")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Создает парсер аргументов консольной версии."""
+    parser = argparse.ArgumentParser(prog="weather-cli", description="Weather Parser Notifier (CLI Version)")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        metavar="ФАЙЛ",
+        help="Профилировать команду семплирующим профайлером и записать стеки в формате folded (для флеймграфа)",
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="КОМАНДА")
+
+    weather_parser = subparsers.add_parser("weather", help="Получить текущую погоду (по умолчанию)")
+    weather_parser.add_argument("--lat", type=float, help="Широта: погода по координатам вместо города")
+    weather_parser.add_argument("--lon", type=float, help="Долгота")
+
+    forecast_parser = subparsers.add_parser("forecast", help="Проверить правила по прогнозу на ближайшие часы")
+    forecast_parser.add_argument("--hours", type=int, default=6, help="Горизонт проверки в часах (по умолчанию 6)")
+
+    ingest_parser = subparsers.add_parser("ingest", help="Загрузить архивы ответов API (.jsonl/.json) в историю")
+    ingest_parser.add_argument("paths", nargs="+", metavar="ПУТЬ", help="Файлы или каталоги с архивами")
+    ingest_parser.add_argument("--workers", type=int, default=None, help="Процессов разбора (по умолчанию — ядер)")
+    ingest_parser.add_argument("--batch-size", type=int, default=50000, help="Записей в одной транзакции")
+    ingest_parser.add_argument(
+        "--with-notifications", action="store_true", help="Проверять правила и сохранять уведомления"
+    )
+    ingest_parser.add_argument("--restart", action="store_true", help="Загрузить файлы заново, игнорируя позиции")
+
+    stats_parser = subparsers.add_parser("stats", help="Показать метрики этапов запроса")
+    stats_parser.add_argument("--prometheus", action="store_true", help="Вывести в текстовом формате Prometheus")
+    stats_parser.add_argument("--reset", action="store_true", help="Сбросить накопленные метрики")
+
+    rules_parser = subparsers.add_parser("rules", help="Показать или изменить пороги, паузы и гистерезис правил")
+    rules_parser.add_argument("rule_id", nargs="?", type=int, metavar="ID", help="Правило, которое нужно изменить")
+    rules_parser.add_argument("--rule-set", metavar="НАБОР", help="Показать правила набора вместо общих")
+    rules_parser.add_argument("--threshold", metavar="ПОРОГ", help="Новый порог правила")
+    rules_parser.add_argument("--cooldown", type=int, metavar="МИН", help="Пауза после срабатывания в минутах")
+    rules_parser.add_argument("--hysteresis", type=float, help="Запас от порога для повторного срабатывания")
+    rules_parser.add_argument("--city", help="Изменить только для этого города")
+    active_group = rules_parser.add_mutually_exclusive_group()
+    active_group.add_argument("--enable", dest="active", action="store_const", const=True, help="Включить правило")
+    active_group.add_argument("--disable", dest="active", action="store_const", const=False, help="Выключить правило")
+
+    subscribe_parser = subparsers.add_parser("subscribe", help="Подписать пользователя на город или показать подписки")
+    subscribe_parser.add_argument("user", nargs="?", metavar="ПОЛЬЗОВАТЕЛЬ", help="Имя пользователя")
+    subscribe_parser.add_argument("city", nargs="?", metavar="ГОРОД", help="Город подписки")
+    subscribe_parser.add_argument(
+        "--rule-set", metavar="НАБОР", help="Набор правил (по умолчанию — личный набор пользователя)"
+    )
+    subscribe_parser.add_argument("--remove", action="store_true", help="Отменить подписки пользователя на город")
+
+    subparsers.add_parser("poll", help="Запросить погоду для городов подписок и разослать уведомления")
+
+    daemon_parser = subparsers.add_parser("daemon", help="Запустить демон погоды: кэш и запросы к API для CLI и GUI")
+    daemon_parser.add_argument("--port", type=int, help="Порт (по умолчанию из WEATHER_DAEMON_URL или 8766)")
+    daemon_parser.add_argument("--refresh", type=int, metavar="СЕК", help="Срок кэша текущей погоды в секундах")
+
+    check_parser = subparsers.add_parser("check-counters", help="Проверить счетчики строк и сводки истории")
+    check_parser.add_argument("--dry-run", action="store_true", help="Только показать расхождения")
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Запуск консольной версии.
+
+    Args:
+        argv: Аргументы командной строки. Если None, берутся из sys.argv
+    """
+    args = build_parser().parse_args(argv)
+    # .env читается до выбора команды: команды работы с БД (rules, ingest и др.) не загружают Config,
+    # но берут из него WEATHER_DB_PATH и RECENT_HISTORY_SIZE
+    load_dotenv()
+
+    if args.profile is None:
+        run_command(args)
+        return
+
+    from src.utils.profiling import PROFILES_DIR, SamplingProfiler
+
+    path = Path(args.profile) if args.profile else PROFILES_DIR / f"profile_{datetime.now():%Y%m%d_%H%M%S}.folded"
+    with SamplingProfiler() as profiler:
+        try:
+            run_command(args)
+        finally:
+            profiler.stop()
+            profiler.write_folded(path)
+            print(f"\n🔥 Профиль ({profiler.samples} снимков): {path}")
+            print("   Флеймграф: flamegraph.pl профиль > flame.svg или https://www.speedscope.app")
+
+
+def run_command(args: argparse.Namespace) -> None:
+    """Выполняет выбранную команду."""
+    if args.command == "forecast":
+        run_forecast(args)
+    elif args.command == "ingest":
+        run_ingest(args)
+    elif args.command == "stats":
+        run_stats(args)
+    elif args.command == "rules":
+        run_rules(args)
+    elif args.command == "subscribe":
+        run_subscribe(args)
+    elif args.command == "poll":
+        run_poll()
+    elif args.command == "daemon":
+        run_daemon(args)
+    elif args.command == "check-counters":
+        run_check_counters(args)
+    else:
+        run_weather(getattr(args, "lat", None), getattr(args, "lon", None))
+
+
 if __name__ == "__main__":
     main()
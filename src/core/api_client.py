@@ -1,9 +1,25 @@
 """Служба для работы с OpenWeatherMap API."""
 
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
 import requests
 from requests import Response
 
 from src.core.config_loader import Config
+from src.core.resilience import CircuitBreaker, LatencyTracker
+from src.utils import metrics
+
+HTTP_REQUEST_SECONDS = metrics.histogram("http_request_seconds", "Полное время HTTP-запроса к API")
+HTTP_RESPONSE_WAIT_SECONDS = metrics.histogram(
+    "http_response_wait_seconds", "От отправки запроса до получения заголовков ответа (response.elapsed)"
+)
+HTTP_RESPONSES_TOTAL = metrics.counter("http_responses_total", "Ответы API по HTTP-статусу")
+HTTP_ERRORS_TOTAL = metrics.counter("http_errors_total", "Запросы без ответа (DNS, соединение, таймаут)")
+HTTP_HEDGES_TOTAL = metrics.counter("http_hedges_total", "Дублирующие запросы к API по тому, чей ответ пришел первым")
+
+# Потоков для запросов с дублированием: основной запрос и дубль для каждого из одновременных запросов
+HEDGE_WORKERS = 16
 
 
 class OpenWeatherMapApiClient:
@@ -11,24 +27,126 @@ class OpenWeatherMapApiClient:
 
     def __init__(self, config: Config):
         self.config = config
+        self.latencies = LatencyTracker()
+        self.breaker: CircuitBreaker | None = None
+        if config.breaker_error_rate:
+            self.breaker = CircuitBreaker(config.breaker_error_rate, config.breaker_open_seconds)
+        self._hedge_executor: ThreadPoolExecutor | None = None
 
-    def fetch_weather_json(self) -> dict:
+    def _attempt(self, url: str, params: dict) -> Response:
+        """Один HTTP-запрос; время успешного ответа запоминается для порога дублирования.
+
+        Ответы с ошибкой (429, 5xx, неизвестный город) не учитываются: API отвечает на них
+        быстрее обычного, и порог дублирования занижался бы.
         """
-        Запрашивает данные о погоде и возвращает JSON полного списка неразобранных данных о погоде.
+        started = time.perf_counter()
+        response = requests.get(url, params=params, timeout=self.config.timeout)
+        if response.ok:
+            self.latencies.add(time.perf_counter() - started)
+        return response
 
-        Returns:
-            Словарь с неразобранными данными от API OpenWeatherMap.
+    def _send_hedged(self, url: str, params: dict) -> Response:
+        """Запрос с дублированием: если ответа нет дольше перцентиля обычного времени, отправляется дубль.
+
+        Возвращается ответ, пришедший первым. Запрос, ответ которого не понадобился,
+        дорабатывает в фоне (requests не умеет прерывать запрос).
         """
+        if self._hedge_executor is None:
+            self._hedge_executor = ThreadPoolExecutor(HEDGE_WORKERS, thread_name_prefix="api-hedge")
+        primary = self._hedge_executor.submit(self._attempt, url, params)
+
+        delay = self.latencies.hedge_delay(self.config.hedge_percentile)
+        if delay is None or wait([primary], timeout=delay).done:
+            return primary.result()
+
+        hedge = self._hedge_executor.submit(self._attempt, url, params)
+        pending: set[Future] = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    HTTP_HEDGES_TOTAL.inc(winner="primary" if future is primary else "hedge")
+                    return future.result()
+            if not pending:
+                return primary.result()  # Оба запроса завершились ошибкой: выбрасывается ошибка основного
+
+    def _get(self, url: str, city: str | None = None, coordinates: tuple[float, float] | None = None) -> Response:
+        """Выполняет GET-запрос к API с общими параметрами (город или координаты, ключ, язык, единицы).
+
+        Args:
+            url: Адрес эндпоинта
+            city: Город запроса. Если None, берется город из настроек
+            coordinates: Широта и долгота запроса вместо города
+
+        Raises:
+            CircuitOpenError: API недавно отвечало в основном ошибками (без обращения к API)
+        """
+        if coordinates is not None:
+            location = {"lat": coordinates[0], "lon": coordinates[1]}
+        else:
+            location = {"q": city or self.config.city}
         params = {
-            "q": self.config.city,
+            **location,
             "appid": self.config.api_key,
             "lang": self.config.language,
             "units": self.config.units,
         }
 
-        response: Response = requests.get(self.config.base_url, params=params, timeout=self.config.timeout)
+        epoch = self.breaker.before_request() if self.breaker is not None else 0
+        failed = True
+        try:
+            with HTTP_REQUEST_SECONDS.time():
+                if self.config.hedge_percentile:
+                    response: Response = self._send_hedged(url, params)
+                else:
+                    response = self._attempt(url, params)
+            # Ошибкой API считаются 5xx и 429; 4xx (неизвестный город, неверный ключ) — ошибка запроса
+            failed = response.status_code >= 500 or response.status_code == 429
+        except requests.exceptions.RequestException as e:
+            HTTP_ERRORS_TOTAL.inc(error=type(e).__name__)
+            raise
+        finally:
+            if self.breaker is not None:
+                self.breaker.record(failed, epoch)
+
+        HTTP_RESPONSE_WAIT_SECONDS.observe(response.elapsed.total_seconds())
+        HTTP_RESPONSES_TOTAL.inc(status=str(response.status_code))
+        metrics.annotate(http_status=response.status_code, payload_bytes=len(response.content))
 
         # Проверяет статус ответа: при ошибках HTTP (4xx, 5xx) выбрасываем исключение HTTPError
         response.raise_for_status()
 
-        return response.json()
+        return response
+
+    def fetch_weather_json(self) -> dict:
+        """
+        Запрашивает данные о погоде и возвращает JSON полного списка неразобранных данных о погоде.
+
+        Returns:
+            Словарь с неразобранными данными от API OpenWeatherMap.
+        """
+        return self._get(self.config.base_url).json()
+
+    def fetch_forecast_json(self) -> dict:
+        """
+        Запрашивает прогноз на 5 дней с шагом 3 часа (эндпоинт /forecast).
+
+        Returns:
+            Словарь с неразобранным прогнозом от API OpenWeatherMap (40 записей в поле list).
+        """
+        return self._get(self.config.forecast_url).json()
+
+    def fetch_weather_raw(self, city: str | None = None, coordinates: tuple[float, float] | None = None) -> bytes:
+        """Запрашивает текущую погоду и возвращает тело ответа без декодирования.
+
+        Байты разбираются JSON-бэкендом (src.core.json_backend) сразу в WeatherData.
+
+        Args:
+            city: Город запроса. Если None, берется город из настроек
+            coordinates: Широта и долгота запроса вместо города
+        """
+        return self._get(self.config.base_url, city, coordinates).content
+
+    def fetch_forecast_raw(self) -> bytes:
+        """Запрашивает прогноз на 5 дней и возвращает тело ответа без декодирования."""
+        return self._get(self.config.forecast_url).content
@@ -5,7 +5,7 @@ from dataclasses import dataclass
 
 from dotenv import load_dotenv
 
-load_dotenv()
+from src.utils.geo import validate_coordinates
 
 
 @dataclass
@@ -17,10 +17,33 @@ class Config:
 
     # Поля со значениями по умолчанию
     base_url: str = "https://api.openweathermap.org/data/2.5/weather"
+    forecast_url: str = "https://api.openweathermap.org/data/2.5/forecast"
     city: str = "Moscow"
+    latitude: float | None = None  # Координаты по умолчанию вместо города (обе или ни одной)
+    longitude: float | None = None
     language: str = "ru"
     units: str = "metric"
     timeout: int = 30
+    json_backend: str = "auto"  # auto, msgspec, orjson или json
+    metrics_enabled: bool = False  # Сбор метрик этапов (см. src/utils/metrics.py)
+    slow_request_ms: int = 2000  # Порог журнала медленных запросов, 0 — выключен
+    notification_sinks: tuple[str, ...] = ()  # Получатели уведомлений: jsonl, webhook, desktop
+    notification_webhook_url: str = ""
+    daemon_url: str = ""  # Адрес демона погоды (weather-cli daemon); пусто — CLI и GUI работают сами
+    daemon_refresh_seconds: int = 600  # Срок кэша текущей погоды в демоне
+    hedge_percentile: float = 0.0  # Дубль запроса к API после этого перцентиля времени ответа, 0 — выключено
+    breaker_error_rate: float = 0.0  # Доля ошибок API, при которой запросы отклоняются сразу, 0 — выключено
+    breaker_open_seconds: int = 30  # Сколько секунд отклонять запросы перед пробным
+    stale_max_seconds: int = 0  # Наблюдение из истории не старше стольких секунд отдается сразу, 0 — выключено
+    geo_cell_degrees: float = 0.05  # Шаг сетки кэша погоды по координатам: точки одной ячейки получают один ответ
+    geo_cache_seconds: int = 600  # Сколько секунд ответ ячейки сетки считается свежим
+
+    @property
+    def coordinates(self) -> tuple[float, float] | None:
+        """Координаты по умолчанию (широта, долгота) или None, если погода запрашивается по городу."""
+        if self.latitude is None or self.longitude is None:
+            return None
+        return self.latitude, self.longitude
 
 
 class ConfigLoader:
@@ -29,20 +52,45 @@ class ConfigLoader:
     @staticmethod
     def load() -> Config:
         """Загружает и проверяет настройку."""
+        # .env читается при загрузке настроек, а не при импорте модуля
+        load_dotenv()
+
         api_key: str | None = os.getenv("OPENWEATHER_API_KEY")
         if not api_key:
             raise ValueError("OPENWEATHER_API_KEY не найден в .env файле")
 
-        # Разбираем значение timeout с проверкой на ошибки
-        timeout_str: str = os.getenv("REQUEST_TIMEOUT", "30")
-        try:
-            timeout: int = int(timeout_str)
-        except ValueError as err:
-            raise ValueError(f"Некорректное значение timeout: '{timeout_str}'. Должно быть целым числом.") from err
+        timeout = ConfigLoader._parse_int("REQUEST_TIMEOUT", "30", minimum=1)
+        slow_request_ms = ConfigLoader._parse_int("SLOW_REQUEST_MS", "2000", minimum=0)
+        daemon_refresh_seconds = ConfigLoader._parse_int("DAEMON_REFRESH_SECONDS", "600", minimum=1)
+
+        hedge_percentile = ConfigLoader._parse_float("HEDGE_PERCENTILE", "0")
+        if not 0 <= hedge_percentile < 100:
+            raise ValueError(f"HEDGE_PERCENTILE должен быть от 0 до 100 (0 — выключено), получено: {hedge_percentile}")
 
-        # Дополнительная проверка
-        if timeout <= 0:
-            raise ValueError(f"Таймаут должен быть положительным числом, получено: {timeout}")
+        breaker_error_rate = ConfigLoader._parse_float("BREAKER_ERROR_RATE", "0")
+        if not 0 <= breaker_error_rate <= 1:
+            raise ValueError(
+                f"BREAKER_ERROR_RATE должен быть от 0 до 1 (0 — выключено), получено: {breaker_error_rate}"
+            )
+
+        breaker_open_seconds = ConfigLoader._parse_int("BREAKER_OPEN_SECONDS", "30", minimum=1)
+        stale_max_seconds = ConfigLoader._parse_int("STALE_MAX_SECONDS", "0", minimum=0)
+
+        latitude_str: str = os.getenv("DEFAULT_LAT", "")
+        longitude_str: str = os.getenv("DEFAULT_LON", "")
+        latitude = longitude = None
+        if latitude_str or longitude_str:
+            if not (latitude_str and longitude_str):
+                raise ValueError("DEFAULT_LAT и DEFAULT_LON задаются вместе")
+            latitude = ConfigLoader._parse_float("DEFAULT_LAT", "")
+            longitude = ConfigLoader._parse_float("DEFAULT_LON", "")
+            validate_coordinates(latitude, longitude)
+
+        geo_cell_degrees = ConfigLoader._parse_float("GEO_CELL_DEGREES", "0.05")
+        if not 0 < geo_cell_degrees <= 1:
+            raise ValueError(f"GEO_CELL_DEGREES должен быть больше 0 и не больше 1, получено: {geo_cell_degrees}")
+
+        geo_cache_seconds = ConfigLoader._parse_int("GEO_CACHE_SECONDS", "600", minimum=1)
 
         return Config(
             api_key=api_key,
@@ -50,8 +98,51 @@ class ConfigLoader:
                 "OPENWEATHER_BASE_URL",
                 "https://api.openweathermap.org/data/2.5/weather",
             ),
+            forecast_url=os.getenv(
+                "OPENWEATHER_FORECAST_URL",
+                "https://api.openweathermap.org/data/2.5/forecast",
+            ),
             city=os.getenv("DEFAULT_CITY", "Moscow"),
+            latitude=latitude,
+            longitude=longitude,
             language=os.getenv("DEFAULT_LANGUAGE", "ru"),
             units=os.getenv("DEFAULT_UNITS", "metric"),
             timeout=timeout,
+            json_backend=os.getenv("JSON_BACKEND", "auto"),
+            metrics_enabled=os.getenv("METRICS_ENABLED", "").lower() in ("1", "true", "yes"),
+            slow_request_ms=slow_request_ms,
+            notification_sinks=tuple(
+                name.strip().lower() for name in os.getenv("NOTIFICATION_SINKS", "").split(",") if name.strip()
+            ),
+            notification_webhook_url=os.getenv("NOTIFICATION_WEBHOOK_URL", ""),
+            daemon_url=os.getenv("WEATHER_DAEMON_URL", ""),
+            daemon_refresh_seconds=daemon_refresh_seconds,
+            hedge_percentile=hedge_percentile,
+            breaker_error_rate=breaker_error_rate,
+            breaker_open_seconds=breaker_open_seconds,
+            stale_max_seconds=stale_max_seconds,
+            geo_cell_degrees=geo_cell_degrees,
+            geo_cache_seconds=geo_cache_seconds,
         )
+
+    @staticmethod
+    def _parse_int(name: str, default: str, minimum: int) -> int:
+        """Читает целое число не меньше minimum из переменной окружения."""
+        value: str = os.getenv(name, default)
+        try:
+            number = int(value)
+        except ValueError as err:
+            raise ValueError(f"Некорректное значение {name}: '{value}'. Должно быть целым числом.") from err
+        if number < minimum:
+            requirement = {0: "неотрицательным числом", 1: "положительным числом"}.get(minimum, f"не меньше {minimum}")
+            raise ValueError(f"{name} должен быть {requirement}, получено: {number}")
+        return number
+
+    @staticmethod
+    def _parse_float(name: str, default: str) -> float:
+        """Читает дробное число из переменной окружения."""
+        value: str = os.getenv(name, default)
+        try:
+            return float(value)
+        except ValueError as err:
+            raise ValueError(f"Некорректное значение {name}: '{value}'. Должно быть числом.") from err
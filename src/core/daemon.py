@@ -0,0 +1,288 @@
+"""Демон погоды: один долгоживущий процесс владеет клиентом API, кэшем и записью в БД.
+
+CLI и GUI обращаются к нему как тонкие клиенты (src/core/daemon_client.py) по HTTP
+на localhost вместо того, чтобы каждый раз создавать WeatherService, открывать базу
+данных и запрашивать API. Ответы кэша хранятся уже сериализованными, поэтому поиск
+занимает доли миллисекунды.
+
+    GET /weather?city=Moscow    текущая погода, запись истории и уведомления
+    GET /weather?lat=55.75&lon=37.62  то же по координатам (кэш ячеек сетки, см. src/core/geo_cache.py)
+    GET /history?limit=10       последние записи истории
+    GET /notifications?limit=5  уведомления последней записи
+    GET /metrics                метрики процесса в формате Prometheus
+    GET /health
+
+Погода запрошенных городов обновляется в фоне до того, как устареет; город, который
+долго никто не запрашивал, из обновления выпадает. С STALE_MAX_SECONDS промах кэша
+отвечает последним наблюдением из истории, а ответ, который не успел обновиться
+(API медленно отвечает или недоступно), отдается, пока он не старше этого срока.
+"""
+
+import json
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from requests.exceptions import RequestException
+
+from src.core.daemon_client import record_to_dict, weather_to_dict
+from src.core.weather_service import WeatherService
+from src.utils import metrics
+
+DAEMON_REQUESTS_TOTAL = metrics.counter("daemon_requests_total", "Запросы к демону по эндпоинту и попаданию в кэш")
+DAEMON_REFRESHES_TOTAL = metrics.counter("daemon_refreshes_total", "Фоновые обновления погоды по результату")
+
+# Обновлять город заранее, когда прошла эта доля срока кэша
+REFRESH_AHEAD = 0.9
+# Город без запросов дольше стольких сроков кэша перестает обновляться
+IDLE_CITY_REFRESHES = 6
+# Чтения истории кэшируются ненадолго: ее могут дописывать другие процессы (ingest)
+HISTORY_CACHE_SECONDS = 5.0
+MAX_HISTORY_LIMIT = 1000
+
+
+@dataclass(slots=True)
+class CachedWeather:
+    """Погода города в кэше демона."""
+
+    city: str  # Город, как его запросил клиент
+    body: bytes  # Готовый ответ /weather (без поля cached)
+    fetched_at: float  # time.monotonic() запроса к API
+    last_read: float
+
+
+class WeatherDaemon(ThreadingHTTPServer):
+    """HTTP-сервер демона. Каждый запрос обрабатывается в своем потоке."""
+
+    daemon_threads = True
+
+    def __init__(self, service: WeatherService, host: str, port: int, refresh_seconds: float):
+        """Создает сервер.
+
+        Args:
+            service: Сервис погоды, которым владеет демон
+            host: Адрес (только localhost: API без авторизации)
+            port: Порт, 0 — выбрать свободный
+            refresh_seconds: Срок кэша текущей погоды в секундах
+        """
+        super().__init__((host, port), DaemonRequestHandler)
+        self.service = service
+        self.refresh_seconds = refresh_seconds
+        self.stale_seconds = service.config.stale_max_seconds
+        self._cache: dict[str, CachedWeather] = {}
+        self._fetch_locks: dict[str, threading.Lock] = {}
+        self._fetch_locks_lock = threading.Lock()
+        self._reads: dict[tuple[str, int], tuple[float, bytes]] = {}  # (эндпоинт, limit) -> (время, ответ)
+        self._stopped = threading.Event()
+        self._refresher = threading.Thread(target=self._refresh_loop, name="weather-daemon-refresh", daemon=True)
+
+    @staticmethod
+    def _city_key(city: str) -> str:
+        return city.strip().casefold()
+
+    def _fetch_lock(self, key: str) -> threading.Lock:
+        with self._fetch_locks_lock:
+            return self._fetch_locks.setdefault(key, threading.Lock())
+
+    def _fetch(self, city: str, key: str) -> CachedWeather:
+        """Запрашивает погоду, сохраняет ее в историю и кладет готовый ответ в кэш."""
+        with self.service.trace_request():
+            weather_data, response_time = self.service.fetch_weather_data(city)
+            record, notifications = self.service.process_weather_data(weather_data, response_time)
+        payload = {
+            "weather": weather_to_dict(weather_data),
+            "record": record_to_dict(record),
+            "notifications": notifications,
+        }
+        now = time.monotonic()
+        previous = self._cache.get(key)
+        entry = CachedWeather(city, _encode(payload), now, previous.last_read if previous else now)
+        self._cache[key] = entry
+        self._reads.clear()  # Появилась новая запись истории
+        return entry
+
+    def _from_history(self, city: str, key: str) -> CachedWeather | None:
+        """Кладет в кэш последнее наблюдение города из истории, если оно не старше срока устаревания.
+
+        Время запроса записи сдвигается на возраст наблюдения: свежее наблюдение живет в кэше
+        остаток срока, старое сразу подхватывает фоновое обновление.
+        """
+        if not self.stale_seconds:
+            return None
+        stored = self.service.get_stored_weather(city, max_age_seconds=self.stale_seconds)
+        if stored is None:
+            return None
+        weather_data, record, notifications = stored
+        payload = {
+            "weather": weather_to_dict(weather_data),
+            "record": record_to_dict(record),
+            "notifications": notifications,
+        }
+        now = time.monotonic()
+        entry = self._cache[key] = CachedWeather(city, _encode(payload), now - weather_data.age_seconds, now)
+        return entry
+
+    def get_weather(self, city: str | None) -> tuple[bytes, bool]:
+        """Ответ /weather: из кэша, а при промахе — после запроса к API.
+
+        Одновременные промахи по одному городу ждут один запрос к API. Ответ, который
+        старше срока кэша, но не старше STALE_MAX_SECONDS, отдается сразу: его
+        обновляет фоновый цикл.
+
+        Returns:
+            Кортеж (тело ответа, True если ответ из кэша)
+        """
+        city = city or self.service.config.city
+        key = self._city_key(city)
+        entry = self._cache.get(key)
+        now = time.monotonic()
+        if entry is None or now - entry.fetched_at >= self.refresh_seconds:
+            with self._fetch_lock(key):
+                entry = self._cache.get(key) or self._from_history(city, key)
+                age = time.monotonic() - entry.fetched_at if entry is not None else None
+                if age is None or age >= max(self.refresh_seconds, self.stale_seconds):
+                    entry = self._fetch(city, key)
+                    entry.last_read = time.monotonic()
+                    return entry.body, False
+        entry.last_read = now
+        return entry.body, True
+
+    def get_weather_at(self, latitude: float, longitude: float) -> tuple[bytes, bool]:
+        """Ответ /weather по координатам из кэша ячеек сетки сервиса.
+
+        Returns:
+            Кортеж (тело ответа, True если запрос к API не понадобился)
+        """
+        weather_data, record, notifications, cached = self.service.get_weather_at(latitude, longitude)
+        if not cached:
+            self._reads.clear()  # Появилась новая запись истории
+        payload = {
+            "weather": weather_to_dict(weather_data),
+            "record": record_to_dict(record),
+            "notifications": notifications,
+        }
+        return _encode(payload), cached
+
+    def get_reads(self, endpoint: str, limit: int) -> bytes:
+        """Ответы /history и /notifications с коротким кэшем."""
+        cached = self._reads.get((endpoint, limit))
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < HISTORY_CACHE_SECONDS:
+            return cached[1]
+
+        engine = self.service.notification_engine
+        if endpoint == "history":
+            payload = {"records": [record_to_dict(record) for record in engine.db_manager.get_recent_records(limit)]}
+        else:
+            payload = {"notifications": engine.get_recent_notifications(limit)}
+        body = _encode(payload)
+        self._reads[(endpoint, limit)] = (now, body)
+        return body
+
+    def _refresh_loop(self) -> None:
+        """Обновляет города, которые скоро устареют и которые недавно запрашивали."""
+        tick = min(1.0, self.refresh_seconds / 10)
+        while not self._stopped.wait(tick):
+            now = time.monotonic()
+            for key, entry in list(self._cache.items()):
+                if now - entry.last_read > self.refresh_seconds * IDLE_CITY_REFRESHES:
+                    del self._cache[key]  # Город больше не нужен: следующий запрос будет промахом
+                    continue
+                if now - entry.fetched_at < self.refresh_seconds * REFRESH_AHEAD:
+                    continue
+                city = entry.city
+                with self._fetch_lock(key):
+                    if self._cache.get(key) is not entry:
+                        continue  # Уже обновлен запросом клиента
+                    try:
+                        self._fetch(city, key)
+                    except (ValueError, RequestException) as e:
+                        DAEMON_REFRESHES_TOTAL.inc(result="error")
+                        print(f"⚠️ Не удалось обновить погоду для {city}: {e}")
+                        continue
+                DAEMON_REFRESHES_TOTAL.inc(result="ok")
+
+    def serve(self) -> None:
+        """Обслуживает запросы до остановки (Ctrl+C или SIGTERM)."""
+        # SIGTERM завершает демон так же, как Ctrl+C: метрики и очередь уведомлений успевают сохраниться
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=self.shutdown).start())
+        self.service.notification_engine.db_manager.warm_recent_records()
+        self._refresher.start()
+        try:
+            self.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._stopped.set()
+            self.server_close()
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов демона."""
+
+    server: WeatherDaemon
+    protocol_version = "HTTP/1.1"  # Соединения клиентов переиспользуются
+    # Заголовки и тело уходят отдельными записями: без TCP_NODELAY ответ на живом
+    # соединении ждет задержанного ACK клиента (~40 мс)
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        endpoint = url.path.strip("/")
+
+        try:
+            if endpoint == "weather":
+                city, latitude, longitude = (params.get(name, [None])[0] for name in ("city", "lat", "lon"))
+                coordinates = self.server.service.config.coordinates if city is None else None
+                if latitude is not None or longitude is not None:
+                    if latitude is None or longitude is None:
+                        raise ValueError("Координаты задаются вместе: lat и lon")
+                    coordinates = float(latitude), float(longitude)
+                if coordinates is not None:
+                    body, cached = self.server.get_weather_at(*coordinates)
+                else:
+                    body, cached = self.server.get_weather(city)
+                DAEMON_REQUESTS_TOTAL.inc(endpoint=endpoint, cache="hit" if cached else "miss")
+                # Признак кэша дописывается в готовый ответ без повторной сериализации
+                self._send(HTTPStatus.OK, body[:-1] + (b', "cached": true}' if cached else b', "cached": false}'))
+                return
+            if endpoint in ("history", "notifications"):
+                limit = min(max(int(params.get("limit", ["10"])[0]), 1), MAX_HISTORY_LIMIT)
+                DAEMON_REQUESTS_TOTAL.inc(endpoint=endpoint)
+                self._send(HTTPStatus.OK, self.server.get_reads(endpoint, limit))
+                return
+            if endpoint == "metrics":
+                state = metrics.merge_states(metrics.load_state(), metrics.REGISTRY.snapshot())
+                self._send(HTTPStatus.OK, metrics.render_prometheus(state).encode(), "text/plain; version=0.0.4")
+                return
+            if endpoint == "health":
+                self._send(HTTPStatus.OK, b'{"status": "ok"}')
+                return
+            self._send_error(HTTPStatus.NOT_FOUND, f"Неизвестный эндпоинт: /{endpoint}")
+        except ValueError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+        except RequestException as e:
+            self._send_error(HTTPStatus.BAD_GATEWAY, f"Ошибка при обращении к серверу погоды: {e}")
+
+    def _send(self, status: HTTPStatus, body: bytes, content_type: str = "application/json; charset=utf-8") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: HTTPStatus, message: str) -> None:
+        self._send(status, _encode({"error": message}))
+
+    def log_message(self, format: str, *args) -> None:
+        """Не пишет строку доступа на каждый запрос: клиенты обращаются часто."""
+
+
+def _encode(payload: dict[str, Any]) -> bytes:
+    return json.dumps(payload, ensure_ascii=False).encode()
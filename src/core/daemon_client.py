@@ -0,0 +1,169 @@
+"""Тонкий клиент демона погоды (см. src/core/daemon.py).
+
+Клиент не создает WeatherService, не открывает базу данных и не обращается к API:
+запрос к демону на localhost — это одно HTTP-соединение, которое переиспользуется
+между запросами (отдельное для каждого потока).
+"""
+
+import http.client
+import json
+import os
+import threading
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any
+from urllib.parse import urlencode, urlsplit
+
+from dotenv import load_dotenv
+
+from src.core.data_parser import WeatherData
+from src.database.models import WeatherRecord
+
+DEFAULT_DAEMON_URL = "http://127.0.0.1:8766"
+
+# Поля WeatherRecord, которые передаются клиенту (description_id — внутренняя ссылка базы данных)
+RECORD_FIELDS = (
+    "id",
+    "city",
+    "timestamp",
+    "temperature",
+    "feels_like",
+    "humidity",
+    "pressure",
+    "description",
+    "wind_speed",
+    "response_time_ms",
+)
+
+
+class DaemonError(Exception):
+    """Демон ответил ошибкой (например, API погоды недоступно)."""
+
+
+def record_to_dict(record: WeatherRecord) -> dict[str, Any]:
+    """Запись истории в словарь для JSON (время в ISO 8601)."""
+    data = {field: getattr(record, field) for field in RECORD_FIELDS}
+    if isinstance(record.timestamp, datetime):
+        data["timestamp"] = record.timestamp.isoformat(timespec="seconds")
+    return data
+
+
+def record_from_dict(data: dict[str, Any]) -> WeatherRecord:
+    """Запись истории из словаря, полученного от демона."""
+    timestamp = data.get("timestamp")
+    return WeatherRecord(
+        **{field: data[field] for field in RECORD_FIELDS if field != "timestamp"},
+        timestamp=datetime.fromisoformat(timestamp) if timestamp else None,
+    )
+
+
+def weather_to_dict(weather_data: WeatherData) -> dict[str, Any]:
+    """WeatherData в словарь для JSON."""
+    return asdict(weather_data)
+
+
+class DaemonClient:
+    """Клиент локального демона погоды."""
+
+    def __init__(self, url: str = DEFAULT_DAEMON_URL, timeout: float = 35.0):
+        """Создает клиента.
+
+        Args:
+            url: Адрес демона (http://хост:порт)
+            timeout: Таймаут ответа в секундах. Промах кэша ждет запрос к API, поэтому
+                таймаут чуть больше таймаута API по умолчанию
+        """
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return connection
+
+    def _get(self, path: str, **params: Any) -> dict[str, Any]:
+        """Выполняет GET-запрос к демону и возвращает разобранный JSON.
+
+        Raises:
+            OSError: Демон недоступен
+            DaemonError: Демон ответил ошибкой
+        """
+        query = {name: value for name, value in params.items() if value is not None}
+        target = f"{path}?{urlencode(query)}" if query else path
+        # Демон мог закрыть простаивающее соединение: один повтор на новом соединении
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request("GET", target)
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+        if response.will_close:
+            connection.close()
+            self._local.connection = None
+
+        payload = json.loads(body)
+        if response.status != 200:
+            raise DaemonError(payload.get("error", f"HTTP {response.status}"))
+        return payload
+
+    def is_available(self) -> bool:
+        """Проверяет, что демон запущен и отвечает."""
+        try:
+            self._get("/health")
+        except (OSError, DaemonError, ValueError):
+            return False
+        return True
+
+    def get_weather(
+        self, city: str | None = None, latitude: float | None = None, longitude: float | None = None
+    ) -> tuple[WeatherData, WeatherRecord, list[str], bool]:
+        """Текущая погода из кэша демона (при промахе демон запросит API сам).
+
+        Args:
+            city: Город. Если None, город (или координаты) по умолчанию из настроек демона
+            latitude: Широта: погода по координатам вместо города (вместе с longitude)
+            longitude: Долгота
+
+        Returns:
+            Кортеж (WeatherData, запись истории, уведомления, True если ответ из кэша)
+        """
+        payload = self._get("/weather", city=city, lat=latitude, lon=longitude)
+        return (
+            WeatherData(**payload["weather"]),
+            record_from_dict(payload["record"]),
+            payload["notifications"],
+            payload["cached"],
+        )
+
+    def get_history(self, limit: int = 10) -> list[WeatherRecord]:
+        """Последние записи истории."""
+        return [record_from_dict(data) for data in self._get("/history", limit=limit)["records"]]
+
+    def get_notifications(self, limit: int = 5) -> list[str]:
+        """Уведомления последней записи истории."""
+        return self._get("/notifications", limit=limit)["notifications"]
+
+    def close(self) -> None:
+        """Закрывает соединение текущего потока."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+def get_daemon_client() -> DaemonClient | None:
+    """Клиент демона, если в настройках задан WEATHER_DAEMON_URL, иначе None."""
+    load_dotenv()
+    url = os.getenv("WEATHER_DAEMON_URL", "")
+    return DaemonClient(url) if url else None
@@ -1,6 +1,7 @@
 """Разбор данных от OpenWeatherMap API."""
 
 from dataclasses import dataclass
+from datetime import datetime
 from typing import Any
 
 
@@ -15,6 +16,7 @@ class WeatherData:
     description: str
     wind_speed: float
     city: str
+    age_seconds: int | None = None  # Возраст наблюдения из истории; None — свежий ответ API
 
 
 def parse_openweathermap_response(json_response: dict[str, Any]) -> WeatherData:
@@ -42,3 +44,79 @@ def parse_openweathermap_response(json_response: dict[str, Any]) -> WeatherData:
         )
     except (KeyError, IndexError) as e:
         raise ValueError(f"Непредусмотренные данные от API: {e}") from e
+
+
+def parse_openweathermap_group(json_response: dict[str, Any]) -> list[WeatherData]:
+    """
+    Разбирает ответ эндпоинта /group (текущая погода для нескольких городов).
+
+    Args:
+        json_response: Словарь с полем list — списком ответов в формате /weather.
+
+    Returns:
+        Список WeatherData в порядке городов из ответа.
+
+    Raises:
+        ValueError: Если получены непредусмотренные данные.
+    """
+    try:
+        items = json_response["list"]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Непредусмотренные данные от API: {e}") from e
+    return [parse_openweathermap_response(item) for item in items]
+
+
+@dataclass(slots=True)
+class ForecastEntry:
+    """Одна точка прогноза (шаг 3 часа)."""
+
+    forecast_time: datetime
+    temperature: float
+    feels_like: float
+    humidity: int
+    pressure: int
+    description: str
+    wind_speed: float
+    precipitation_probability: float = 0.0  # Вероятность осадков 0..1 (поле pop)
+
+
+@dataclass
+class WeatherForecast:
+    """Прогноз погоды для города."""
+
+    city: str
+    entries: list[ForecastEntry]
+
+
+def parse_openweathermap_forecast(json_response: dict[str, Any]) -> WeatherForecast:
+    """
+    Разбирает ответ эндпоинта /forecast за один проход по списку прогнозов.
+
+    Args:
+        json_response: Словарь с прогнозом от API OpenWeatherMap.
+
+    Returns:
+        WeatherForecast с точками прогноза в хронологическом порядке.
+
+    Raises:
+        ValueError: Если получены непредусмотренные данные.
+    """
+    try:
+        entries = []
+        for item in json_response["list"]:
+            main = item["main"]
+            entries.append(
+                ForecastEntry(
+                    forecast_time=datetime.fromtimestamp(item["dt"]),
+                    temperature=main["temp"],
+                    feels_like=main["feels_like"],
+                    humidity=main["humidity"],
+                    pressure=main["pressure"],
+                    description=item["weather"][0]["description"],
+                    wind_speed=item["wind"]["speed"],
+                    precipitation_probability=item.get("pop", 0.0),
+                )
+            )
+        return WeatherForecast(city=json_response["city"]["name"], entries=entries)
+    except (KeyError, IndexError, TypeError) as e:
+        raise ValueError(f"Непредусмотренные данные прогноза от API: {e}") from e
@@ -0,0 +1,82 @@
+"""Кэш погоды по координатам: ячейки сетки вместо точных координат.
+
+Координаты мобильных клиентов почти не повторяются, поэтому кэш по точным
+координатам не попадал бы никогда. Точка привязывается к ячейке сетки с шагом
+GEO_CELL_DEGREES, и все запросы из ячейки в течение GEO_CACHE_SECONDS получают
+один ответ: API запрашивается один раз по координатам центра ячейки, и в историю
+сохраняется одно наблюдение.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from src.core.data_parser import WeatherData
+from src.database.models import WeatherRecord
+from src.utils.geo import cell_center, grid_cell
+
+# Ячеек в памяти: давно не запрашивавшиеся вытесняются
+GEO_CACHE_MAX_CELLS = 10_000
+
+
+@dataclass(slots=True)
+class CellWeather:
+    """Погода ячейки сетки."""
+
+    weather_data: WeatherData
+    record: WeatherRecord
+    notifications: list[str]
+    fetched_at: float  # time.monotonic() наблюдения
+
+
+class GeoWeatherCache:
+    """Погода по ячейкам сетки со сроком свежести и ограничением числа ячеек."""
+
+    def __init__(self, cell_degrees: float, ttl_seconds: float, max_cells: int = GEO_CACHE_MAX_CELLS):
+        """Создает пустой кэш.
+
+        Args:
+            cell_degrees: Шаг сетки в градусах
+            ttl_seconds: Сколько секунд погода ячейки считается свежей
+            max_cells: Сколько ячеек держать в памяти
+        """
+        self.cell_degrees = cell_degrees
+        self.ttl_seconds = ttl_seconds
+        self.max_cells = max_cells
+        self._cells: OrderedDict[tuple[int, int], CellWeather] = OrderedDict()  # LRU
+        self._fetch_locks: dict[tuple[int, int], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        """Ячейка, в которую попадает точка."""
+        return grid_cell(latitude, longitude, self.cell_degrees)
+
+    def center(self, cell: tuple[int, int]) -> tuple[float, float]:
+        """Координаты центра ячейки: по ним запрашивается API."""
+        return cell_center(cell, self.cell_degrees)
+
+    def get(self, cell: tuple[int, int]) -> CellWeather | None:
+        """Свежая погода ячейки или None."""
+        with self._lock:
+            entry = self._cells.get(cell)
+            if entry is None or time.monotonic() - entry.fetched_at >= self.ttl_seconds:
+                return None
+            self._cells.move_to_end(cell)
+            return entry
+
+    def put(self, cell: tuple[int, int], entry: CellWeather) -> None:
+        with self._lock:
+            self._cells[cell] = entry
+            self._cells.move_to_end(cell)
+            if len(self._cells) > self.max_cells:
+                evicted, _ = self._cells.popitem(last=False)
+                self._fetch_locks.pop(evicted, None)
+
+    def fetch_lock(self, cell: tuple[int, int]) -> threading.Lock:
+        """Блокировка ячейки: одновременные промахи по ней ждут один запрос к API."""
+        with self._lock:
+            return self._fetch_locks.setdefault(cell, threading.Lock())
+
+    def __len__(self) -> int:
+        return len(self._cells)
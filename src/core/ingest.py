@@ -0,0 +1,258 @@
+"""Загрузка архивов ответов OpenWeatherMap (JSONL/JSON) в историю погоды.
+
+Файлы читаются потоково кусками строк. Разбор кусков идет в пуле процессов,
+а запись — в одном потоке крупными транзакциями. Позиция в каждом файле
+сохраняется вместе с пачкой записей, поэтому прерванную загрузку можно продолжить.
+"""
+
+import os
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from src.core.data_parser import parse_openweathermap_response
+from src.core.json_backend import loads
+from src.database.db_manager import DatabaseManager, get_db_manager
+from src.notifications.evaluator import ConditionEvaluator
+from src.notifications.rule_index import RuleIndex
+
+INGEST_CHUNK_LINES = 2000  # Строк в одном задании для процесса-разборщика
+INGEST_BATCH_ROWS = 50000  # Записей в одной транзакции
+INGEST_SUFFIXES = (".jsonl", ".json")
+
+
+@dataclass
+class IngestStats:
+    """Итоги загрузки."""
+
+    files: int = 0
+    rows: int = 0
+    errors: int = 0  # Строки, которые не удалось разобрать
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        """Скорость загрузки в записях в секунду."""
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def _iter_responses(payload: Any) -> Iterable[dict]:
+    """Ответы /weather внутри документа: одиночный ответ, список ответов или ответ /group."""
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict) and "list" in payload and "main" not in payload:
+        return payload["list"]
+    return (payload,)
+
+
+def parse_archive_lines(lines: list[bytes]) -> tuple[list[tuple], int]:
+    """Разбирает кусок архива. Выполняется в процессе пула.
+
+    Время записи берется из поля dt ответа, а не из времени загрузки.
+
+    Returns:
+        Кортеж (строки (city, timestamp, temperature, feels_like, humidity, pressure,
+        description, wind_speed), количество строк с ошибками)
+    """
+    rows = []
+    errors = 0
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            for item in _iter_responses(loads(line)):
+                weather = parse_openweathermap_response(item)
+                rows.append(
+                    (
+                        weather.city,
+                        datetime.fromtimestamp(item["dt"]).strftime("%Y-%m-%d %H:%M:%S"),
+                        weather.temperature,
+                        weather.feels_like,
+                        weather.humidity,
+                        weather.pressure,
+                        weather.description,
+                        weather.wind_speed,
+                    )
+                )
+        except (ValueError, KeyError, TypeError):
+            errors += 1
+
+    return rows, errors
+
+
+def _read_chunks(path: Path, start_offset: int, chunk_lines: int) -> Iterator[tuple[list[bytes], int]]:
+    """Читает файл кусками, начиная с байтовой позиции.
+
+    JSONL читается по строкам, JSON-файл — целиком как один документ.
+
+    Yields:
+        Кортеж (строки куска, байтовая позиция сразу после куска)
+    """
+    with path.open("rb") as f:
+        if path.suffix == ".json":
+            content = f.read()
+            if start_offset < len(content):
+                yield [content], len(content)
+            return
+
+        f.seek(start_offset)
+        offset = start_offset
+        chunk = []
+        for line in f:
+            offset += len(line)
+            chunk.append(line)
+            if len(chunk) >= chunk_lines:
+                yield chunk, offset
+                chunk = []
+        if chunk:
+            yield chunk, offset
+
+
+def collect_archive_files(paths: Iterable[str | Path]) -> list[Path]:
+    """Раскрывает каталоги в отсортированный список файлов .jsonl/.json."""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.suffix in INGEST_SUFFIXES and p.is_file()))
+        else:
+            files.append(path)
+    return files
+
+
+class ArchiveIngestor:
+    """Загружает архивы ответов API в weather_history."""
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager | None = None,
+        workers: int | None = None,
+        chunk_lines: int = INGEST_CHUNK_LINES,
+        batch_rows: int = INGEST_BATCH_ROWS,
+        with_notifications: bool = False,
+    ):
+        """Инициализирует загрузчик.
+
+        Args:
+            db_manager: Менеджер БД. Если None, используется общий экземпляр
+            workers: Количество процессов разбора. Если None — по числу ядер
+            chunk_lines: Строк в одном задании для процесса
+            batch_rows: Записей в одной транзакции
+            with_notifications: Проверять правила и сохранять уведомления для каждой записи
+        """
+        self.db_manager = db_manager or get_db_manager()
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_lines = chunk_lines
+        self.batch_rows = batch_rows
+        self.with_notifications = with_notifications
+
+        self._description_ids: dict[str, int] = {}
+        self._evaluator = ConditionEvaluator()
+        self._rule_index = RuleIndex(self.db_manager.get_active_notification_rules() if with_notifications else [])
+
+    def ingest(self, paths: Iterable[str | Path], restart: bool = False) -> IngestStats:
+        """Загружает файлы по порядку.
+
+        Args:
+            paths: Файлы и каталоги с архивами
+            restart: Игнорировать сохраненные позиции и загрузить файлы с начала
+
+        Returns:
+            Итоги загрузки
+        """
+        stats = IngestStats()
+        started = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for path in collect_archive_files(paths):
+                self._ingest_file(path, pool, stats, restart)
+                stats.files += 1
+
+        stats.elapsed = time.perf_counter() - started
+        return stats
+
+    def _ingest_file(self, path: Path, pool: ProcessPoolExecutor, stats: IngestStats, restart: bool) -> None:
+        """Загружает один файл, продолжая с сохраненной позиции."""
+        source = str(path.resolve())
+        if restart:
+            self.db_manager.reset_ingest_checkpoint(source)
+        start_offset = self.db_manager.get_ingest_checkpoint(source)
+
+        if start_offset:
+            print(f"⏩ {path.name}: продолжение с байта {start_offset}")
+        else:
+            print(f"📥 {path.name}: загрузка")
+
+        # Ограниченное окно заданий: файл не читается в память целиком,
+        # а результаты забираются в порядке файла, чтобы позиция оставалась корректной
+        pending: deque[tuple[Future, int]] = deque()
+        batch: list[tuple] = []
+        batch_offset = start_offset
+        file_rows = 0
+        started = time.perf_counter()
+
+        def drain_one() -> None:
+            nonlocal batch_offset, file_rows
+            future, end_offset = pending.popleft()
+            rows, errors = future.result()
+            stats.errors += errors
+            batch.extend(self._to_history_row(row) for row in rows)
+            batch_offset = end_offset
+
+            if len(batch) >= self.batch_rows:
+                file_rows += self._flush(batch, source, batch_offset)
+                batch.clear()
+                elapsed = time.perf_counter() - started
+                print(f"   {path.name}: {file_rows} записей, {file_rows / elapsed:.0f} записей/с")
+
+        for lines, end_offset in _read_chunks(path, start_offset, self.chunk_lines):
+            pending.append((pool.submit(parse_archive_lines, lines), end_offset))
+            if len(pending) >= self.workers * 2:
+                drain_one()
+
+        while pending:
+            drain_one()
+
+        if batch or batch_offset != start_offset:
+            file_rows += self._flush(batch, source, batch_offset)
+
+        stats.rows += file_rows
+        print(f"✅ {path.name}: загружено записей {file_rows}")
+
+    def _to_history_row(self, row: tuple) -> tuple:
+        """Заменяет текст описания на id словаря и добавляет response_time_ms (для архива 0)."""
+        description = row[6]
+        description_id = self._description_ids.get(description)
+        if description_id is None:
+            description_id = self.db_manager.get_or_create_description(description).id
+            self._description_ids[description] = description_id
+        return (*row[:6], description_id, row[7], 0)
+
+    def _flush(self, batch: list[tuple], source: str, byte_offset: int) -> int:
+        """Записывает пачку и позицию файла одной транзакцией."""
+        evaluate = self._evaluate if self.with_notifications else None
+        return self.db_manager.ingest_weather_batch(batch, checkpoint=(source, byte_offset), evaluate=evaluate)
+
+    def _evaluate(self, history_id: int, row: tuple) -> list[tuple[int, str]]:
+        """Проверяет правила для загруженной записи."""
+        description = self.db_manager.get_description(row[6])
+        weather_data = {
+            "city": row[0],
+            "temperature": row[2],
+            "feels_like": row[3],
+            "humidity": row[4],
+            "pressure": row[5],
+            "description": description.text_lower,
+            "description_entry": description,
+            "wind_speed": row[7],
+        }
+
+        return [
+            (rule.id, self._evaluator.format_message(rule, weather_data))
+            for rule in self._rule_index.match(weather_data)
+        ]
@@ -0,0 +1,217 @@
+"""Декодирование ответов API из байтов тела с выбором самого быстрого доступного JSON-бэкенда.
+
+Порядок выбора в режиме "auto":
+    1. msgspec — декодирует байты сразу в типизированную схему за один проход,
+       без промежуточных словарей;
+    2. orjson — быстрый разбор в словари, затем обычный разбор data_parser;
+    3. json из стандартной библиотеки — всегда доступен.
+
+msgspec и orjson необязательны: uv sync --extra fast-json
+"""
+
+import json
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from src.core.data_parser import (
+    ForecastEntry,
+    WeatherData,
+    WeatherForecast,
+    parse_openweathermap_forecast,
+    parse_openweathermap_group,
+    parse_openweathermap_response,
+)
+from src.utils import metrics
+
+JSON_DECODE_SECONDS = metrics.histogram("json_decode_seconds", "Декодирование тела ответа API")
+PARSE_SECONDS = metrics.histogram("parse_seconds", "Сборка WeatherData/WeatherForecast из декодированного ответа")
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - зависит от окружения
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависит от окружения
+    orjson = None
+
+JSON_BACKENDS = ("msgspec", "orjson", "json")
+
+# Разбор в словари для кода, которому нужны поля вне схемы (например, dt при загрузке архивов)
+loads: Callable[[bytes | str], Any] = orjson.loads if orjson is not None else json.loads
+
+
+def available_backends() -> list[str]:
+    """Возвращает установленные бэкенды в порядке предпочтения."""
+    installed = {"msgspec": msgspec is not None, "orjson": orjson is not None, "json": True}
+    return [name for name in JSON_BACKENDS if installed[name]]
+
+
+@dataclass(frozen=True)
+class JsonBackend:
+    """Набор функций декодирования ответов API из байтов тела."""
+
+    name: str
+    decode_weather: Callable[[bytes], WeatherData]
+    decode_group: Callable[[bytes], list[WeatherData]]
+    decode_forecast: Callable[[bytes], WeatherForecast]
+
+
+def _dict_backend(name: str, loads: Callable[[bytes], Any]) -> JsonBackend:
+    """Бэкенд из двух шагов: байты -> словари -> объекты data_parser."""
+
+    def decoder(parse: Callable[[Any], Any]) -> Callable[[bytes], Any]:
+        def decode(raw: bytes) -> Any:
+            try:
+                with JSON_DECODE_SECONDS.time():
+                    payload = loads(raw)
+            except ValueError as e:  # json.JSONDecodeError и orjson.JSONDecodeError наследуют ValueError
+                raise ValueError(f"Некорректный JSON от API: {e}") from e
+            with PARSE_SECONDS.time():
+                return parse(payload)
+
+        return decode
+
+    return JsonBackend(
+        name=name,
+        decode_weather=decoder(parse_openweathermap_response),
+        decode_group=decoder(parse_openweathermap_group),
+        decode_forecast=decoder(parse_openweathermap_forecast),
+    )
+
+
+if msgspec is not None:
+    # Схема описывает только используемые поля: остальные msgspec пропускает, не создавая объектов
+
+    class _Main(msgspec.Struct):
+        temp: float
+        feels_like: float
+        humidity: int
+        pressure: int
+
+    class _Condition(msgspec.Struct):
+        description: str
+
+    class _Wind(msgspec.Struct):
+        speed: float
+
+    class _Current(msgspec.Struct):
+        main: _Main
+        weather: list[_Condition]
+        wind: _Wind
+        name: str
+
+    class _Group(msgspec.Struct):
+        list: list[_Current]
+
+    class _ForecastItem(msgspec.Struct):
+        dt: int
+        main: _Main
+        weather: list[_Condition]
+        wind: _Wind
+        pop: float = 0.0
+
+    class _City(msgspec.Struct):
+        name: str
+
+    class _Forecast(msgspec.Struct):
+        city: _City
+        list: list[_ForecastItem]
+
+    _current_decoder = msgspec.json.Decoder(_Current)
+    _group_decoder = msgspec.json.Decoder(_Group)
+    _forecast_decoder = msgspec.json.Decoder(_Forecast)
+
+    def _to_weather_data(item: _Current) -> WeatherData:
+        if not item.weather:
+            raise ValueError("Непредусмотренные данные от API: пустой список weather")
+        main = item.main
+        return WeatherData(
+            temperature=main.temp,
+            feels_like=main.feels_like,
+            humidity=main.humidity,
+            pressure=main.pressure,
+            description=item.weather[0].description,
+            wind_speed=item.wind.speed,
+            city=item.name,
+        )
+
+    def _msgspec_decode(decoder: msgspec.json.Decoder, raw: bytes) -> Any:
+        try:
+            # Декодирование и проверка схемы в msgspec — один шаг
+            with JSON_DECODE_SECONDS.time():
+                return decoder.decode(raw)
+        except msgspec.DecodeError as e:  # ValidationError — подкласс DecodeError
+            raise ValueError(f"Непредусмотренные данные от API: {e}") from e
+
+    def _msgspec_weather(raw: bytes) -> WeatherData:
+        current = _msgspec_decode(_current_decoder, raw)
+        with PARSE_SECONDS.time():
+            return _to_weather_data(current)
+
+    def _msgspec_group(raw: bytes) -> list[WeatherData]:
+        group = _msgspec_decode(_group_decoder, raw)
+        with PARSE_SECONDS.time():
+            return [_to_weather_data(item) for item in group.list]
+
+    def _msgspec_forecast(raw: bytes) -> WeatherForecast:
+        forecast = _msgspec_decode(_forecast_decoder, raw)
+        with PARSE_SECONDS.time():
+            return _forecast_from_struct(forecast)
+
+    def _forecast_from_struct(forecast: _Forecast) -> WeatherForecast:
+        entries = []
+        for item in forecast.list:
+            if not item.weather:
+                raise ValueError("Непредусмотренные данные прогноза от API: пустой список weather")
+            main = item.main
+            entries.append(
+                ForecastEntry(
+                    forecast_time=datetime.fromtimestamp(item.dt),
+                    temperature=main.temp,
+                    feels_like=main.feels_like,
+                    humidity=main.humidity,
+                    pressure=main.pressure,
+                    description=item.weather[0].description,
+                    wind_speed=item.wind.speed,
+                    precipitation_probability=item.pop,
+                )
+            )
+        return WeatherForecast(city=forecast.city.name, entries=entries)
+
+
+def get_json_backend(name: str = "auto") -> JsonBackend:
+    """Возвращает бэкенд декодирования.
+
+    Args:
+        name: "auto", "msgspec", "orjson" или "json". Если запрошенный бэкенд
+            не установлен, используется следующий доступный
+
+    Raises:
+        ValueError: Если имя бэкенда неизвестно
+    """
+    if name != "auto" and name not in JSON_BACKENDS:
+        raise ValueError(f"Неизвестный JSON-бэкенд: '{name}'. Допустимо: auto, {', '.join(JSON_BACKENDS)}")
+
+    installed = available_backends()
+    if name == "auto":
+        name = installed[0]
+    elif name not in installed:
+        # Следующий по скорости из установленных; json есть всегда
+        fallback = next(b for b in JSON_BACKENDS[JSON_BACKENDS.index(name) :] if b in installed)
+        print(f"⚠️ JSON-бэкенд {name} не установлен, используется {fallback}")
+        name = fallback
+
+    if name == "msgspec":
+        return JsonBackend(
+            name="msgspec",
+            decode_weather=_msgspec_weather,
+            decode_group=_msgspec_group,
+            decode_forecast=_msgspec_forecast,
+        )
+    if name == "orjson":
+        return _dict_backend("orjson", orjson.loads)
+    return _dict_backend("json", json.loads)
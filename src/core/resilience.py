@@ -0,0 +1,149 @@
+"""Защита запросов к API от хвостовых задержек и массовых ошибок.
+
+LatencyTracker помнит время последних успешных ответов и дает порог для
+дублирующего (hedged) запроса: если ответ не пришел за p-й перцентиль обычного
+времени, отправляется второй такой же запрос и берется тот, что вернется первым.
+Дубль получают только самые медленные запросы (около 100 - p процентов), поэтому
+нагрузка на API растет на несколько процентов, а редкие зависания в несколько
+секунд перестают определять p99.
+
+CircuitBreaker считает ошибки среди последних запросов. Когда их доля превышает
+порог, breaker размыкается: запросы сразу завершаются CircuitOpenError и не ждут
+таймаута. Через заданное время пропускается один пробный запрос — при успехе
+breaker замыкается, при ошибке снова размыкается. Каждая смена состояния начинает
+новую эпоху: результат запроса, отправленного в прошлой эпохе (например, начатого
+до размыкания и завершившегося во время пробного), не учитывается.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+from requests.exceptions import RequestException
+
+from src.utils import metrics
+
+BREAKER_TRANSITIONS_TOTAL = metrics.counter(
+    "circuit_breaker_transitions_total", "Переходы circuit breaker API по новому состоянию"
+)
+BREAKER_REJECTED_TOTAL = metrics.counter(
+    "circuit_breaker_rejected_total", "Запросы к API, отклоненные разомкнутым circuit breaker"
+)
+
+# Сколько последних ответов учитывается в перцентиле и сколько нужно, чтобы ему доверять
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+# Дубль раньше этого порога только удвоил бы нагрузку: быстрые ответы не зависают
+HEDGE_MIN_DELAY_SECONDS = 0.05
+
+# Окно circuit breaker и минимальное число запросов в нем для решения о размыкании
+BREAKER_WINDOW = 20
+BREAKER_MIN_REQUESTS = 10
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(RequestException):
+    """Запрос отклонен без обращения к API: breaker разомкнут."""
+
+
+class LatencyTracker:
+    """Скользящее окно времени последних успешных ответов."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def hedge_delay(self, percentile: float) -> float | None:
+        """Порог для дублирующего запроса в секундах; None, пока ответов слишком мало."""
+        with self._lock:
+            if len(self._samples) < LATENCY_MIN_SAMPLES:
+                return None
+            samples = sorted(self._samples)
+        index = min(int(len(samples) * percentile / 100), len(samples) - 1)
+        return max(samples[index], HEDGE_MIN_DELAY_SECONDS)
+
+
+class CircuitBreaker:
+    """Размыкается при высокой доле ошибок и пропускает пробный запрос после паузы."""
+
+    def __init__(self, error_rate: float, open_seconds: float):
+        """Создает замкнутый breaker.
+
+        Args:
+            error_rate: Доля ошибок среди последних BREAKER_WINDOW запросов, при которой breaker размыкается
+            open_seconds: Сколько секунд отклонять запросы перед пробным
+        """
+        self.error_rate = error_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._outcomes: deque[bool] = deque(maxlen=BREAKER_WINDOW)  # True — ошибка
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._epoch = 0  # Номер текущего состояния: растет при каждом переходе
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        self._epoch += 1
+        BREAKER_TRANSITIONS_TOTAL.inc(state=state)
+
+    def before_request(self) -> int:
+        """Проверяет, можно ли отправить запрос.
+
+        Returns:
+            Эпоха запроса: ее нужно передать в record вместе с результатом
+
+        Raises:
+            CircuitOpenError: Breaker разомкнут или пробный запрос уже выполняется
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return self._epoch
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    BREAKER_REJECTED_TOTAL.inc()
+                    raise CircuitOpenError(
+                        "API погоды недоступно: много ошибок среди последних запросов, "
+                        f"повтор через {math.ceil(remaining)} с"
+                    )
+                self._transition(HALF_OPEN)
+                self._trial_running = False
+            if self._trial_running:
+                BREAKER_REJECTED_TOTAL.inc()
+                raise CircuitOpenError("API погоды недоступно: выполняется пробный запрос")
+            self._trial_running = True
+            return self._epoch
+
+    def record(self, failed: bool, epoch: int) -> None:
+        """Учитывает результат запроса, пропущенного before_request.
+
+        Args:
+            failed: True если запрос завершился ошибкой API
+            epoch: Эпоха, которую вернул before_request для этого запроса
+        """
+        with self._lock:
+            if epoch != self._epoch:
+                return  # Запрос начался в прошлом состоянии: до размыкания или до пробного запроса
+            if self.state == HALF_OPEN:
+                self._trial_running = False
+                if failed:
+                    self._opened_at = time.monotonic()
+                    self._transition(OPEN)
+                else:
+                    self._outcomes.clear()
+                    self._transition(CLOSED)
+                return
+
+            self._outcomes.append(failed)
+            requests_seen = len(self._outcomes)
+            if requests_seen >= BREAKER_MIN_REQUESTS and sum(self._outcomes) >= self.error_rate * requests_seen:
+                self._opened_at = time.monotonic()
+                self._outcomes.clear()
+                self._transition(OPEN)
@@ -1,11 +1,41 @@
 """Сервис для координации получения данных о погоде."""
 
+import threading
 import time
+from collections.abc import Callable, Generator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from requests.exceptions import RequestException
 
 from src.core.api_client import OpenWeatherMapApiClient
 from src.core.config_loader import Config, ConfigLoader
-from src.core.data_parser import WeatherData, parse_openweathermap_response
-from src.notifications.engine import notification_engine
+from src.core.data_parser import WeatherData, WeatherForecast
+from src.core.geo_cache import CellWeather, GeoWeatherCache
+from src.core.json_backend import get_json_backend
+from src.database.models import IssuedNotification, WeatherRecord
+from src.notifications.dispatch import NotificationDispatcher
+from src.notifications.engine import get_notification_engine
+from src.notifications.sinks import build_sinks
+from src.utils import metrics
+from src.utils.geo import KM_PER_DEGREE, validate_coordinates
+from src.utils.slow_log import SlowRequestLog
+
+WEATHER_REQUEST_SECONDS = metrics.histogram(
+    "request_seconds", "Запрос погоды целиком: HTTP, разбор, сохранение и уведомления"
+)
+WEATHER_REQUESTS_TOTAL = metrics.counter("requests_total", "Запросы погоды по результату")
+GEO_LOOKUPS_TOTAL = metrics.counter("geo_lookups_total", "Запросы погоды по координатам по источнику ответа")
+SUBSCRIPTION_POLL_SECONDS = metrics.histogram(
+    "subscription_poll_seconds", "Опрос городов подписок: запросы, сохранение и рассылка уведомлений"
+)
+
+# Одновременных запросов к API при опросе городов подписок
+POLL_WORKERS = 8
+
+# Получатель погоды, сохраненной фоновым обновлением: (WeatherData, запись истории, уведомления)
+RefreshCallback = Callable[[WeatherData, WeatherRecord, list[str]], None]
 
 
 class WeatherService:
@@ -19,10 +49,316 @@ class WeatherService:
         """
         self.config = config or ConfigLoader.load()
         self.api_client = OpenWeatherMapApiClient(self.config)
+        self.json_backend = get_json_backend(self.config.json_backend)
+        self.notification_engine = get_notification_engine()
+        self.slow_log = SlowRequestLog(self.config.slow_request_ms)
+        self._history_cities: dict[str, str] = {}  # Запрос города -> город в истории (как его называет API)
+        # Обновляемые в фоне города (ключ запроса) -> поток и получатели свежей записи
+        self._refreshing: dict[str, tuple[threading.Thread, list[RefreshCallback]]] = {}
+        self._refreshing_lock = threading.Lock()
+        self.geo_cache = GeoWeatherCache(self.config.geo_cell_degrees, self.config.geo_cache_seconds)
+        if self.config.metrics_enabled:
+            metrics.enable_metrics()
+
+        # Общий движок получает диспетчер один раз, даже если сервисов несколько
+        if self.config.notification_sinks and self.notification_engine.dispatcher is None:
+            sinks = build_sinks(self.config)
+            if sinks:
+                self.notification_engine.dispatcher = NotificationDispatcher(sinks)
+
+    @contextmanager
+    def trace_request(self) -> Generator[metrics.RequestTrace, None, None]:
+        """Отслеживает этапы запроса внутри блока и пишет его в журнал, если он медленнее порога.
+
+        Этапы берутся из гистограмм метрик, поэтому журнал работает и при выключенных метриках.
+        """
+        request_trace = None
+        try:
+            with metrics.trace() as request_trace:
+                yield request_trace
+        except Exception as e:
+            request_trace.attributes["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if request_trace is not None:
+                self.slow_log.record(request_trace)
+
+    def fetch_weather_data(
+        self, city: str | None = None, coordinates: tuple[float, float] | None = None
+    ) -> tuple[WeatherData, int]:
+        """Запрашивает и разбирает данные о погоде без сохранения в БД.
+
+        Args:
+            city: Город запроса. Если None, берется город из настроек
+            coordinates: Широта и долгота запроса вместо города
+
+        Returns:
+            Кортеж (WeatherData, время ответа API в миллисекундах)
+
+        Raises:
+            ValueError: При ошибках парсинга
+            requests.exceptions.RequestException: При ошибках сети или API
+        """
+        start_time = time.time()
+
+        # Получаем тело ответа и разбираем его сразу в WeatherData
+        raw_body = self.api_client.fetch_weather_raw(city, coordinates)
+        weather_data = self.json_backend.decode_weather(raw_body)
+        metrics.annotate(city=weather_data.city)
+
+        # Вычисляем время ответа
+        response_time = int((time.time() - start_time) * 1000)
+
+        if coordinates is None:
+            self._remember_city(city or self.config.city, weather_data.city)
+        return weather_data, response_time
+
+    @staticmethod
+    def _query_key(city: str) -> str:
+        return city.strip().casefold()
+
+    def _remember_city(self, query: str, city: str) -> None:
+        """Запоминает название города в истории: по нему ищется последнее наблюдение запроса."""
+        key = self._query_key(query)
+        if self._history_cities.get(key) != city:
+            self._history_cities[key] = city
+            self.notification_engine.db_manager.remember_city_query(key, city)
+
+    def get_stored_weather(
+        self, city: str | None = None, max_age_seconds: int | None = None
+    ) -> tuple[WeatherData, WeatherRecord, list[str]] | None:
+        """Последнее сохраненное наблюдение города без запроса к API.
+
+        Args:
+            city: Город запроса. Если None, берется город из настроек
+            max_age_seconds: Наблюдение старше этого возраста не возвращается. None — любое
+
+        Returns:
+            Кортеж (WeatherData с возрастом наблюдения, запись истории, уведомления записи)
+            или None, если подходящего наблюдения нет
+        """
+        db_manager = self.notification_engine.db_manager
+        key = self._query_key(city or self.config.city)
+        history_city = self._history_cities.get(key) or db_manager.get_city_for_query(key)
+        if history_city is None:
+            return None  # Город еще не запрашивался: неизвестно, как он называется в истории
+        records = db_manager.get_recent_city_records(history_city, 1)
+        if not records:
+            return None
+
+        record = records[0]
+        age_seconds = self._record_age(record)
+        if max_age_seconds is not None and age_seconds > max_age_seconds:
+            return None
+        weather_data = self._weather_from_record(record, age_seconds)
+        notifications = [n.message for n in db_manager.get_notifications_for_record(record.id)]
+        return weather_data, record, notifications
+
+    @staticmethod
+    def _record_age(record: WeatherRecord) -> int:
+        """Возраст записи истории в секундах."""
+        return max(int((datetime.now() - record.timestamp).total_seconds()), 0)
+
+    @staticmethod
+    def _weather_from_record(record: WeatherRecord, age_seconds: int | None = None) -> WeatherData:
+        """WeatherData из записи истории."""
+        return WeatherData(
+            temperature=record.temperature,
+            feels_like=record.feels_like,
+            humidity=record.humidity,
+            pressure=record.pressure,
+            description=record.description,
+            wind_speed=record.wind_speed,
+            city=record.city,
+            age_seconds=age_seconds,
+        )
+
+    def get_weather_at(self, latitude: float, longitude: float) -> tuple[WeatherData, WeatherRecord, list[str], bool]:
+        """Погода по координатам через кэш ячеек сетки (см. src/core/geo_cache.py).
+
+        Запросы из одной ячейки в течение GEO_CACHE_SECONDS получают один ответ: из памяти,
+        из наблюдения в истории в центре ячейки (его мог сохранить другой процесс) или
+        от одного запроса к API по координатам центра ячейки.
+
+        Returns:
+            Кортеж (WeatherData, запись истории, уведомления, True если запрос к API не понадобился)
+
+        Raises:
+            ValueError: Некорректные координаты или ошибка парсинга
+            requests.exceptions.RequestException: При ошибках сети или API
+        """
+        validate_coordinates(latitude, longitude)
+        cache = self.geo_cache
+        cell = cache.cell(latitude, longitude)
+        entry = cache.get(cell)
+        if entry is not None:
+            GEO_LOOKUPS_TOTAL.inc(source="cache")
+            return entry.weather_data, entry.record, entry.notifications, True
+
+        with cache.fetch_lock(cell):
+            entry = cache.get(cell)
+            if entry is not None:
+                GEO_LOOKUPS_TOTAL.inc(source="cache")  # Ответ ячейки получил одновременный запрос
+                return entry.weather_data, entry.record, entry.notifications, True
+
+            entry = self._cell_from_history(cell)
+            if entry is not None:
+                GEO_LOOKUPS_TOTAL.inc(source="history")
+                cache.put(cell, entry)
+                return entry.weather_data, entry.record, entry.notifications, True
+
+            entry = self._fetch_cell(cell)
+            GEO_LOOKUPS_TOTAL.inc(source="api")
+            cache.put(cell, entry)
+            return entry.weather_data, entry.record, entry.notifications, False
+
+    def _cell_from_history(self, cell: tuple[int, int]) -> CellWeather | None:
+        """Свежее наблюдение центра ячейки из истории: ячейку уже запрашивал другой процесс."""
+        db_manager = self.notification_engine.db_manager
+        latitude, longitude = self.geo_cache.center(cell)
+        # Наблюдения соседних ячеек сохранены в их центрах, не ближе шага сетки
+        radius_km = self.geo_cache.cell_degrees * KM_PER_DEGREE / 4
+        since = datetime.now() - timedelta(seconds=self.geo_cache.ttl_seconds)
+        found = db_manager.find_nearest_record(latitude, longitude, radius_km, since=since)
+        if found is None:
+            return None
+        record, _ = found
+        notifications = [n.message for n in db_manager.get_notifications_for_record(record.id)]
+        fetched_at = time.monotonic() - self._record_age(record)
+        return CellWeather(self._weather_from_record(record), record, notifications, fetched_at)
+
+    def _fetch_cell(self, cell: tuple[int, int]) -> CellWeather:
+        """Запрашивает погоду в центре ячейки, сохраняет ее в историю вместе с координатами."""
+        center = self.geo_cache.center(cell)
+        try:
+            with self.trace_request(), WEATHER_REQUEST_SECONDS.time():
+                weather_data, response_time = self.fetch_weather_data(coordinates=center)
+                record, notifications = self.process_weather_data(weather_data, response_time)
+                self.notification_engine.db_manager.save_observation_location(record.id, *center)
+        except Exception:
+            WEATHER_REQUESTS_TOTAL.inc(result="error")
+            raise
+        WEATHER_REQUESTS_TOTAL.inc(result="ok")
+        return CellWeather(weather_data, record, notifications, time.monotonic())
+
+    def get_stale_weather(
+        self, on_refreshed: RefreshCallback | None = None
+    ) -> tuple[WeatherData, WeatherRecord, list[str]] | None:
+        """Погода в режиме stale-while-revalidate (STALE_MAX_SECONDS).
+
+        Последнее наблюдение из истории возвращается сразу, а свежая погода
+        запрашивается в фоне и сохраняется в историю для следующего раза.
+
+        Args:
+            on_refreshed: Вызывается из фонового потока со свежей погодой, когда она сохранена
+
+        Returns:
+            Кортеж (WeatherData с возрастом наблюдения, запись истории, уведомления) или None,
+            если режим выключен или наблюдения не старше STALE_MAX_SECONDS нет
+        """
+        if not self.config.stale_max_seconds:
+            return None
+        stored = self.get_stored_weather(max_age_seconds=self.config.stale_max_seconds)
+        if stored is None:
+            return None
+
+        WEATHER_REQUESTS_TOTAL.inc(result="stale")
+        self.refresh_in_background(on_refreshed=on_refreshed)
+        return stored
+
+    def refresh_in_background(self, city: str | None = None, on_refreshed: RefreshCallback | None = None) -> bool:
+        """Запрашивает и сохраняет погоду в фоновом потоке.
+
+        Один город обновляется одним потоком: повторный вызов, пока он работает, только
+        добавляет получателя свежей погоды. Поток фоновый (daemon) и не задерживает выход
+        из программы — перед выходом нужно вызвать wait_for_refreshes.
+
+        Args:
+            city: Город запроса. Если None, берется город из настроек
+            on_refreshed: Вызывается из фонового потока со свежей погодой, когда она сохранена
+
+        Returns:
+            False, если этот город уже обновляется
+        """
+        city = city or self.config.city
+        key = self._query_key(city)
+        callbacks = [on_refreshed] if on_refreshed is not None else []
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                self._refreshing[key][1].extend(callbacks)
+                return False
+            thread = threading.Thread(target=self._refresh, args=(city, key), name="weather-refresh", daemon=True)
+            self._refreshing[key] = (thread, callbacks)
+        thread.start()
+        return True
+
+    def wait_for_refreshes(self, timeout: float | None = None) -> None:
+        """Ждет завершения фоновых обновлений (не дольше timeout секунд на каждое)."""
+        with self._refreshing_lock:
+            threads = [thread for thread, _ in self._refreshing.values()]
+        for thread in threads:
+            thread.join(timeout)
+
+    def _refresh(self, city: str, key: str) -> None:
+        result = None
+        try:
+            with self.trace_request(), WEATHER_REQUEST_SECONDS.time():
+                weather_data, response_time = self.fetch_weather_data(city)
+                record, notifications = self.process_weather_data(weather_data, response_time)
+            result = (weather_data, record, notifications)
+            WEATHER_REQUESTS_TOTAL.inc(result="ok")
+        except (ValueError, RequestException) as e:
+            WEATHER_REQUESTS_TOTAL.inc(result="error")
+            print(f"⚠️ Не удалось обновить погоду для {city} в фоне: {e}")
+        finally:
+            with self._refreshing_lock:
+                _, callbacks = self._refreshing.pop(key)
+        if result is not None:
+            for callback in callbacks:
+                callback(*result)
+
+    @staticmethod
+    def _to_weather_dict(weather_data: WeatherData) -> dict:
+        """Преобразует WeatherData в словарь для движка уведомлений."""
+        return {
+            "city": weather_data.city,
+            "temperature": weather_data.temperature,
+            "feels_like": weather_data.feels_like,
+            "humidity": weather_data.humidity,
+            "pressure": weather_data.pressure,
+            "description": weather_data.description,  # Нижний регистр берется из словаря описаний
+            "wind_speed": weather_data.wind_speed,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def process_weather_data(self, weather_data: WeatherData, response_time: int) -> tuple[WeatherRecord, list[str]]:
+        """Сохраняет данные о погоде в историю и генерирует уведомления.
+
+        Args:
+            weather_data: Разобранные данные о погоде
+            response_time: Время ответа API в миллисекундах
+
+        Returns:
+            Кортеж (сохраненная запись истории, список уведомлений)
+        """
+        # Обрабатываем уведомления
+        record, notifications = self.notification_engine.process_weather_record(
+            self._to_weather_dict(weather_data), response_time
+        )
+
+        print(f"✅ Запрос сохранен в истории (ID: {record.id})")
+        print(f"🔔 Сгенерировано уведомлений: {len(notifications)}")
+
+        return record, notifications
 
     def get_weather_with_notifications(self) -> tuple[WeatherData, list[str]]:
         """Получает данные о погоде и генерирует уведомления.
 
+        Если в настройках заданы координаты (DEFAULT_LAT, DEFAULT_LON), погода берется
+        через кэш ячеек сетки (get_weather_at). Если задан STALE_MAX_SECONDS и в истории
+        есть достаточно свежее наблюдение города, оно возвращается сразу
+        (WeatherData.age_seconds), а погода обновляется в фоне.
+
         Returns:
             Кортеж (WeatherData, список уведомлений)
 
@@ -30,40 +366,89 @@ class WeatherService:
             ValueError: При ошибках конфигурации или парсинга
             requests.exceptions.RequestException: При ошибках сети или API
         """
-        start_time = time.time()
+        coordinates = self.config.coordinates
+        if coordinates is not None:
+            try:
+                weather_data, _, notifications, _ = self.get_weather_at(*coordinates)
+            except Exception as e:
+                print(f"❌ Ошибка при получении погоды: {e}")
+                raise
+            return weather_data, notifications
+
+        stale = self.get_stale_weather()
+        if stale is not None:
+            weather_data, _, notifications = stale
+            return weather_data, notifications
 
         try:
-            # Получаем сырые данные
-            raw_json = self.api_client.fetch_weather_json()
+            with self.trace_request(), WEATHER_REQUEST_SECONDS.time():
+                weather_data, response_time = self.fetch_weather_data()
+                _, notifications = self.process_weather_data(weather_data, response_time)
+            WEATHER_REQUESTS_TOTAL.inc(result="ok")
+            return weather_data, notifications
 
-            # Парсим данные
-            weather_data = parse_openweathermap_response(raw_json)
+        except Exception as e:
+            WEATHER_REQUESTS_TOTAL.inc(result="error")
+            print(f"❌ Ошибка при получении погоды: {e}")
+            raise
+
+    def poll_subscriptions(self) -> tuple[int, list[IssuedNotification]]:
+        """Запрашивает погоду для городов подписок и рассылает уведомления подписчикам.
 
-            # Вычисляем время ответа
-            response_time = int((time.time() - start_time) * 1000)
+        Каждый город запрашивается один раз, сколько бы пользователей на него ни
+        подписалось; запросы идут параллельно. Город, для которого запрос не удался,
+        пропускается до следующего опроса.
 
-            # Преобразуем WeatherData в словарь для движка уведомлений
-            weather_dict = {
-                "city": weather_data.city,
-                "temperature": weather_data.temperature,
-                "feels_like": weather_data.feels_like,
-                "humidity": weather_data.humidity,
-                "pressure": weather_data.pressure,
-                "description": weather_data.description.lower(),  # Для проверки contains
-                "wind_speed": weather_data.wind_speed,
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            }
+        Returns:
+            Кортеж (количество опрошенных городов, выданные уведомления)
+        """
+        engine = self.notification_engine
+        cities = engine.get_subscription_index().cities
+        if not cities:
+            return 0, []
 
-            # Обрабатываем уведомления
-            history_id, notifications = notification_engine.process_weather_data(weather_dict, response_time)
+        with self.trace_request(), SUBSCRIPTION_POLL_SECONDS.time():
+            observations = {}
+            with ThreadPoolExecutor(max_workers=min(POLL_WORKERS, len(cities))) as pool:
+                results = {city: pool.submit(self.fetch_weather_data, city) for city in cities}
+            for city, future in results.items():
+                try:
+                    weather_data, response_time = future.result()
+                except (ValueError, RequestException) as e:
+                    WEATHER_REQUESTS_TOTAL.inc(result="error")
+                    print(f"⚠️ Погода для города {city} не получена: {e}")
+                    continue
+                WEATHER_REQUESTS_TOTAL.inc(result="ok")
+                observations[city] = (self._to_weather_dict(weather_data), response_time)
 
-            print(f"✅ Запрос сохранен в истории (ID: {history_id})")
-            print(f"🔔 Сгенерировано уведомлений: {len(notifications)}")
+            issued = engine.process_subscriptions(observations)
+        return len(observations), issued
 
-            return weather_data, notifications
+    def get_forecast_with_notifications(self, hours: int = 6) -> tuple[WeatherForecast, list[str]]:
+        """Получает прогноз на 5 дней, сохраняет его и заранее проверяет правила.
+
+        Один запрос прогноза заменяет опрос текущей погоды каждые 3 часа.
+
+        Args:
+            hours: Горизонт проверки правил в часах
+
+        Returns:
+            Кортеж (WeatherForecast, список предупреждений на ближайшие hours часов)
+
+        Raises:
+            ValueError: При ошибках парсинга
+            requests.exceptions.RequestException: При ошибках сети или API
+        """
+        try:
+            forecast = self.json_backend.decode_forecast(self.api_client.fetch_forecast_raw())
+            saved = self.notification_engine.db_manager.save_forecast(forecast.city, forecast.entries)
+            alerts = self.notification_engine.evaluate_forecast(forecast, hours=hours)
+
+            print(f"✅ Прогноз сохранен (точек: {saved})")
+            return forecast, alerts
 
         except Exception as e:
-            print(f"❌ Ошибка при получении погоды: {e}")
+            print(f"❌ Ошибка при получении прогноза: {e}")
             raise
 
     def get_weather(self) -> WeatherData:
@@ -1,12 +1,134 @@
 """Менеджер базы данных SQLite."""
 
+import math
+import os
 import sqlite3
-from collections.abc import Generator
+import sys
+import threading
+import time
+from collections.abc import Callable, Generator, Iterable
 from contextlib import contextmanager
-from datetime import datetime
+from dataclasses import replace
+from datetime import UTC, datetime
+from functools import cache
 from pathlib import Path
 
-from src.database.models import IssuedNotification, NotificationRule, WeatherRecord
+from src.core.config_loader import ConfigLoader
+from src.core.data_parser import ForecastEntry
+from src.database.models import (
+    IssuedNotification,
+    NotificationRule,
+    NotificationState,
+    WeatherDescription,
+    WeatherRecord,
+)
+from src.database.recent import SERIES_FIELDS, ObservationRing, RecentObservations, from_micros, to_micros
+from src.utils import metrics
+from src.utils.geo import KM_PER_DEGREE, distance_km, grid_cell
+from src.utils.weather_icons import get_weather_icon
+
+DB_WRITE_SECONDS = metrics.histogram("db_write_seconds", "Сохранение записи истории (соединение + транзакция)")
+NOTIFICATION_WRITE_SECONDS = metrics.histogram("notification_write_seconds", "Сохранение выданного уведомления")
+SQLITE_LOCK_WAIT_SECONDS = metrics.histogram(
+    "sqlite_lock_wait_seconds", "Ожидание блокировки записи SQLite (BEGIN IMMEDIATE)"
+)
+
+# Явный порядок колонок для позиционного декодирования строк (без sqlite3.Row)
+WEATHER_COLUMNS = (
+    "h.id, h.city, h.timestamp, h.temperature, h.feels_like, h.humidity, h.pressure, "
+    "h.description_id, h.wind_speed, h.response_time_ms, h.created_at"
+)
+RULE_COLUMNS = (
+    "id, name, condition_type, operator, threshold_value, message_template, icon, priority, is_active, created_at, "
+    "cooldown_minutes, hysteresis, rule_set_id"
+)
+DESCRIPTION_COLUMNS = "id, text, text_lower, icon, keyword_flags, keyword_bits"
+NOTIFICATION_COLUMNS = "inot.id, inot.history_id, inot.rule_id, inot.message, inot.created_at, inot.user_id"
+
+# Поля, по которым разрешена серверная сортировка истории, и их SQL-выражения (защита от SQL-инъекций)
+HISTORY_SORT_COLUMNS = {"timestamp": "h.timestamp", "temperature": "h.temperature", "description": "d.text"}
+
+# Флаги ключевых слов хранятся в 64-битном INTEGER SQLite
+MAX_DESCRIPTION_KEYWORDS = 63
+
+# Шаг сетки индекса координат наблюдений в градусах (~1 км по широте). Не зависит от ячеек
+# кэша погоды по координатам: поиск ближайшего наблюдения перебирает ячейки индекса вокруг точки
+GEO_INDEX_CELL_DEGREES = 0.01
+
+# Поля часовых сводок истории (weather_rollups): для графиков за длинные периоды
+ROLLUP_FIELDS = ("temperature", "feels_like", "humidity", "pressure", "wind_speed")
+
+# Интервалы сводок: час хранится в weather_rollups, сутки собираются из часов при запросе
+ROLLUP_BUCKETS = {"hour": "hour", "day": "substr(hour, 1, 10) || ' 00:00:00'"}
+
+# Таблицы, для которых триггеры ведут счетчики строк (city = '' означает всю таблицу)
+COUNTED_TABLES = ("weather_history", "issued_notifications")
+# Построчные триггеры удаления, которые clear_history отключает на время очистки
+HISTORY_DELETE_TRIGGERS = (
+    "trg_weather_history_count_delete",
+    "trg_issued_notifications_count_delete",
+    "trg_weather_history_rollup_delete",
+)
+
+# Последние наблюдения в памяти (см. src/database/recent.py): емкость буфера на город
+# (переопределяется переменной RECENT_HISTORY_SIZE, 0 — выключено) и число буферов городов
+RECENT_HISTORY_SIZE = 256
+RECENT_HISTORY_MAX_CITIES = 1024
+# Как часто сверять буферы с базой данных: в нее могут писать другие процессы (ingest, демон)
+RECENT_SYNC_SECONDS = 1.0
+
+
+def _parse_datetime(value: str | None) -> datetime | None:
+    """Преобразует строку даты из SQLite в datetime."""
+    return datetime.fromisoformat(value) if value else None
+
+
+def _created_now() -> datetime:
+    """Время создания записи, как его заполнил бы CURRENT_TIMESTAMP (UTC, с точностью до секунды).
+
+    Записи истории получают его явно: тогда то же значение попадает и в буферы последних наблюдений.
+    """
+    return datetime.now(UTC).replace(tzinfo=None, microsecond=0)
+
+
+def history_sort_key(record: WeatherRecord, order_by: str) -> tuple:
+    """Возвращает ключ keyset-пагинации (значение колонки сортировки, id) для записи.
+
+    Args:
+        record: Последняя запись страницы
+        order_by: Колонка сортировки из HISTORY_SORT_COLUMNS
+
+    Returns:
+        Кортеж для параметра after в DatabaseManager.get_records_page
+    """
+    if order_by == "timestamp":
+        # Тот же строковый формат, в котором datetime сохраняется в SQLite
+        return record.timestamp.isoformat(" "), record.id
+    return getattr(record, order_by), record.id
+
+
+def decode_rule_row(row: tuple) -> NotificationRule:
+    """Собирает NotificationRule из строки в порядке RULE_COLUMNS."""
+    return NotificationRule(
+        row[0],
+        row[1],
+        row[2],
+        row[3],
+        row[4],
+        row[5],
+        row[6],
+        row[7],
+        bool(row[8]),
+        _parse_datetime(row[9]),
+        row[10],
+        row[11],
+        row[12],
+    )
+
+
+def decode_notification_row(row: tuple) -> IssuedNotification:
+    """Собирает IssuedNotification из строки в порядке NOTIFICATION_COLUMNS."""
+    return IssuedNotification(row[0], row[1], row[2], row[3], _parse_datetime(row[4]), row[5])
 
 
 class DatabaseManager:
@@ -16,8 +138,10 @@ class DatabaseManager:
         """Инициализирует менеджер базы данных.
 
         Args:
-            db_path: Путь к файлу базы данных. Если None, используется data/db/weather.db
+            db_path: Путь к файлу базы данных. Если None, берется из переменной окружения
+                WEATHER_DB_PATH, а без нее используется data/db/weather.db
         """
+        db_path = db_path or os.getenv("WEATHER_DB_PATH")
         if db_path is None:
             # Создаем директорию data/db если ее нет
             base_dir = Path(__file__).parent.parent.parent
@@ -27,6 +151,19 @@ class DatabaseManager:
         else:
             self.db_path = Path(db_path)
 
+        # Словарь описаний погоды в памяти: описаний немного, а используются они в каждой записи
+        self._descriptions_lock = threading.Lock()
+        self._descriptions_by_id: dict[int, WeatherDescription] = {}
+        self._descriptions_by_text: dict[str, WeatherDescription] = {}
+        self._description_keywords: dict[str, int] = {}  # ключевое слово -> номер бита
+
+        # Кольцевые буферы последних наблюдений: недавние записи читаются без SQLite
+        capacity = ConfigLoader._parse_int("RECENT_HISTORY_SIZE", str(RECENT_HISTORY_SIZE), minimum=0)
+        self.recent = (
+            RecentObservations(capacity, RECENT_HISTORY_MAX_CITIES, self._description_text) if capacity > 0 else None
+        )
+
+        self._migrate_legacy_description_column()
         self._init_database()
 
     @contextmanager
@@ -44,27 +181,40 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    @staticmethod
+    def _begin_write(conn: sqlite3.Connection) -> None:
+        """Сразу берет блокировку записи, чтобы ожидание других писателей измерялось отдельно."""
+        with SQLITE_LOCK_WAIT_SECONDS.time():
+            conn.execute("BEGIN IMMEDIATE")
+
     def _init_database(self) -> None:
         """Инициализирует базу данных, создает таблицы если их нет."""
         with self._get_connection() as conn:
+            # Словарь описаний погоды
+            self._create_description_tables(conn)
+            self._migrate_description_keyword_bits(conn)
+
             # Таблица истории запросов погоды
+            self._create_weather_history_table(conn, "weather_history")
+
+            # Пользователи и их наборы правил (у каждого набора свои пороги)
             conn.execute("""
-                CREATE TABLE IF NOT EXISTS weather_history (
+                CREATE TABLE IF NOT EXISTS users (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    city TEXT NOT NULL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    temperature REAL NOT NULL,
-                    feels_like REAL NOT NULL,
-                    humidity INTEGER NOT NULL,
-                    pressure INTEGER NOT NULL,
-                    description TEXT NOT NULL,
-                    wind_speed REAL NOT NULL,
-                    response_time_ms INTEGER DEFAULT 0,
+                    name TEXT NOT NULL UNIQUE,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rule_sets (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE,
+                    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             """)
 
-            # Таблица правил уведомлений
+            # Таблица правил уведомлений (rule_set_id = NULL — общие правила)
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS notification_rules (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -76,9 +226,45 @@ class DatabaseManager:
                     icon TEXT,
                     priority INTEGER DEFAULT 1,
                     is_active BOOLEAN DEFAULT 1,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    cooldown_minutes INTEGER NOT NULL DEFAULT 0,
+                    hysteresis REAL NOT NULL DEFAULT 0,
+                    rule_set_id INTEGER REFERENCES rule_sets(id) ON DELETE CASCADE
                 )
             """)
+            self._migrate_rule_cooldown_columns(conn)
+
+            # Подписки: пользователь получает уведомления набора правил по городу
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS subscriptions (
+                    city TEXT NOT NULL,
+                    rule_set_id INTEGER NOT NULL REFERENCES rule_sets(id) ON DELETE CASCADE,
+                    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                    PRIMARY KEY (city, rule_set_id, user_id)
+                ) WITHOUT ROWID
+            """)
+
+            # Пауза и гистерезис правил для отдельных городов (NULL — как в правиле)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rule_city_settings (
+                    rule_id INTEGER NOT NULL REFERENCES notification_rules(id) ON DELETE CASCADE,
+                    city TEXT NOT NULL,
+                    cooldown_minutes INTEGER,
+                    hysteresis REAL,
+                    PRIMARY KEY (rule_id, city)
+                ) WITHOUT ROWID
+            """)
+
+            # Последнее срабатывание правил по городам: из него при запуске заполняется индекс пауз
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS notification_state (
+                    rule_id INTEGER NOT NULL REFERENCES notification_rules(id) ON DELETE CASCADE,
+                    city TEXT NOT NULL,
+                    last_fired_at DATETIME,
+                    latched INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (rule_id, city)
+                ) WITHOUT ROWID
+            """)
 
             # Таблица выданных уведомлений
             conn.execute("""
@@ -88,26 +274,620 @@ class DatabaseManager:
                     rule_id INTEGER NOT NULL,
                     message TEXT NOT NULL,
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
                     FOREIGN KEY (history_id) REFERENCES weather_history(id) ON DELETE CASCADE,
                     FOREIGN KEY (rule_id) REFERENCES notification_rules(id) ON DELETE CASCADE
                 )
             """)
+            self._migrate_subscription_columns(conn)
+
+            # Таблица прогнозов: одна строка на точку прогноза каждого скачанного прогноза
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS forecast (
+                    city TEXT NOT NULL,
+                    forecast_time DATETIME NOT NULL,
+                    fetched_at DATETIME NOT NULL,
+                    temperature REAL NOT NULL,
+                    feels_like REAL NOT NULL,
+                    humidity INTEGER NOT NULL,
+                    pressure INTEGER NOT NULL,
+                    description_id INTEGER NOT NULL REFERENCES weather_descriptions(id),
+                    wind_speed REAL NOT NULL,
+                    precipitation_probability REAL DEFAULT 0,
+                    PRIMARY KEY (city, forecast_time, fetched_at)
+                ) WITHOUT ROWID
+            """)
+
+            # Позиции загрузки архивов: до какого байта файл уже перенесен в историю
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+                    source TEXT PRIMARY KEY,
+                    byte_offset INTEGER NOT NULL DEFAULT 0,
+                    rows_ingested INTEGER NOT NULL DEFAULT 0,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Координаты наблюдений, запрошенных по lat/lon, с номером ячейки сетки для поиска ближайшего
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS weather_locations (
+                    history_id INTEGER PRIMARY KEY REFERENCES weather_history(id) ON DELETE CASCADE,
+                    latitude REAL NOT NULL,
+                    longitude REAL NOT NULL,
+                    cell_lat INTEGER NOT NULL,
+                    cell_lon INTEGER NOT NULL,
+                    timestamp DATETIME NOT NULL
+                )
+            """)
+
+            # Город в истории по запросу: API называет город по-своему (Moscow -> Москва при lang=ru)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS city_queries (
+                    query TEXT PRIMARY KEY,
+                    city TEXT NOT NULL
+                ) WITHOUT ROWID
+            """)
 
             # Создаем индексы
             conn.execute("CREATE INDEX IF NOT EXISTS idx_weather_history_timestamp ON weather_history(timestamp)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_weather_history_city ON weather_history(city)")
+            # Последние записи города (загрузка буфера города, ряды значений за период)
+            conn.execute("DROP INDEX IF EXISTS idx_weather_history_city")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_weather_history_city_timestamp ON weather_history(city, timestamp)"
+            )
+            # Индексы для постраничной сортировки истории без полного сканирования
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_weather_history_temperature ON weather_history(temperature, id)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_weather_history_description ON weather_history(description_id, id)"
+            )
             conn.execute(
                 "CREATE INDEX IF NOT EXISTS idx_notification_rules_active ON notification_rules(is_active, priority)"
             )
             conn.execute(
                 "CREATE INDEX IF NOT EXISTS idx_issued_notifications_history ON issued_notifications(history_id)"
             )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_issued_notifications_user ON issued_notifications(user_id, id)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_notification_rules_rule_set "
+                "ON notification_rules(rule_set_id, is_active)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_subscriptions_user ON subscriptions(user_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_forecast_city_fetched ON forecast(city, fetched_at)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_weather_locations_cell "
+                "ON weather_locations(cell_lat, cell_lon, timestamp)"
+            )
+
+            # Счетчики строк, которые ведут триггеры
+            self._init_row_counters(conn)
+            self._init_rules_version(conn)
+            self._init_rollups(conn)
 
             # Вставляем базовые правила уведомлений
             self._insert_base_rules(conn)
 
+            # Ключевые слова правил "contains" и словарь описаний в память
+            self._sync_description_keywords(conn)
+            self._load_descriptions(conn)
+
+    @staticmethod
+    def _create_description_tables(conn: sqlite3.Connection) -> None:
+        """Создает таблицы словаря описаний погоды и ключевых слов правил."""
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS weather_descriptions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                text TEXT NOT NULL UNIQUE,
+                text_lower TEXT NOT NULL,
+                icon TEXT NOT NULL,
+                keyword_flags INTEGER NOT NULL DEFAULT 0,
+                keyword_bits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS description_keywords (
+                bit INTEGER PRIMARY KEY,
+                keyword TEXT NOT NULL UNIQUE
+            )
+        """)
+
+    @staticmethod
+    def _create_weather_history_table(conn: sqlite3.Connection, table_name: str) -> None:
+        """Создает таблицу истории; описание хранится ссылкой на weather_descriptions."""
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                city TEXT NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                temperature REAL NOT NULL,
+                feels_like REAL NOT NULL,
+                humidity INTEGER NOT NULL,
+                pressure INTEGER NOT NULL,
+                description_id INTEGER NOT NULL REFERENCES weather_descriptions(id),
+                wind_speed REAL NOT NULL,
+                response_time_ms INTEGER DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    def _migrate_legacy_description_column(self) -> None:
+        """Переводит историю со строковой колонки description на ссылки description_id.
+
+        SQLite не умеет менять колонки, поэтому таблица пересоздается по стандартной схеме:
+        новая таблица, копирование, удаление старой, переименование. Внешние ключи на время
+        миграции отключаются, иначе удаление старой таблицы каскадно удалит уведомления.
+        """
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(weather_history)")}
+            if "description" not in columns:
+                return
+
+            print("🔧 Миграция истории: описания погоды переносятся в словарь...")
+            conn.execute("PRAGMA foreign_keys = OFF")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._create_description_tables(conn)
+                texts = [row[0] for row in conn.execute("SELECT DISTINCT description FROM weather_history")]
+                conn.executemany(
+                    "INSERT OR IGNORE INTO weather_descriptions (text, text_lower, icon) VALUES (?, ?, ?)",
+                    [(text, text.lower(), get_weather_icon(text)) for text in texts],
+                )
+
+                self._create_weather_history_table(conn, "weather_history_new")
+                conn.execute("""
+                    INSERT INTO weather_history_new
+                    (id, city, timestamp, temperature, feels_like, humidity, pressure,
+                     description_id, wind_speed, response_time_ms, created_at)
+                    SELECT h.id, h.city, h.timestamp, h.temperature, h.feels_like, h.humidity, h.pressure,
+                           d.id, h.wind_speed, h.response_time_ms, h.created_at
+                    FROM weather_history h
+                    JOIN weather_descriptions d ON d.text = h.description
+                """)
+                # Индексы и триггеры старой таблицы удаляются вместе с ней и создаются заново в _init_database
+                conn.execute("DROP TABLE weather_history")
+                conn.execute("ALTER TABLE weather_history_new RENAME TO weather_history")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            conn.execute("VACUUM")
+            print("✅ Миграция истории завершена")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _migrate_rule_cooldown_columns(conn: sqlite3.Connection) -> None:
+        """Добавляет колонки паузы и гистерезиса в правила из базы прошлой версии.
+
+        Паузы существующих правил остаются выключенными (0): поведение уведомлений
+        после обновления не меняется, пока паузу не задать через weather-cli rules --cooldown.
+        """
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(notification_rules)")}
+        if "cooldown_minutes" in columns:
+            return
+
+        conn.execute("ALTER TABLE notification_rules ADD COLUMN cooldown_minutes INTEGER NOT NULL DEFAULT 0")
+        conn.execute("ALTER TABLE notification_rules ADD COLUMN hysteresis REAL NOT NULL DEFAULT 0")
+
+    @staticmethod
+    def _migrate_description_keyword_bits(conn: sqlite3.Connection) -> None:
+        """Добавляет в словарь описаний число битов, для которых вычислены флаги ключевых слов.
+
+        В базе прошлой версии оно нулевое: флаги всех описаний пересчитает _sync_description_keywords.
+        """
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(weather_descriptions)")}
+        if "keyword_bits" not in columns:
+            conn.execute("ALTER TABLE weather_descriptions ADD COLUMN keyword_bits INTEGER NOT NULL DEFAULT 0")
+
+    @staticmethod
+    def _migrate_subscription_columns(conn: sqlite3.Connection) -> None:
+        """Добавляет набор правил в правила и подписчика в уведомления из базы прошлой версии."""
+        rule_columns = {row[1] for row in conn.execute("PRAGMA table_info(notification_rules)")}
+        if "rule_set_id" not in rule_columns:
+            conn.execute(
+                "ALTER TABLE notification_rules ADD COLUMN rule_set_id INTEGER "
+                "REFERENCES rule_sets(id) ON DELETE CASCADE"
+            )
+        notification_columns = {row[1] for row in conn.execute("PRAGMA table_info(issued_notifications)")}
+        if "user_id" not in notification_columns:
+            conn.execute(
+                "ALTER TABLE issued_notifications ADD COLUMN user_id INTEGER REFERENCES users(id) ON DELETE CASCADE"
+            )
+
+    def _sync_description_keywords(self, conn: sqlite3.Connection) -> None:
+        """Назначает биты ключевым словам правил "contains" и пересчитывает флаги описаний.
+
+        Биты назначаются по порядку и не освобождаются, поэтому флаги описания вычислены для
+        первых keyword_bits битов. Описание, добавленное процессом со старым набором слов,
+        хранит меньшее keyword_bits: его флаги пересчитываются здесь, а до этого новые слова
+        проверяются поиском подстроки (см. _make_description).
+        """
+        keywords = {
+            row[0]: row[1] for row in conn.execute("SELECT keyword, bit FROM description_keywords ORDER BY bit")
+        }
+        rule_keywords = {
+            row[0].lower()
+            for row in conn.execute(
+                "SELECT threshold_value FROM notification_rules WHERE condition_type = 'description' "
+                "AND operator = 'contains' AND rule_set_id IS NULL"
+            )
+        }
+
+        new_keywords = sorted(rule_keywords - keywords.keys())
+        next_bit = max(keywords.values(), default=-1) + 1
+        for keyword in new_keywords:
+            if next_bit >= MAX_DESCRIPTION_KEYWORDS:
+                # Остальные слова проверяются поиском подстроки в ConditionEvaluator
+                break
+            conn.execute("INSERT INTO description_keywords (bit, keyword) VALUES (?, ?)", (next_bit, keyword))
+            keywords[keyword] = next_bit
+            next_bit += 1
+
+        stale = conn.execute(
+            "SELECT id, text_lower FROM weather_descriptions WHERE keyword_bits < ?", (len(keywords),)
+        ).fetchall()
+        conn.executemany(
+            "UPDATE weather_descriptions SET keyword_flags = ?, keyword_bits = ? WHERE id = ?",
+            [
+                (self._compute_keyword_flags(text_lower, keywords), len(keywords), description_id)
+                for description_id, text_lower in stale
+            ],
+        )
+
+        self._description_keywords = keywords
+
+    @staticmethod
+    def _compute_keyword_flags(text_lower: str, keywords: dict[str, int]) -> int:
+        """Вычисляет битовую маску ключевых слов, содержащихся в описании."""
+        flags = 0
+        for keyword, bit in keywords.items():
+            if keyword in text_lower:
+                flags |= 1 << bit
+        return flags
+
+    def _make_description(self, row: Iterable) -> WeatherDescription:
+        """Собирает WeatherDescription из строки в порядке DESCRIPTION_COLUMNS.
+
+        Проверенными считаются только слова с битами, для которых флаги описания вычислены:
+        остальные ConditionEvaluator проверяет поиском подстроки.
+        """
+        description_id, text, text_lower, icon, flags, keyword_bits = row
+        keywords = {keyword: bit for keyword, bit in self._description_keywords.items() if bit < keyword_bits}
+        return WeatherDescription(
+            id=description_id,
+            text=text,
+            text_lower=text_lower,
+            icon=icon,
+            keyword_flags=flags,
+            checked_keywords=frozenset(keywords),
+            matched_keywords=frozenset(keyword for keyword, bit in keywords.items() if flags >> bit & 1),
+        )
+
+    def _cache_description(self, description: WeatherDescription) -> None:
+        """Кладет описание в словари по id и по тексту."""
+        self._descriptions_by_id[description.id] = description
+        self._descriptions_by_text[description.text] = description
+
+    def _load_descriptions(self, conn: sqlite3.Connection) -> None:
+        """Загружает весь словарь описаний в память."""
+        rows = conn.execute(f"SELECT {DESCRIPTION_COLUMNS} FROM weather_descriptions").fetchall()  # noqa: S608
+        with self._descriptions_lock:
+            for row in rows:
+                self._cache_description(self._make_description(tuple(row)))
+
+    def get_description(self, description_id: int) -> WeatherDescription:
+        """Возвращает описание по id из словаря в памяти.
+
+        Args:
+            description_id: ID описания в weather_descriptions
+
+        Returns:
+            Запись словаря описаний
+
+        Raises:
+            KeyError: Если описания нет в базе данных
+        """
+        description = self._descriptions_by_id.get(description_id)
+        if description is not None:
+            return description
+
+        # Описание могло быть добавлено другим процессом
+        with self._get_connection() as conn:
+            row = conn.execute(
+                f"SELECT {DESCRIPTION_COLUMNS} FROM weather_descriptions WHERE id = ?",  # noqa: S608
+                (description_id,),
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"Описание погоды с id={description_id} не найдено")
+
+        with self._descriptions_lock:
+            description = self._make_description(tuple(row))
+            self._cache_description(description)
+        return description
+
+    def _description_text(self, description_id: int) -> str:
+        description = self._descriptions_by_id.get(description_id) or self.get_description(description_id)
+        return description.text
+
+    def get_or_create_description(self, text: str) -> WeatherDescription:
+        """Возвращает описание по тексту, добавляя его в словарь при первом появлении.
+
+        Иконка, текст в нижнем регистре и флаги ключевых слов вычисляются один раз
+        для каждого уникального описания, а не для каждой записи.
+
+        Args:
+            text: Текст описания погоды от API
+
+        Returns:
+            Запись словаря описаний
+        """
+        description = self._descriptions_by_text.get(text)
+        if description is not None:
+            return description
+
+        with self._descriptions_lock:
+            description = self._descriptions_by_text.get(text)
+            if description is not None:
+                return description
+
+            text_lower = text.lower()
+            with self._get_connection() as conn:
+                conn.execute(
+                    """
+                    INSERT OR IGNORE INTO weather_descriptions (text, text_lower, icon, keyword_flags, keyword_bits)
+                    VALUES (?, ?, ?, ?, ?)
+                """,
+                    (
+                        text,
+                        text_lower,
+                        get_weather_icon(text),
+                        self._compute_keyword_flags(text_lower, self._description_keywords),
+                        len(self._description_keywords),
+                    ),
+                )
+                row = conn.execute(
+                    f"SELECT {DESCRIPTION_COLUMNS} FROM weather_descriptions WHERE text = ?",  # noqa: S608
+                    (text,),
+                ).fetchone()
+
+            description = self._make_description(tuple(row))
+            self._cache_description(description)
+            return description
+
+    def _decode_weather_row(self, row: tuple) -> WeatherRecord:
+        """Собирает WeatherRecord из строки в порядке WEATHER_COLUMNS.
+
+        Текст описания берется из словаря в памяти, поэтому все записи с одинаковым
+        описанием ссылаются на один объект строки. Город интернируется по той же причине.
+        """
+        description_id = row[7]
+        description = self._descriptions_by_id.get(description_id) or self.get_description(description_id)
+        return WeatherRecord(
+            row[0],
+            sys.intern(row[1]),
+            datetime.fromisoformat(row[2]),
+            row[3],
+            row[4],
+            row[5],
+            row[6],
+            description.text,
+            row[8],
+            row[9],
+            _parse_datetime(row[10]),
+            description_id,
+        )
+
+    def _init_row_counters(self, conn: sqlite3.Connection) -> None:
+        """Создает таблицу счетчиков строк и триггеры, поддерживающие ее при INSERT/DELETE.
+
+        Счетчики позволяют узнать количество записей за O(1) вместо COUNT(*),
+        который сканирует всю таблицу. Для истории счетчики ведутся и по каждому городу.
+        """
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS row_counters (
+                table_name TEXT NOT NULL,
+                city TEXT NOT NULL DEFAULT '',
+                row_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (table_name, city)
+            )
+        """)
+
+        # История: общий счетчик и счетчик города
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_weather_history_count_insert
+            AFTER INSERT ON weather_history
+            BEGIN
+                INSERT INTO row_counters (table_name, city, row_count) VALUES ('weather_history', '', 1)
+                ON CONFLICT (table_name, city) DO UPDATE SET row_count = row_count + 1;
+                INSERT INTO row_counters (table_name, city, row_count) VALUES ('weather_history', NEW.city, 1)
+                ON CONFLICT (table_name, city) DO UPDATE SET row_count = row_count + 1;
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_weather_history_count_delete
+            AFTER DELETE ON weather_history
+            BEGIN
+                UPDATE row_counters SET row_count = row_count - 1
+                WHERE table_name = 'weather_history' AND city IN ('', OLD.city);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_weather_history_count_update_city
+            AFTER UPDATE OF city ON weather_history
+            WHEN OLD.city <> NEW.city
+            BEGIN
+                UPDATE row_counters SET row_count = row_count - 1
+                WHERE table_name = 'weather_history' AND city = OLD.city;
+                INSERT INTO row_counters (table_name, city, row_count) VALUES ('weather_history', NEW.city, 1)
+                ON CONFLICT (table_name, city) DO UPDATE SET row_count = row_count + 1;
+            END
+        """)
+
+        # Выданные уведомления: только общий счетчик (каскадное удаление тоже вызывает триггер)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_issued_notifications_count_insert
+            AFTER INSERT ON issued_notifications
+            BEGIN
+                INSERT INTO row_counters (table_name, city, row_count) VALUES ('issued_notifications', '', 1)
+                ON CONFLICT (table_name, city) DO UPDATE SET row_count = row_count + 1;
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_issued_notifications_count_delete
+            AFTER DELETE ON issued_notifications
+            BEGIN
+                UPDATE row_counters SET row_count = row_count - 1
+                WHERE table_name = 'issued_notifications' AND city = '';
+            END
+        """)
+
+        # Первое создание счетчиков для уже существующей базы: считаем строки один раз
+        initialized = conn.execute(
+            "SELECT 1 FROM row_counters WHERE table_name = 'weather_history' AND city = ''"
+        ).fetchone()
+        if initialized is None:
+            self._rebuild_row_counters(conn)
+
+    def _init_rollups(self, conn: sqlite3.Connection) -> None:
+        """Создает часовые сводки истории и триггеры, поддерживающие их при INSERT/UPDATE/DELETE.
+
+        Для каждого города и часа хранятся число наблюдений, сумма, минимум и максимум полей
+        ROLLUP_FIELDS: график за годы строится по тысячам строк сводок, а не по миллионам
+        записей истории. При удалении записи уменьшаются число и сумма; минимум и максимум
+        часа, из которого удалили не все записи, остаются прежними до пересчета сводок.
+        Исправление записи учитывается как удаление старой версии и вставка новой.
+        """
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'weather_rollups'"
+        ).fetchone()
+        columns = ",\n                ".join(
+            f"{field}_sum REAL NOT NULL, {field}_min REAL NOT NULL, {field}_max REAL NOT NULL"
+            for field in ROLLUP_FIELDS
+        )
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS weather_rollups (
+                city TEXT NOT NULL,
+                hour TEXT NOT NULL,
+                samples INTEGER NOT NULL,
+                {columns},
+                PRIMARY KEY (city, hour)
+            ) WITHOUT ROWID
+        """)
+
+        names = ", ".join(f"{field}_sum, {field}_min, {field}_max" for field in ROLLUP_FIELDS)
+        values = ", ".join(f"NEW.{field}, NEW.{field}, NEW.{field}" for field in ROLLUP_FIELDS)
+        merge = ", ".join(
+            f"{field}_sum = {field}_sum + excluded.{field}_sum, "
+            f"{field}_min = MIN({field}_min, excluded.{field}_min), "
+            f"{field}_max = MAX({field}_max, excluded.{field}_max)"
+            for field in ROLLUP_FIELDS
+        )
+        subtract = ", ".join(f"{field}_sum = {field}_sum - OLD.{field}" for field in ROLLUP_FIELDS)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_weather_history_rollup_insert
+            AFTER INSERT ON weather_history
+            BEGIN
+                INSERT INTO weather_rollups (city, hour, samples, {names})
+                VALUES (NEW.city, strftime('%Y-%m-%d %H:00:00', NEW.timestamp), 1, {values})
+                ON CONFLICT (city, hour) DO UPDATE SET samples = samples + 1, {merge};
+            END
+        """)  # noqa: S608 - поля берутся из ROLLUP_FIELDS
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_weather_history_rollup_delete
+            AFTER DELETE ON weather_history
+            BEGIN
+                UPDATE weather_rollups SET samples = samples - 1, {subtract}
+                WHERE city = OLD.city AND hour = strftime('%Y-%m-%d %H:00:00', OLD.timestamp);
+                DELETE FROM weather_rollups
+                WHERE city = OLD.city AND hour = strftime('%Y-%m-%d %H:00:00', OLD.timestamp) AND samples <= 0;
+            END
+        """)  # noqa: S608 - поля берутся из ROLLUP_FIELDS
+        watched = ", ".join(("city", "timestamp", *ROLLUP_FIELDS))
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_weather_history_rollup_update
+            AFTER UPDATE OF {watched} ON weather_history
+            BEGIN
+                UPDATE weather_rollups SET samples = samples - 1, {subtract}
+                WHERE city = OLD.city AND hour = strftime('%Y-%m-%d %H:00:00', OLD.timestamp);
+                DELETE FROM weather_rollups
+                WHERE city = OLD.city AND hour = strftime('%Y-%m-%d %H:00:00', OLD.timestamp) AND samples <= 0;
+                INSERT INTO weather_rollups (city, hour, samples, {names})
+                VALUES (NEW.city, strftime('%Y-%m-%d %H:00:00', NEW.timestamp), 1, {values})
+                ON CONFLICT (city, hour) DO UPDATE SET samples = samples + 1, {merge};
+            END
+        """)  # noqa: S608 - поля берутся из ROLLUP_FIELDS
+
+        # Первое создание сводок для уже существующей базы: считаем их по истории один раз
+        if exists is None:
+            self._rebuild_rollups(conn)
+
+    @staticmethod
+    def _rebuild_rollups(conn: sqlite3.Connection) -> None:
+        """Пересчитывает все часовые сводки по истории."""
+        names = ", ".join(f"{field}_sum, {field}_min, {field}_max" for field in ROLLUP_FIELDS)
+        aggregates = ", ".join(f"SUM({field}), MIN({field}), MAX({field})" for field in ROLLUP_FIELDS)
+        conn.execute("DELETE FROM weather_rollups")
+        conn.execute(f"""
+            INSERT INTO weather_rollups (city, hour, samples, {names})
+            SELECT city, strftime('%Y-%m-%d %H:00:00', timestamp) AS hour, COUNT(*), {aggregates}
+            FROM weather_history
+            GROUP BY city, hour
+        """)  # noqa: S608 - поля берутся из ROLLUP_FIELDS
+
+    @staticmethod
+    def _init_rules_version(conn: sqlite3.Connection) -> None:
+        """Создает версию правил, которую триггеры увеличивают при любом изменении правил.
+
+        По ней движок уведомлений узнает одним запросом, что индекс правил пора перестроить,
+        в том числе после изменений из другого процесса (weather-cli rules). Подписки и
+        наборы правил тоже меняют версию: от них зависят индексы наборов правил по городам.
+        """
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rules_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("INSERT OR IGNORE INTO rules_version (id, version) VALUES (1, 0)")
+        for table in ("notification_rules", "rule_city_settings", "rule_sets", "subscriptions"):
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                conn.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+                    AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE rules_version SET version = version + 1;
+                    END
+                """)  # noqa: S608
+
+    @staticmethod
+    def _count_rows(conn: sqlite3.Connection) -> dict[tuple[str, str], int]:
+        """Фактическое количество строк, подсчитанное сканированием таблиц."""
+        actual = {}
+        for table in COUNTED_TABLES:
+            actual[(table, "")] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]  # noqa: S608
+        for city, count in conn.execute("SELECT city, COUNT(*) FROM weather_history GROUP BY city"):
+            actual[("weather_history", city)] = count
+        return actual
+
+    def _rebuild_row_counters(self, conn: sqlite3.Connection) -> None:
+        """Пересчитывает все счетчики строк по фактическим данным."""
+        conn.execute("DELETE FROM row_counters")
+        conn.executemany(
+            "INSERT INTO row_counters (table_name, city, row_count) VALUES (?, ?, ?)",
+            [(table, city, count) for (table, city), count in self._count_rows(conn).items()],
+        )
+
     def _insert_base_rules(self, conn: sqlite3.Connection) -> None:
-        """Вставляет базовые правила уведомлений в базу данных."""
+        """Вставляет базовые правила уведомлений в базу данных.
+
+        Args:
+            conn: Соединение с БД
+        """
         base_rules = [
             # Базовые температурные правила
             (1, "Холодно", "temperature", "lt", "5", "🧥 Наденьте куртку! На улице холодно ({temperature}°C)", "🧥", 1),
@@ -213,14 +993,39 @@ class DatabaseManager:
                 2,
             ),
         ]
+        # Правила на тенденцию выключены: уведомления существующих баз данных не должны меняться
+        # после обновления. Включаются командой weather-cli rules ID --enable
+        trend_rules = [
+            (
+                17,
+                "Давление падает",
+                "pressure:delta:3h",
+                "lt",
+                "-5",
+                "🌀 Давление за 3 часа изменилось на {value} мм рт.ст. ({pressure} мм рт.ст.). Возможна смена погоды",
+                "🌀",
+                2,
+            ),
+            (
+                18,
+                "Теплее обычного",
+                "temperature:anomaly:7d",
+                "gt",
+                "8",
+                "🌡️ На {value}°C теплее, чем в среднем за неделю ({temperature}°C)",
+                "🌡️",
+                3,
+            ),
+        ]
 
-        for rule in base_rules:
+        rules = [(*rule, 1) for rule in base_rules] + [(*rule, 0) for rule in trend_rules]
+        for rule in rules:
             try:
                 conn.execute(
                     """
                     INSERT OR IGNORE INTO notification_rules
-                    (id, name, condition_type, operator, threshold_value, message_template, icon, priority)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    (id, name, condition_type, operator, threshold_value, message_template, icon, priority, is_active)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
                     rule,
                 )
@@ -232,112 +1037,731 @@ class DatabaseManager:
         """Сохраняет запись о погоде в базу данных.
 
         Args:
-            record: Запись о погоде
+            record: Запись о погоде. Если description_id не задан, описание ищется в словаре по тексту
 
         Returns:
             ID сохраненной записи
         """
-        with self._get_connection() as conn:
+        description_id = record.description_id or self.get_or_create_description(record.description).id
+        timestamp = record.timestamp or datetime.now()
+        created_at = _created_now()
+
+        with DB_WRITE_SECONDS.time(), self._get_connection() as conn:
+            self._begin_write(conn)
             cursor = conn.cursor()
             cursor.execute(
                 """
                 INSERT INTO weather_history
                 (city, timestamp, temperature, feels_like, humidity, pressure,
-                 description, wind_speed, response_time_ms)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                 description_id, wind_speed, response_time_ms, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
                 (
                     record.city,
-                    record.timestamp or datetime.now(),
+                    timestamp,
                     record.temperature,
                     record.feels_like,
                     record.humidity,
                     record.pressure,
-                    record.description,
+                    description_id,
                     record.wind_speed,
                     record.response_time_ms,
+                    created_at,
                 ),
             )
-            return cursor.lastrowid
+            history_id = cursor.lastrowid
+            signature = self._history_signature(conn) if self._tracks_recent() else None
+
+        if signature is not None:
+            saved = replace(
+                record, id=history_id, timestamp=timestamp, description_id=description_id, created_at=created_at
+            )
+            self._append_recent([saved], signature)
+        return history_id
+
+    def save_weather_records(self, records: list[WeatherRecord]) -> list[int]:
+        """Сохраняет несколько записей о погоде одной транзакцией (опрос городов подписок).
+
+        Args:
+            records: Записи о погоде с заполненным description_id
+
+        Returns:
+            ID сохраненных записей в том же порядке
+        """
+        timestamps = [record.timestamp or datetime.now() for record in records]
+        created_at = _created_now()
+        with DB_WRITE_SECONDS.time(), self._get_connection() as conn:
+            self._begin_write(conn)
+            cursor = conn.cursor()
+            ids = []
+            for record, timestamp in zip(records, timestamps, strict=True):
+                cursor.execute(
+                    """
+                    INSERT INTO weather_history
+                    (city, timestamp, temperature, feels_like, humidity, pressure,
+                     description_id, wind_speed, response_time_ms, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                    (
+                        record.city,
+                        timestamp,
+                        record.temperature,
+                        record.feels_like,
+                        record.humidity,
+                        record.pressure,
+                        record.description_id,
+                        record.wind_speed,
+                        record.response_time_ms,
+                        created_at,
+                    ),
+                )
+                ids.append(cursor.lastrowid)
+            signature = self._history_signature(conn) if self._tracks_recent() and ids else None
+
+        if signature is not None:
+            saved = [
+                replace(record, id=history_id, timestamp=timestamp, created_at=created_at)
+                for record, history_id, timestamp in zip(records, ids, timestamps, strict=True)
+            ]
+            self._append_recent(saved, signature)
+        return ids
+
+    def ingest_weather_batch(
+        self,
+        rows: list[tuple],
+        checkpoint: tuple[str, int] | None = None,
+        evaluate: Callable[[int, tuple], list[tuple[int, str]]] | None = None,
+    ) -> int:
+        """Сохраняет пачку записей истории одной транзакцией (загрузка архивов).
+
+        Позиция в исходном файле обновляется в той же транзакции, поэтому после сбоя
+        загрузка продолжается ровно с первой несохраненной записи.
+
+        Args:
+            rows: Кортежи (city, timestamp, temperature, feels_like, humidity, pressure,
+                description_id, wind_speed, response_time_ms)
+            checkpoint: (источник, байтовая позиция после последней записи пачки)
+            evaluate: Функция (history_id, строка) -> [(rule_id, сообщение)]. Если None,
+                уведомления не создаются и строки вставляются одним executemany
+
+        Returns:
+            Количество сохраненных записей
+        """
+        insert_sql = """
+            INSERT INTO weather_history
+            (city, timestamp, temperature, feels_like, humidity, pressure,
+             description_id, wind_speed, response_time_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+
+        with self._get_connection() as conn:
+            self._begin_write(conn)
+            if evaluate is None:
+                conn.executemany(insert_sql, rows)
+            else:
+                # Для уведомлений нужен id каждой записи, поэтому вставка построчная (но в одной транзакции)
+                cursor = conn.cursor()
+                notifications = []
+                for row in rows:
+                    cursor.execute(insert_sql, row)
+                    history_id = cursor.lastrowid
+                    notifications.extend(
+                        (history_id, rule_id, message) for rule_id, message in evaluate(history_id, row)
+                    )
+                conn.executemany(
+                    "INSERT INTO issued_notifications (history_id, rule_id, message) VALUES (?, ?, ?)",
+                    notifications,
+                )
+
+            if checkpoint is not None:
+                source, byte_offset = checkpoint
+                conn.execute(
+                    """
+                    INSERT INTO ingest_checkpoints (source, byte_offset, rows_ingested)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (source) DO UPDATE SET
+                        byte_offset = excluded.byte_offset,
+                        rows_ingested = rows_ingested + excluded.rows_ingested,
+                        updated_at = CURRENT_TIMESTAMP
+                """,
+                    (source, byte_offset, len(rows)),
+                )
+
+        # Архивные записи старше последних в буферах: проще загрузить буферы заново
+        self._reset_recent()
+        return len(rows)
+
+    def get_ingest_checkpoint(self, source: str) -> int:
+        """Возвращает байтовую позицию, до которой источник уже загружен (0 — не загружался)."""
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT byte_offset FROM ingest_checkpoints WHERE source = ?", (source,)).fetchone()
+            return row[0] if row else 0
+
+    def reset_ingest_checkpoint(self, source: str) -> None:
+        """Сбрасывает позицию загрузки источника, чтобы загрузить его заново."""
+        with self._get_connection() as conn:
+            conn.execute("DELETE FROM ingest_checkpoints WHERE source = ?", (source,))
+
+    def remember_city_query(self, query: str, city: str) -> None:
+        """Запоминает, под каким названием город запроса сохраняется в истории."""
+        with self._get_connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO city_queries (query, city) VALUES (?, ?)
+                ON CONFLICT (query) DO UPDATE SET city = excluded.city WHERE city != excluded.city
+            """,
+                (query, city),
+            )
+
+    def get_city_for_query(self, query: str) -> str | None:
+        """Название города в истории для запроса или None, если запрос еще не выполнялся."""
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT city FROM city_queries WHERE query = ?", (query,)).fetchone()
+            return row[0] if row else None
+
+    # --- Координаты наблюдений ---
+
+    def save_observation_location(self, history_id: int, latitude: float, longitude: float) -> None:
+        """Запоминает координаты, для которых запрошена запись истории."""
+        cell_lat, cell_lon = grid_cell(latitude, longitude, GEO_INDEX_CELL_DEGREES)
+        with self._get_connection() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO weather_locations
+                (history_id, latitude, longitude, cell_lat, cell_lon, timestamp)
+                SELECT id, ?, ?, ?, ?, timestamp FROM weather_history WHERE id = ?
+            """,
+                (latitude, longitude, cell_lat, cell_lon, history_id),
+            )
+
+    def find_nearest_record(
+        self, latitude: float, longitude: float, radius_km: float, since: datetime | None = None
+    ) -> tuple[WeatherRecord, float] | None:
+        """Ближайшее к точке наблюдение с известными координатами.
+
+        Кандидаты выбираются по индексу сетки: ячейки GEO_INDEX_CELL_DEGREES в квадрате,
+        описанном вокруг круга radius_km. Точное расстояние считается только для них.
+
+        Args:
+            latitude: Широта точки
+            longitude: Долгота точки
+            radius_km: Наблюдения дальше этого расстояния не рассматриваются
+            since: Наблюдения старше этого момента не рассматриваются. None — любые
+
+        Returns:
+            Кортеж (запись, расстояние в км) или None. Из равноудаленных — самая новая запись
+        """
+        lat_delta = radius_km / KM_PER_DEGREE
+        lon_delta = lat_delta / max(math.cos(math.radians(latitude)), 0.01)
+        west, east = longitude - lon_delta, longitude + lon_delta
+        # Долгота в индексе приведена к [-180, 180): за меридианом 180 квадрат продолжается с другого края
+        lon_ranges = [(west, east)]
+        if west < -180:
+            lon_ranges.append((west + 360, 180))
+        if east >= 180:
+            lon_ranges.append((-180, east - 360))
+        lon_filter = " OR ".join("l.cell_lon BETWEEN ? AND ?" for _ in lon_ranges)
+        bounds = (
+            latitude - lat_delta,
+            latitude + lat_delta,
+            *(bound for lon_range in lon_ranges for bound in lon_range),
+        )
+        params: tuple = tuple(math.floor(bound / GEO_INDEX_CELL_DEGREES) for bound in bounds)
+        since_filter = ""
+        if since is not None:
+            since_filter = "AND l.timestamp >= ?"
+            params += (since,)
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(
+                f"""
+                SELECT {WEATHER_COLUMNS}, l.latitude, l.longitude
+                FROM weather_locations l
+                JOIN weather_history h ON h.id = l.history_id
+                WHERE l.cell_lat BETWEEN ? AND ? AND ({lon_filter}) {since_filter}
+            """,  # noqa: S608 - подставляются только константы
+                params,
+            )
+            best_row, best_key = None, None
+            for row in cursor:
+                distance = distance_km(latitude, longitude, row[-2], row[-1])
+                key = (distance, -row[0])
+                if distance <= radius_km and (best_key is None or key < best_key):
+                    best_row, best_key = row, key
+
+        if best_row is None:
+            return None
+        return self._decode_weather_row(best_row[:-2]), best_key[0]
+
+    # --- Последние наблюдения в памяти ---
+
+    def _tracks_recent(self) -> bool:
+        """Буферы включены и загружены: новые записи нужно в них добавлять."""
+        return self.recent is not None and self.recent.signature is not None
+
+    @staticmethod
+    def _history_signature(conn: sqlite3.Connection) -> tuple[int, int]:
+        """(последний выданный id, число записей) истории — оба значения читаются за O(1)."""
+        row = conn.execute("""
+            SELECT
+                (SELECT seq FROM sqlite_sequence WHERE name = 'weather_history'),
+                (SELECT row_count FROM row_counters WHERE table_name = 'weather_history' AND city = '')
+        """).fetchone()
+        return row[0] or 0, row[1] or 0
+
+    def _append_recent(self, records: list[WeatherRecord], signature: tuple[int, int]) -> None:
+        """Добавляет сохраненные записи в буферы, если между сверкой и записью в БД не писал никто другой."""
+        recent = self.recent
+        with recent.lock:
+            known = recent.signature
+            if known is None:
+                return
+            count = len(records)
+            if records[0].id == known[0] + 1 and signature == (known[0] + count, known[1] + count):
+                recent.append(records, signature)
+            else:
+                recent.clear()
+
+    def _reset_recent(self) -> None:
+        if self.recent is not None:
+            with self.recent.lock:
+                self.recent.clear()
+
+    def _recent_ring(self, city: str | None) -> ObservationRing:
+        """Буфер города (или всех городов при city=None), сверенный с базой данных.
+
+        Не чаще раза в RECENT_SYNC_SECONDS сверяет последний id и число записей истории:
+        если в базу писал другой процесс или историю очистили, буферы загружаются заново.
+        Вызывается под recent.lock.
+        """
+        recent = self.recent
+        now = time.monotonic()
+        if recent.signature is not None and now - recent.checked_at < RECENT_SYNC_SECONDS:
+            ring = recent.get_all() if city is None else recent.get_city(city)
+            if ring is not None:
+                return ring
+
+        with self._get_connection() as conn:
+            signature = self._history_signature(conn)
+            if signature != recent.signature:
+                recent.clear()
+                recent.signature = signature
+            recent.checked_at = now
+            ring = recent.get_all() if city is None else recent.get_city(city)
+            if ring is None:
+                records = self._select_recent_records(conn, recent.capacity, city)
+                ring = recent.load_all(records) if city is None else recent.load_city(city, records)
+            return ring
+
+    def _select_recent_records(self, conn: sqlite3.Connection, limit: int, city: str | None) -> list[WeatherRecord]:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        if city is None:
+            cursor.execute(
+                f"SELECT {WEATHER_COLUMNS} FROM weather_history h ORDER BY h.timestamp DESC, h.id DESC LIMIT ?",  # noqa: S608
+                (limit,),
+            )
+        else:
+            cursor.execute(
+                f"""
+                SELECT {WEATHER_COLUMNS} FROM weather_history h
+                WHERE h.city = ?
+                ORDER BY h.timestamp DESC, h.id DESC
+                LIMIT ?
+            """,  # noqa: S608
+                (city, limit),
+            )
+        return list(map(self._decode_weather_row, cursor))
+
+    def warm_recent_records(self) -> None:
+        """Заранее загружает буфер последних записей (при запуске долгоживущего процесса)."""
+        if self.recent is not None:
+            with self.recent.lock:
+                self._recent_ring(None)
+
+    def get_recent_city_records(self, city: str, limit: int = 10) -> list[WeatherRecord]:
+        """Последние записи о погоде в городе, от новых к старым.
+
+        Args:
+            city: Город (как он сохранен в истории)
+            limit: Максимальное количество записей
+
+        Returns:
+            Список последних записей города
+        """
+        recent = self.recent
+        if recent is not None and limit <= recent.capacity:
+            with recent.lock:
+                return recent.records(self._recent_ring(city), limit)
+        with self._get_connection() as conn:
+            return self._select_recent_records(conn, limit, city)
+
+    def get_recent_series(self, city: str, field: str, since: datetime) -> tuple[list[datetime], list[float]]:
+        """Значения поля записей города начиная с момента since, в порядке времени.
+
+        Для оконных расчетов: если буфер города покрывает период, значения берутся из памяти.
+
+        Args:
+            city: Город
+            field: Числовое поле записи из SERIES_FIELDS
+            since: Начало периода
+
+        Returns:
+            Кортеж (время наблюдений, значения)
+
+        Raises:
+            ValueError: Если поле не поддерживается
+        """
+        if field not in SERIES_FIELDS:
+            raise ValueError(f"Неподдерживаемое поле: {field}")
+
+        recent = self.recent
+        if recent is not None:
+            since_micros = to_micros(since)
+            with recent.lock:
+                ring = self._recent_ring(city)
+                # Неполный буфер содержит все записи города; полный — только последние
+                if not ring.is_full or ring.oldest_timestamp <= since_micros:
+                    timestamps, values = ring.series(field, since_micros)
+                    return [from_micros(timestamp) for timestamp in timestamps], values.tolist()
+        return self.get_history_series(city, field, since)
+
+    def get_history_series(
+        self, city: str, field: str, since: datetime, until: datetime | None = None
+    ) -> tuple[list[datetime], list[float]]:
+        """Значения поля записей города за период из базы данных, в порядке времени.
+
+        Args:
+            city: Город
+            field: Числовое поле записи из SERIES_FIELDS
+            since: Начало периода
+            until: Конец периода (включительно). Если None, до последней записи
+
+        Returns:
+            Кортеж (время наблюдений, значения)
+
+        Raises:
+            ValueError: Если поле не поддерживается
+        """
+        if field not in SERIES_FIELDS:
+            raise ValueError(f"Неподдерживаемое поле: {field}")
+
+        until_clause = "AND timestamp <= ?" if until is not None else ""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(
+                f"""
+                SELECT timestamp, {field} FROM weather_history
+                WHERE city = ? AND timestamp >= ? {until_clause}
+                ORDER BY timestamp
+            """,  # noqa: S608 - поле берется из белого списка
+                (city, since, until) if until is not None else (city, since),
+            )
+            timestamps, values = [], []
+            for timestamp, value in cursor:
+                timestamps.append(datetime.fromisoformat(timestamp))
+                values.append(value)
+            return timestamps, values
+
+    def get_history_rollup(
+        self, city: str, field: str, since: datetime, until: datetime, bucket: str = "hour"
+    ) -> tuple[list[datetime], list[float], list[float], list[float]]:
+        """Среднее, минимум и максимум поля записей города по часам или суткам за период.
+
+        Читает часовые сводки weather_rollups, а не записи истории.
+
+        Args:
+            city: Город
+            field: Поле из ROLLUP_FIELDS
+            since: Начало периода (берется весь интервал, в который оно попадает)
+            until: Конец периода (включительно)
+            bucket: Интервал: "hour" или "day"
+
+        Returns:
+            Кортеж (начала интервалов, средние, минимумы, максимумы)
+
+        Raises:
+            ValueError: Если поле или интервал не поддерживаются
+        """
+        if field not in ROLLUP_FIELDS:
+            raise ValueError(f"Неподдерживаемое поле: {field}")
+        if bucket not in ROLLUP_BUCKETS:
+            raise ValueError(f"Неподдерживаемый интервал сводки: {bucket}")
+
+        start = since.replace(minute=0, second=0, microsecond=0)
+        if bucket == "day":
+            start = start.replace(hour=0)
+        expression = ROLLUP_BUCKETS[bucket]
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(
+                f"""
+                SELECT {expression} AS bucket, SUM(samples), SUM({field}_sum), MIN({field}_min), MAX({field}_max)
+                FROM weather_rollups
+                WHERE city = ? AND hour >= ? AND hour <= ?
+                GROUP BY bucket
+                ORDER BY bucket
+            """,  # noqa: S608 - поле и интервал берутся из белых списков
+                (city, start.strftime("%Y-%m-%d %H:%M:%S"), until.strftime("%Y-%m-%d %H:%M:%S")),
+            )
+            starts, means, minima, maxima = [], [], [], []
+            for bucket_start, samples, total, minimum, maximum in cursor:
+                starts.append(datetime.fromisoformat(bucket_start))
+                means.append(total / samples)
+                minima.append(minimum)
+                maxima.append(maximum)
+            return starts, means, minima, maxima
+
+    def get_history_bounds(self, city: str) -> tuple[datetime, datetime] | None:
+        """Время первой и последней записи города или None, если записей нет."""
+        with self._get_connection() as conn:
+            # Два запроса по индексу (city, timestamp): каждый читает одну строку
+            first = conn.execute("SELECT MIN(timestamp) FROM weather_history WHERE city = ?", (city,)).fetchone()[0]
+            last = conn.execute("SELECT MAX(timestamp) FROM weather_history WHERE city = ?", (city,)).fetchone()[0]
+        if first is None:
+            return None
+        return datetime.fromisoformat(first), datetime.fromisoformat(last)
+
+    def get_history_cities(self) -> list[str]:
+        """Города, по которым есть записи истории (из счетчиков строк, без сканирования истории)."""
+        with self._get_connection() as conn:
+            rows = conn.execute(
+                "SELECT city FROM row_counters "
+                "WHERE table_name = 'weather_history' AND city <> '' AND row_count > 0 ORDER BY city"
+            ).fetchall()
+            return [row["city"] for row in rows]
 
     def get_recent_records(self, limit: int = 10) -> list[WeatherRecord]:
         """Получает последние записи о погоде.
 
+        Записи в пределах емкости буфера берутся из памяти.
+
         Args:
             limit: Максимальное количество записей (0 = все записи)
 
         Returns:
             Список последних записей
         """
+        recent = self.recent
+        if recent is not None and 0 < limit <= recent.capacity:
+            with recent.lock:
+                return recent.records(self._recent_ring(None), limit)
+
         with self._get_connection() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = None  # Позиционное декодирование быстрее sqlite3.Row
 
             if limit == 0:
                 # Получаем все записи
-                cursor.execute("""
-                    SELECT * FROM weather_history
-                    ORDER BY timestamp DESC
-                """)
+                cursor.execute(f"""
+                    SELECT {WEATHER_COLUMNS} FROM weather_history h
+                    ORDER BY h.timestamp DESC, h.id DESC
+                """)  # noqa: S608 - в запрос подставляется только константа со списком колонок
             else:
                 cursor.execute(
-                    """
-                    SELECT * FROM weather_history
-                    ORDER BY timestamp DESC
+                    f"""
+                    SELECT {WEATHER_COLUMNS} FROM weather_history h
+                    ORDER BY h.timestamp DESC, h.id DESC
                     LIMIT ?
-                """,
+                """,  # noqa: S608
                     (limit,),
                 )
 
-            records = []
-            for row in cursor.fetchall():
-                records.append(
-                    WeatherRecord(
-                        id=row["id"],
-                        city=row["city"],
-                        timestamp=datetime.fromisoformat(row["timestamp"]),
-                        temperature=row["temperature"],
-                        feels_like=row["feels_like"],
-                        humidity=row["humidity"],
-                        pressure=row["pressure"],
-                        description=row["description"],
-                        wind_speed=row["wind_speed"],
-                        response_time_ms=row["response_time_ms"],
-                        created_at=datetime.fromisoformat(row["created_at"]) if row["created_at"] else None,
-                    )
+            return list(map(self._decode_weather_row, cursor))
+
+    def get_records_page(
+        self,
+        limit: int,
+        after: tuple | None = None,
+        order_by: str = "timestamp",
+        descending: bool = True,
+        max_id: int | None = None,
+    ) -> list[WeatherRecord]:
+        """Получает страницу истории с keyset-пагинацией.
+
+        В отличие от OFFSET, стоимость запроса не зависит от номера страницы:
+        SQLite продолжает чтение индекса с ключа последней записи предыдущей страницы.
+
+        Записи, сохраненные другими процессами (демон, загрузка архивов, опрос подписок),
+        сдвинули бы первую страницу относительно уже прочитанных. Поэтому постраничное
+        чтение фиксирует снимок истории: max_id из get_max_history_id() на момент чтения
+        первой страницы. id растут монотонно (AUTOINCREMENT), и при одном max_id каждая
+        страница начинается с одного и того же ключа.
+
+        Args:
+            limit: Размер страницы
+            after: Ключ (значение колонки сортировки, id) последней записи предыдущей страницы.
+                None для первой страницы
+            order_by: Колонка сортировки из HISTORY_SORT_COLUMNS
+            descending: True для сортировки по убыванию
+            max_id: Читать только записи с id не больше этого (снимок истории). None — все записи
+
+        Returns:
+            Список записей страницы
+
+        Raises:
+            ValueError: Если колонка сортировки не поддерживается
+        """
+        if order_by not in HISTORY_SORT_COLUMNS:
+            raise ValueError(f"Неподдерживаемая колонка сортировки: {order_by}")
+        if after is None and order_by == "timestamp" and descending and self.recent and limit <= self.recent.capacity:
+            # Первая страница по умолчанию — последние записи из памяти, если после снимка ничего не сохранено
+            records = self.get_recent_records(limit)
+            if max_id is None or all(record.id <= max_id for record in records):
+                return records
+
+        sort_expression = HISTORY_SORT_COLUMNS[order_by]
+        direction = "DESC" if descending else "ASC"
+        comparison = "<" if descending else ">"
+        conditions, params = [], []
+        if after is not None:
+            conditions.append(f"({sort_expression}, h.id) {comparison} (?, ?)")
+            params.extend(after)
+        if max_id is not None:
+            conditions.append("h.id <= ?")
+            params.append(max_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # Текст описания нужен в запросе только для сортировки по нему
+        join = "JOIN weather_descriptions d ON d.id = h.description_id" if order_by == "description" else ""
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(
+                f"""
+                SELECT {WEATHER_COLUMNS} FROM weather_history h
+                {join}
+                {where}
+                ORDER BY {sort_expression} {direction}, h.id {direction}
+                LIMIT ?
+            """,  # noqa: S608 - колонка и направление берутся из белого списка
+                (*params, limit),
+            )
+
+            return list(map(self._decode_weather_row, cursor))
+
+    def save_forecast(self, city: str, entries: list[ForecastEntry], fetched_at: datetime | None = None) -> int:
+        """Сохраняет прогноз одним пакетным upsert в одной транзакции.
+
+        Args:
+            city: Город
+            entries: Точки прогноза
+            fetched_at: Время получения прогноза. Если None, текущее время
+
+        Returns:
+            Количество сохраненных точек прогноза
+        """
+        fetched_at_str = (fetched_at or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+        rows = [
+            (
+                city,
+                entry.forecast_time.strftime("%Y-%m-%d %H:%M:%S"),
+                fetched_at_str,
+                entry.temperature,
+                entry.feels_like,
+                entry.humidity,
+                entry.pressure,
+                self.get_or_create_description(entry.description).id,
+                entry.wind_speed,
+                entry.precipitation_probability,
+            )
+            for entry in entries
+        ]
+
+        with self._get_connection() as conn:
+            conn.executemany(
+                """
+                INSERT INTO forecast
+                (city, forecast_time, fetched_at, temperature, feels_like, humidity, pressure,
+                 description_id, wind_speed, precipitation_probability)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (city, forecast_time, fetched_at) DO UPDATE SET
+                    temperature = excluded.temperature,
+                    feels_like = excluded.feels_like,
+                    humidity = excluded.humidity,
+                    pressure = excluded.pressure,
+                    description_id = excluded.description_id,
+                    wind_speed = excluded.wind_speed,
+                    precipitation_probability = excluded.precipitation_probability
+            """,
+                rows,
+            )
+        return len(rows)
+
+    def get_latest_forecast(self, city: str) -> list[ForecastEntry]:
+        """Получает последний сохраненный прогноз для города.
+
+        Args:
+            city: Город
+
+        Returns:
+            Точки прогноза в хронологическом порядке (пустой список, если прогноза нет)
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(
+                """
+                SELECT forecast_time, temperature, feels_like, humidity, pressure,
+                       description_id, wind_speed, precipitation_probability
+                FROM forecast
+                WHERE city = ? AND fetched_at = (SELECT MAX(fetched_at) FROM forecast WHERE city = ?)
+                ORDER BY forecast_time
+            """,
+                (city, city),
+            )
+            return [
+                ForecastEntry(
+                    datetime.fromisoformat(row[0]),
+                    row[1],
+                    row[2],
+                    row[3],
+                    row[4],
+                    self.get_description(row[5]).text,
+                    row[6],
+                    row[7],
                 )
-            return records
+                for row in cursor
+            ]
 
     def get_active_notification_rules(self) -> list[NotificationRule]:
-        """Получает все активные правила уведомлений.
+        """Получает все активные общие правила уведомлений (без наборов правил пользователей).
 
         Returns:
             Список активных правил
         """
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM notification_rules
-                WHERE is_active = 1
+            cursor.row_factory = None
+            cursor.execute(f"""
+                SELECT {RULE_COLUMNS} FROM notification_rules
+                WHERE is_active = 1 AND rule_set_id IS NULL
                 ORDER BY priority, id
-            """)
+            """)  # noqa: S608
 
-            rules = []
-            for row in cursor.fetchall():
-                rules.append(
-                    NotificationRule(
-                        id=row["id"],
-                        name=row["name"],
-                        condition_type=row["condition_type"],
-                        operator=row["operator"],
-                        threshold_value=row["threshold_value"],
-                        message_template=row["message_template"],
-                        icon=row["icon"],
-                        priority=row["priority"],
-                        is_active=bool(row["is_active"]),
-                        created_at=datetime.fromisoformat(row["created_at"]) if row["created_at"] else None,
-                    )
-                )
-            return rules
+            return list(map(decode_rule_row, cursor))
+
+    def get_inactive_notification_rules(self) -> list[NotificationRule]:
+        """Получает выключенные общие правила уведомлений (их можно включить через set_rule_active)."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(f"""
+                SELECT {RULE_COLUMNS} FROM notification_rules
+                WHERE is_active = 0 AND rule_set_id IS NULL
+                ORDER BY priority, id
+            """)  # noqa: S608
+
+            return list(map(decode_rule_row, cursor))
+
+    def get_rules_version(self) -> int:
+        """Возвращает версию правил: она меняется при каждом изменении правил и их настроек."""
+        with self._get_connection() as conn:
+            return conn.execute("SELECT version FROM rules_version WHERE id = 1").fetchone()[0]
 
     def save_issued_notification(self, notification: IssuedNotification) -> int:
         """Сохраняет выданное уведомление.
@@ -348,75 +1772,410 @@ class DatabaseManager:
         Returns:
             ID сохраненного уведомления
         """
-        with self._get_connection() as conn:
+        with NOTIFICATION_WRITE_SECONDS.time(), self._get_connection() as conn:
+            self._begin_write(conn)
             cursor = conn.cursor()
             cursor.execute(
                 """
-                INSERT INTO issued_notifications (history_id, rule_id, message)
-                VALUES (?, ?, ?)
+                INSERT INTO issued_notifications (history_id, rule_id, message, user_id)
+                VALUES (?, ?, ?, ?)
             """,
-                (notification.history_id, notification.rule_id, notification.message),
+                (notification.history_id, notification.rule_id, notification.message, notification.user_id),
             )
             return cursor.lastrowid
 
-    def get_notifications_for_record(self, history_id: int) -> list[IssuedNotification]:
+    def save_issued_notifications(
+        self, notifications: list[IssuedNotification], states: list[NotificationState] | None = None
+    ) -> None:
+        """Сохраняет уведомления и изменившиеся состояния правил одной транзакцией.
+
+        Args:
+            notifications: Выданные уведомления
+            states: Новые состояния правил (время срабатывания, ожидание гистерезиса)
+        """
+        with NOTIFICATION_WRITE_SECONDS.time(), self._get_connection() as conn:
+            self._begin_write(conn)
+            conn.executemany(
+                "INSERT INTO issued_notifications (history_id, rule_id, message, user_id) VALUES (?, ?, ?, ?)",
+                [(n.history_id, n.rule_id, n.message, n.user_id) for n in notifications],
+            )
+            if states:
+                conn.executemany(
+                    """
+                    INSERT INTO notification_state (rule_id, city, last_fired_at, latched)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (rule_id, city) DO UPDATE SET
+                        last_fired_at = excluded.last_fired_at,
+                        latched = excluded.latched
+                """,
+                    [(state.rule_id, state.city, state.last_fired_at, int(state.latched)) for state in states],
+                )
+
+    def get_notification_states(self) -> dict[tuple[int, str], NotificationState]:
+        """Возвращает последние срабатывания правил по ключу (rule_id, город)."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("SELECT rule_id, city, last_fired_at, latched FROM notification_state")
+            return {
+                (rule_id, city): NotificationState(rule_id, city, _parse_datetime(last_fired_at), bool(latched))
+                for rule_id, city, last_fired_at, latched in cursor
+            }
+
+    def get_rule_city_settings(self) -> dict[tuple[int, str], tuple[int | None, float | None]]:
+        """Возвращает настройки правил для отдельных городов: (rule_id, город) -> (пауза, гистерезис)."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("SELECT rule_id, city, cooldown_minutes, hysteresis FROM rule_city_settings")
+            return {(rule_id, city): (cooldown, hysteresis) for rule_id, city, cooldown, hysteresis in cursor}
+
+    def set_rule_cooldown(
+        self,
+        rule_id: int,
+        cooldown_minutes: int | None = None,
+        hysteresis: float | None = None,
+        city: str | None = None,
+    ) -> bool:
+        """Задает паузу и/или гистерезис правила для всех городов или для одного города.
+
+        Args:
+            rule_id: ID правила
+            cooldown_minutes: Пауза после срабатывания в минутах. None — не менять
+            hysteresis: Гистерезис в единицах порога правила. None — не менять
+            city: Город. Если None, меняется само правило
+
+        Returns:
+            True если правило найдено
+        """
+        with self._get_connection() as conn:
+            if conn.execute("SELECT 1 FROM notification_rules WHERE id = ?", (rule_id,)).fetchone() is None:
+                return False
+
+            if city is None:
+                conn.execute(
+                    """
+                    UPDATE notification_rules SET
+                        cooldown_minutes = COALESCE(?, cooldown_minutes),
+                        hysteresis = COALESCE(?, hysteresis)
+                    WHERE id = ?
+                """,
+                    (cooldown_minutes, hysteresis, rule_id),
+                )
+            else:
+                conn.execute(
+                    """
+                    INSERT INTO rule_city_settings (rule_id, city, cooldown_minutes, hysteresis)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (rule_id, city) DO UPDATE SET
+                        cooldown_minutes = COALESCE(excluded.cooldown_minutes, cooldown_minutes),
+                        hysteresis = COALESCE(excluded.hysteresis, hysteresis)
+                """,
+                    (rule_id, city, cooldown_minutes, hysteresis),
+                )
+            return True
+
+    def get_or_create_user(self, name: str) -> int:
+        """Возвращает id пользователя по имени, создавая пользователя при первом обращении."""
+        with self._get_connection() as conn:
+            conn.execute("INSERT INTO users (name) VALUES (?) ON CONFLICT (name) DO NOTHING", (name,))
+            return conn.execute("SELECT id FROM users WHERE name = ?", (name,)).fetchone()[0]
+
+    def get_users(self) -> dict[int, str]:
+        """Возвращает имена пользователей по id."""
+        with self._get_connection() as conn:
+            return {row[0]: row[1] for row in conn.execute("SELECT id, name FROM users")}
+
+    def get_or_create_rule_set(self, name: str, user_id: int | None = None) -> int:
+        """Возвращает id набора правил по имени.
+
+        Новый набор создается копией активных общих правил: пользователь меняет в нем
+        пороги, не затрагивая других.
+
+        Args:
+            name: Имя набора правил
+            user_id: Владелец нового набора
+
+        Returns:
+            ID набора правил
+        """
+        with self._get_connection() as conn:
+            self._begin_write(conn)
+            row = conn.execute("SELECT id FROM rule_sets WHERE name = ?", (name,)).fetchone()
+            if row is not None:
+                return row[0]
+
+            cursor = conn.execute("INSERT INTO rule_sets (name, user_id) VALUES (?, ?)", (name, user_id))
+            rule_set_id = cursor.lastrowid
+            conn.execute(
+                """
+                INSERT INTO notification_rules
+                (name, condition_type, operator, threshold_value, message_template, icon, priority,
+                 cooldown_minutes, hysteresis, rule_set_id)
+                SELECT name, condition_type, operator, threshold_value, message_template, icon, priority,
+                       cooldown_minutes, hysteresis, ?
+                FROM notification_rules
+                WHERE is_active = 1 AND rule_set_id IS NULL
+                ORDER BY id
+            """,
+                (rule_set_id,),
+            )
+            return rule_set_id
+
+    def add_rules(self, rule_set_id: int, rules: list[NotificationRule]) -> None:
+        """Добавляет правила в набор одной транзакцией.
+
+        Args:
+            rule_set_id: ID набора правил
+            rules: Правила (id и rule_set_id правил не используются)
+        """
+        with self._get_connection() as conn:
+            self._begin_write(conn)
+            conn.executemany(
+                """
+                INSERT INTO notification_rules
+                (name, condition_type, operator, threshold_value, message_template, icon, priority, is_active,
+                 cooldown_minutes, hysteresis, rule_set_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                [
+                    (
+                        rule.name,
+                        rule.condition_type,
+                        rule.operator,
+                        rule.threshold_value,
+                        rule.message_template,
+                        rule.icon,
+                        rule.priority,
+                        int(rule.is_active),
+                        rule.cooldown_minutes,
+                        rule.hysteresis,
+                        rule_set_id,
+                    )
+                    for rule in rules
+                ],
+            )
+
+    def set_rule_active(self, rule_id: int, is_active: bool) -> bool:
+        """Включает или выключает правило.
+
+        Returns:
+            True если правило найдено
+        """
+        with self._get_connection() as conn:
+            cursor = conn.execute("UPDATE notification_rules SET is_active = ? WHERE id = ?", (int(is_active), rule_id))
+            return cursor.rowcount > 0
+
+    def set_rule_threshold(self, rule_id: int, threshold_value: str) -> bool:
+        """Меняет порог правила.
+
+        Returns:
+            True если правило найдено
+        """
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                "UPDATE notification_rules SET threshold_value = ? WHERE id = ?", (threshold_value, rule_id)
+            )
+            return cursor.rowcount > 0
+
+    def find_rule_set(self, name: str) -> int | None:
+        """Возвращает id набора правил по имени или None, если набора нет."""
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT id FROM rule_sets WHERE name = ?", (name,)).fetchone()
+            return row[0] if row else None
+
+    def get_rule_set_rules(self, rule_set_id: int) -> list[NotificationRule]:
+        """Получает активные правила набора в порядке выдачи уведомлений."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(
+                f"""
+                SELECT {RULE_COLUMNS} FROM notification_rules
+                WHERE is_active = 1 AND rule_set_id = ?
+                ORDER BY priority, id
+            """,  # noqa: S608
+                (rule_set_id,),
+            )
+            return list(map(decode_rule_row, cursor))
+
+    def get_subscribed_rules(self) -> dict[int, list[NotificationRule]]:
+        """Получает активные правила наборов, на которые есть подписки: набор -> правила."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(f"""
+                SELECT {RULE_COLUMNS} FROM notification_rules
+                WHERE is_active = 1 AND rule_set_id IN (SELECT rule_set_id FROM subscriptions)
+                ORDER BY priority, id
+            """)  # noqa: S608
+            rules: dict[int, list[NotificationRule]] = {}
+            for rule in map(decode_rule_row, cursor):
+                rules.setdefault(rule.rule_set_id, []).append(rule)
+            return rules
+
+    def subscribe(self, user_id: int, city: str, rule_set_id: int) -> bool:
+        """Подписывает пользователя на уведомления набора правил по городу.
+
+        Returns:
+            True если подписки еще не было
+        """
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO subscriptions (city, rule_set_id, user_id) VALUES (?, ?, ?)",
+                (city, rule_set_id, user_id),
+            )
+            return cursor.rowcount > 0
+
+    def unsubscribe(self, user_id: int, city: str) -> int:
+        """Отменяет подписки пользователя на город.
+
+        Returns:
+            Количество удаленных подписок
+        """
+        with self._get_connection() as conn:
+            cursor = conn.execute("DELETE FROM subscriptions WHERE city = ? AND user_id = ?", (city, user_id))
+            return cursor.rowcount
+
+    def get_subscriptions(self) -> dict[str, dict[int, list[int]]]:
+        """Возвращает подписки, сгруппированные для рассылки: город -> набор правил -> пользователи."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("SELECT city, rule_set_id, user_id FROM subscriptions ORDER BY city, rule_set_id, user_id")
+            subscriptions: dict[str, dict[int, list[int]]] = {}
+            for city, rule_set_id, user_id in cursor:
+                subscriptions.setdefault(city, {}).setdefault(rule_set_id, []).append(user_id)
+            return subscriptions
+
+    def get_user_subscriptions(self) -> list[tuple[str, str, str]]:
+        """Возвращает подписки для просмотра: (пользователь, город, набор правил)."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("""
+                SELECT u.name, s.city, rs.name
+                FROM subscriptions s
+                JOIN users u ON u.id = s.user_id
+                JOIN rule_sets rs ON rs.id = s.rule_set_id
+                ORDER BY u.name, s.city, rs.name
+            """)
+            return cursor.fetchall()
+
+    def get_notifications_for_record(self, history_id: int, user_id: int | None = None) -> list[IssuedNotification]:
         """Получает все уведомления для конкретной записи.
 
         Args:
             history_id: ID записи в истории
+            user_id: Подписчик. Если None, возвращаются уведомления общих правил
 
         Returns:
             Список уведомлений
         """
         with self._get_connection() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = None
             cursor.execute(
-                """
-                SELECT inot.*, nr.icon, nr.priority
+                f"""
+                SELECT {NOTIFICATION_COLUMNS}
                 FROM issued_notifications inot
                 JOIN notification_rules nr ON inot.rule_id = nr.id
-                WHERE inot.history_id = ?
+                WHERE inot.history_id = ? AND inot.user_id IS ?
                 ORDER BY nr.priority, inot.created_at
-            """,
-                (history_id,),
-            )
-
-            notifications = []
-            for row in cursor.fetchall():
-                notifications.append(
-                    IssuedNotification(
-                        id=row["id"],
-                        history_id=row["history_id"],
-                        rule_id=row["rule_id"],
-                        message=row["message"],
-                        created_at=datetime.fromisoformat(row["created_at"]) if row["created_at"] else None,
-                    )
-                )
-            return notifications
+            """,  # noqa: S608
+                (history_id, user_id),
+            )
+
+            return list(map(decode_notification_row, cursor))
+
+    def get_max_history_id(self) -> int:
+        """Наибольший id в истории (0 для пустой истории): граница снимка для get_records_page."""
+        with self._get_connection() as conn:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM weather_history").fetchone()[0]
+
+    def get_record_count(self, city: str | None = None) -> int:
+        """Получает количество записей в истории за O(1) из счетчиков.
 
-    def get_record_count(self) -> int:
-        """Получает общее количество записей в истории.
+        Args:
+            city: Город. Если None, возвращается общее количество записей
 
         Returns:
             Количество записей
         """
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) as count FROM weather_history")
-            return cursor.fetchone()["count"]
+            row = conn.execute(
+                "SELECT row_count FROM row_counters WHERE table_name = 'weather_history' AND city = ?",
+                (city or "",),
+            ).fetchone()
+            return row["row_count"] if row else 0
+
+    def check_row_counters(self, repair: bool = True) -> list[tuple[str, str, int, int]]:
+        """Сверяет счетчики строк с фактическими данными и при необходимости пересчитывает их.
+
+        Требует полного сканирования таблиц, поэтому предназначен для обслуживания,
+        а не для регулярных вызовов. При repair=True заодно пересчитываются часовые сводки
+        истории (их минимум и максимум после удаления записей могут устареть).
+
+        Args:
+            repair: Пересчитать счетчики, если найдены расхождения
+
+        Returns:
+            Список расхождений (таблица, город, значение счетчика, фактическое количество)
+        """
+        with self._get_connection() as conn:
+            stored = {
+                (row["table_name"], row["city"]): row["row_count"]
+                for row in conn.execute("SELECT table_name, city, row_count FROM row_counters")
+            }
+            actual = self._count_rows(conn)
+
+            mismatches = [
+                (table, city, stored.get((table, city), 0), actual.get((table, city), 0))
+                for table, city in sorted(stored.keys() | actual.keys())
+                if stored.get((table, city), 0) != actual.get((table, city), 0)
+            ]
+
+            if mismatches and repair:
+                self._rebuild_row_counters(conn)
+            if repair:
+                self._rebuild_rollups(conn)
+
+            return mismatches
 
     def clear_history(self) -> bool:
         """Очищает всю историю запросов.
 
+        Построчные триггеры счетчиков и сводок на время очистки удаляются, а счетчики
+        и сводки обнуляются напрямую: DELETE без триггеров и внешних ключей SQLite
+        выполняет усечением таблицы, а не обходом миллионов строк. Все происходит
+        в одной транзакции, поэтому другие процессы не увидят историю без триггеров.
+
         Returns:
             True если успешно, False если ошибка
         """
         try:
             with self._get_connection() as conn:
-                # Удаляем данные в правильном порядке (сначала дочерние таблицы)
+                # Дочерние таблицы очищаются явно, поэтому каскад внешних ключей не нужен
+                # (PRAGMA действует только вне транзакции)
+                conn.execute("PRAGMA foreign_keys = OFF")
+                self._begin_write(conn)
+                for trigger in HISTORY_DELETE_TRIGGERS:
+                    conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
                 conn.execute("DELETE FROM issued_notifications")
+                conn.execute("DELETE FROM weather_locations")
                 conn.execute("DELETE FROM weather_history")
 
+                conn.execute("DELETE FROM weather_rollups")
+                conn.execute("DELETE FROM row_counters WHERE table_name = 'weather_history' AND city <> ''")
+                conn.executemany(
+                    "UPDATE row_counters SET row_count = 0 WHERE table_name = ? AND city = ''",
+                    [(table,) for table in COUNTED_TABLES],
+                )
+                # Триггеры создаются заново; счетчики и сводки уже существуют и не пересчитываются
+                self._init_row_counters(conn)
+                self._init_rollups(conn)
+            self._reset_recent()
+
             # VACUUM должен быть вне транзакции
             conn = sqlite3.connect(self.db_path)
             conn.execute("VACUUM")
@@ -429,5 +2188,11 @@ class DatabaseManager:
             return False
 
 
-# Глобальный экземпляр для использования во всем приложении
-db_manager = DatabaseManager()
+@cache
+def get_db_manager() -> DatabaseManager:
+    """Возвращает общий экземпляр менеджера БД.
+
+    Экземпляр создается при первом обращении, а не при импорте модуля,
+    поэтому импорт не создает файлов и не открывает базу данных.
+    """
+    return DatabaseManager()
@@ -4,7 +4,7 @@ from dataclasses import dataclass
 from datetime import datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class WeatherRecord:
     """Запись о погоде в истории."""
 
@@ -19,9 +19,33 @@ class WeatherRecord:
     wind_speed: float = 0.0
     response_time_ms: int = 0
     created_at: datetime | None = None
+    description_id: int | None = None  # Ссылка на weather_descriptions
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
+class WeatherDescription:
+    """Запись словаря описаний погоды с заранее вычисленными производными значениями."""
+
+    id: int
+    text: str
+    text_lower: str
+    icon: str
+    keyword_flags: int = 0  # Биты ключевых слов правил "contains", найденных в описании
+    checked_keywords: frozenset[str] = frozenset()  # Ключевые слова, для которых вычислены флаги
+    matched_keywords: frozenset[str] = frozenset()  # Ключевые слова, найденные в описании
+
+    def match_keyword(self, keyword: str) -> bool | None:
+        """Проверяет ключевое слово по заранее вычисленным флагам.
+
+        Returns:
+            True/False, если слово было учтено при вычислении флагов, иначе None
+        """
+        if keyword in self.checked_keywords:
+            return keyword in self.matched_keywords
+        return None
+
+
+@dataclass(slots=True)
 class NotificationRule:
     """Правило для генерации уведомлений."""
 
@@ -35,9 +59,22 @@ class NotificationRule:
     priority: int = 1  # 1-высокий, 2-средний, 3-низкий
     is_active: bool = True
     created_at: datetime | None = None
+    cooldown_minutes: int = 0  # Пауза после срабатывания (для каждого города отдельно), 0 — без паузы
+    hysteresis: float = 0.0  # Насколько значение должно отойти от порога, чтобы правило сработало снова
+    rule_set_id: int | None = None  # Набор правил пользователей, None — общие правила
+
+
+@dataclass(slots=True)
+class NotificationState:
+    """Последнее срабатывание правила для города."""
+
+    rule_id: int
+    city: str
+    last_fired_at: datetime | None = None
+    latched: bool = False  # Сработало и ждет, пока значение отойдет от порога на гистерезис
 
 
-@dataclass
+@dataclass(slots=True)
 class IssuedNotification:
     """Выданное уведомление для конкретного запроса."""
 
@@ -46,3 +83,4 @@ class IssuedNotification:
     rule_id: int = 0
     message: str = ""
     created_at: datetime | None = None
+    user_id: int | None = None  # Подписчик, которому выдано уведомление; None — общие правила
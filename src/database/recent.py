@@ -0,0 +1,288 @@
+"""Последние наблюдения в памяти: кольцевой буфер фиксированной емкости на каждый город.
+
+Поля записей хранятся колонками в typed arrays (array), а не списком WeatherRecord:
+слот занимает около 70 байт, и объем памяти на отслеживаемый город известен заранее
+(емкость × размер слота). Объекты WeatherRecord собираются только при чтении.
+
+Кроме буферов городов есть общий буфер всех городов (как city = '' в row_counters):
+он отвечает на запросы последних записей истории без обращения к SQLite.
+Буферы держат записи в порядке времени наблюдения. Запись, которая старше последней
+в буфере (загрузка архива), порядок нарушила бы, поэтому такой буфер сбрасывается
+и при следующем чтении загружается из базы данных заново.
+
+Города хранятся в буферах номерами из общей таблицы имен. Когда в таблице накапливаются
+города, которых уже нет ни в одном буфере (вытесненные), она перестраивается.
+"""
+
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from datetime import datetime, timedelta
+
+from src.database.models import WeatherRecord
+
+# Числовые поля записи, которые хранятся в буфере, и коды типов их массивов
+SERIES_FIELDS = {
+    "temperature": "d",
+    "feels_like": "d",
+    "humidity": "i",
+    "pressure": "i",
+    "wind_speed": "d",
+    "response_time_ms": "i",
+}
+INTEGER_FIELDS = tuple(field for field, code in SERIES_FIELDS.items() if code == "i")
+
+# Время хранится целым числом микросекунд от этой точки: без часовых поясов и без потери точности
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+# Время создания записи, которое не заполнено (записи старых версий базы данных)
+NO_TIME = -(2**63)
+
+
+def to_micros(timestamp: datetime) -> int:
+    """datetime в микросекунды от EPOCH."""
+    return (timestamp - EPOCH) // MICROSECOND
+
+
+def from_micros(micros: int) -> datetime:
+    """Микросекунды от EPOCH в datetime."""
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def _zeros(code: str, capacity: int) -> array:
+    return array(code, bytes(array(code).itemsize * capacity))
+
+
+class ObservationRing:
+    """Кольцевой буфер наблюдений: колонки в typed arrays, старые записи перезаписываются."""
+
+    __slots__ = (
+        "capacity",
+        "ids",
+        "city_codes",
+        "timestamps",
+        "created_at",
+        "description_ids",
+        "columns",
+        "_next",
+        "_size",
+    )
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ids = _zeros("q", capacity)
+        self.city_codes = _zeros("i", capacity)  # Номер города в RecentObservations.city_names
+        self.timestamps = _zeros("q", capacity)
+        self.created_at = _zeros("q", capacity)
+        self.description_ids = _zeros("i", capacity)
+        self.columns = {field: _zeros(code, capacity) for field, code in SERIES_FIELDS.items()}
+        self._next = 0  # Слот, в который попадет следующая запись
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def is_full(self) -> bool:
+        """Буфер заполнен: самые старые записи уже вытеснены."""
+        return self._size == self.capacity
+
+    @property
+    def newest_timestamp(self) -> int | None:
+        return self.timestamps[self._next - 1] if self._size else None
+
+    @property
+    def oldest_timestamp(self) -> int | None:
+        return self.timestamps[(self._next - self._size) % self.capacity] if self._size else None
+
+    @classmethod
+    def memory_per_slot(cls) -> int:
+        """Байт на одно наблюдение."""
+        codes = ("q", "i", "q", "q", "i", *SERIES_FIELDS.values())
+        return sum(array(code).itemsize for code in codes)
+
+    def append(self, record: WeatherRecord, city_code: int, timestamp: int) -> bool:
+        """Добавляет наблюдение.
+
+        Returns:
+            False, если наблюдение старше последнего в буфере (буфер не изменяется)
+        """
+        if self._size and timestamp < self.timestamps[self._next - 1]:
+            return False
+        slot = self._next
+        self.ids[slot] = record.id
+        self.city_codes[slot] = city_code
+        self.timestamps[slot] = timestamp
+        self.created_at[slot] = NO_TIME if record.created_at is None else to_micros(record.created_at)
+        self.description_ids[slot] = record.description_id
+        for field, column in self.columns.items():
+            value = getattr(record, field)
+            column[slot] = int(value) if field in INTEGER_FIELDS else value
+        self._next = (slot + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        return True
+
+    def newest_slots(self, limit: int) -> list[int]:
+        """Слоты последних limit наблюдений, от новых к старым."""
+        last, capacity = self._next - 1, self.capacity
+        return [(last - offset) % capacity for offset in range(min(limit, self._size))]
+
+    def _chronological(self, column: array) -> array:
+        """Колонка в порядке времени (от старых к новым)."""
+        if not self.is_full:
+            return column[: self._size]
+        return column[self._next :] + column[: self._next]
+
+    def series(self, field: str, since: int) -> tuple[array, array]:
+        """Значения поля начиная с момента since (микросекунды), в порядке времени.
+
+        Returns:
+            Кортеж (время в микросекундах, значения)
+        """
+        timestamps = self._chronological(self.timestamps)
+        start = bisect_left(timestamps, since)
+        return timestamps[start:], self._chronological(self.columns[field])[start:]
+
+
+class RecentObservations:
+    """Буферы последних наблюдений по городам и общий буфер всех городов.
+
+    Городов может быть много (загрузка архивов), поэтому буферов городов не больше
+    max_cities: давно не читавшийся город вытесняется. Все методы вызываются под lock.
+    """
+
+    def __init__(self, capacity: int, max_cities: int, describe: Callable[[int], str]):
+        """Создает пустое хранилище.
+
+        Args:
+            capacity: Емкость буфера (наблюдений на город)
+            max_cities: Сколько буферов городов держать в памяти
+            describe: Текст описания погоды по description_id
+        """
+        self.capacity = capacity
+        self.max_cities = max_cities
+        self.lock = threading.Lock()
+        self.signature: tuple[int, int] | None = None  # (последний id, число записей) при синхронизации с БД
+        self.checked_at = 0.0  # time.monotonic() последней сверки с БД
+        self.city_names: list[str] = []
+        self._city_codes: dict[str, int] = {}
+        self._all: ObservationRing | None = None
+        self._cities: OrderedDict[str, ObservationRing] = OrderedDict()  # LRU
+        self._describe = describe
+
+    def clear(self) -> None:
+        """Сбрасывает все буферы: следующее чтение загрузит их из базы данных."""
+        self.signature = None
+        self._all = None
+        self._cities.clear()
+        self.city_names = []
+        self._city_codes = {}
+
+    def _compact_city_codes(self) -> None:
+        """Убирает из таблицы городов вытесненные города, если их накопилось много.
+
+        Живых номеров не больше max_cities + capacity (буферы городов и общий буфер),
+        поэтому таблица перестраивается, только когда выросла вдвое сверх этого.
+        """
+        if len(self.city_names) <= 2 * (self.max_cities + self.capacity):
+            return
+        names: list[str] = []
+        renumbered: dict[int, int] = {}
+        rings = [*self._cities.values(), self._all] if self._all is not None else self._cities.values()
+        for ring in rings:
+            codes = ring.city_codes
+            for slot in ring.newest_slots(len(ring)):
+                code = renumbered.get(codes[slot])
+                if code is None:
+                    code = renumbered[codes[slot]] = len(names)
+                    names.append(self.city_names[codes[slot]])
+                codes[slot] = code
+        self.city_names = names
+        self._city_codes = {name: code for code, name in enumerate(names)}
+
+    def _city_code(self, city: str) -> int:
+        code = self._city_codes.get(city)
+        if code is None:
+            code = self._city_codes[city] = len(self.city_names)
+            self.city_names.append(city)
+        return code
+
+    def _fill(self, records: Iterable[WeatherRecord]) -> ObservationRing:
+        ring = ObservationRing(self.capacity)
+        for record in records:
+            ring.append(record, self._city_code(record.city), to_micros(record.timestamp))
+        return ring
+
+    def load_all(self, records: list[WeatherRecord]) -> ObservationRing:
+        """Заполняет общий буфер последними записями из базы данных (от новых к старым)."""
+        self._compact_city_codes()
+        ring = self._all = self._fill(reversed(records))
+        return ring
+
+    def load_city(self, city: str, records: list[WeatherRecord]) -> ObservationRing:
+        """Заполняет буфер города последними записями из базы данных (от новых к старым)."""
+        self._compact_city_codes()
+        ring = self._cities[city] = self._fill(reversed(records))
+        if len(self._cities) > self.max_cities:
+            self._cities.popitem(last=False)
+        return ring
+
+    def get_all(self) -> ObservationRing | None:
+        return self._all
+
+    def get_city(self, city: str) -> ObservationRing | None:
+        ring = self._cities.get(city)
+        if ring is not None:
+            self._cities.move_to_end(city)
+        return ring
+
+    def append(self, records: list[WeatherRecord], signature: tuple[int, int]) -> None:
+        """Добавляет только что сохраненные записи во все загруженные буферы."""
+        self._compact_city_codes()
+        for record in records:
+            code = self._city_code(record.city)
+            # Движок уведомлений сохраняет запись со временем-строкой и разбирает его уже после записи
+            observed = record.timestamp
+            timestamp = to_micros(datetime.fromisoformat(observed) if isinstance(observed, str) else observed)
+            if self._all is not None and not self._all.append(record, code, timestamp):
+                self._all = None
+            ring = self._cities.get(record.city)
+            if ring is not None and not ring.append(record, code, timestamp):
+                del self._cities[record.city]
+        self.signature = signature
+
+    def records(self, ring: ObservationRing, limit: int) -> list[WeatherRecord]:
+        """Последние limit записей буфера, от новых к старым."""
+        ids, codes, timestamps, descriptions = ring.ids, ring.city_codes, ring.timestamps, ring.description_ids
+        created_at = ring.created_at
+        columns = ring.columns
+        temperature, feels_like, humidity = columns["temperature"], columns["feels_like"], columns["humidity"]
+        pressure, wind_speed, response_time = columns["pressure"], columns["wind_speed"], columns["response_time_ms"]
+        names, describe = self.city_names, self._describe
+        return [
+            WeatherRecord(
+                ids[slot],
+                names[codes[slot]],
+                from_micros(timestamps[slot]),
+                temperature[slot],
+                feels_like[slot],
+                humidity[slot],
+                pressure[slot],
+                describe(descriptions[slot]),
+                wind_speed[slot],
+                response_time[slot],
+                None if created_at[slot] == NO_TIME else from_micros(created_at[slot]),
+                descriptions[slot],
+            )
+            for slot in ring.newest_slots(limit)
+        ]
+
+    def memory_bytes(self) -> int:
+        """Объем массивов всех загруженных буферов и таблицы городов."""
+        rings = len(self._cities) + (self._all is not None)
+        names = sys.getsizeof(self.city_names) + sys.getsizeof(self._city_codes)
+        names += sum(sys.getsizeof(name) for name in self.city_names)
+        return rings * self.capacity * ObservationRing.memory_per_slot() + names
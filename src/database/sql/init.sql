@@ -1,5 +1,21 @@
 -- Инициализация базы данных SQLite
 
+-- Таблица: словарь описаний погоды (иконка и флаги ключевых слов вычисляются один раз)
+CREATE TABLE IF NOT EXISTS weather_descriptions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    text TEXT NOT NULL UNIQUE,
+    text_lower TEXT NOT NULL,
+    icon TEXT NOT NULL,
+    keyword_flags INTEGER NOT NULL DEFAULT 0,
+    keyword_bits INTEGER NOT NULL DEFAULT 0  -- флаги вычислены для битов 0..keyword_bits-1
+);
+
+-- Таблица: ключевые слова правил "contains" и номера их битов в keyword_flags
+CREATE TABLE IF NOT EXISTS description_keywords (
+    bit INTEGER PRIMARY KEY,
+    keyword TEXT NOT NULL UNIQUE
+);
+
 -- Таблица: история запросов погоды
 CREATE TABLE IF NOT EXISTS weather_history (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -9,13 +25,52 @@ CREATE TABLE IF NOT EXISTS weather_history (
     feels_like REAL NOT NULL,
     humidity INTEGER NOT NULL,
     pressure INTEGER NOT NULL,
-    description TEXT NOT NULL,
+    description_id INTEGER NOT NULL REFERENCES weather_descriptions(id),
     wind_speed REAL NOT NULL,
     response_time_ms INTEGER DEFAULT 0,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Таблица: пользователи
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Таблица: наборы правил пользователей (новый набор — копия общих правил)
+CREATE TABLE IF NOT EXISTS rule_sets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Таблица: правила уведомлений
+CREATE TABLE IF NOT EXISTS notification_rules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    condition_type TEXT NOT NULL,
+    operator TEXT NOT NULL,
+    threshold_value TEXT NOT NULL,
+    message_template TEXT NOT NULL,
+    icon TEXT,
+    priority INTEGER DEFAULT 1,
+    is_active BOOLEAN DEFAULT 1,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    cooldown_minutes INTEGER NOT NULL DEFAULT 0,  -- пауза после срабатывания для города
+    hysteresis REAL NOT NULL DEFAULT 0,           -- запас от порога для повторного срабатывания
+    rule_set_id INTEGER REFERENCES rule_sets(id) ON DELETE CASCADE  -- NULL — общие правила
+);
+
+-- Таблица: подписки (пользователь получает уведомления набора правил по городу)
+CREATE TABLE IF NOT EXISTS subscriptions (
+    city TEXT NOT NULL,
+    rule_set_id INTEGER NOT NULL REFERENCES rule_sets(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    PRIMARY KEY (city, rule_set_id, user_id)
+) WITHOUT ROWID;
+
 -- Вставляем базовые правила уведомлений
 INSERT OR IGNORE INTO notification_rules
 (id, name, condition_type, operator, threshold_value, message_template, icon, priority) VALUES
@@ -29,6 +84,63 @@ INSERT OR IGNORE INTO notification_rules
 (8, 'Высокая влажность', 'humidity', 'gt', '80', '💧 Высокая влажность ({humidity}%). Одежда сохнет медленно', '💧', 3),
 (9, 'Низкое давление', 'pressure', 'lt', '730', '📉 Низкое давление ({pressure} мм рт.ст.). Метеозависимым быть осторожнее', '📉', 3);
 
+-- Правила на тенденцию выключены: уведомления существующих баз данных не меняются после обновления.
+-- Включаются командой weather-cli rules ID --enable
+INSERT OR IGNORE INTO notification_rules
+(id, name, condition_type, operator, threshold_value, message_template, icon, priority, is_active) VALUES
+(10, 'Давление падает', 'pressure:delta:3h', 'lt', '-5', '🌀 Давление за 3 часа изменилось на {value} мм рт.ст. ({pressure} мм рт.ст.). Возможна смена погоды', '🌀', 2, 0),
+(11, 'Теплее обычного', 'temperature:anomaly:7d', 'gt', '8', '🌡️ На {value}°C теплее, чем в среднем за неделю ({temperature}°C)', '🌡️', 3, 0);
+
+-- Таблица: пауза и гистерезис правил для отдельных городов (NULL — как в правиле)
+CREATE TABLE IF NOT EXISTS rule_city_settings (
+    rule_id INTEGER NOT NULL REFERENCES notification_rules(id) ON DELETE CASCADE,
+    city TEXT NOT NULL,
+    cooldown_minutes INTEGER,
+    hysteresis REAL,
+    PRIMARY KEY (rule_id, city)
+) WITHOUT ROWID;
+
+-- Таблица: версия правил, триггеры увеличивают ее при любом изменении правил и их настроек
+CREATE TABLE IF NOT EXISTS rules_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO rules_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_notification_rules_version_insert
+AFTER INSERT ON notification_rules BEGIN UPDATE rules_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_notification_rules_version_update
+AFTER UPDATE ON notification_rules BEGIN UPDATE rules_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_notification_rules_version_delete
+AFTER DELETE ON notification_rules BEGIN UPDATE rules_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_rule_city_settings_version_insert
+AFTER INSERT ON rule_city_settings BEGIN UPDATE rules_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_rule_city_settings_version_update
+AFTER UPDATE ON rule_city_settings BEGIN UPDATE rules_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_rule_city_settings_version_delete
+AFTER DELETE ON rule_city_settings BEGIN UPDATE rules_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_rule_sets_version_insert
+AFTER INSERT ON rule_sets BEGIN UPDATE rules_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_rule_sets_version_update
+AFTER UPDATE ON rule_sets BEGIN UPDATE rules_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_rule_sets_version_delete
+AFTER DELETE ON rule_sets BEGIN UPDATE rules_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_subscriptions_version_insert
+AFTER INSERT ON subscriptions BEGIN UPDATE rules_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_subscriptions_version_update
+AFTER UPDATE ON subscriptions BEGIN UPDATE rules_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_subscriptions_version_delete
+AFTER DELETE ON subscriptions BEGIN UPDATE rules_version SET version = version + 1; END;
+
+-- Таблица: последнее срабатывание правил по городам (заполняет индекс пауз при запуске)
+CREATE TABLE IF NOT EXISTS notification_state (
+    rule_id INTEGER NOT NULL REFERENCES notification_rules(id) ON DELETE CASCADE,
+    city TEXT NOT NULL,
+    last_fired_at DATETIME,
+    latched INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (rule_id, city)
+) WITHOUT ROWID;
+
 -- Таблица: выданные уведомления (связь история-правила)
 CREATE TABLE IF NOT EXISTS issued_notifications (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -36,15 +148,62 @@ CREATE TABLE IF NOT EXISTS issued_notifications (
     rule_id INTEGER NOT NULL,
     message TEXT NOT NULL,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,  -- подписчик; NULL — общие правила
     FOREIGN KEY (history_id) REFERENCES weather_history(id) ON DELETE CASCADE,
     FOREIGN KEY (rule_id) REFERENCES notification_rules(id) ON DELETE CASCADE
 );
 
+-- Таблица: прогноз погоды (точки каждого скачанного прогноза)
+CREATE TABLE IF NOT EXISTS forecast (
+    city TEXT NOT NULL,
+    forecast_time DATETIME NOT NULL,
+    fetched_at DATETIME NOT NULL,
+    temperature REAL NOT NULL,
+    feels_like REAL NOT NULL,
+    humidity INTEGER NOT NULL,
+    pressure INTEGER NOT NULL,
+    description_id INTEGER NOT NULL REFERENCES weather_descriptions(id),
+    wind_speed REAL NOT NULL,
+    precipitation_probability REAL DEFAULT 0,
+    PRIMARY KEY (city, forecast_time, fetched_at)
+) WITHOUT ROWID;
+
+-- Таблица: позиции загрузки архивов ответов API
+CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+    source TEXT PRIMARY KEY,
+    byte_offset INTEGER NOT NULL DEFAULT 0,
+    rows_ingested INTEGER NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Таблица: координаты наблюдений, запрошенных по lat/lon (ячейка сетки 0.01° для поиска ближайшего)
+CREATE TABLE IF NOT EXISTS weather_locations (
+    history_id INTEGER PRIMARY KEY REFERENCES weather_history(id) ON DELETE CASCADE,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    cell_lat INTEGER NOT NULL,
+    cell_lon INTEGER NOT NULL,
+    timestamp DATETIME NOT NULL
+);
+
+-- Таблица: название города в истории по запросу (API называет город по-своему)
+CREATE TABLE IF NOT EXISTS city_queries (
+    query TEXT PRIMARY KEY,
+    city TEXT NOT NULL
+) WITHOUT ROWID;
+
 -- Создаем индексы для ускорения поиска
 CREATE INDEX IF NOT EXISTS idx_weather_history_timestamp ON weather_history(timestamp);
-CREATE INDEX IF NOT EXISTS idx_weather_history_city ON weather_history(city);
+CREATE INDEX IF NOT EXISTS idx_weather_history_city_timestamp ON weather_history(city, timestamp);
+CREATE INDEX IF NOT EXISTS idx_weather_history_temperature ON weather_history(temperature, id);
+CREATE INDEX IF NOT EXISTS idx_weather_history_description ON weather_history(description_id, id);
 CREATE INDEX IF NOT EXISTS idx_notification_rules_active ON notification_rules(is_active, priority);
 CREATE INDEX IF NOT EXISTS idx_issued_notifications_history ON issued_notifications(history_id);
+CREATE INDEX IF NOT EXISTS idx_issued_notifications_user ON issued_notifications(user_id, id);
+CREATE INDEX IF NOT EXISTS idx_notification_rules_rule_set ON notification_rules(rule_set_id, is_active);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_user ON subscriptions(user_id);
+CREATE INDEX IF NOT EXISTS idx_forecast_city_fetched ON forecast(city, fetched_at);
+CREATE INDEX IF NOT EXISTS idx_weather_locations_cell ON weather_locations(cell_lat, cell_lon, timestamp);
 
 -- Вставляем базовые правила уведомлений
 INSERT OR IGNORE INTO notification_rules
@@ -58,3 +217,142 @@ INSERT OR IGNORE INTO notification_rules
 ('Сильный ветер', 'wind_speed', 'gt', '10', '💨 Сильный ветер ({value} м/с)! Будьте осторожны', '💨', 2),
 ('Высокая влажность', 'humidity', 'gt', '80', '💧 Высокая влажность ({value}%). Одежда сохнет медленно', '💧', 3),
 ('Низкое давление', 'pressure', 'lt', '730', '📉 Низкое давление ({value} мм рт.ст.). Метеозависимым быть осторожнее', '📉', 3);
+
+-- Таблица: счетчики строк (city = '' — вся таблица), поддерживаются триггерами
+CREATE TABLE IF NOT EXISTS row_counters (
+    table_name TEXT NOT NULL,
+    city TEXT NOT NULL DEFAULT '',
+    row_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, city)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_weather_history_count_insert
+AFTER INSERT ON weather_history
+BEGIN
+    INSERT INTO row_counters (table_name, city, row_count) VALUES ('weather_history', '', 1)
+    ON CONFLICT (table_name, city) DO UPDATE SET row_count = row_count + 1;
+    INSERT INTO row_counters (table_name, city, row_count) VALUES ('weather_history', NEW.city, 1)
+    ON CONFLICT (table_name, city) DO UPDATE SET row_count = row_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_weather_history_count_delete
+AFTER DELETE ON weather_history
+BEGIN
+    UPDATE row_counters SET row_count = row_count - 1
+    WHERE table_name = 'weather_history' AND city IN ('', OLD.city);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_weather_history_count_update_city
+AFTER UPDATE OF city ON weather_history
+WHEN OLD.city <> NEW.city
+BEGIN
+    UPDATE row_counters SET row_count = row_count - 1
+    WHERE table_name = 'weather_history' AND city = OLD.city;
+    INSERT INTO row_counters (table_name, city, row_count) VALUES ('weather_history', NEW.city, 1)
+    ON CONFLICT (table_name, city) DO UPDATE SET row_count = row_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_issued_notifications_count_insert
+AFTER INSERT ON issued_notifications
+BEGIN
+    INSERT INTO row_counters (table_name, city, row_count) VALUES ('issued_notifications', '', 1)
+    ON CONFLICT (table_name, city) DO UPDATE SET row_count = row_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_issued_notifications_count_delete
+AFTER DELETE ON issued_notifications
+BEGIN
+    UPDATE row_counters SET row_count = row_count - 1
+    WHERE table_name = 'issued_notifications' AND city = '';
+END;
+
+-- Таблица: часовые сводки истории для графиков (ведутся триггерами; минимум и максимум часа
+-- после удаления или исправления части его записей пересчитывает weather-cli check-counters)
+CREATE TABLE IF NOT EXISTS weather_rollups (
+    city TEXT NOT NULL,
+    hour TEXT NOT NULL,  -- начало часа 'YYYY-MM-DD HH:00:00'
+    samples INTEGER NOT NULL,
+    temperature_sum REAL NOT NULL, temperature_min REAL NOT NULL, temperature_max REAL NOT NULL,
+    feels_like_sum REAL NOT NULL, feels_like_min REAL NOT NULL, feels_like_max REAL NOT NULL,
+    humidity_sum REAL NOT NULL, humidity_min REAL NOT NULL, humidity_max REAL NOT NULL,
+    pressure_sum REAL NOT NULL, pressure_min REAL NOT NULL, pressure_max REAL NOT NULL,
+    wind_speed_sum REAL NOT NULL, wind_speed_min REAL NOT NULL, wind_speed_max REAL NOT NULL,
+    PRIMARY KEY (city, hour)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_weather_history_rollup_insert
+AFTER INSERT ON weather_history
+BEGIN
+    INSERT INTO weather_rollups
+    (city, hour, samples,
+     temperature_sum, temperature_min, temperature_max,
+     feels_like_sum, feels_like_min, feels_like_max,
+     humidity_sum, humidity_min, humidity_max,
+     pressure_sum, pressure_min, pressure_max,
+     wind_speed_sum, wind_speed_min, wind_speed_max)
+    VALUES
+    (NEW.city, strftime('%Y-%m-%d %H:00:00', NEW.timestamp), 1,
+     NEW.temperature, NEW.temperature, NEW.temperature,
+     NEW.feels_like, NEW.feels_like, NEW.feels_like,
+     NEW.humidity, NEW.humidity, NEW.humidity,
+     NEW.pressure, NEW.pressure, NEW.pressure,
+     NEW.wind_speed, NEW.wind_speed, NEW.wind_speed)
+    ON CONFLICT (city, hour) DO UPDATE SET
+        samples = samples + 1,
+        temperature_sum = temperature_sum + excluded.temperature_sum, temperature_min = MIN(temperature_min, excluded.temperature_min), temperature_max = MAX(temperature_max, excluded.temperature_max),
+        feels_like_sum = feels_like_sum + excluded.feels_like_sum, feels_like_min = MIN(feels_like_min, excluded.feels_like_min), feels_like_max = MAX(feels_like_max, excluded.feels_like_max),
+        humidity_sum = humidity_sum + excluded.humidity_sum, humidity_min = MIN(humidity_min, excluded.humidity_min), humidity_max = MAX(humidity_max, excluded.humidity_max),
+        pressure_sum = pressure_sum + excluded.pressure_sum, pressure_min = MIN(pressure_min, excluded.pressure_min), pressure_max = MAX(pressure_max, excluded.pressure_max),
+        wind_speed_sum = wind_speed_sum + excluded.wind_speed_sum, wind_speed_min = MIN(wind_speed_min, excluded.wind_speed_min), wind_speed_max = MAX(wind_speed_max, excluded.wind_speed_max);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_weather_history_rollup_delete
+AFTER DELETE ON weather_history
+BEGIN
+    UPDATE weather_rollups SET
+        samples = samples - 1,
+        temperature_sum = temperature_sum - OLD.temperature,
+        feels_like_sum = feels_like_sum - OLD.feels_like,
+        humidity_sum = humidity_sum - OLD.humidity,
+        pressure_sum = pressure_sum - OLD.pressure,
+        wind_speed_sum = wind_speed_sum - OLD.wind_speed
+    WHERE city = OLD.city AND hour = strftime('%Y-%m-%d %H:00:00', OLD.timestamp);
+    DELETE FROM weather_rollups
+    WHERE city = OLD.city AND hour = strftime('%Y-%m-%d %H:00:00', OLD.timestamp) AND samples <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_weather_history_rollup_update
+AFTER UPDATE OF city, timestamp, temperature, feels_like, humidity, pressure, wind_speed ON weather_history
+BEGIN
+    UPDATE weather_rollups SET
+        samples = samples - 1,
+        temperature_sum = temperature_sum - OLD.temperature,
+        feels_like_sum = feels_like_sum - OLD.feels_like,
+        humidity_sum = humidity_sum - OLD.humidity,
+        pressure_sum = pressure_sum - OLD.pressure,
+        wind_speed_sum = wind_speed_sum - OLD.wind_speed
+    WHERE city = OLD.city AND hour = strftime('%Y-%m-%d %H:00:00', OLD.timestamp);
+    DELETE FROM weather_rollups
+    WHERE city = OLD.city AND hour = strftime('%Y-%m-%d %H:00:00', OLD.timestamp) AND samples <= 0;
+    INSERT INTO weather_rollups
+    (city, hour, samples,
+     temperature_sum, temperature_min, temperature_max,
+     feels_like_sum, feels_like_min, feels_like_max,
+     humidity_sum, humidity_min, humidity_max,
+     pressure_sum, pressure_min, pressure_max,
+     wind_speed_sum, wind_speed_min, wind_speed_max)
+    VALUES
+    (NEW.city, strftime('%Y-%m-%d %H:00:00', NEW.timestamp), 1,
+     NEW.temperature, NEW.temperature, NEW.temperature,
+     NEW.feels_like, NEW.feels_like, NEW.feels_like,
+     NEW.humidity, NEW.humidity, NEW.humidity,
+     NEW.pressure, NEW.pressure, NEW.pressure,
+     NEW.wind_speed, NEW.wind_speed, NEW.wind_speed)
+    ON CONFLICT (city, hour) DO UPDATE SET
+        samples = samples + 1,
+        temperature_sum = temperature_sum + excluded.temperature_sum, temperature_min = MIN(temperature_min, excluded.temperature_min), temperature_max = MAX(temperature_max, excluded.temperature_max),
+        feels_like_sum = feels_like_sum + excluded.feels_like_sum, feels_like_min = MIN(feels_like_min, excluded.feels_like_min), feels_like_max = MAX(feels_like_max, excluded.feels_like_max),
+        humidity_sum = humidity_sum + excluded.humidity_sum, humidity_min = MIN(humidity_min, excluded.humidity_min), humidity_max = MAX(humidity_max, excluded.humidity_max),
+        pressure_sum = pressure_sum + excluded.pressure_sum, pressure_min = MIN(pressure_min, excluded.pressure_min), pressure_max = MAX(pressure_max, excluded.pressure_max),
+        wind_speed_sum = wind_speed_sum + excluded.wind_speed_sum, wind_speed_min = MIN(wind_speed_min, excluded.wind_speed_min), wind_speed_max = MAX(wind_speed_max, excluded.wind_speed_max);
+END;
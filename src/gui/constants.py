@@ -11,20 +11,26 @@ WINDOW_X = 100
 WINDOW_Y = 50
 
 # Тайминги
-TIMER_DELAY_MS = 100  # Задержка для неблокирующего запроса
+WORKER_SHUTDOWN_TIMEOUT_MS = 2000  # Сколько ждать фоновый запрос при закрытии окна
 
 # Кнопки
 BTN_GET_WEATHER = "🌍 Узнать погоду на сегодня"
 BTN_CLEAR_HISTORY = "🗑️ Очистить историю"
 BTN_EXPORT_HISTORY = "📈 Экспорт CSV"
+BTN_CANCEL = "✖ Отменить запрос"
 
 # Статусы
 STATUS_READY = "Готово к работе"
 STATUS_SERVICE_INIT = "✅ Сервис погоды инициализирован"
 STATUS_SERVICE_ERROR = "❌ Ошибка инициализации сервиса"
+STATUS_DAEMON = "⚡ Подключено к демону погоды"
 STATUS_LOADING = "🔄 Запрашиваю данные о погоде..."
 STATUS_SUCCESS = "✅ Данные получены успешно"
+STATUS_CACHED = "⚡ Погода получена недавно, запрос к API не понадобился"
+STATUS_STALE = "🕒 Наблюдение {age} назад, погода обновляется в фоне"
 STATUS_FETCH_ERROR = "❌ Ошибка при получении данных"
+STATUS_CANCELLING = "⏹ Отменяю запрос, жду ответа сервера..."
+STATUS_CANCELLED = "⏹ Запрос отменен"
 
 # Плейсхолдеры
 PLACEHOLDER_WEATHER = "Здесь появится информация о погоде..."
@@ -40,3 +46,25 @@ HISTORY_EMPTY = "История запросов пуста"
 # Колонки таблицы истории
 HISTORY_COLUMNS = ["Время", "Температура", "Погода"]
 HISTORY_COLUMN_WIDTHS = [120, 120, 200]  # Ширина колонок
+HISTORY_SORT_FIELDS = ["timestamp", "temperature", "description"]  # Колонки БД для серверной сортировки
+
+# Постраничная загрузка истории
+HISTORY_PAGE_SIZE = 100  # Строк в одной странице, подгружаемой из SQLite
+HISTORY_MAX_CACHED_PAGES = 20  # Сколько страниц держать в памяти, остальные перечитываются по ключу
+
+# График истории
+HISTORY_TAB_TABLE = "📋 Таблица"
+HISTORY_TAB_CHART = "📈 График"
+CHART_FIELDS = {"temperature": "Температура, °C", "pressure": "Давление, мм рт. ст.", "humidity": "Влажность, %"}
+CHART_EMPTY = "Нет записей для графика"
+CHART_HINT = "Колесо — масштаб, перетаскивание — сдвиг, двойной щелчок — весь период"
+CHART_SOURCES = {None: "записи истории", "hour": "часовые сводки", "day": "суточные сводки"}
+CHART_MIN_HEIGHT = 220
+CHART_MIN_SPAN_SECONDS = 600  # Самый крупный масштаб: 10 минут на всю ширину
+CHART_ZOOM_STEP = 1.25  # Во сколько раз меняется масштаб за один шаг колеса
+CHART_RELOAD_DELAY_MS = 150  # Пауза после масштабирования или сдвига перед чтением данных
+
+# Интервалы сводок от крупного к мелкому (секунды): сводки берутся, если интервалов за период
+# не меньше половины точек графика, иначе читаются сами записи истории
+CHART_ROLLUP_BUCKETS = (("day", 86400), ("hour", 3600))
+CHART_ROLLUP_MIN_RATIO = 0.5
@@ -0,0 +1,262 @@
+"""График истории: поле записей города за выбранный период."""
+
+from bisect import bisect_left, bisect_right
+
+from PyQt6.QtCore import QPointF, QRectF, Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QColor, QMouseEvent, QPainter, QPaintEvent, QPen, QPolygonF, QResizeEvent, QWheelEvent
+from PyQt6.QtWidgets import QWidget
+
+from src.database.models import WeatherRecord
+from src.gui.constants import (
+    CHART_EMPTY,
+    CHART_FIELDS,
+    CHART_MIN_HEIGHT,
+    CHART_MIN_SPAN_SECONDS,
+    CHART_RELOAD_DELAY_MS,
+    CHART_SOURCES,
+    CHART_ZOOM_STEP,
+)
+from src.gui.history_manager import HistoryManager, from_seconds, to_seconds
+
+# Отступы области построения: слева подписи значений, снизу подписи времени
+PLOT_MARGINS = (52, 10, 12, 24)  # слева, сверху, справа, снизу
+GRID_LINES = 5
+
+# Насколько вид может выходить за границы данных (доля ширины вида)
+VIEW_OVERSHOOT = 0.05
+
+COLOR_BACKGROUND = QColor("#2b2b2b")
+COLOR_GRID = QColor("#444444")
+COLOR_TEXT = QColor("#aaaaaa")
+COLOR_LINE = QColor("#4CAF50")
+
+
+def format_tick(seconds: float, span: float) -> str:
+    """Подпись времени на оси: чем шире период, тем крупнее единицы."""
+    timestamp = from_seconds(seconds)
+    if span <= 2 * 86400:
+        return timestamp.strftime("%H:%M")
+    if span <= 7 * 86400:
+        return timestamp.strftime("%d.%m %H:%M")
+    if span <= 366 * 86400:
+        return timestamp.strftime("%d.%m")
+    return timestamp.strftime("%m.%Y")
+
+
+class HistoryChart(QWidget):
+    """График поля истории города с масштабированием колесом мыши и сдвигом перетаскиванием.
+
+    Данные читаются с запасом в ширину вида по обе стороны и прорежены до точки на
+    пиксель, поэтому при сдвиге и масштабировании график сразу перерисовывается по
+    уже загруженным точкам, а новые данные читаются один раз после паузы
+    CHART_RELOAD_DELAY_MS.
+    """
+
+    status_changed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.city: str | None = None
+        self.field = next(iter(CHART_FIELDS))
+
+        self._bounds: tuple[float, float] | None = None  # Первая и последняя запись города
+        self._view: tuple[float, float] | None = None  # Видимый период (секунды от EPOCH)
+        self._xs: list[float] = []
+        self._ys: list[float] = []
+        self._source: str | None = None
+        self._drag: tuple[float, tuple[float, float]] | None = None  # (x мыши, вид) в начале перетаскивания
+
+        self._reload_timer = QTimer(self)
+        self._reload_timer.setSingleShot(True)
+        self._reload_timer.setInterval(CHART_RELOAD_DELAY_MS)
+        self._reload_timer.timeout.connect(self.reload)
+
+        self.setMinimumHeight(CHART_MIN_HEIGHT)
+        self.setCursor(Qt.CursorShape.OpenHandCursor)
+
+    # --- Данные ---
+
+    def set_series(self, city: str | None, field: str) -> None:
+        """Показывает поле города за весь период его истории."""
+        self.city, self.field = city, field
+        self._bounds = HistoryManager.get_chart_bounds(city) if city else None
+        self.show_all()
+
+    def show_all(self) -> None:
+        """Показывает весь период истории города."""
+        if self._bounds is None:
+            self._view = None
+            self.reload()
+            return
+        first, last = self._bounds
+        self._set_view(first, max(last, first + CHART_MIN_SPAN_SECONDS))
+        self.reload()
+
+    def on_record_saved(self, record: WeatherRecord) -> None:
+        """Добавляет сохраненную запись: если виден конец истории, вид сдвигается за ней."""
+        if record.city != self.city or record.timestamp is None:
+            return
+
+        seconds = to_seconds(record.timestamp)
+        if self._bounds is None or self._view is None:
+            self._bounds = (seconds, seconds)
+            self.show_all()
+            return
+
+        first, last = self._bounds
+        self._bounds = (first, max(last, seconds))
+        start, end = self._view
+        if end >= last:
+            self._set_view(start + seconds - last, end + seconds - last)
+        self._reload_timer.start()
+
+    def reload(self) -> None:
+        """Читает ряд для видимого периода с запасом по сторонам."""
+        self._reload_timer.stop()
+        if self.city is None or self._view is None:
+            self._xs, self._ys, self._source = [], [], None
+            self.status_changed.emit(CHART_EMPTY)
+            self.update()
+            return
+
+        # Запас в ширину вида по сторонам (в пределах истории) — точка на пиксель и по нему
+        start, end = self._view
+        span = end - start
+        first, last = self._bounds
+        since, until = max(start - span, first), min(end + span, last)
+        points = int(max(self._plot_rect().width(), 100) * (until - since) / span) + 2
+        self._xs, self._ys, self._source = HistoryManager.get_chart_series(self.city, self.field, since, until, points)
+        self.status_changed.emit(
+            f"{from_seconds(start):%d.%m.%Y %H:%M} — {from_seconds(end):%d.%m.%Y %H:%M} · "
+            f"точек: {len(self._xs)} ({CHART_SOURCES[self._source]})"
+        )
+        self.update()
+
+    def _set_view(self, start: float, end: float) -> None:
+        """Устанавливает видимый период, не давая уйти далеко за границы данных."""
+        first, last = self._bounds
+        span = max(min(end - start, (last - first) * (1 + 2 * VIEW_OVERSHOOT)), CHART_MIN_SPAN_SECONDS)
+        low, high = first - span * VIEW_OVERSHOOT, last + span * VIEW_OVERSHOOT
+        # Вид шире данных выравнивается по центру, иначе сдвигается внутрь границ
+        start = (low + high - span) / 2 if span >= high - low else min(max(start, low), high - span)
+        self._view = (start, start + span)
+
+    def _change_view(self, start: float, end: float) -> None:
+        """Меняет вид: перерисовка сразу по загруженным точкам, чтение данных — после паузы."""
+        if self._view is None:
+            return
+        self._set_view(start, end)
+        self.update()
+        self._reload_timer.start()
+
+    # --- Мышь ---
+
+    def wheelEvent(self, event: QWheelEvent) -> None:
+        if self._view is None:
+            return
+        start, end = self._view
+        rect = self._plot_rect()
+        # Точка под курсором остается на месте
+        anchor = start + (event.position().x() - rect.left()) / rect.width() * (end - start)
+        ratio = CHART_ZOOM_STEP ** (-event.angleDelta().y() / 120)
+        self._change_view(anchor - (anchor - start) * ratio, anchor + (end - anchor) * ratio)
+        event.accept()
+
+    def mousePressEvent(self, event: QMouseEvent) -> None:
+        if event.button() == Qt.MouseButton.LeftButton and self._view is not None:
+            self._drag = (event.position().x(), self._view)
+            self.setCursor(Qt.CursorShape.ClosedHandCursor)
+
+    def mouseMoveEvent(self, event: QMouseEvent) -> None:
+        if self._drag is None:
+            return
+        x, (start, end) = self._drag
+        shift = (event.position().x() - x) / self._plot_rect().width() * (end - start)
+        self._change_view(start - shift, end - shift)
+
+    def mouseReleaseEvent(self, event: QMouseEvent) -> None:
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._drag = None
+            self.setCursor(Qt.CursorShape.OpenHandCursor)
+
+    def mouseDoubleClickEvent(self, event: QMouseEvent) -> None:
+        self.show_all()
+
+    def resizeEvent(self, event: QResizeEvent) -> None:
+        # Точек нужно столько, сколько пикселей по ширине
+        super().resizeEvent(event)
+        if self._view is not None:
+            self._reload_timer.start()
+
+    # --- Отрисовка ---
+
+    def _plot_rect(self) -> QRectF:
+        left, top, right, bottom = PLOT_MARGINS
+        return QRectF(self.rect()).adjusted(left, top, -right, -bottom)
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.fillRect(self.rect(), COLOR_BACKGROUND)
+        rect = self._plot_rect()
+        painter.setPen(COLOR_TEXT)
+
+        if self._view is None or not self._xs:
+            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, CHART_EMPTY)
+            return
+
+        # Масштаб по вертикали — по точкам в видимом периоде (и соседним, чтобы линия не обрывалась)
+        start, end = self._view
+        span = end - start
+        first = max(bisect_left(self._xs, start) - 1, 0)
+        last = min(bisect_right(self._xs, end) + 1, len(self._xs))
+        visible = self._ys[first:last]
+        if not visible:
+            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, CHART_EMPTY)
+            return
+        low, high = min(visible), max(visible)
+        padding = (high - low) * 0.05 or 1.0
+        low, high = low - padding, high + padding
+
+        def to_point(x: float, y: float) -> QPointF:
+            return QPointF(
+                rect.left() + (x - start) / span * rect.width(),
+                rect.bottom() - (y - low) / (high - low) * rect.height(),
+            )
+
+        # Сетка и подписи
+        for i in range(GRID_LINES + 1):
+            value = low + (high - low) * i / GRID_LINES
+            y = rect.bottom() - rect.height() * i / GRID_LINES
+            painter.setPen(COLOR_GRID)
+            painter.drawLine(QPointF(rect.left(), y), QPointF(rect.right(), y))
+            painter.setPen(COLOR_TEXT)
+            painter.drawText(
+                QRectF(0, y - 8, rect.left() - 4, 16),
+                Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter,
+                f"{value:.1f}",
+            )
+        for i in range(GRID_LINES + 1):
+            x = rect.left() + rect.width() * i / GRID_LINES
+            painter.setPen(COLOR_GRID)
+            painter.drawLine(QPointF(x, rect.top()), QPointF(x, rect.bottom()))
+            painter.setPen(COLOR_TEXT)
+            # Крайние подписи прижимаются внутрь, чтобы не обрезаться краем виджета
+            if i == 0:
+                label_rect, alignment = QRectF(x, rect.bottom() + 4, 100, 16), Qt.AlignmentFlag.AlignLeft
+            elif i == GRID_LINES:
+                label_rect, alignment = QRectF(x - 100, rect.bottom() + 4, 100, 16), Qt.AlignmentFlag.AlignRight
+            else:
+                label_rect, alignment = QRectF(x - 50, rect.bottom() + 4, 100, 16), Qt.AlignmentFlag.AlignHCenter
+            painter.drawText(
+                label_rect, alignment | Qt.AlignmentFlag.AlignTop, format_tick(start + span * i / GRID_LINES, span)
+            )
+
+        # Линия ряда
+        painter.setClipRect(rect)
+        painter.setPen(QPen(COLOR_LINE, 1.5))
+        points = [to_point(x, y) for x, y in zip(self._xs[first:last], visible, strict=True)]
+        if len(points) == 1:
+            painter.drawEllipse(points[0], 2.5, 2.5)
+        else:
+            painter.drawPolyline(QPolygonF(points))
@@ -6,8 +6,25 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any
 
-from src.database.db_manager import db_manager
-from src.utils.pressure_converter import convert_pressure_to_mmhg
+from src.database.db_manager import get_db_manager
+from src.database.models import WeatherRecord
+from src.database.recent import from_micros, to_micros
+from src.gui.constants import CHART_ROLLUP_BUCKETS, CHART_ROLLUP_MIN_RATIO
+from src.utils.downsample import lttb
+from src.utils.pressure_converter import HPA_TO_MMHG_RATIO, convert_pressure_to_mmhg
+from src.utils.weather_icons import get_weather_icon
+
+MICROS_PER_SECOND = 1_000_000
+
+
+def to_seconds(timestamp: datetime) -> float:
+    """Время в секунды от EPOCH — координата оси X графика."""
+    return to_micros(timestamp) / MICROS_PER_SECOND
+
+
+def from_seconds(seconds: float) -> datetime:
+    """Координата оси X графика во время."""
+    return from_micros(round(seconds * MICROS_PER_SECOND))
 
 
 class HistoryManager:
@@ -25,40 +42,78 @@ class HistoryManager:
             Список словарей с данными для отображения
         """
         if limit == 0:
-            records = db_manager.get_recent_records(limit=1000)
+            records = get_db_manager().get_recent_records(limit=1000)
         else:
-            records = db_manager.get_recent_records(limit=limit)
+            records = get_db_manager().get_recent_records(limit=limit)
 
         formatted_records = []
         for record in records:
-            # Форматируем время
-            time_str = record.timestamp.strftime("%d.%m %H:%M") if record.timestamp else "Н/Д"
-
-            # Форматируем температуру с иконкой
-            temp_str = f"{record.temperature:+.1f}°C"
-            temp_icon = ""
-            if record.temperature < 0:
-                temp_icon = "🔵 "  # Синий кружок для мороза
-            elif record.temperature > 25:
-                temp_icon = "🔴 "  # Красный кружок для жары
-
-            # Форматируем описание погоды с иконкой
-            weather_icon = HistoryManager._get_weather_icon(record.description)
-            weather_text = f"{weather_icon} {record.description}"
-
             formatted_records.append(
                 {
                     "id": record.id,
-                    "time": time_str,
-                    "temperature": f"{temp_icon}{temp_str}",
+                    "time": HistoryManager.format_time(record),
+                    "temperature": HistoryManager.format_temperature(record),
                     "temperature_raw": record.temperature,  # Для сортировки и обработки
-                    "description": weather_text,
+                    "description": HistoryManager.format_description(record),
                     "full_record": record,
                 }
             )
 
         return formatted_records
 
+    @staticmethod
+    def get_history_page(
+        limit: int,
+        after: tuple | None = None,
+        order_by: str = "timestamp",
+        descending: bool = True,
+        max_id: int | None = None,
+    ) -> list[WeatherRecord]:
+        """
+        Получает страницу истории без форматирования (для ленивой модели таблицы).
+
+        Args:
+            limit: Размер страницы
+            after: Ключ последней записи предыдущей страницы (None для первой)
+            order_by: Колонка сортировки
+            descending: True для сортировки по убыванию
+            max_id: Граница снимка истории из get_snapshot_id (None — все записи)
+
+        Returns:
+            Список записей страницы
+        """
+        return get_db_manager().get_records_page(limit, after, order_by, descending, max_id)
+
+    @staticmethod
+    def get_snapshot_id() -> int:
+        """Наибольший id истории: страницы с этой границей не сдвигаются от новых записей."""
+        return get_db_manager().get_max_history_id()
+
+    @staticmethod
+    def format_time(record: WeatherRecord) -> str:
+        """Форматирует время записи для таблицы истории."""
+        return record.timestamp.strftime("%d.%m %H:%M") if record.timestamp else "Н/Д"
+
+    @staticmethod
+    def format_temperature(record: WeatherRecord) -> str:
+        """Форматирует температуру с иконкой для таблицы истории."""
+        temp_icon = ""
+        if record.temperature < 0:
+            temp_icon = "🔵 "  # Синий кружок для мороза
+        elif record.temperature > 25:
+            temp_icon = "🔴 "  # Красный кружок для жары
+        return f"{temp_icon}{record.temperature:+.1f}°C"
+
+    @staticmethod
+    def format_description(record: WeatherRecord) -> str:
+        """Форматирует описание погоды с иконкой для таблицы истории."""
+        if record.description_id is not None:
+            # Иконка заранее вычислена в словаре описаний
+            icon = get_db_manager().get_description(record.description_id).icon
+        else:
+            icon = HistoryManager._get_weather_icon(record.description)
+        return f"{icon} {record.description}"
+
     @staticmethod
     def _get_weather_icon(description: str) -> str:
         """
@@ -70,38 +125,76 @@ class HistoryManager:
         Returns:
             Строка с иконкой
         """
-        desc_lower = description.lower()
-
-        if "ясно" in desc_lower or "солнечно" in desc_lower:
-            return "☀️"
-        elif "облачно" in desc_lower:
-            return "☁️"
-        elif "дождь" in desc_lower:
-            if "ливень" in desc_lower or "сильный" in desc_lower:
-                return "🌧️"
-            return "🌦️"
-        elif "снег" in desc_lower:
-            return "❄️"
-        elif "туман" in desc_lower:
-            return "🌫️"
-        elif "гроза" in desc_lower or "гроз" in desc_lower:
-            return "⛈️"
-        elif "ветер" in desc_lower:
-            return "💨"
-        elif "пасмурно" in desc_lower:
-            return "☁️"
-        else:
-            return "🌤️"
+        return get_weather_icon(description)
 
     @staticmethod
-    def get_total_count() -> int:
+    def get_total_count(city: str | None = None) -> int:
         """
-        Получает общее количество записей в истории.
+        Получает количество записей в истории (из счетчиков, без сканирования таблицы).
+
+        Args:
+            city: Город. Если None, возвращается общее количество записей
 
         Returns:
             Количество записей
         """
-        return db_manager.get_record_count()
+        return get_db_manager().get_record_count(city)
+
+    @staticmethod
+    def get_chart_cities() -> list[str]:
+        """Города, по которым есть записи истории."""
+        return get_db_manager().get_history_cities()
+
+    @staticmethod
+    def get_chart_bounds(city: str) -> tuple[float, float] | None:
+        """Время первой и последней записи города в секундах от EPOCH или None."""
+        bounds = get_db_manager().get_history_bounds(city)
+        return (to_seconds(bounds[0]), to_seconds(bounds[1])) if bounds else None
+
+    @staticmethod
+    def get_chart_series(
+        city: str, field: str, since: float, until: float, points: int
+    ) -> tuple[list[float], list[float], str | None]:
+        """
+        Ряд для графика: не больше points точек поля города за период.
+
+        Короткий период читается из истории запросом по диапазону, длинный — из часовых
+        или суточных сводок (годы поминутных записей — тысячи строк сводок). Ряд
+        прореживается до points точек алгоритмом LTTB, сохраняющим пики и перепады.
+
+        Args:
+            city: Город
+            field: Поле записи (давление переводится в мм рт. ст.)
+            since: Начало периода в секундах от EPOCH
+            until: Конец периода в секундах от EPOCH
+            points: Сколько точек нужно графику (обычно по точке на пиксель)
+
+        Returns:
+            Кортеж (секунды от EPOCH, значения, интервал сводок или None для записей истории)
+        """
+        db = get_db_manager()
+        span = until - since
+        bucket = next(
+            (
+                (name, seconds)
+                for name, seconds in CHART_ROLLUP_BUCKETS
+                if span / seconds >= points * CHART_ROLLUP_MIN_RATIO
+            ),
+            None,
+        )
+
+        if bucket is None:
+            timestamps, values = db.get_history_series(city, field, from_seconds(since), from_seconds(until))
+            xs = [to_seconds(timestamp) for timestamp in timestamps]
+        else:
+            name, seconds = bucket
+            starts, values, _, _ = db.get_history_rollup(city, field, from_seconds(since), from_seconds(until), name)
+            xs = [to_seconds(start) + seconds / 2 for start in starts]  # Точка — середина интервала
+
+        if field == "pressure":
+            values = [value * HPA_TO_MMHG_RATIO for value in values]
+        xs, ys = lttb(xs, values, points)
+        return xs, ys, bucket[0] if bucket else None
 
     @staticmethod
     def clear_history() -> bool:
@@ -112,7 +205,7 @@ class HistoryManager:
             True если успешно, False если ошибка
         """
         try:
-            db_manager.clear_history()
+            get_db_manager().clear_history()
             return True
         except Exception as e:
             print(f"Ошибка очистки истории: {e}")
@@ -160,7 +253,7 @@ class HistoryManager:
             filepath = export_dir / filename
 
             # Получаем все записи из БД напрямую
-            records = db_manager.get_recent_records(limit=0)
+            records = get_db_manager().get_recent_records(limit=0)
 
             if not records:
                 return False, "Нет данных для экспорта"
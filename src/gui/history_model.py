@@ -0,0 +1,169 @@
+"""Ленивая модель таблицы истории для QTableView."""
+
+from collections import OrderedDict
+from typing import Any
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from src.database.db_manager import history_sort_key
+from src.database.models import WeatherRecord
+from src.gui.constants import HISTORY_COLUMNS, HISTORY_MAX_CACHED_PAGES, HISTORY_PAGE_SIZE, HISTORY_SORT_FIELDS
+from src.gui.history_manager import HistoryManager
+
+# Функции форматирования ячеек по номеру колонки
+CELL_FORMATTERS = (HistoryManager.format_time, HistoryManager.format_temperature, HistoryManager.format_description)
+
+
+class HistoryTableModel(QAbstractTableModel):
+    """Модель истории, подгружающая строки из SQLite страницами по мере прокрутки.
+
+    Строки добавляются через canFetchMore/fetchMore, ячейки форматируются только
+    при отрисовке (data). В памяти хранится не более HISTORY_MAX_CACHED_PAGES страниц:
+    для каждой загруженной страницы запоминается ключ ее начала, и вытесненная
+    страница перечитывается одним индексным запросом, когда снова становится видимой.
+    Страницы читаются из снимка истории (записи с id не больше _max_id на момент refresh),
+    поэтому записи других процессов не сдвигают перечитанные страницы, включая первую.
+
+    Новые записи, сохраненные после загрузки, добавляются в начало через prepend_record
+    и хранятся отдельно от страниц, поэтому номера строк внутри страниц не сдвигаются.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.order_by = "timestamp"
+        self.descending = True
+
+        self._row_count = 0
+        self._head: list[WeatherRecord] = []  # Записи, добавленные через prepend_record (новые первыми)
+        self._page_starts: list[tuple | None] = []  # Ключ, после которого начинается каждая страница
+        self._pages: OrderedDict[int, list[WeatherRecord]] = OrderedDict()  # LRU-кэш страниц
+        self._next_after: tuple | None = None  # Ключ последней загруженной записи
+        self._max_id = 0  # Граница снимка истории, из которого читаются страницы
+        self._exhausted = False
+
+    # --- Стандартный интерфейс модели ---
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:  # noqa: B008
+        return 0 if parent.isValid() else self._row_count
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:  # noqa: B008
+        return 0 if parent.isValid() else len(HISTORY_COLUMNS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return HISTORY_COLUMNS[section]
+        return None
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            record = self.record_at(index.row())
+            return CELL_FORMATTERS[index.column()](record) if record else None
+
+        # Время и температура выравниваются по центру, как в прежней таблице
+        if role == Qt.ItemDataRole.TextAlignmentRole and index.column() < 2:
+            return Qt.AlignmentFlag.AlignCenter
+
+        return None
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent: QModelIndex) -> None:
+        if parent.isValid() or self._exhausted:
+            return
+
+        records = self._load_page(self._next_after)
+        if len(records) < HISTORY_PAGE_SIZE:
+            self._exhausted = True
+        if not records:
+            return
+
+        page = len(self._page_starts)
+        self._page_starts.append(self._next_after)
+        self._cache_page(page, records)
+        self._next_after = history_sort_key(records[-1], self.order_by)
+
+        self.beginInsertRows(QModelIndex(), self._row_count, self._row_count + len(records) - 1)
+        self._row_count += len(records)
+        self.endInsertRows()
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder) -> None:
+        """Сортирует историю на стороне SQLite и начинает загрузку заново."""
+        self.order_by = HISTORY_SORT_FIELDS[column]
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        self.refresh()
+
+    # --- Работа со страницами ---
+
+    def refresh(self) -> None:
+        """Сбрасывает загруженные страницы и загружает первую страницу заново."""
+        self.beginResetModel()
+        self._row_count = 0
+        self._head.clear()
+        self._page_starts.clear()
+        self._pages.clear()
+        self._next_after = None
+        self._max_id = HistoryManager.get_snapshot_id()
+        self._exhausted = False
+        self.endResetModel()
+
+        self.fetchMore(QModelIndex())
+
+    def prepend_record(self, record: WeatherRecord) -> None:
+        """Показывает только что сохраненную запись первой строкой без обращения к БД.
+
+        Работает для сортировки по времени по убыванию (вид по умолчанию). При другой
+        сортировке место новой записи заранее неизвестно, поэтому загружается первая страница.
+
+        Args:
+            record: Сохраненная запись с заполненным id
+        """
+        if self.order_by != "timestamp" or not self.descending:
+            self.refresh()
+            return
+
+        # Запись уже в таблице, если попала в снимок при перезагрузке модели после сохранения.
+        # Проверка не читает первую страницу: она могла быть вытеснена из кэша
+        if record.id <= self._max_id or (self._head and self._head[0].id >= record.id):
+            return
+
+        # Накопленные записи переносятся в обычные страницы одним чтением первой страницы
+        if len(self._head) >= HISTORY_PAGE_SIZE:
+            self.refresh()
+            return
+
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self._head.insert(0, record)
+        self._row_count += 1
+        self.endInsertRows()
+
+    def record_at(self, row: int) -> WeatherRecord | None:
+        """Возвращает запись по номеру строки, при необходимости перечитывая страницу."""
+        if row < len(self._head):
+            return self._head[row]
+
+        page, offset = divmod(row - len(self._head), HISTORY_PAGE_SIZE)
+        records = self._pages.get(page)
+        if records is None:
+            if page >= len(self._page_starts):
+                return None
+            records = self._load_page(self._page_starts[page])
+            self._cache_page(page, records)
+        else:
+            self._pages.move_to_end(page)
+
+        return records[offset] if offset < len(records) else None
+
+    def _load_page(self, after: tuple | None) -> list[WeatherRecord]:
+        """Загружает одну страницу после указанного ключа."""
+        return HistoryManager.get_history_page(HISTORY_PAGE_SIZE, after, self.order_by, self.descending, self._max_id)
+
+    def _cache_page(self, page: int, records: list[WeatherRecord]) -> None:
+        """Кладет страницу в LRU-кэш, вытесняя самые давно использованные."""
+        self._pages[page] = records
+        self._pages.move_to_end(page)
+        while len(self._pages) > HISTORY_MAX_CACHED_PAGES:
+            self._pages.popitem(last=False)
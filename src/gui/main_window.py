@@ -2,53 +2,70 @@
 
 import sys
 
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtGui import QCursor
+from PyQt6.QtCore import Qt, QThreadPool
+from PyQt6.QtGui import QCloseEvent, QCursor
 from PyQt6.QtWidgets import (
     QApplication,
+    QComboBox,
     QGroupBox,
     QHBoxLayout,
+    QHeaderView,
     QLabel,
     QMainWindow,
     QMessageBox,
     QProgressBar,
     QPushButton,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
+    QTabWidget,
     QTextEdit,
     QVBoxLayout,
     QWidget,
 )
 
+from src.core.daemon_client import DaemonClient, get_daemon_client
 from src.core.data_parser import WeatherData
 from src.core.weather_service import WeatherService
+from src.database.models import WeatherRecord
 from src.gui.constants import (
+    BTN_CANCEL,
     BTN_CLEAR_HISTORY,
     BTN_EXPORT_HISTORY,
     BTN_GET_WEATHER,
+    CHART_FIELDS,
+    CHART_HINT,
     ERROR_SERVICE_NOT_INIT,
     ERROR_TITLE,
     HISTORY_COLUMN_WIDTHS,
-    HISTORY_COLUMNS,
     HISTORY_EMPTY,
+    HISTORY_TAB_CHART,
+    HISTORY_TAB_TABLE,
     HISTORY_TITLE,
     MAIN_TITLE,
     PLACEHOLDER_WEATHER,
+    STATUS_CACHED,
+    STATUS_CANCELLED,
+    STATUS_CANCELLING,
+    STATUS_DAEMON,
     STATUS_FETCH_ERROR,
     STATUS_LOADING,
     STATUS_READY,
     STATUS_SERVICE_ERROR,
     STATUS_SERVICE_INIT,
+    STATUS_STALE,
     STATUS_SUCCESS,
-    TIMER_DELAY_MS,
     WINDOW_HEIGHT,
     WINDOW_TITLE,
     WINDOW_WIDTH,
     WINDOW_X,
     WINDOW_Y,
+    WORKER_SHUTDOWN_TIMEOUT_MS,
 )
+from src.gui.history_chart import HistoryChart
 from src.gui.history_manager import HistoryManager
+from src.gui.history_model import HistoryTableModel
 from src.gui.resource_manager import get_background_url, load_stylesheet
+from src.gui.weather_worker import WeatherFetchResult, WeatherFetchWorker
+from src.utils.time_format import format_age
 
 
 class WeatherWindow(QMainWindow):
@@ -57,23 +74,39 @@ class WeatherWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.weather_service: WeatherService | None = None
+        self.daemon_client: DaemonClient | None = None  # Тонкий клиент, если запущен демон погоды
         self.history_manager = HistoryManager()
 
+        # Фоновые запросы: не более одного активного, результаты старых запросов игнорируются
+        self.thread_pool = QThreadPool(self)
+        self.active_worker: WeatherFetchWorker | None = None
+        self.request_counter = 0
+
         # Виджеты
         self.central_widget: QWidget | None = None
         self.title_label: QLabel | None = None
         self.get_weather_btn: QPushButton | None = None
+        self.cancel_btn: QPushButton | None = None
         self.progress_bar: QProgressBar | None = None
         self.weather_output: QTextEdit | None = None
         self.status_label: QLabel | None = None
 
         # Новые виджеты для истории
         self.history_group: QGroupBox | None = None
-        self.history_table: QTableWidget | None = None
+        self.history_table: QTableView | None = None
+        self.history_model: HistoryTableModel | None = None
+        self.history_total = 0  # Счетчик записей: обновляется без повторного COUNT(*)
         self.history_status: QLabel | None = None
         self.btn_clear_history: QPushButton | None = None
         self.btn_export_history: QPushButton | None = None
 
+        # График истории
+        self.history_tabs: QTabWidget | None = None
+        self.chart_city_box: QComboBox | None = None
+        self.chart_field_box: QComboBox | None = None
+        self.history_chart: HistoryChart | None = None
+        self.chart_status: QLabel | None = None
+
         self.init_ui()
         self.init_weather_service()
         self.load_history()  # Загружаем историю при старте
@@ -97,17 +130,28 @@ class WeatherWindow(QMainWindow):
         self.central_widget = QWidget()
         self.title_label = QLabel(MAIN_TITLE)
         self.get_weather_btn = QPushButton(BTN_GET_WEATHER)
+        self.cancel_btn = QPushButton(BTN_CANCEL)
         self.progress_bar = QProgressBar()
         self.weather_output = QTextEdit()
         self.status_label = QLabel(STATUS_READY)
 
         # Виджеты истории
         self.history_group = QGroupBox(HISTORY_TITLE)
-        self.history_table = QTableWidget()
+        self.history_table = QTableView()
+        self.history_model = HistoryTableModel(self)
         self.history_status = QLabel(HISTORY_EMPTY)
         self.btn_clear_history = QPushButton(BTN_CLEAR_HISTORY)
         self.btn_export_history = QPushButton(BTN_EXPORT_HISTORY)
 
+        # Виджеты графика истории
+        self.history_tabs = QTabWidget()
+        self.chart_city_box = QComboBox()
+        self.chart_field_box = QComboBox()
+        for field, title in CHART_FIELDS.items():
+            self.chart_field_box.addItem(title, field)
+        self.history_chart = HistoryChart(self)
+        self.chart_status = QLabel(CHART_HINT)
+
     def setup_layout(self) -> None:
         """Настраивает компоновку виджетов."""
         main_layout = QVBoxLayout(self.central_widget)
@@ -117,6 +161,7 @@ class WeatherWindow(QMainWindow):
         # Основная секция
         main_layout.addWidget(self.title_label)
         main_layout.addWidget(self.get_weather_btn)
+        main_layout.addWidget(self.cancel_btn)
         main_layout.addWidget(self.progress_bar)
         main_layout.addWidget(self.weather_output)
         main_layout.addWidget(self.status_label)
@@ -131,13 +176,18 @@ class WeatherWindow(QMainWindow):
         """Настраивает компоновку секции истории."""
         history_layout = QVBoxLayout(self.history_group)
 
-        # Настраиваем таблицу
-        self.history_table.setColumnCount(len(HISTORY_COLUMNS))
-        self.history_table.setHorizontalHeaderLabels(HISTORY_COLUMNS)
-        self.history_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-        self.history_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        # Настраиваем таблицу: данные подгружаются моделью постранично при прокрутке
+        self.history_table.setModel(self.history_model)
+        self.history_table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        self.history_table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
         self.history_table.setAlternatingRowColors(True)
         self.history_table.verticalHeader().setVisible(False)
+        # Фиксированная высота строк: представлению не нужно измерять каждую строку
+        self.history_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+
+        # Сортировка по клику на заголовок выполняется в SQLite (HistoryTableModel.sort)
+        self.history_table.horizontalHeader().setSortIndicator(0, Qt.SortOrder.DescendingOrder)
+        self.history_table.setSortingEnabled(True)
 
         # Устанавливаем ширину колонок
         for i, width in enumerate(HISTORY_COLUMN_WIDTHS):
@@ -146,7 +196,15 @@ class WeatherWindow(QMainWindow):
         # Автоматическое растягивание последней колонки
         self.history_table.horizontalHeader().setStretchLastSection(True)
 
-        history_layout.addWidget(self.history_table)
+        # Вкладки: таблица записей и график
+        table_page = QWidget()
+        table_layout = QVBoxLayout(table_page)
+        table_layout.setContentsMargins(0, 0, 0, 0)
+        table_layout.addWidget(self.history_table)
+        self.history_tabs.addTab(table_page, HISTORY_TAB_TABLE)
+        self.history_tabs.addTab(self.create_chart_page(), HISTORY_TAB_CHART)
+
+        history_layout.addWidget(self.history_tabs)
         history_layout.addWidget(self.history_status)
 
         # Кнопки управления историей
@@ -157,6 +215,22 @@ class WeatherWindow(QMainWindow):
 
         history_layout.addLayout(button_layout)
 
+    def create_chart_page(self) -> QWidget:
+        """Создает вкладку графика: выбор города и поля, график и строку состояния."""
+        chart_page = QWidget()
+        chart_layout = QVBoxLayout(chart_page)
+        chart_layout.setContentsMargins(0, 0, 0, 0)
+
+        controls_layout = QHBoxLayout()
+        controls_layout.addWidget(self.chart_city_box)
+        controls_layout.addWidget(self.chart_field_box)
+        controls_layout.addStretch()
+
+        chart_layout.addLayout(controls_layout)
+        chart_layout.addWidget(self.history_chart)
+        chart_layout.addWidget(self.chart_status)
+        return chart_page
+
     def setup_styles_and_background(self) -> None:
         """Настраивает стили и фон виджетов."""
         # Загружаем стиль из QSS файла
@@ -176,6 +250,8 @@ class WeatherWindow(QMainWindow):
         self.title_label.setObjectName("title_label")
         self.title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.get_weather_btn.setObjectName("get_weather_btn")
+        self.cancel_btn.setObjectName("cancel_btn")
+        self.cancel_btn.setVisible(False)
         self.weather_output.setObjectName("weather_output")
         self.weather_output.setReadOnly(True)
         self.weather_output.setPlaceholderText(PLACEHOLDER_WEATHER)
@@ -191,9 +267,17 @@ class WeatherWindow(QMainWindow):
         self.btn_clear_history.setObjectName("btn_clear_history")
         self.btn_export_history.setObjectName("btn_export_history")
 
+        # Настройки для графика
+        self.history_tabs.setObjectName("history_tabs")
+        self.chart_city_box.setObjectName("chart_city_box")
+        self.chart_field_box.setObjectName("chart_field_box")
+        self.chart_status.setObjectName("chart_status")
+        self.chart_status.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
     def setup_cursors(self) -> None:
         """Настраивает курсоры для виджетов."""
         self.get_weather_btn.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
+        self.cancel_btn.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
         self.weather_output.setCursor(QCursor(Qt.CursorShape.IBeamCursor))
         self.btn_clear_history.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
         self.btn_export_history.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
@@ -201,11 +285,21 @@ class WeatherWindow(QMainWindow):
     def setup_connections(self) -> None:
         """Настраивает соединения сигналов и слотов."""
         self.get_weather_btn.clicked.connect(self.on_get_weather_clicked)
+        self.cancel_btn.clicked.connect(self.on_cancel_clicked)
         self.btn_clear_history.clicked.connect(self.on_clear_history_clicked)
         self.btn_export_history.clicked.connect(self.on_export_history_clicked)
+        self.chart_city_box.currentIndexChanged.connect(self.on_chart_series_changed)
+        self.chart_field_box.currentIndexChanged.connect(self.on_chart_series_changed)
+        self.history_chart.status_changed.connect(self.chart_status.setText)
 
     def init_weather_service(self) -> None:
-        """Инициализирует сервис погоды."""
+        """Инициализирует сервис погоды или подключается к демону погоды."""
+        client = get_daemon_client()
+        if client is not None and client.is_available():
+            self.daemon_client = client
+            self.status_label.setText(STATUS_DAEMON)
+            return
+
         try:
             self.weather_service = WeatherService()
             self.status_label.setText(STATUS_SERVICE_INIT)
@@ -215,48 +309,40 @@ class WeatherWindow(QMainWindow):
             self.get_weather_btn.setEnabled(False)
 
     def load_history(self) -> None:
-        """Загружает историю запросов в таблицу."""
+        """Перезагружает историю запросов в таблице."""
         try:
-            records = self.history_manager.get_recent_history(limit=5)
-            total_count = self.history_manager.get_total_count()
-
-            if not records:
-                self.history_status.setText(HISTORY_EMPTY)
-                self.history_table.setRowCount(0)
-                return
-
-            self.history_table.setRowCount(len(records))
-
-            for row, record in enumerate(records):
-                # Время
-                time_item = QTableWidgetItem(record["time"])
-                time_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                self.history_table.setItem(row, 0, time_item)
-
-                # Температура (используем temperature_raw для получения числового значения)
-                temp_item = QTableWidgetItem(record["temperature"])
-                temp_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-
-                # Используем raw значение температуры для цветовой подсветки
-                temp_value = record["temperature_raw"]
-                if temp_value < 0:
-                    # Можно добавить цвет, но просили без него
-                    pass
-                elif temp_value > 25:
-                    pass
-
-                self.history_table.setItem(row, 1, temp_item)
-
-                # Описание погоды
-                desc_item = QTableWidgetItem(record["description"])
-                self.history_table.setItem(row, 2, desc_item)
-
-            self.history_status.setText(f"📊 Показано: {len(records)} из {total_count} записей")
+            self.history_model.refresh()
+            self.history_total = self.history_manager.get_total_count()
+            self.update_history_status()
+            self.load_chart_cities()
 
         except Exception as e:
             self.history_status.setText(f"❌ Ошибка загрузки истории: {str(e)}")
             print(f"Ошибка загрузки истории: {e}")
 
+    def load_chart_cities(self) -> None:
+        """Заполняет список городов графика, сохраняя выбранный город."""
+        selected = self.chart_city_box.currentText()
+        self.chart_city_box.blockSignals(True)
+        self.chart_city_box.clear()
+        self.chart_city_box.addItems(self.history_manager.get_chart_cities())
+        index = self.chart_city_box.findText(selected)
+        self.chart_city_box.setCurrentIndex(max(index, 0))
+        self.chart_city_box.blockSignals(False)
+        self.on_chart_series_changed()
+
+    def on_chart_series_changed(self) -> None:
+        """Показывает на графике выбранные город и поле за весь период."""
+        city = self.chart_city_box.currentText() or None
+        self.history_chart.set_series(city, self.chart_field_box.currentData())
+
+    def update_history_status(self) -> None:
+        """Обновляет строку состояния под таблицей истории."""
+        if self.history_total == 0:
+            self.history_status.setText(HISTORY_EMPTY)
+        else:
+            self.history_status.setText(f"📊 Всего записей: {self.history_total}")
+
     def on_clear_history_clicked(self) -> None:
         """Обработчик нажатия кнопки очистки истории."""
         reply = QMessageBox.question(
@@ -302,42 +388,110 @@ class WeatherWindow(QMainWindow):
 
     def on_get_weather_clicked(self) -> None:
         """Обработчик нажатия кнопки получения погоды."""
-        if not self.weather_service:
+        if not self.weather_service and not self.daemon_client:
             self.show_error(ERROR_SERVICE_NOT_INIT)
             return
 
+        # Защита от наложения запросов
+        if self.active_worker is not None:
+            return
+
         # Блокируем кнопку и показываем прогресс
         self.get_weather_btn.setEnabled(False)
+        self.cancel_btn.setVisible(True)
         self.progress_bar.setVisible(True)
         self.progress_bar.setRange(0, 0)
         self.status_label.setText(STATUS_LOADING)
 
-        # Меняем курсор на ожидание
-        QApplication.setOverrideCursor(QCursor(Qt.CursorShape.WaitCursor))
+        # Сеть, запись в БД и чтение истории выполняются в пуле потоков
+        self.request_counter += 1
+        worker = WeatherFetchWorker(self.weather_service, self.request_counter, self.daemon_client)
+        worker.signals.finished.connect(self.on_fetch_finished)
+        worker.signals.failed.connect(self.on_fetch_failed)
+        worker.signals.cancelled.connect(self.on_fetch_cancelled)
+        worker.signals.refreshed.connect(self.on_fetch_refreshed)
+        self.active_worker = worker
+        self.thread_pool.start(worker)
+
+    def on_cancel_clicked(self) -> None:
+        """Обработчик нажатия кнопки отмены запроса."""
+        if self.active_worker is None:
+            return
 
-        # Используем QTimer для неблокирующего выполнения
-        QTimer.singleShot(TIMER_DELAY_MS, self.fetch_weather)
+        # Поток может еще ждать ответа сервера или сохранять запись: кнопки остаются
+        # заблокированными, пока он не пришлет finished, failed или cancelled
+        self.active_worker.cancel()
+        self.cancel_btn.setEnabled(False)
+        self.status_label.setText(STATUS_CANCELLING)
 
-    def fetch_weather(self) -> None:
-        """Получает данные о погоде."""
-        try:
-            # Используем новый метод с уведомлениями
-            weather_data, notifications = self.weather_service.get_weather_with_notifications()
-            self.display_weather_with_notifications(weather_data, notifications)
+    def is_current_request(self, request_id: int) -> bool:
+        """Проверяет, что результат относится к активному (не отмененному) запросу."""
+        return self.active_worker is not None and self.active_worker.request_id == request_id
+
+    def on_fetch_finished(self, result: WeatherFetchResult) -> None:
+        """Получает результат фонового запроса в главном потоке."""
+        if not self.is_current_request(result.request_id):
+            return
+
+        cancelled = self.active_worker.is_cancelled
+        self.finish_fetch()
+        if cancelled:
+            # Отмена пришла, когда запись уже сохранялась: погода не показывается, но запись попадает в таблицу
+            self.status_label.setText(STATUS_CANCELLED)
+        else:
+            self.display_weather_with_notifications(result.weather_data, result.notifications)
+            age_seconds = result.weather_data.age_seconds
+            if age_seconds is not None:
+                self.status_label.setText(STATUS_STALE.format(age=format_age(age_seconds)))
+            else:
+                self.status_label.setText(STATUS_CACHED if result.cached else STATUS_SUCCESS)
+
+        # Новая запись добавляется в таблицу и счетчик; запись из кэша в таблице уже есть
+        if not result.cached:
+            self.add_saved_record(result.record)
+
+    def on_fetch_refreshed(self, result: WeatherFetchResult) -> None:
+        """Получает свежую погоду, сохраненную в фоне после ответа из истории."""
+        self.add_saved_record(result.record)
+        # Свежая погода заменяет наблюдение из истории, если после него не начат новый запрос
+        if self.active_worker is None and result.request_id == self.request_counter:
+            self.display_weather_with_notifications(result.weather_data, result.notifications)
             self.status_label.setText(STATUS_SUCCESS)
 
-            # Обновляем историю после получения новых данных
-            self.load_history()
+    def add_saved_record(self, record: WeatherRecord) -> None:
+        """Добавляет сохраненную запись в таблицу, счетчик и график без повторного чтения истории."""
+        self.history_model.prepend_record(record)
+        self.history_total += 1
+        self.update_history_status()
+        if self.chart_city_box.findText(record.city) < 0:
+            self.load_chart_cities()
+        else:
+            self.history_chart.on_record_saved(record)
+
+    def on_fetch_failed(self, request_id: int, message: str) -> None:
+        """Показывает ошибку фонового запроса."""
+        if not self.is_current_request(request_id):
+            return
+
+        self.finish_fetch()
+        self.show_error(f"Ошибка при получении погоды: {message}")
+        self.status_label.setText(STATUS_FETCH_ERROR)
 
-        except Exception as e:
-            self.show_error(f"Ошибка при получении погоды: {str(e)}")
-            self.status_label.setText(STATUS_FETCH_ERROR)
+    def on_fetch_cancelled(self, request_id: int) -> None:
+        """Обрабатывает отмену, обнаруженную рабочим потоком."""
+        if not self.is_current_request(request_id):
+            return
+
+        self.finish_fetch()
+        self.status_label.setText(STATUS_CANCELLED)
 
-        finally:
-            # Восстанавливаем интерфейс
-            self.get_weather_btn.setEnabled(True)
-            self.progress_bar.setVisible(False)
-            QApplication.restoreOverrideCursor()
+    def finish_fetch(self) -> None:
+        """Восстанавливает интерфейс после завершения или отмены запроса."""
+        self.active_worker = None
+        self.get_weather_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.setVisible(False)
+        self.progress_bar.setVisible(False)
 
     def display_weather_with_notifications(self, weather_data: WeatherData, notifications: list[str]) -> None:
         """Отображает данные о погоде и уведомления в интерфейсе."""
@@ -380,6 +534,15 @@ class WeatherWindow(QMainWindow):
 
         self.weather_output.setText(weather_text)
 
+    def closeEvent(self, event: QCloseEvent) -> None:
+        """Отменяет активный запрос и ждет рабочие потоки перед закрытием окна."""
+        if self.active_worker is not None:
+            self.active_worker.cancel()
+        self.thread_pool.waitForDone(WORKER_SHUTDOWN_TIMEOUT_MS)
+        if self.weather_service is not None:
+            self.weather_service.wait_for_refreshes(WORKER_SHUTDOWN_TIMEOUT_MS / 1000)
+        super().closeEvent(event)
+
     def show_error(self, message: str) -> None:
         """Показывает сообщение об ошибке."""
         QMessageBox.critical(self, ERROR_TITLE, message)
@@ -0,0 +1,125 @@
+"""Фоновое получение погоды для GUI без блокировки цикла событий Qt."""
+
+import threading
+from dataclasses import dataclass
+
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+from src.core.daemon_client import DaemonClient
+from src.core.data_parser import WeatherData
+from src.core.weather_service import WeatherService
+from src.database.models import WeatherRecord
+
+
+@dataclass
+class WeatherFetchResult:
+    """Результат фонового запроса погоды для отображения в окне."""
+
+    request_id: int
+    weather_data: WeatherData
+    notifications: list[str]
+    record: WeatherRecord  # Запись истории, из которой взята погода
+    cached: bool = False  # Запись сохранена раньше (кэш демона или ячейки сетки, история) и уже есть в таблице
+
+
+class WeatherWorkerSignals(QObject):
+    """Сигналы рабочего потока. Доставляются в главный поток через очередь событий Qt."""
+
+    finished = pyqtSignal(object)  # WeatherFetchResult
+    failed = pyqtSignal(int, str)  # request_id, текст ошибки
+    cancelled = pyqtSignal(int)  # request_id
+    refreshed = pyqtSignal(object)  # WeatherFetchResult свежей погоды после ответа из истории
+
+
+class WeatherFetchWorker(QRunnable):
+    """Выполняет запрос, разбор, сохранение и уведомления в пуле потоков.
+
+    HTTP-запрос нельзя прервать на середине, поэтому отмена проверяется между этапами:
+    запрос, отмененный до сохранения, не сохраняется в историю. Сохраненная запись
+    возвращается в окно и после отмены, чтобы таблица истории совпадала с БД.
+    Поток всегда завершается одним сигналом: finished, failed или cancelled.
+    """
+
+    def __init__(
+        self, weather_service: WeatherService | None, request_id: int, daemon_client: DaemonClient | None = None
+    ):
+        super().__init__()
+        self.weather_service = weather_service
+        self.daemon_client = daemon_client  # Если задан, погода берется у демона
+        self.request_id = request_id
+        self.signals = WeatherWorkerSignals()
+        self._cancel_event = threading.Event()
+        self._result_sent = threading.Event()  # finished, failed или cancelled уже отправлен
+
+    def cancel(self) -> None:
+        """Запрашивает отмену. Безопасно вызывать из любого потока."""
+        self._cancel_event.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        """True если запрошена отмена."""
+        return self._cancel_event.is_set()
+
+    def run(self) -> None:
+        """Выполняется в потоке из QThreadPool."""
+        try:
+            self._run()
+        finally:
+            self._result_sent.set()
+
+    def _run(self) -> None:
+        try:
+            if self.daemon_client is not None:
+                weather_data, record, notifications, cached = self.daemon_client.get_weather()
+                self.signals.finished.emit(
+                    WeatherFetchResult(self.request_id, weather_data, notifications, record, cached)
+                )
+                return
+
+            coordinates = self.weather_service.config.coordinates
+            if coordinates is not None:
+                weather_data, record, notifications, cached = self.weather_service.get_weather_at(*coordinates)
+                self.signals.finished.emit(
+                    WeatherFetchResult(self.request_id, weather_data, notifications, record, cached)
+                )
+                return
+
+            # Наблюдение из истории показывается сразу, свежая погода сохраняется в фоне
+            # и приходит в окно сигналом refreshed
+            stale = self.weather_service.get_stale_weather(on_refreshed=self._emit_refreshed)
+            if stale is not None:
+                weather_data, record, notifications = stale
+                self.signals.finished.emit(
+                    WeatherFetchResult(self.request_id, weather_data, notifications, record, cached=True)
+                )
+                return
+
+            with self.weather_service.trace_request():
+                weather_data, response_time = self.weather_service.fetch_weather_data()
+                if self.is_cancelled:
+                    self.signals.cancelled.emit(self.request_id)
+                    return
+
+                record, notifications = self.weather_service.process_weather_data(weather_data, response_time)
+
+            self.signals.finished.emit(
+                WeatherFetchResult(
+                    request_id=self.request_id,
+                    weather_data=weather_data,
+                    notifications=notifications,
+                    record=record,
+                )
+            )
+
+        except Exception as e:
+            if self.is_cancelled:
+                self.signals.cancelled.emit(self.request_id)
+            else:
+                print(f"❌ Ошибка при получении погоды: {e}")
+                self.signals.failed.emit(self.request_id, str(e))
+
+    def _emit_refreshed(self, weather_data: WeatherData, record: WeatherRecord, notifications: list[str]) -> None:
+        """Передает в окно погоду, сохраненную фоновым обновлением (вызывается из его потока)."""
+        # Свежая погода должна прийти в окно после ответа из истории, а не раньше
+        self._result_sent.wait()
+        self.signals.refreshed.emit(WeatherFetchResult(self.request_id, weather_data, notifications, record))
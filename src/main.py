@@ -2,9 +2,6 @@
 
 import argparse
 
-from src.cli import main as cli_main
-from src.gui.main_window import main as gui_main
-
 
 def main() -> None:
     """Основная функция запуска приложения."""
@@ -12,12 +9,20 @@ def main() -> None:
     parser.add_argument("--gui", action="store_true", help="Запустить в графическом режиме (по умолчанию)")
     parser.add_argument("--cli", action="store_true", help="Запустить в консольном режиме")
 
-    args = parser.parse_args()
+    # Остальные аргументы передаются консольной версии (например, команда check-counters)
+    args, cli_args = parser.parse_known_args()
 
-    # По умолчанию запускаем GUI
+    # Импортируем только нужный режим: консольная версия не должна загружать PyQt6
     if args.cli:
-        cli_main()
+        from src.cli import main as cli_main
+
+        cli_main(cli_args)
     else:
+        if cli_args:
+            parser.error(f"неизвестные аргументы: {' '.join(cli_args)}")
+
+        from src.gui.main_window import main as gui_main
+
         gui_main()
 
 
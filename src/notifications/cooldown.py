@@ -0,0 +1,129 @@
+"""Паузы и гистерезис правил уведомлений."""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Any
+
+from src.database.db_manager import DatabaseManager
+from src.database.models import NotificationRule, NotificationState
+from src.notifications.evaluator import ConditionEvaluator
+
+
+class RuleCooldownIndex:
+    """Индекс последних срабатываний правил по городам.
+
+    Заполняется из таблицы notification_state при создании и дальше ведется в памяти,
+    поэтому проверка "правило на паузе" не требует запросов к базе данных. Измененные
+    состояния забираются через take_changes() и сохраняются вместе с уведомлениями.
+    """
+
+    def __init__(self, db_manager: DatabaseManager):
+        """Загружает состояния правил и настройки городов.
+
+        Args:
+            db_manager: Менеджер БД
+        """
+        self.lock = threading.Lock()  # Проверка и отметка срабатывания должны идти без разрыва
+        self._states = db_manager.get_notification_states()
+        self._city_settings = db_manager.get_rule_city_settings()
+        self._changes: dict[tuple[int, str], NotificationState] = {}
+        self._latched: dict[str, set[int]] = {}  # город -> правила, ждущие сброса гистерезиса
+        self._fired: dict[str, set[int]] = {}  # город -> правила, срабатывавшие в нем
+        for (rule_id, city), state in self._states.items():
+            self._fired.setdefault(city, set()).add(rule_id)
+            if state.latched:
+                self._latched.setdefault(city, set()).add(rule_id)
+
+    def reload_settings(self, db_manager: DatabaseManager) -> None:
+        """Перечитывает настройки городов (после изменения правил)."""
+        self._city_settings = db_manager.get_rule_city_settings()
+
+    def settings(self, rule: NotificationRule, city: str) -> tuple[int, float]:
+        """Возвращает (пауза в минутах, гистерезис) правила с учетом настроек города."""
+        cooldown_minutes, hysteresis = self._city_settings.get((rule.id, city), (None, None))
+        return (
+            rule.cooldown_minutes if cooldown_minutes is None else cooldown_minutes,
+            rule.hysteresis if hysteresis is None else hysteresis,
+        )
+
+    def release_latched(
+        self, city: str, rules_by_id: dict[int, NotificationRule], weather_data: dict[str, Any]
+    ) -> None:
+        """Снимает ожидание гистерезиса с правил города, значение которых отошло от порога.
+
+        Проверяются только сработавшие ранее правила с гистерезисом, а не все правила.
+
+        Args:
+            city: Город записи
+            rules_by_id: Активные правила по id
+            weather_data: Словарь с данными о погоде
+        """
+        for rule_id in list(self._latched.get(city, ())):
+            rule = rules_by_id.get(rule_id)
+            if rule is None:
+                continue  # Правило выключено: состояние пригодится, если его включат снова
+            _, hysteresis = self.settings(rule, city)
+            if hysteresis <= 0 or ConditionEvaluator.is_released(rule, weather_data, hysteresis):
+                state = self._states[(rule_id, city)]
+                state.latched = False
+                self._latched[city].discard(rule_id)
+                self._changes[(rule_id, city)] = state
+
+    def suppressed_rules(self, city: str, rules_by_id: dict[int, NotificationRule], now: datetime) -> set[int]:
+        """Возвращает правила города, которые сейчас молчат (см. is_suppressed).
+
+        Их не нужно проверять: уведомление по ним все равно не выдается. Перебираются
+        только правила, уже срабатывавшие в этом городе, а не все правила.
+
+        Args:
+            city: Город записи
+            rules_by_id: Активные правила по id
+            now: Время записи
+
+        Returns:
+            id правил на паузе или в ожидании сброса гистерезиса
+        """
+        suppressed = set()
+        for rule_id in self._fired.get(city, ()):
+            rule = rules_by_id.get(rule_id)
+            if rule is not None and self.is_suppressed(rule, city, now):
+                suppressed.add(rule_id)
+        return suppressed
+
+    def is_suppressed(self, rule: NotificationRule, city: str, now: datetime) -> bool:
+        """Проверяет, нужно ли промолчать о сработавшем правиле.
+
+        Правило молчит во время паузы после прошлого срабатывания и пока ждет сброса
+        гистерезиса (см. release_latched).
+
+        Args:
+            rule: Сработавшее правило
+            city: Город записи
+            now: Время записи
+
+        Returns:
+            True если уведомление не нужно выдавать
+        """
+        state = self._states.get((rule.id, city))
+        if state is None:
+            return False
+
+        cooldown_minutes, _ = self.settings(rule, city)
+        if cooldown_minutes and state.last_fired_at and now < state.last_fired_at + timedelta(minutes=cooldown_minutes):
+            return True
+        return state.latched
+
+    def mark_fired(self, rule: NotificationRule, city: str, now: datetime) -> None:
+        """Отмечает срабатывание правила для города."""
+        _, hysteresis = self.settings(rule, city)
+        state = NotificationState(rule.id, city, now, latched=hysteresis > 0)
+        self._states[(rule.id, city)] = self._changes[(rule.id, city)] = state
+        self._fired.setdefault(city, set()).add(rule.id)
+        if state.latched:
+            self._latched.setdefault(city, set()).add(rule.id)
+
+    def take_changes(self) -> list[NotificationState]:
+        """Возвращает состояния, измененные с прошлого вызова, для сохранения в БД."""
+        changes = list(self._changes.values())
+        self._changes.clear()
+        return changes
@@ -0,0 +1,167 @@
+"""Асинхронная доставка уведомлений получателям.
+
+NotificationEngine публикует сработавшие уведомления в диспетчер и сразу возвращается:
+у каждого получателя своя ограниченная очередь и свой поток, который забирает
+уведомления пачками, доставляет их и повторяет пачку при ошибке. Медленный
+или недоступный получатель не задерживает ни запрос погоды, ни других получателей.
+
+Если очередь получателя заполнена, publish() ждет не дольше put_timeout и
+отбрасывает остаток (счетчик notifications_dropped_total): запрос погоды
+важнее доставки.
+"""
+
+import atexit
+import queue
+import threading
+import time
+
+from src.notifications.sinks import NotificationEvent, NotificationSink
+from src.utils import metrics
+
+NOTIFICATIONS_DELIVERED_TOTAL = metrics.counter("notifications_delivered_total", "Доставленные уведомления")
+NOTIFICATIONS_DROPPED_TOTAL = metrics.counter(
+    "notifications_dropped_total", "Уведомления, отброшенные из-за переполненной очереди"
+)
+NOTIFICATIONS_FAILED_TOTAL = metrics.counter(
+    "notifications_failed_total", "Уведомления, не доставленные после всех повторов"
+)
+NOTIFICATION_RETRIES_TOTAL = metrics.counter("notification_retries_total", "Повторные попытки доставки пачки")
+NOTIFICATION_BATCH_SECONDS = metrics.histogram("notification_batch_seconds", "Доставка одной пачки уведомлений")
+
+_STOP = object()  # Сигнал потоку получателя: доставить оставшееся и завершиться
+
+
+class _SinkWorker:
+    """Очередь и поток доставки одного получателя."""
+
+    def __init__(self, sink: NotificationSink, dispatcher: "NotificationDispatcher"):
+        self.sink = sink
+        self.queue: queue.Queue = queue.Queue(maxsize=dispatcher.queue_size)
+        self._dispatcher = dispatcher
+        self._thread = threading.Thread(target=self._run, name=f"notify-{sink.name}", daemon=True)
+        self._thread.start()
+
+    def put(self, events: list[NotificationEvent]) -> int:
+        """Ставит уведомления в очередь.
+
+        Returns:
+            Количество отброшенных уведомлений
+        """
+        timeout = self._dispatcher.put_timeout
+        for i, event in enumerate(events):
+            try:
+                self.queue.put(event, timeout=timeout)
+            except queue.Full:
+                dropped = len(events) - i
+                NOTIFICATIONS_DROPPED_TOTAL.inc(dropped, sink=self.sink.name)
+                return dropped
+        return 0
+
+    def stop(self, timeout: float) -> None:
+        """Доставляет уже поставленное в очередь и останавливает поток."""
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            print(f"⚠️ Очередь уведомлений {self.sink.name} не освободилась, остаток не доставлен")
+            return
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        dispatcher = self._dispatcher
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+
+            # Добираем пачку: все, что успело прийти за flush_interval, но не больше batch_size
+            batch = [item]
+            deadline = time.monotonic() + dispatcher.flush_interval
+            while len(batch) < dispatcher.batch_size:
+                try:
+                    item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._deliver(batch)
+
+        self.sink.close()
+
+    def _deliver(self, batch: list[NotificationEvent]) -> None:
+        dispatcher = self._dispatcher
+        name = self.sink.name
+        for attempt in range(dispatcher.max_retries + 1):
+            try:
+                with NOTIFICATION_BATCH_SECONDS.time():
+                    self.sink.deliver(batch)
+                NOTIFICATIONS_DELIVERED_TOTAL.inc(len(batch), sink=name)
+                return
+            except Exception as e:
+                if attempt == dispatcher.max_retries:
+                    NOTIFICATIONS_FAILED_TOTAL.inc(len(batch), sink=name)
+                    print(f"⚠️ Не удалось доставить уведомления ({name}, {len(batch)} шт.): {e}")
+                    return
+                NOTIFICATION_RETRIES_TOTAL.inc(sink=name)
+                time.sleep(dispatcher.retry_delay * 2**attempt)
+
+
+class NotificationDispatcher:
+    """Диспетчер уведомлений: по ограниченной очереди и потоку на каждого получателя."""
+
+    def __init__(
+        self,
+        sinks: list[NotificationSink],
+        queue_size: int = 1000,
+        batch_size: int = 100,
+        flush_interval: float = 0.1,
+        max_retries: int = 3,
+        retry_delay: float = 0.5,
+        put_timeout: float = 0.05,
+    ):
+        """Создает диспетчер и запускает потоки получателей.
+
+        Args:
+            sinks: Получатели уведомлений
+            queue_size: Емкость очереди каждого получателя
+            batch_size: Максимальный размер пачки
+            flush_interval: Сколько секунд добирать пачку после первого уведомления
+            max_retries: Повторы пачки после ошибки доставки
+            retry_delay: Пауза перед первым повтором (дальше удваивается)
+            put_timeout: Сколько publish() ждет места в заполненной очереди
+        """
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.put_timeout = put_timeout
+        self._closed = False
+        self._workers = [_SinkWorker(sink, self) for sink in sinks]
+        atexit.register(self.close)
+
+    @property
+    def sink_names(self) -> list[str]:
+        """Имена получателей."""
+        return [worker.sink.name for worker in self._workers]
+
+    def publish(self, events: list[NotificationEvent]) -> int:
+        """Ставит уведомления в очереди всех получателей, не дожидаясь доставки.
+
+        Returns:
+            Количество отброшенных уведомлений (по всем получателям)
+        """
+        if self._closed or not events:
+            return 0
+        return sum(worker.put(events) for worker in self._workers)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Доставляет уведомления из очередей и останавливает потоки (вызывается и при выходе)."""
+        if self._closed:
+            return
+        self._closed = True
+        for worker in self._workers:
+            worker.stop(timeout)
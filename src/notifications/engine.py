@@ -1,28 +1,78 @@
 """Движок для генерации уведомлений на основе правил."""
 
-from src.database.db_manager import db_manager
+import threading
+from datetime import datetime, timedelta
+from functools import cache
+
+from src.core.data_parser import WeatherForecast
+from src.database.db_manager import DatabaseManager, get_db_manager
 from src.database.models import IssuedNotification, WeatherRecord
+from src.notifications.cooldown import RuleCooldownIndex
+from src.notifications.dispatch import NotificationDispatcher
 from src.notifications.evaluator import ConditionEvaluator
+from src.notifications.rule_index import RuleIndex
+from src.notifications.sinks import NotificationEvent
+from src.notifications.subscriptions import SubscriptionIndex
+from src.notifications.windows import WindowStatistics
+from src.utils import metrics
+
+RULE_EVALUATION_SECONDS = metrics.histogram("rule_evaluation_seconds", "Проверка всех активных правил для записи")
+RULES_EVALUATED_TOTAL = metrics.counter("rules_evaluated_total", "Проверенные правила")
+RULES_SUPPRESSED_TOTAL = metrics.counter("rules_suppressed_total", "Правила, пропущенные из-за паузы или гистерезиса")
+NOTIFICATIONS_ISSUED_TOTAL = metrics.counter("notifications_issued_total", "Выданные уведомления")
 
 
 class NotificationEngine:
     """Движок для обработки уведомлений."""
 
-    def __init__(self):
-        """Инициализирует движок уведомлений."""
+    def __init__(self, db_manager: DatabaseManager | None = None):
+        """Инициализирует движок уведомлений.
+
+        Args:
+            db_manager: Менеджер БД. Если None, используется общий экземпляр
+        """
+        self.db_manager = db_manager or get_db_manager()
         self.evaluator = ConditionEvaluator()
+        self.cooldowns = RuleCooldownIndex(self.db_manager)
+        self.windows = WindowStatistics(self.db_manager)  # Скользящие окна для условий на тенденцию
+        self.dispatcher: NotificationDispatcher | None = None  # Доставка получателям, если они настроены
+        self._rule_index: RuleIndex | None = None
+        self._rules_version = -1
+        self._subscription_index: SubscriptionIndex | None = None
+        self._subscriptions_version = -1
+        self._rule_index_lock = threading.Lock()
+        self._latest_notifications: tuple[int, list[str]] = (-1, [])  # (id записи, ее уведомления)
 
-    def process_weather_data(self, weather_data: dict, response_time_ms: int = 0) -> tuple[int, list[str]]:
-        """Обрабатывает данные о погоде, сохраняет в БД и генерирует уведомления.
+    def get_rule_index(self) -> RuleIndex:
+        """Возвращает индекс активных правил, перестраивая его после изменения правил."""
+        version = self.db_manager.get_rules_version()
+        with self._rule_index_lock:
+            if self._rule_index is None or version != self._rules_version:
+                self._rule_index = RuleIndex(self.db_manager.get_active_notification_rules())
+                self._rules_version = version
+                self.cooldowns.reload_settings(self.db_manager)
+            return self._rule_index
 
-        Args:
-            weather_data: Словарь с данными о погоде
-            response_time_ms: Время ответа API в миллисекундах
+    def get_subscription_index(self) -> SubscriptionIndex:
+        """Возвращает индексы наборов правил по городам подписок, перестраивая их после изменений."""
+        version = self.db_manager.get_rules_version()
+        with self._rule_index_lock:
+            if self._subscription_index is None or version != self._subscriptions_version:
+                self._subscription_index = SubscriptionIndex.load(self.db_manager)
+                self._subscriptions_version = version
+                self.cooldowns.reload_settings(self.db_manager)
+            return self._subscription_index
+
+    def _prepare_record(self, weather_data: dict, response_time_ms: int) -> tuple[dict, WeatherRecord]:
+        """Готовит данные для правил и запись истории (еще без id).
 
         Returns:
-            Кортеж (ID сохраненной записи, список сообщений уведомлений)
+            Кортеж (данные о погоде с описанием из словаря, запись истории)
         """
-        # 1. Сохраняем запись в историю
+        # Описание берется из словаря: нижний регистр и флаги ключевых слов уже вычислены
+        description = self.db_manager.get_or_create_description(weather_data.get("description", ""))
+        weather_data = {**weather_data, "description": description.text_lower, "description_entry": description}
+
         record = WeatherRecord(
             city=weather_data.get("city", ""),
             timestamp=weather_data.get("timestamp"),
@@ -30,34 +80,228 @@ class NotificationEngine:
             feels_like=weather_data.get("feels_like", 0),
             humidity=weather_data.get("humidity", 0),
             pressure=weather_data.get("pressure", 0),
-            description=weather_data.get("description", ""),
+            description=description.text,
             wind_speed=weather_data.get("wind_speed", 0),
             response_time_ms=response_time_ms,
+            description_id=description.id,
         )
+        return weather_data, record
+
+    @staticmethod
+    def _set_record_id(record: WeatherRecord, history_id: int) -> None:
+        """Заполняет id сохраненной записи и приводит время к datetime."""
+        record.id = history_id
+        if isinstance(record.timestamp, str):
+            record.timestamp = datetime.fromisoformat(record.timestamp)
+
+    def process_weather_data(self, weather_data: dict, response_time_ms: int = 0) -> tuple[int, list[str]]:
+        """Обрабатывает данные о погоде, сохраняет в БД и генерирует уведомления.
+
+        Args:
+            weather_data: Словарь с данными о погоде
+            response_time_ms: Время ответа API в миллисекундах
+
+        Returns:
+            Кортеж (ID сохраненной записи, список сообщений уведомлений)
+        """
+        record, notifications = self.process_weather_record(weather_data, response_time_ms)
+        return record.id, notifications
+
+    def process_weather_record(self, weather_data: dict, response_time_ms: int = 0) -> tuple[WeatherRecord, list[str]]:
+        """То же, что process_weather_data, но возвращает сохраненную запись целиком.
+
+        Запись можно сразу показать в истории, не перечитывая ее из базы данных.
+
+        Args:
+            weather_data: Словарь с данными о погоде
+            response_time_ms: Время ответа API в миллисекундах
 
-        history_id = db_manager.save_weather_record(record)
+        Returns:
+            Кортеж (сохраненная запись с заполненным id, список сообщений уведомлений)
+        """
+        # 1. Сохраняем запись в историю
+        weather_data, record = self._prepare_record(weather_data, response_time_ms)
+        history_id = self.db_manager.save_weather_record(record)
+        self._set_record_id(record, history_id)
 
-        # 2. Получаем активные правила
-        rules = db_manager.get_active_notification_rules()
+        # 2. Получаем индекс активных правил и значения окон, которые им нужны
+        rule_index = self.get_rule_index()
         notifications = []
+        now = record.timestamp or datetime.now()
+        if rule_index.window_conditions:
+            weather_data.update(
+                self.windows.observe(record.city, now, weather_data, rule_index.window_conditions, self._rules_version)
+            )
+
+        # 3. Находим сработавшие правила; правила на паузе для этого города не проверяются
+        fired = []
+        with RULE_EVALUATION_SECONDS.time(), self.cooldowns.lock:
+            self.cooldowns.release_latched(record.city, rule_index.by_id, weather_data)
+            suppressed = self.cooldowns.suppressed_rules(record.city, rule_index.by_id, now)
+            for rule in rule_index.match(weather_data, skip=suppressed):
+                fired.append((rule, self.evaluator.format_message(rule, weather_data)))
+                self.cooldowns.mark_fired(rule, record.city, now)
+            states = self.cooldowns.take_changes()
+        RULES_EVALUATED_TOTAL.inc(len(rule_index) - len(suppressed))
+        RULES_SUPPRESSED_TOTAL.inc(len(suppressed))
+
+        # 4. Сохраняем уведомления и новые состояния правил в БД одной транзакцией
+        issued = []
+        for rule, message in fired:
+            issued.append(IssuedNotification(history_id=history_id, rule_id=rule.id, message=message))
+            notifications.append(message)
+        if issued or states:
+            self.db_manager.save_issued_notifications(issued, states)
+
+        # 5. Отдаем уведомления на доставку, не дожидаясь ее
+        if self.dispatcher is not None and fired:
+            city = record.city
+            self.dispatcher.publish(
+                [
+                    NotificationEvent(rule.id, rule.name, rule.priority, rule.icon, city, message, history_id, now)
+                    for rule, message in fired
+                ]
+            )
+        self._latest_notifications = (history_id, notifications)
+        NOTIFICATIONS_ISSUED_TOTAL.inc(len(notifications))
+        metrics.annotate(
+            record_id=history_id,
+            rule_count=len(rule_index),
+            suppressed=len(suppressed),
+            notifications=len(notifications),
+        )
+
+        return record, notifications
+
+    def process_subscriptions(self, observations: dict[str, tuple[dict, int]]) -> list[IssuedNotification]:
+        """Сохраняет наблюдения городов подписок и раздает уведомления подписчикам.
+
+        Наблюдение города проверяется один раз индексом всех наборов правил, на которые
+        подписаны в этом городе. Сообщение форматируется один раз на шаблон и раздается
+        всем подписчикам набора. Записи истории сохраняются одной транзакцией,
+        уведомления всех подписчиков и состояния правил — второй.
+
+        Args:
+            observations: Город подписки -> (словарь с данными о погоде, время ответа API в мс)
+
+        Returns:
+            Выданные уведомления (по одному на каждого подписчика сработавшего правила)
+        """
+        subscription_index = self.get_subscription_index()
+        prepared = [
+            (city, *self._prepare_record(weather_data, response_time_ms))
+            for city, (weather_data, response_time_ms) in observations.items()
+            if city in subscription_index.city_indexes
+        ]
+        if not prepared:
+            return []
+
+        history_ids = self.db_manager.save_weather_records([record for _, _, record in prepared])
+
+        fired = []  # (правило, город записи, сообщение, id записи, время, подписчики)
+        evaluated = suppressed = 0
+        with self.cooldowns.lock:
+            for (city, weather_data, record), history_id in zip(prepared, history_ids, strict=True):
+                self._set_record_id(record, history_id)
+                rule_index = subscription_index.city_indexes[city]
+                now = record.timestamp or datetime.now()
+                if rule_index.window_conditions:
+                    # Окна ведутся по городу записи: по нему они восстанавливаются из истории
+                    weather_data.update(
+                        self.windows.observe(
+                            record.city, now, weather_data, rule_index.window_conditions, self._subscriptions_version
+                        )
+                    )
+                messages: dict[str, str] = {}  # Наборы — копии общих правил: шаблоны у них одинаковые
+                with RULE_EVALUATION_SECONDS.time():
+                    # Паузы ведутся по городу подписки: ответ API может писать город иначе
+                    self.cooldowns.release_latched(city, rule_index.by_id, weather_data)
+                    skipped = self.cooldowns.suppressed_rules(city, rule_index.by_id, now)
+                    for rule in rule_index.match(weather_data, skip=skipped):
+                        self.cooldowns.mark_fired(rule, city, now)
+                        message = messages.get(rule.message_template)
+                        if message is None:
+                            message = messages[rule.message_template] = self.evaluator.format_message(
+                                rule, weather_data
+                            )
+                        fired.append(
+                            (rule, record.city, message, history_id, now, subscription_index.subscribers(city, rule))
+                        )
+                evaluated += len(rule_index) - len(skipped)
+                suppressed += len(skipped)
+            states = self.cooldowns.take_changes()
+        RULES_EVALUATED_TOTAL.inc(evaluated)
+        RULES_SUPPRESSED_TOTAL.inc(suppressed)
+
+        # Сообщение одно на правило, строки уведомлений — по одной на подписчика
+        issued = [
+            IssuedNotification(None, history_id, rule.id, message, now, user_id)
+            for rule, _, message, history_id, now, user_ids in fired
+            for user_id in user_ids
+        ]
+        if issued or states:
+            self.db_manager.save_issued_notifications(issued, states)
+
+        if self.dispatcher is not None and fired:
+            self.dispatcher.publish(
+                [
+                    NotificationEvent(
+                        rule.id, rule.name, rule.priority, rule.icon, city, message, history_id, now, user_id
+                    )
+                    for rule, city, message, history_id, now, user_ids in fired
+                    for user_id in user_ids
+                ]
+            )
+        NOTIFICATIONS_ISSUED_TOTAL.inc(len(issued))
+        metrics.annotate(cities=len(prepared), suppressed=suppressed, notifications=len(issued))
+
+        return issued
 
-        # 3. Проверяем каждое правило
-        for rule in rules:
-            try:
-                if self.evaluator.evaluate(rule, weather_data):
-                    message = self.evaluator.format_message(rule, weather_data)
+    def evaluate_forecast(self, forecast: WeatherForecast, hours: int = 6, now: datetime | None = None) -> list[str]:
+        """Заранее проверяет правила на точках прогноза в ближайшие hours часов.
+
+        Каждое правило дает не больше одного предупреждения — по первой точке прогноза,
+        в которой оно срабатывает ("дождь в ближайшие 6 часов"). Предупреждения не
+        сохраняются в issued_notifications: они не относятся к записи истории.
+
+        Args:
+            forecast: Прогноз погоды
+            hours: Горизонт проверки в часах
+            now: Текущее время (для воспроизводимых расчетов)
+
+        Returns:
+            Список предупреждений с временем точки прогноза
+        """
+        now = now or datetime.now()
+        horizon = now + timedelta(hours=hours)
+        window = [entry for entry in forecast.entries if now <= entry.forecast_time <= horizon]
+        if not window:
+            return []
 
-                    # Сохраняем уведомление в БД
-                    issued_notification = IssuedNotification(history_id=history_id, rule_id=rule.id, message=message)
-                    db_manager.save_issued_notification(issued_notification)
+        rule_index = self.get_rule_index()
+        fired_rule_ids = set()
+        alerts = []
 
-                    notifications.append(message)
+        for entry in window:
+            description = self.db_manager.get_or_create_description(entry.description)
+            entry_data = {
+                "city": forecast.city,
+                "temperature": entry.temperature,
+                "feels_like": entry.feels_like,
+                "humidity": entry.humidity,
+                "pressure": entry.pressure,
+                "description": description.text_lower,
+                "description_entry": description,
+                "wind_speed": entry.wind_speed,
+            }
 
-            except (ValueError, TypeError) as e:
-                print(f"Ошибка при оценке правила {rule.name}: {e}")
-                continue
+            # Правило, уже сработавшее в прогнозе раньше, повторно не проверяется
+            for rule in rule_index.match(entry_data, skip=fired_rule_ids):
+                message = self.evaluator.format_message(rule, entry_data)
+                alerts.append(f"🕒 {entry.forecast_time:%d.%m %H:%M}: {message}")
+                fired_rule_ids.add(rule.id)
 
-        return history_id, notifications
+        return alerts
 
     def get_recent_notifications(self, limit: int = 5) -> list[str]:
         """Получает последние уведомления.
@@ -68,15 +312,21 @@ class NotificationEngine:
         Returns:
             Список последних уведомлений
         """
-        recent_records = db_manager.get_recent_records(limit=limit)
+        recent_records = self.db_manager.get_recent_records(limit=1)
         if not recent_records:
             return []
 
-        latest_record = recent_records[0]
-        notifications = db_manager.get_notifications_for_record(latest_record.id)
+        # Уведомления записи, которую этот процесс только что сохранил, известны без запроса к БД
+        latest_id = recent_records[0].id
+        history_id, messages = self._latest_notifications
+        if latest_id == history_id:
+            return list(messages)
+        notifications = self.db_manager.get_notifications_for_record(latest_id)
 
         return [n.message for n in notifications]
 
 
-# Глобальный экземпляр для использования
-notification_engine = NotificationEngine()
+@cache
+def get_notification_engine() -> NotificationEngine:
+    """Возвращает общий экземпляр движка уведомлений, создавая его при первом обращении."""
+    return NotificationEngine()
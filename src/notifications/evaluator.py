@@ -3,6 +3,7 @@
 from typing import Any
 
 from src.database.models import NotificationRule
+from src.notifications.windows import parse_window_condition
 from src.utils.pressure_converter import convert_pressure_to_mmhg
 
 
@@ -57,8 +58,20 @@ class ConditionEvaluator:
             value = convert_pressure_to_mmhg(pressure_hpa)
             threshold = float(rule.threshold_value)
         elif rule.condition_type == "description":
+            # Для "contains" используем заранее вычисленные флаги ключевых слов из словаря описаний
+            description = weather_data.get("description_entry")
+            if rule.operator == "contains" and description is not None:
+                matched = description.match_keyword(rule.threshold_value)
+                if matched is not None:
+                    return matched
             value = str(weather_data.get("description", "")).lower()
             threshold = rule.threshold_value.lower()
+        elif parse_window_condition(rule.condition_type) is not None:
+            # Значения окон заранее добавляет в данные движок уведомлений (WindowStatistics)
+            value = weather_data.get(rule.condition_type)
+            if value is None:
+                return False  # В окне еще мало наблюдений
+            threshold = float(rule.threshold_value)
         else:
             return False
 
@@ -78,6 +91,54 @@ class ConditionEvaluator:
         else:
             return False
 
+    @staticmethod
+    def measure(rule: NotificationRule, weather_data: dict[str, Any]) -> float | None:
+        """Возвращает значение, которое правило сравнивает с порогом (None для текстовых условий)."""
+        return ConditionEvaluator.measure_condition(rule.condition_type, weather_data)
+
+    @staticmethod
+    def measure_condition(condition_type: str, weather_data: dict[str, Any]) -> float | None:
+        """Возвращает значение числового условия condition_type (None для текстовых условий)."""
+        if condition_type == "temperature_humidity":
+            return weather_data.get("temperature", 0) * weather_data.get("humidity", 0) / 100
+        if condition_type == "pressure":
+            return convert_pressure_to_mmhg(weather_data.get("pressure", 0))
+        if condition_type in ("temperature", "feels_like", "humidity", "wind_speed"):
+            return weather_data.get(condition_type, 0)
+        if parse_window_condition(condition_type) is not None:
+            return weather_data.get(condition_type)
+        return None
+
+    @staticmethod
+    def is_released(rule: NotificationRule, weather_data: dict[str, Any], hysteresis: float) -> bool:
+        """Проверяет, отошло ли значение от порога сработавшего правила дальше гистерезиса.
+
+        Пока значение колеблется у порога, правило не срабатывает повторно.
+        Для текстовых условий достаточно, чтобы условие перестало выполняться.
+
+        Args:
+            rule: Правило уведомления
+            weather_data: Словарь с данными о погоде
+            hysteresis: Запас в единицах порога правила
+
+        Returns:
+            True если правило можно снова выдавать
+        """
+        if ConditionEvaluator.evaluate(rule, weather_data):
+            return False
+
+        value = ConditionEvaluator.measure(rule, weather_data)
+        if value is None or rule.operator == "eq":
+            return True
+
+        threshold = float(rule.threshold_value)
+        # "Ощущается как" всегда сравнивается через "<", индекс духоты — через ">"
+        if rule.condition_type == "feels_like" or (
+            rule.condition_type != "temperature_humidity" and rule.operator in ("lt", "lte")
+        ):
+            return value >= threshold + hysteresis
+        return value <= threshold - hysteresis
+
     @staticmethod
     def format_message(rule: NotificationRule, weather_data: dict[str, Any]) -> str:
         """Форматирует сообщение уведомления, заменяя плейсхолдеры.
@@ -104,6 +165,10 @@ class ConditionEvaluator:
             "{description}": str(weather_data.get("description", "")),
             "{city}": str(weather_data.get("city", "")),
         }
+        # Значение условия правила: для условий окон — изменение, отклонение или среднее
+        if "{value}" in message:
+            value = ConditionEvaluator.measure(rule, weather_data)
+            placeholders["{value}"] = f"{value:.1f}" if value is not None else "—"
 
         for placeholder, replacement in placeholders.items():
             message = message.replace(placeholder, replacement)
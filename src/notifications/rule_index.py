@@ -0,0 +1,242 @@
+"""Индекс правил уведомлений: все сработавшие правила без перебора каждого правила.
+
+Числовые правила группируются по (condition_type, operator), пороги в группе
+отсортированы. Для "gt" срабатывают все правила с порогом меньше значения — это
+префикс отсортированного списка, его границу дает один bisect. Аналогично для
+"gte", "lt", "lte" (префикс или суффикс) и "eq" (диапазон). Правила "contains"
+по описанию проверяются одним проходом автомата Ахо — Корасик по тексту описания,
+"eq" по описанию — поиском в словаре. Описаний погоды немного, поэтому результат
+для описания запоминается.
+
+Результат совпадает с ConditionEvaluator.evaluate для каждого правила: "ощущается как"
+всегда сравнивается через "<", индекс духоты — через ">", давление — в мм рт. ст.
+Правила, которые в индекс не укладываются (нечисловой порог, сравнение описаний
+на больше/меньше), проверяются ConditionEvaluator как раньше.
+
+Условия скользящих окон ("pressure:delta:3h") индексируются как числовые: их значения
+движок уведомлений добавляет в данные о погоде до проверки правил.
+"""
+
+import math
+from bisect import bisect_left, bisect_right
+from collections import deque
+from collections.abc import Collection
+from itertools import compress
+from typing import Any
+
+from src.database.models import NotificationRule
+from src.notifications.evaluator import ConditionEvaluator
+from src.notifications.windows import WindowSpec, parse_window_condition
+
+NUMERIC_CONDITIONS = ("temperature", "feels_like", "humidity", "wind_speed", "pressure", "temperature_humidity")
+NUMERIC_OPERATORS = ("gt", "gte", "lt", "lte", "eq")
+
+DESCRIPTION_CACHE_SIZE = 4096
+
+# До стольких правил обычный перебор быстрее: индекс окупается на сотнях правил
+LINEAR_SCAN_MAX_RULES = 32
+
+# Условия, для которых ConditionEvaluator не смотрит на оператор
+FIXED_OPERATORS = {"feels_like": "lt", "temperature_humidity": "gt"}
+
+
+def _evaluate_safely(rule: NotificationRule, weather_data: dict[str, Any]) -> bool:
+    """Проверяет правило перебором; ошибку в правиле печатает и считает несработавшим."""
+    try:
+        return ConditionEvaluator.evaluate(rule, weather_data)
+    except (ValueError, TypeError) as e:
+        print(f"Ошибка при оценке правила {rule.name}: {e}")
+        return False
+
+
+class KeywordMatcher:
+    """Автомат Ахо — Корасик: все ключевые слова, входящие в текст, за один проход по тексту."""
+
+    def __init__(self, keywords: list[str]):
+        """Строит автомат.
+
+        Args:
+            keywords: Ключевые слова (уже в нижнем регистре)
+        """
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[str]] = [[]]
+
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(keyword)
+
+        # Ссылки неудач обходом в ширину: выход состояния дополняется выходом его ссылки
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                candidate = self._goto[fail].get(char, 0)
+                self._fail[next_state] = candidate if candidate != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> set[str]:
+        """Возвращает ключевые слова, входящие в текст."""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set(output[0])  # Пустое ключевое слово входит в любой текст
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class _ThresholdGroup:
+    """Правила одной пары (condition_type, operator), отсортированные по порогу."""
+
+    __slots__ = ("operator", "thresholds", "positions")
+
+    def __init__(self, operator: str, entries: list[tuple[float, int]]):
+        entries.sort()
+        self.operator = operator
+        self.thresholds = [threshold for threshold, _ in entries]
+        self.positions = [position for _, position in entries]
+
+    def matching(self, value: float) -> list[int]:
+        """Позиции правил, для которых "значение <оператор> порог" выполняется."""
+        thresholds = self.thresholds
+        if self.operator == "gt":  # порог < значения
+            return self.positions[: bisect_left(thresholds, value)]
+        if self.operator == "gte":  # порог <= значения
+            return self.positions[: bisect_right(thresholds, value)]
+        if self.operator == "lt":  # порог > значения
+            return self.positions[bisect_right(thresholds, value) :]
+        if self.operator == "lte":  # порог >= значения
+            return self.positions[bisect_left(thresholds, value) :]
+        return self.positions[bisect_left(thresholds, value) : bisect_right(thresholds, value)]
+
+
+class RuleIndex:
+    """Индекс активных правил для быстрого поиска сработавших."""
+
+    def __init__(self, rules: list[NotificationRule]):
+        """Строит индекс.
+
+        Args:
+            rules: Правила в порядке выдачи уведомлений (приоритет, id)
+        """
+        self.rules = rules
+        self.by_id = {rule.id: rule for rule in rules}
+        self._fallback: list[int] = []
+        self._keyword_positions: dict[str, list[int]] = {}
+        self._description_positions: dict[str, list[int]] = {}  # "eq" по описанию
+        self._description_cache: dict[str, list[int]] = {}
+        # Условия окон, значения которых нужны правилам: condition_type -> описание окна
+        self.window_conditions: dict[str, WindowSpec] = {}
+
+        groups: dict[tuple[str, str], list[tuple[float, int]]] = {}
+        for position, rule in enumerate(rules):
+            if rule.condition_type == "description" and rule.operator == "contains":
+                self._keyword_positions.setdefault(rule.threshold_value.lower(), []).append(position)
+                continue
+            if rule.condition_type == "description" and rule.operator == "eq":
+                self._description_positions.setdefault(rule.threshold_value.lower(), []).append(position)
+                continue
+
+            window = parse_window_condition(rule.condition_type)
+            if window is not None:
+                self.window_conditions[rule.condition_type] = window
+
+            operator = FIXED_OPERATORS.get(rule.condition_type, rule.operator)
+            numeric = rule.condition_type in NUMERIC_CONDITIONS or window is not None
+            if not numeric or operator not in NUMERIC_OPERATORS:
+                self._fallback.append(position)
+                continue
+            try:
+                threshold = float(rule.threshold_value)
+            except ValueError:
+                self._fallback.append(position)  # Ошибку покажет ConditionEvaluator
+                continue
+            if math.isnan(threshold):
+                self._fallback.append(position)  # NaN нарушает порядок сортировки
+                continue
+            groups.setdefault((rule.condition_type, operator), []).append((threshold, position))
+
+        # Группы одного условия проверяются подряд: значение вычисляется один раз
+        self._groups: dict[str, list[_ThresholdGroup]] = {}
+        for (condition_type, operator), entries in groups.items():
+            self._groups.setdefault(condition_type, []).append(_ThresholdGroup(operator, entries))
+        self._matcher = KeywordMatcher(list(self._keyword_positions)) if self._keyword_positions else None
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _match_description(self, description: str) -> list[int]:
+        """Позиции правил по описанию ("contains" и "eq"), с запоминанием результата."""
+        cached = self._description_cache.get(description)
+        if cached is not None:
+            return cached
+
+        positions = list(self._description_positions.get(description, ()))
+        if self._matcher is not None:
+            for keyword in self._matcher.find(description):
+                positions.extend(self._keyword_positions[keyword])
+
+        if len(self._description_cache) >= DESCRIPTION_CACHE_SIZE:
+            self._description_cache.clear()
+        self._description_cache[description] = positions
+        return positions
+
+    def match(self, weather_data: dict[str, Any], skip: Collection[int] = ()) -> list[NotificationRule]:
+        """Возвращает сработавшие правила в исходном порядке.
+
+        Args:
+            weather_data: Словарь с данными о погоде
+            skip: id правил, которые не нужно проверять (например, на паузе)
+        """
+        if len(self.rules) <= LINEAR_SCAN_MAX_RULES:
+            return [rule for rule in self.rules if rule.id not in skip and _evaluate_safely(rule, weather_data)]
+
+        positions: list[int] = []
+        for condition_type, groups in self._groups.items():
+            value = ConditionEvaluator.measure_condition(condition_type, weather_data)
+            if value is None and condition_type in self.window_conditions:
+                continue  # В окне еще мало наблюдений
+            if not isinstance(value, int | float):
+                print(f"Ошибка при оценке правил {condition_type}: нечисловое значение {value!r}")
+                continue
+            for group in groups:
+                positions.extend(group.matching(value))
+
+        if self._keyword_positions or self._description_positions:
+            positions.extend(self._match_description(str(weather_data.get("description", "")).lower()))
+
+        rules = self.rules
+        positions.extend(
+            position
+            for position in self._fallback
+            if rules[position].id not in skip and _evaluate_safely(rules[position], weather_data)
+        )
+        if skip:
+            positions = [position for position in positions if rules[position].id not in skip]
+
+        if len(positions) * 16 < len(rules):
+            positions.sort()
+            return [rules[position] for position in positions]
+
+        # Сработала заметная доля правил: отметки и один проход по списку быстрее сортировки
+        marks = bytearray(len(rules))
+        for position in positions:
+            marks[position] = 1
+        return list(compress(rules, marks))
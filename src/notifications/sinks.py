@@ -0,0 +1,139 @@
+"""Получатели уведомлений для очереди доставки (см. dispatch.py).
+
+Получатель принимает пачку уведомлений целиком: файл открывается один раз на пачку,
+вебхук получает один POST-запрос, рабочий стол — одно всплывающее окно.
+Ошибка доставки — любое исключение из deliver(): очередь повторит пачку.
+"""
+
+import json
+import shutil
+import subprocess  # noqa: S404 - notify-send/osascript для уведомлений рабочего стола
+import sys
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+from src.core.config_loader import Config
+
+NOTIFICATIONS_LOG_PATH = Path(__file__).parent.parent.parent / "data" / "notifications" / "notifications.jsonl"
+
+
+@dataclass(slots=True, frozen=True)
+class NotificationEvent:
+    """Выданное уведомление, передаваемое получателям."""
+
+    rule_id: int
+    rule_name: str
+    priority: int
+    icon: str
+    city: str
+    message: str
+    history_id: int | None
+    created_at: datetime
+    user_id: int | None = None  # Подписчик; None — общие правила
+
+    def to_dict(self) -> dict:
+        """Словарь для JSON (время в ISO 8601)."""
+        return {**asdict(self), "created_at": self.created_at.isoformat(timespec="seconds")}
+
+
+class NotificationSink:
+    """Базовый получатель уведомлений."""
+
+    name = "sink"
+
+    def deliver(self, batch: list[NotificationEvent]) -> None:
+        """Доставляет пачку уведомлений. При ошибке выбрасывает исключение."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Освобождает ресурсы получателя."""
+
+
+class JsonlSink(NotificationSink):
+    """Дописывает уведомления в файл JSONL (одна строка на уведомление)."""
+
+    name = "jsonl"
+
+    def __init__(self, path: Path = NOTIFICATIONS_LOG_PATH):
+        self.path = path
+
+    def deliver(self, batch: list[NotificationEvent]) -> None:
+        lines = "".join(json.dumps(event.to_dict(), ensure_ascii=False) + "\n" for event in batch)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+class WebhookSink(NotificationSink):
+    """Отправляет пачку уведомлений одним POST-запросом: {"notifications": [...]}."""
+
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self._session = requests.Session()  # Соединение переиспользуется между пачками
+
+    def deliver(self, batch: list[NotificationEvent]) -> None:
+        response = self._session.post(
+            self.url, json={"notifications": [event.to_dict() for event in batch]}, timeout=self.timeout
+        )
+        response.raise_for_status()
+
+    def close(self) -> None:
+        self._session.close()
+
+
+class DesktopSink(NotificationSink):
+    """Показывает уведомления на рабочем столе (notify-send в Linux, osascript в macOS)."""
+
+    name = "desktop"
+
+    def __init__(self):
+        if sys.platform == "darwin":
+            self._command = shutil.which("osascript")
+        else:
+            self._command = shutil.which("notify-send")
+        if self._command is None:
+            raise ValueError("Не найдена программа для уведомлений рабочего стола (notify-send или osascript)")
+
+    def deliver(self, batch: list[NotificationEvent]) -> None:
+        # Пачка — одно окно, чтобы не засыпать рабочий стол всплывающими уведомлениями
+        title = f"Погода: {batch[0].city}" if len(batch) == 1 else f"Погода: {len(batch)} уведомлений"
+        body = "\n".join(event.message for event in batch)
+        if sys.platform == "darwin":
+            script = f"display notification {json.dumps(body)} with title {json.dumps(title)}"
+            command = [self._command, "-e", script]
+        else:
+            command = [self._command, "--app-name=Weather Parser", title, body]
+        subprocess.run(command, check=True, timeout=10, capture_output=True)  # noqa: S603
+
+
+SINK_NAMES = ("jsonl", "webhook", "desktop")
+
+
+def build_sinks(config: Config) -> list[NotificationSink]:
+    """Создает получателей, перечисленных в NOTIFICATION_SINKS.
+
+    Получатель, который нельзя создать (нет программы уведомлений или адреса вебхука),
+    пропускается с предупреждением.
+    """
+    sinks: list[NotificationSink] = []
+    for name in config.notification_sinks:
+        try:
+            if name == "jsonl":
+                sinks.append(JsonlSink())
+            elif name == "webhook":
+                if not config.notification_webhook_url:
+                    raise ValueError("не задан NOTIFICATION_WEBHOOK_URL")
+                sinks.append(WebhookSink(config.notification_webhook_url, timeout=config.timeout))
+            elif name == "desktop":
+                sinks.append(DesktopSink())
+            else:
+                raise ValueError(f"неизвестный получатель, доступны: {', '.join(SINK_NAMES)}")
+        except ValueError as e:
+            print(f"⚠️ Получатель уведомлений {name} отключен: {e}")
+    return sinks
@@ -0,0 +1,50 @@
+"""Подписки пользователей: наблюдение города проверяется один раз для всех подписчиков.
+
+Для каждого города строится один RuleIndex по объединению наборов правил, на которые
+в нем подписаны. Города с одинаковым составом наборов используют общий индекс.
+Сработавшее правило набора раздается всем подписчикам набора в городе, поэтому
+стоимость проверки растет с числом городов и сработавших правил, а не с произведением
+пользователей на правила.
+"""
+
+from src.database.db_manager import DatabaseManager
+from src.database.models import NotificationRule
+from src.notifications.rule_index import RuleIndex
+
+
+class SubscriptionIndex:
+    """Индексы правил по городам подписок и подписчики наборов правил."""
+
+    def __init__(self, subscriptions: dict[str, dict[int, list[int]]], rules: dict[int, list[NotificationRule]]):
+        """Строит индексы.
+
+        Args:
+            subscriptions: Город -> набор правил -> пользователи
+            rules: Набор правил -> активные правила набора
+        """
+        self.subscriptions = subscriptions
+        self.city_indexes: dict[str, RuleIndex] = {}
+        indexes: dict[frozenset[int], RuleIndex] = {}
+        for city, rule_sets in subscriptions.items():
+            key = frozenset(rule_sets)
+            index = indexes.get(key)
+            if index is None:
+                combined = [rule for rule_set_id in key for rule in rules.get(rule_set_id, ())]
+                combined.sort(key=lambda rule: (rule.priority, rule.id))
+                index = indexes[key] = RuleIndex(combined)
+            self.city_indexes[city] = index
+        self.index_count = len(indexes)
+
+    @classmethod
+    def load(cls, db_manager: DatabaseManager) -> "SubscriptionIndex":
+        """Загружает подписки и правила подписанных наборов из базы данных."""
+        return cls(db_manager.get_subscriptions(), db_manager.get_subscribed_rules())
+
+    @property
+    def cities(self) -> list[str]:
+        """Города, на которые есть подписки."""
+        return list(self.subscriptions)
+
+    def subscribers(self, city: str, rule: NotificationRule) -> list[int]:
+        """Пользователи, получающие уведомление правила по городу."""
+        return self.subscriptions[city].get(rule.rule_set_id, [])
@@ -0,0 +1,283 @@
+"""Скользящие окна по наблюдениям города: условия правил на тенденцию погоды.
+
+Условие окна записывается в condition_type как "поле:статистика:окно", например
+"pressure:delta:3h" — изменение давления за 3 часа (мм рт. ст.), "temperature:anomaly:7d" —
+отклонение температуры от среднего за 7 дней. Статистики:
+
+- mean, min, max — среднее, минимум и максимум за окно;
+- delta — последнее значение минус самое раннее в окне;
+- anomaly — последнее значение минус среднее за окно;
+- ewma — экспоненциальное сглаживание с постоянной времени, равной окну.
+
+Окна ведутся в памяти для каждого города и обновляются за O(1) на наблюдение
+(амортизированно): сумма для среднего, монотонные очереди для минимума и максимума.
+Окно, которое понадобилось правилам впервые (или после перезапуска), один раз
+восстанавливается из weather_history; дальше история на каждое наблюдение не читается.
+"""
+
+import math
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any
+
+from src.database.db_manager import DatabaseManager
+from src.database.recent import to_micros
+from src.utils.pressure_converter import HPA_TO_MMHG_RATIO
+
+WINDOW_FIELDS = ("temperature", "feels_like", "humidity", "pressure", "wind_speed")
+WINDOW_STATS = ("mean", "min", "max", "delta", "anomaly", "ewma")
+WINDOW_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+# Окна длиннее не ведутся: восстановление из истории читало бы слишком много записей
+MAX_WINDOW_SECONDS = 31 * 86400
+
+# Сглаживание восстанавливается по стольким постоянным времени истории: вклад более
+# ранних наблюдений меньше e^-5 (<1%)
+EWMA_HISTORY_SPANS = 5
+
+# delta и anomaly имеют смысл, когда в окне есть хотя бы два наблюдения
+MIN_TREND_SAMPLES = 2
+
+MICROS_PER_SECOND = 1_000_000
+
+_CONDITION_PATTERN = re.compile(r"([a-z_]+):([a-z]+):(\d+)([mhd])")
+
+
+@dataclass(frozen=True, slots=True)
+class WindowSpec:
+    """Условие окна: поле наблюдения, статистика и длина окна в секундах."""
+
+    field: str
+    stat: str
+    seconds: int
+
+    @property
+    def key(self) -> tuple[str, int]:
+        """Окно, из которого берется статистика (у сглаживания — свое)."""
+        return self.field, self.seconds
+
+    @property
+    def history_seconds(self) -> int:
+        """Сколько секунд истории нужно, чтобы восстановить статистику."""
+        return self.seconds * EWMA_HISTORY_SPANS if self.stat == "ewma" else self.seconds
+
+
+@lru_cache(maxsize=1024)
+def parse_window_condition(condition_type: str) -> WindowSpec | None:
+    """
+    Разбирает условие окна вида "pressure:delta:3h".
+
+    Args:
+        condition_type: Тип условия правила
+
+    Returns:
+        Описание окна или None, если это не условие окна (или оно некорректно)
+    """
+    match = _CONDITION_PATTERN.fullmatch(condition_type)
+    if match is None:
+        return None
+    field_name, stat, amount, unit = match.groups()
+    seconds = int(amount) * WINDOW_UNITS[unit]
+    if field_name not in WINDOW_FIELDS or stat not in WINDOW_STATS or not 0 < seconds <= MAX_WINDOW_SECONDS:
+        return None
+    return WindowSpec(field_name, stat, seconds)
+
+
+def sample_value(field_name: str, value: float) -> float:
+    """Значение поля в единицах правил: давление — в мм рт. ст. (без округления)."""
+    return value * HPA_TO_MMHG_RATIO if field_name == "pressure" else float(value)
+
+
+class SlidingWindow:
+    """Наблюдения за последние seconds секунд: среднее, минимум, максимум и изменение за O(1)."""
+
+    __slots__ = ("span", "last_micros", "_samples", "_minima", "_maxima", "_sum")
+
+    def __init__(self, seconds: int):
+        self.span = seconds * MICROS_PER_SECOND
+        self.last_micros = 0
+        self._samples: deque[tuple[int, float]] = deque()
+        # Монотонные очереди: кандидаты в минимум (возрастают) и максимум (убывают)
+        self._minima: deque[tuple[int, float]] = deque()
+        self._maxima: deque[tuple[int, float]] = deque()
+        self._sum = 0.0
+
+    def add(self, micros: int, value: float) -> None:
+        """Добавляет наблюдение (время не раньше предыдущего) и вытесняет вышедшие из окна."""
+        self._samples.append((micros, value))
+        self._sum += value
+        self.last_micros = micros
+        minima, maxima = self._minima, self._maxima
+        while minima and minima[-1][1] >= value:
+            minima.pop()
+        minima.append((micros, value))
+        while maxima and maxima[-1][1] <= value:
+            maxima.pop()
+        maxima.append((micros, value))
+
+        since = micros - self.span
+        samples = self._samples
+        while samples[0][0] < since:
+            _, evicted = samples.popleft()
+            self._sum -= evicted
+        while minima[0][0] < since:
+            minima.popleft()
+        while maxima[0][0] < since:
+            maxima.popleft()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def value(self, stat: str) -> float | None:
+        """Статистика окна; None, если наблюдений для нее недостаточно."""
+        samples = self._samples
+        if not samples:
+            return None
+        if stat == "min":
+            return self._minima[0][1]
+        if stat == "max":
+            return self._maxima[0][1]
+        if stat == "delta":
+            return samples[-1][1] - samples[0][1] if len(samples) >= MIN_TREND_SAMPLES else None
+        mean = self._sum / len(samples)
+        if stat == "anomaly":
+            return samples[-1][1] - mean if len(samples) >= MIN_TREND_SAMPLES else None
+        return mean
+
+
+class Ewma:
+    """Экспоненциальное сглаживание неравномерного ряда с постоянной времени seconds."""
+
+    __slots__ = ("span", "value", "last_micros")
+
+    def __init__(self, seconds: int):
+        self.span = seconds * MICROS_PER_SECOND
+        self.value: float | None = None
+        self.last_micros = 0
+
+    def add(self, micros: int, value: float) -> None:
+        if self.value is None:
+            self.value = value
+        else:
+            # Вес нового наблюдения растет с паузой после предыдущего
+            alpha = 1 - math.exp(-(micros - self.last_micros) / self.span)
+            self.value += alpha * (value - self.value)
+        self.last_micros = micros
+
+
+@dataclass(slots=True)
+class _CityWindows:
+    """Окна одного города."""
+
+    last_micros: int = 0
+    windows: dict[tuple[str, int], SlidingWindow] = field(default_factory=dict)
+    averages: dict[tuple[str, int], Ewma] = field(default_factory=dict)
+
+
+class WindowStatistics:
+    """Окна по городам для условий правил."""
+
+    def __init__(self, db_manager: DatabaseManager):
+        """Создает пустые окна.
+
+        Args:
+            db_manager: Менеджер БД, из истории которого восстанавливаются окна
+        """
+        self.db_manager = db_manager
+        self._cities: dict[str, _CityWindows] = {}
+        self._rules_version = -1  # Версия правил, для которой накоплены окна
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        city: str,
+        timestamp: datetime,
+        weather_data: dict[str, Any],
+        conditions: dict[str, WindowSpec],
+        rules_version: int = 0,
+    ) -> dict[str, float | None]:
+        """Учитывает наблюдение города и возвращает значения условий окон.
+
+        Наблюдение уже должно быть сохранено в истории: окно, которого еще нет в памяти,
+        восстанавливается из истории вместе с ним.
+
+        Окна города ведутся для объединения условий всех вызывающих (общие правила и наборы
+        правил подписок) и убираются только при смене версии правил: тогда нужные новым
+        правилам окна восстанавливаются из истории при следующих наблюдениях.
+
+        Args:
+            city: Город наблюдения (как в истории)
+            timestamp: Время наблюдения
+            weather_data: Данные о погоде
+            conditions: Условия окон правил: condition_type -> описание окна
+            rules_version: Версия правил, из которых взяты условия
+
+        Returns:
+            Словарь condition_type -> значение (None, если наблюдений недостаточно)
+        """
+        micros = to_micros(timestamp)
+        with self._lock:
+            if rules_version > self._rules_version:
+                # Версия растет монотонно: индексы, перестроенные позже, не сбрасывают окна повторно
+                self._cities.clear()
+                self._rules_version = rules_version
+
+            state = self._cities.get(city)
+            keep = True
+            if state is not None and micros < state.last_micros:
+                # Наблюдение старше уже учтенных: окна на его момент собираются из истории и не запоминаются
+                del self._cities[city]
+                state, keep = None, False
+            if state is None:
+                state = _CityWindows()
+                if keep:
+                    self._cities[city] = state
+
+            self._restore(state, city, timestamp, [spec for spec in conditions.values() if not self._has(state, spec)])
+
+            if micros > state.last_micros:
+                for key, window in state.windows.items():
+                    if window.last_micros < micros:
+                        window.add(micros, sample_value(key[0], weather_data.get(key[0], 0)))
+                for key, average in state.averages.items():
+                    if average.last_micros < micros:
+                        average.add(micros, sample_value(key[0], weather_data.get(key[0], 0)))
+                state.last_micros = micros
+
+            return {
+                condition_type: (
+                    state.averages[spec.key].value if spec.stat == "ewma" else state.windows[spec.key].value(spec.stat)
+                )
+                for condition_type, spec in conditions.items()
+            }
+
+    def clear(self) -> None:
+        """Забывает все окна: следующие наблюдения восстановят их из истории."""
+        with self._lock:
+            self._cities.clear()
+
+    @staticmethod
+    def _has(state: _CityWindows, spec: WindowSpec) -> bool:
+        return spec.key in (state.averages if spec.stat == "ewma" else state.windows)
+
+    def _restore(self, state: _CityWindows, city: str, timestamp: datetime, specs: list[WindowSpec]) -> None:
+        """Восстанавливает новые окна из истории: один запрос на поле."""
+        by_field: dict[str, list[WindowSpec]] = {}
+        for spec in specs:
+            by_field.setdefault(spec.field, []).append(spec)
+
+        for field_name, field_specs in by_field.items():
+            history_seconds = max(spec.history_seconds for spec in field_specs)
+            since = timestamp - timedelta(seconds=history_seconds)
+            timestamps, values = self.db_manager.get_history_series(city, field_name, since, until=timestamp)
+            samples = [(to_micros(t), sample_value(field_name, v)) for t, v in zip(timestamps, values, strict=True)]
+
+            for spec in field_specs:
+                target = Ewma(spec.seconds) if spec.stat == "ewma" else SlidingWindow(spec.seconds)
+                for micros, value in samples:
+                    target.add(micros, value)
+                (state.averages if spec.stat == "ewma" else state.windows)[spec.key] = target
@@ -0,0 +1,53 @@
+"""Прореживание временных рядов для графиков: Largest-Triangle-Three-Buckets (LTTB)."""
+
+
+def lttb(xs: list[float], ys: list[float], threshold: int) -> tuple[list[float], list[float]]:
+    """
+    Прореживает ряд до threshold точек, сохраняя его форму (пики, провалы, перепады).
+
+    Первая и последняя точки сохраняются. Остальные точки делятся на threshold - 2
+    корзины; из каждой корзины берется точка, образующая треугольник наибольшей
+    площади с уже выбранной точкой предыдущей корзины и средней точкой следующей.
+    В отличие от усреднения, выбросы не сглаживаются и не пропадают с графика.
+
+    Args:
+        xs: Координаты по оси X в порядке возрастания
+        ys: Значения
+        threshold: Сколько точек оставить (меньше 3 — ряд не прореживается)
+
+    Returns:
+        Кортеж (координаты, значения) выбранных точек
+    """
+    count = len(xs)
+    if threshold < 3 or count <= threshold:
+        return list(xs), list(ys)
+
+    sampled_x, sampled_y = [xs[0]], [ys[0]]
+    bucket_size = (count - 2) / (threshold - 2)
+    selected = 0
+
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # Средняя точка следующей корзины (для последней корзины — последняя точка ряда)
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        next_count = next_end - end
+        average_x = sum(xs[end:next_end]) / next_count
+        average_y = sum(ys[end:next_end]) / next_count
+
+        # Площадь треугольника без множителя 1/2: для выбора максимума он не нужен
+        ax, ay = xs[selected], ys[selected]
+        dx, dy = ax - average_x, average_y - ay
+        best_area = -1.0
+        for index in range(start, end):
+            area = abs(dx * (ys[index] - ay) + (xs[index] - ax) * dy)
+            if area > best_area:
+                best_area, selected = area, index
+
+        sampled_x.append(xs[selected])
+        sampled_y.append(ys[selected])
+
+    sampled_x.append(xs[-1])
+    sampled_y.append(ys[-1])
+    return sampled_x, sampled_y
@@ -0,0 +1,52 @@
+"""Координаты: проверка, расстояние между точками и привязка к сетке ячеек."""
+
+import math
+
+EARTH_RADIUS_KM = 6371.0
+# Километров в одном градусе широты (и долготы на экваторе)
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def validate_coordinates(latitude: float, longitude: float) -> None:
+    """
+    Проверяет, что координаты лежат в допустимых пределах.
+
+    Raises:
+        ValueError: Широта вне [-90, 90] или долгота вне [-180, 180]
+    """
+    if not -90 <= latitude <= 90:
+        raise ValueError(f"Широта должна быть от -90 до 90, получено: {latitude}")
+    if not -180 <= longitude <= 180:
+        raise ValueError(f"Долгота должна быть от -180 до 180, получено: {longitude}")
+
+
+def distance_km(latitude1: float, longitude1: float, latitude2: float, longitude2: float) -> float:
+    """Расстояние между двумя точками по поверхности Земли в километрах (формула гаверсинусов)."""
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    half_dphi = (phi2 - phi1) / 2
+    half_dlambda = math.radians(longitude2 - longitude1) / 2
+    a = math.sin(half_dphi) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def grid_cell(latitude: float, longitude: float, cell_degrees: float) -> tuple[int, int]:
+    """Ячейка сетки с шагом cell_degrees, в которую попадает точка: (номер по широте, номер по долготе).
+
+    Долгота приводится к [-180, 180): меридианы 180 и -180 попадают в одну ячейку.
+    Северный полюс относится к последнему ряду ячеек, а не к ряду за полюсом.
+    """
+    longitude = (longitude + 180) % 360 - 180
+    last_row = math.ceil(90 / cell_degrees) - 1
+    return min(math.floor(latitude / cell_degrees), last_row), math.floor(longitude / cell_degrees)
+
+
+def cell_center(cell: tuple[int, int], cell_degrees: float) -> tuple[float, float]:
+    """Координаты центра ячейки сетки (округлены до 6 знаков, ~10 см).
+
+    Крайние ячейки, если шаг не делит 90 или 180 нацело, выходят за полюс или меридиан 180:
+    они обрезаются по границе, и берется центр обрезанной ячейки.
+    """
+    row, column = cell
+    south, north = max(row * cell_degrees, -90), min((row + 1) * cell_degrees, 90)
+    west, east = max(column * cell_degrees, -180), min((column + 1) * cell_degrees, 180)
+    return round((south + north) / 2, 6), round((west + east) / 2, 6)
@@ -0,0 +1,322 @@
+"""Легкие метрики: счетчики и гистограммы с фиксированными корзинами.
+
+Метрики объявляются на уровне модулей и по умолчанию выключены: каждый вызов
+сводится к проверке одного флага, а time() возвращает общий пустой контекст.
+После enable_metrics() значения копятся в памяти процесса и при выходе
+добавляются к файлу состояния data/metrics/metrics.json. Рядом пишется
+weather.prom в текстовом формате Prometheus (для textfile collector node_exporter).
+Отчет — команда weather-cli stats.
+
+Независимо от включения метрик, внутри trace() длительности всех этапов
+запоминаются в RequestTrace текущего запроса — для журнала медленных запросов.
+"""
+
+import atexit
+import json
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Generator
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any
+
+METRICS_PREFIX = "weather_"
+
+# Корзины в секундах: от десятков микросекунд (разбор, правила) до секунд (HTTP)
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0,
+)  # fmt: skip
+
+METRICS_DIR = Path(__file__).parent.parent.parent / "data" / "metrics"
+STATE_FILENAME = "metrics.json"
+PROMETHEUS_FILENAME = "weather.prom"
+
+_NULL_TIMER = nullcontext()
+
+
+class RequestTrace:
+    """Длительности этапов и атрибуты одного запроса погоды."""
+
+    __slots__ = ("started", "elapsed", "stages", "attributes")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.stages: dict[str, float] = {}  # имя гистограммы -> суммарные секунды
+        self.attributes: dict[str, Any] = {}
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+_current_trace: ContextVar[RequestTrace | None] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def trace() -> Generator[RequestTrace, None, None]:
+    """Собирает этапы запроса, выполняемого внутри блока (в текущем потоке)."""
+    request_trace = RequestTrace()
+    token = _current_trace.set(request_trace)
+    try:
+        yield request_trace
+    finally:
+        request_trace.elapsed = time.perf_counter() - request_trace.started
+        _current_trace.reset(token)
+
+
+def annotate(**attributes: Any) -> None:
+    """Добавляет атрибуты (размер ответа, число правил...) к текущему запросу, если он отслеживается."""
+    request_trace = _current_trace.get()
+    if request_trace is not None:
+        request_trace.attributes.update(attributes)
+
+
+class Counter:
+    """Монотонный счетчик с необязательными метками."""
+
+    __slots__ = ("name", "help", "_registry", "_values", "_lock")
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._registry = registry
+        self._values: dict[tuple[tuple[str, str], ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Увеличивает счетчик. Метки задаются именованными аргументами."""
+        if not self._registry.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (верхние границы, +Inf добавляется неявно)."""
+
+    __slots__ = ("name", "help", "buckets", "_registry", "_counts", "_sum", "_lock")
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._registry = registry
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Добавляет наблюдение."""
+        request_trace = _current_trace.get()
+        if request_trace is not None:
+            request_trace.add_stage(self.name, value)
+        if not self._registry.enabled:
+            return
+        index = bisect_left(self.buckets, value)  # Первая корзина с границей >= value
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self):
+        """Контекстный менеджер, измеряющий длительность блока в секундах."""
+        if not self._registry.enabled and _current_trace.get() is None:
+            return _NULL_TIMER
+        return _Timer(self)
+
+
+class _Timer:
+    """Замер длительности блока with для гистограммы."""
+
+    __slots__ = ("_histogram", "_started")
+
+    def __init__(self, histogram: Histogram):
+        self._histogram = histogram
+
+    def __enter__(self) -> None:
+        self._started = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self._histogram.observe(time.perf_counter() - self._started)
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса."""
+
+    def __init__(self):
+        self.enabled = False
+        self._metrics: dict[str, Counter | Histogram] = {}
+        self._lock = threading.Lock()
+        self._directory = METRICS_DIR
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        """Возвращает счетчик, создавая его при первом обращении."""
+        return self._register(name, lambda: Counter(self, name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Возвращает гистограмму, создавая ее при первом обращении."""
+        return self._register(name, lambda: Histogram(self, name, help_text, buckets))
+
+    def _register(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def enable(self, directory: Path | None = None) -> None:
+        """Включает сбор. Накопленное сохраняется при завершении процесса."""
+        if self.enabled:
+            return
+        if directory is not None:
+            self._directory = directory
+        self.enabled = True
+        atexit.register(self.save)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Значения, накопленные в этом процессе, в формате файла состояния."""
+        state: dict[str, Any] = {"counters": {}, "histograms": {}}
+        for metric in list(self._metrics.values()):
+            with metric._lock:
+                if isinstance(metric, Counter):
+                    if metric._values:
+                        state["counters"][metric.name] = {
+                            "help": metric.help,
+                            "values": [[dict(key), value] for key, value in metric._values.items()],
+                        }
+                elif any(metric._counts):
+                    state["histograms"][metric.name] = {
+                        "help": metric.help,
+                        "buckets": list(metric.buckets),
+                        "counts": list(metric._counts),
+                        "sum": metric._sum,
+                    }
+        return state
+
+    def save(self) -> None:
+        """Добавляет значения процесса к файлу состояния и обновляет файл Prometheus."""
+        current = self.snapshot()
+        if not current["counters"] and not current["histograms"]:
+            return
+
+        try:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            state = merge_states(load_state(self._directory), current)
+            (self._directory / STATE_FILENAME).write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+            (self._directory / PROMETHEUS_FILENAME).write_text(render_prometheus(state), encoding="utf-8")
+        except OSError as e:
+            print(f"⚠️ Не удалось сохранить метрики: {e}")
+            return
+
+        # Сохраненное больше не относится к процессу: повторный save() не задвоит значения
+        for metric in list(self._metrics.values()):
+            with metric._lock:
+                if isinstance(metric, Counter):
+                    metric._values.clear()
+                else:
+                    metric._counts = [0] * len(metric._counts)
+                    metric._sum = 0.0
+
+
+def load_state(directory: Path = METRICS_DIR) -> dict[str, Any]:
+    """Читает накопленное состояние (пустое, если файла нет или он поврежден)."""
+    try:
+        return json.loads((directory / STATE_FILENAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"counters": {}, "histograms": {}}
+
+
+def merge_states(base: dict[str, Any], extra: dict[str, Any]) -> dict[str, Any]:
+    """Складывает два состояния. Гистограмма с другими корзинами начинается заново."""
+    counters = {name: dict(data) for name, data in base.get("counters", {}).items()}
+    for name, data in extra["counters"].items():
+        stored = counters.get(name, {}).get("values", [])
+        values = {json.dumps(labels, sort_keys=True): value for labels, value in stored}
+        for labels, value in data["values"]:
+            key = json.dumps(labels, sort_keys=True)
+            values[key] = values.get(key, 0) + value
+        counters[name] = {"help": data["help"], "values": [[json.loads(k), v] for k, v in values.items()]}
+
+    histograms = {name: dict(data) for name, data in base.get("histograms", {}).items()}
+    for name, data in extra["histograms"].items():
+        stored = histograms.get(name)
+        if stored is None or stored["buckets"] != data["buckets"]:
+            histograms[name] = data
+            continue
+        histograms[name] = {
+            "help": data["help"],
+            "buckets": data["buckets"],
+            "counts": [a + b for a, b in zip(stored["counts"], data["counts"], strict=True)],
+            "sum": stored["sum"] + data["sum"],
+        }
+
+    return {"counters": counters, "histograms": histograms}
+
+
+def estimate_quantile(buckets: list[float], counts: list[int], q: float) -> float:
+    """Оценка квантиля по корзинам с линейной интерполяцией (как histogram_quantile в Prometheus)."""
+    total = sum(counts)
+    if not total:
+        return math.nan
+    rank = q * total
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(buckets, counts, strict=False):
+        if cumulative + count >= rank:
+            return lower + (bound - lower) * ((rank - cumulative) / count if count else 0)
+        cumulative += count
+        lower = bound
+    return buckets[-1]  # Значение в корзине +Inf: известна только нижняя граница
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def render_prometheus(state: dict[str, Any]) -> str:
+    """Текстовый формат Prometheus (exposition format 0.0.4)."""
+    lines = []
+    for name, data in sorted(state["counters"].items()):
+        full_name = f"{METRICS_PREFIX}{name}"
+        lines += [f"# HELP {full_name} {data['help']}", f"# TYPE {full_name} counter"]
+        lines += [f"{full_name}{_format_labels(labels)} {value:g}" for labels, value in data["values"]]
+
+    for name, data in sorted(state["histograms"].items()):
+        full_name = f"{METRICS_PREFIX}{name}"
+        lines += [f"# HELP {full_name} {data['help']}", f"# TYPE {full_name} histogram"]
+        cumulative = 0
+        for bound, count in zip([*data["buckets"], "+Inf"], data["counts"], strict=True):
+            cumulative += count
+            lines.append(f'{full_name}_bucket{{le="{bound}"}} {cumulative}')
+        lines += [f"{full_name}_sum {data['sum']:.6f}", f"{full_name}_count {cumulative}"]
+
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def enable_metrics(directory: Path | None = None) -> None:
+    """Включает сбор метрик в этом процессе."""
+    REGISTRY.enable(directory)
+
+
+def counter(name: str, help_text: str) -> Counter:
+    """Счетчик из общего реестра."""
+    return REGISTRY.counter(name, help_text)
+
+
+def histogram(name: str, help_text: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    """Гистограмма из общего реестра."""
+    return REGISTRY.histogram(name, help_text, buckets)
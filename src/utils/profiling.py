@@ -0,0 +1,76 @@
+"""Семплирующий профайлер с выводом в формате folded stacks для флеймграфов.
+
+Фоновый поток с заданным интервалом снимает стеки всех потоков процесса
+(sys._current_frames) и считает одинаковые стеки. Результат — строки
+"поток;функция (файл:строка);... количество", которые понимают flamegraph.pl,
+speedscope и inferno. В отличие от cProfile, профайлер не замедляет каждый вызов
+функции, поэтому подходит для замеров реальных запросов.
+"""
+
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+
+PROFILES_DIR = Path(__file__).parent.parent.parent / "data" / "profiles"
+
+
+class SamplingProfiler:
+    """Семплирующий профайлер. Используется как контекстный менеджер или через start()/stop()."""
+
+    def __init__(self, interval: float = 0.005):
+        """Создает профайлер.
+
+        Args:
+            interval: Интервал между снимками стеков в секундах
+        """
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter[str] = Counter()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "SamplingProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """Запускает поток семплирования."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Останавливает семплирование."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, str(thread_id)))
+                # ";" разделяет кадры в формате folded
+                self._stacks[";".join(name.replace(";", ":") for name in reversed(stack))] += 1
+            self.samples += 1
+
+    def write_folded(self, path: Path) -> Path:
+        """Записывает стеки в формате folded (по убыванию количества снимков)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
@@ -0,0 +1,61 @@
+"""Журнал медленных запросов погоды (JSONL, одна запись на запрос)."""
+
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from src.utils.metrics import RequestTrace
+
+SLOW_LOG_PATH = Path(__file__).parent.parent.parent / "data" / "logs" / "slow_requests.jsonl"
+
+
+class SlowRequestLog:
+    """Записывает запросы, обработка которых заняла больше порога.
+
+    Запись содержит длительности этапов (по именам гистограмм метрик, в мс), ожидание
+    блокировки SQLite и атрибуты запроса: город, размер ответа, количество правил и т.д.
+    """
+
+    def __init__(self, threshold_ms: int, path: Path = SLOW_LOG_PATH):
+        """Создает журнал.
+
+        Args:
+            threshold_ms: Порог в миллисекундах. 0 — журнал выключен
+            path: Файл журнала
+        """
+        self.threshold_ms = threshold_ms
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, request_trace: RequestTrace) -> bool:
+        """Записывает запрос, если он медленнее порога.
+
+        Returns:
+            True если запись добавлена в журнал
+        """
+        total_ms = request_trace.elapsed * 1000
+        if self.threshold_ms <= 0 or total_ms < self.threshold_ms:
+            return False
+
+        stages = request_trace.stages
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "total_ms": round(total_ms, 2),
+            "threshold_ms": self.threshold_ms,
+            "stages_ms": {name.removesuffix("_seconds"): round(seconds * 1000, 3) for name, seconds in stages.items()},
+            "sqlite_wait_ms": round(stages.get("sqlite_lock_wait_seconds", 0.0) * 1000, 3),
+            **request_trace.attributes,
+        }
+
+        try:
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            print(f"⚠️ Не удалось записать журнал медленных запросов: {e}")
+            return False
+
+        print(f"🐢 Медленный запрос: {total_ms:.0f} мс (порог {self.threshold_ms} мс), подробности в {self.path}")
+        return True
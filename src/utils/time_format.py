@@ -0,0 +1,20 @@
+"""Форматирование промежутков времени для вывода пользователю."""
+
+
+def format_age(seconds: int) -> str:
+    """
+    Возраст наблюдения в коротком виде: секунды, минуты или часы с минутами.
+
+    Args:
+        seconds: Возраст в секундах
+
+    Returns:
+        Строка вида "45 с", "12 мин" или "2 ч 5 мин"
+    """
+    if seconds < 60:
+        return f"{seconds} с"
+    minutes = seconds // 60
+    if minutes < 60:
+        return f"{minutes} мин"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} ч {minutes} мин" if minutes else f"{hours} ч"
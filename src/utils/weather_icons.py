@@ -0,0 +1,35 @@
+"""Модуль для подбора иконки по описанию погоды."""
+
+
+def get_weather_icon(description: str) -> str:
+    """
+    Возвращает иконку для описания погоды.
+
+    Args:
+        description: Описание погоды
+
+    Returns:
+        Строка с иконкой
+    """
+    desc_lower = description.lower()
+
+    if "ясно" in desc_lower or "солнечно" in desc_lower:
+        return "☀️"
+    elif "облачно" in desc_lower:
+        return "☁️"
+    elif "дождь" in desc_lower:
+        if "ливень" in desc_lower or "сильный" in desc_lower:
+            return "🌧️"
+        return "🌦️"
+    elif "снег" in desc_lower:
+        return "❄️"
+    elif "туман" in desc_lower:
+        return "🌫️"
+    elif "гроза" in desc_lower or "гроз" in desc_lower:
+        return "⛈️"
+    elif "ветер" in desc_lower:
+        return "💨"
+    elif "пасмурно" in desc_lower:
+        return "☁️"
+    else:
+        return "🌤️"
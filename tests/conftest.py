@@ -0,0 +1,66 @@
+"""Общие фикстуры тестов: временная база данных и записи истории."""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.database.db_manager import DatabaseManager, get_db_manager
+from src.database.models import WeatherRecord
+from src.notifications.engine import get_notification_engine
+
+# Виджеты Qt создаются без окон и дисплея
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+START = datetime(2024, 1, 1)
+DESCRIPTIONS = ("ясно", "облачно с прояснениями", "небольшой дождь", "снег", "туман")
+
+
+def make_record(i: int, city: str = "Москва", step: timedelta = timedelta(minutes=10)) -> WeatherRecord:
+    """Запись номер i: время идет с шагом step, значения меняются предсказуемо."""
+    return WeatherRecord(
+        city=city,
+        timestamp=START + i * step,
+        temperature=round(-5 + (i * 7) % 30 + (i % 10) / 10, 1),
+        feels_like=round(-8 + (i * 7) % 30, 1),
+        humidity=40 + (i * 13) % 60,
+        pressure=990 + (i * 11) % 50,
+        description=DESCRIPTIONS[i % len(DESCRIPTIONS)],
+        wind_speed=round((i * 3) % 15 + 0.5, 1),
+        response_time_ms=100 + i % 50,
+    )
+
+
+def save_records(db: DatabaseManager, records: list[WeatherRecord]) -> list[int]:
+    """Сохраняет записи одной транзакцией, заполняя их id."""
+    for record in records:
+        record.description_id = db.get_or_create_description(record.description).id
+    ids = db.save_weather_records(records)
+    for record, history_id in zip(records, ids, strict=True):
+        record.id = history_id
+    return ids
+
+
+@pytest.fixture
+def db(tmp_path) -> DatabaseManager:
+    """Менеджер пустой временной базы данных."""
+    return DatabaseManager(str(tmp_path / "weather.db"))
+
+
+@pytest.fixture
+def shared_db(tmp_path, monkeypatch) -> DatabaseManager:
+    """Временная база данных как общий экземпляр get_db_manager (для сервисов и GUI)."""
+    monkeypatch.setenv("WEATHER_DB_PATH", str(tmp_path / "weather.db"))
+    get_db_manager.cache_clear()
+    get_notification_engine.cache_clear()
+    yield get_db_manager()
+    get_db_manager.cache_clear()
+    get_notification_engine.cache_clear()
+
+
+@pytest.fixture(scope="session")
+def qt_app():
+    """Приложение Qt для моделей и виджетов."""
+    from PyQt6.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
@@ -0,0 +1,19 @@
+"""Консольная версия: настройки из .env для команд, работающих только с БД."""
+
+from src import cli
+from src.database.db_manager import get_db_manager
+
+
+def test_db_commands_use_dotenv_settings(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "from_dotenv.db"
+    monkeypatch.delenv("WEATHER_DB_PATH", raising=False)
+    monkeypatch.setattr(cli, "load_dotenv", lambda: monkeypatch.setenv("WEATHER_DB_PATH", str(path)))
+    get_db_manager.cache_clear()
+    try:
+        cli.main(["check-counters", "--dry-run"])
+        assert str(get_db_manager().db_path) == str(path)
+    finally:
+        get_db_manager.cache_clear()
+
+    assert path.exists()
+    assert "Счетчики согласованы" in capsys.readouterr().out
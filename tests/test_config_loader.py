@@ -0,0 +1,48 @@
+"""Разбор числовых настроек из переменных окружения."""
+
+import pytest
+
+from src.core.config_loader import ConfigLoader
+
+
+@pytest.fixture
+def env(monkeypatch):
+    """Окружение с ключом API и без .env проекта."""
+    monkeypatch.setattr("src.core.config_loader.load_dotenv", lambda: None)
+    monkeypatch.setenv("OPENWEATHER_API_KEY", "test")
+    return monkeypatch
+
+
+def test_integer_settings_have_defaults(env):
+    config = ConfigLoader.load()
+    assert config.timeout == 30
+    assert config.slow_request_ms == 2000
+    assert config.daemon_refresh_seconds == 600
+    assert config.breaker_open_seconds == 30
+    assert config.geo_cache_seconds == 600
+
+
+@pytest.mark.parametrize(
+    ("name", "value", "message"),
+    [
+        ("REQUEST_TIMEOUT", "abc", "Некорректное значение REQUEST_TIMEOUT: 'abc'"),
+        ("REQUEST_TIMEOUT", "0", "REQUEST_TIMEOUT должен быть положительным числом"),
+        ("SLOW_REQUEST_MS", "-1", "SLOW_REQUEST_MS должен быть неотрицательным числом"),
+        ("DAEMON_REFRESH_SECONDS", "1.5", "Должно быть целым числом"),
+        ("BREAKER_OPEN_SECONDS", "-5", "BREAKER_OPEN_SECONDS должен быть положительным числом"),
+        ("STALE_MAX_SECONDS", "-1", "STALE_MAX_SECONDS должен быть неотрицательным числом"),
+        ("GEO_CACHE_SECONDS", "0", "GEO_CACHE_SECONDS должен быть положительным числом"),
+    ],
+)
+def test_invalid_integer_settings_are_rejected(env, name, value, message):
+    env.setenv(name, value)
+    with pytest.raises(ValueError, match=message):
+        ConfigLoader.load()
+
+
+def test_zero_disables_optional_settings(env):
+    env.setenv("SLOW_REQUEST_MS", "0")
+    env.setenv("STALE_MAX_SECONDS", "0")
+    config = ConfigLoader.load()
+    assert config.slow_request_ms == 0
+    assert config.stale_max_seconds == 0
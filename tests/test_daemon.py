@@ -0,0 +1,95 @@
+"""Демон погоды и его тонкий клиент: эндпоинты, попадания и промахи кэша."""
+
+import json
+import threading
+
+import pytest
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+from benchmarks.bench_json_parse import make_current
+from src.core.config_loader import Config
+from src.core.daemon import WeatherDaemon
+from src.core.daemon_client import DaemonClient, DaemonError
+
+
+@pytest.fixture
+def api_calls():
+    """Города запросов к API; "down" в списке — API недоступно."""
+    return []
+
+
+@pytest.fixture
+def daemon(shared_db, monkeypatch, api_calls):
+    from src.core.weather_service import WeatherService
+
+    service = WeatherService(Config(api_key="test", city="Moscow"))
+
+    def fetch_weather_raw(city=None, coordinates=None):
+        if "down" in api_calls:
+            raise RequestsConnectionError("нет соединения")
+        api_calls.append(city)
+        return json.dumps(make_current(len(api_calls))).encode()
+
+    monkeypatch.setattr(service.api_client, "fetch_weather_raw", fetch_weather_raw)
+    server = WeatherDaemon(service, "127.0.0.1", 0, refresh_seconds=60)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(daemon):
+    host, port = daemon.server_address[:2]
+    client = DaemonClient(f"http://{host}:{port}", timeout=5)
+    yield client
+    client.close()
+
+
+def test_weather_is_served_from_cache(daemon, client, api_calls, capsys):
+    assert client.is_available()
+
+    weather, record, _, cached = client.get_weather()
+    assert not cached
+    assert api_calls == ["Moscow"]
+    assert record.id is not None
+    assert record.temperature == weather.temperature
+
+    # Город сравнивается без учета регистра и пробелов: ответ берется из кэша
+    again = client.get_weather(" moscow ")
+    assert again[3]
+    assert again[1] == record
+    assert api_calls == ["Moscow"]
+
+    client.get_weather("Kazan")
+    assert api_calls == ["Moscow", "Kazan"]
+
+    # Устаревший ответ запрашивается заново
+    daemon.refresh_seconds = 0
+    assert not client.get_weather()[3]
+    assert api_calls == ["Moscow", "Kazan", "Moscow"]
+    capsys.readouterr()
+
+
+def test_history_and_notifications(daemon, client, capsys):
+    assert client.get_history() == []
+    _, record, notifications, _ = client.get_weather()
+
+    # Новая запись сбрасывает кэш чтений истории
+    assert client.get_history(limit=5) == [record]
+    assert client.get_notifications() == notifications
+    capsys.readouterr()
+
+
+def test_errors(client, api_calls, capsys):
+    with pytest.raises(DaemonError, match="Неизвестный эндпоинт"):
+        client._get("/unknown")
+    with pytest.raises(DaemonError, match="lat и lon"):
+        client._get("/weather", lat=55.75)
+
+    api_calls.append("down")
+    with pytest.raises(DaemonError, match="Ошибка при обращении к серверу погоды"):
+        client.get_weather("Moscow")
+    assert client.is_available()  # Соединение после ошибки переиспользуется
+    capsys.readouterr()
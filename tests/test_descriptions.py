@@ -0,0 +1,48 @@
+"""Словарь описаний погоды и флаги ключевых слов правил "contains"."""
+
+from src.database.db_manager import DatabaseManager
+from src.database.models import NotificationRule
+from src.notifications.evaluator import ConditionEvaluator
+
+
+def add_contains_rule(db: DatabaseManager, keyword: str) -> NotificationRule:
+    with db._get_connection() as conn:
+        conn.execute(
+            "INSERT INTO notification_rules (name, condition_type, operator, threshold_value, message_template) "
+            "VALUES (?, 'description', 'contains', ?, ?)",
+            (keyword, keyword, keyword),
+        )
+    return NotificationRule(name=keyword, condition_type="description", operator="contains", threshold_value=keyword)
+
+
+def matches(rule: NotificationRule, description) -> bool:
+    return ConditionEvaluator.evaluate(rule, {"description": description.text_lower, "description_entry": description})
+
+
+def test_flags_are_computed_once_per_description(db):
+    rain = db.get_or_create_description("Небольшой дождь")
+    assert db.get_or_create_description("Небольшой дождь") is rain
+    assert rain.match_keyword("дождь") is True
+    assert rain.match_keyword("снег") is False
+    assert rain.match_keyword("неизвестное слово") is None
+
+
+def test_description_from_process_with_older_keywords(tmp_path):
+    path = str(tmp_path / "weather.db")
+    old = DatabaseManager(path)  # Процесс, запущенный до появления правила с новым словом
+    rule = add_contains_rule(old, "град")
+    new = DatabaseManager(path)
+    assert "град" in new._description_keywords
+    assert "град" not in old._description_keywords
+
+    # Старый процесс сохраняет описание без бита нового слова
+    hail = old.get_or_create_description("Гроза с градом")
+    loaded = new.get_description(hail.id)
+    assert loaded.match_keyword("град") is None
+    assert matches(rule, loaded)
+    assert loaded.match_keyword("дождь") is False  # Слова, известные старому процессу, проверены по флагам
+
+    # Флаги таких описаний пересчитываются при следующем запуске
+    restarted = DatabaseManager(path).get_description(hail.id)
+    assert restarted.match_keyword("град") is True
+    assert matches(rule, restarted)
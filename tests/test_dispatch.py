@@ -0,0 +1,125 @@
+"""Доставка уведомлений: пачки, повторы, отбрасывание при переполнении очереди."""
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from benchmarks.mock_owm_server import MockOwmServer, MockSettings
+from src.notifications.dispatch import NotificationDispatcher
+from src.notifications.sinks import JsonlSink, NotificationEvent, NotificationSink, WebhookSink
+
+
+def make_events(count: int) -> list[NotificationEvent]:
+    return [
+        NotificationEvent(i, f"Правило {i}", 1, "🔔", "Москва", f"Сообщение {i}", i, datetime(2024, 1, 1))
+        for i in range(count)
+    ]
+
+
+class RecordingSink(NotificationSink):
+    """Получатель, который запоминает пачки; первые failures доставок и все, пока закрыт gate, не проходят."""
+
+    name = "recording"
+
+    def __init__(self, failures: int = 0):
+        self.batches: list[list[NotificationEvent]] = []
+        self.attempts = 0
+        self.failures = failures
+        self.gate = threading.Event()
+        self.gate.set()
+        self.closed = False
+
+    def deliver(self, batch: list[NotificationEvent]) -> None:
+        self.gate.wait(5)
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError("получатель недоступен")
+        self.batches.append(batch)
+
+    def close(self) -> None:
+        self.closed = True
+
+    @property
+    def delivered(self) -> list[int]:
+        return [event.rule_id for batch in self.batches for event in batch]
+
+
+@pytest.fixture
+def webhook_server():
+    """Локальная замена вебхука (POST /webhook поддельного сервера OpenWeatherMap)."""
+    server = MockOwmServer(settings=MockSettings())
+    server.start()
+    yield server
+    server.stop()
+
+
+def webhook_url(server: MockOwmServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/webhook"
+
+
+def test_webhook_receives_batches(webhook_server):
+    dispatcher = NotificationDispatcher([WebhookSink(webhook_url(webhook_server))], batch_size=10, flush_interval=0.05)
+    assert dispatcher.publish(make_events(25)) == 0
+    dispatcher.close()
+
+    assert webhook_server.webhook_notifications == 25
+    assert 3 <= webhook_server.webhook_batches < 25
+
+
+def test_failed_webhook_batch_is_given_up_after_retries(webhook_server, capsys):
+    webhook_server.settings.error_rate = 1.0
+    dispatcher = NotificationDispatcher(
+        [WebhookSink(webhook_url(webhook_server))], flush_interval=0.01, max_retries=2, retry_delay=0.001
+    )
+    dispatcher.publish(make_events(3))
+    dispatcher.close()
+
+    assert webhook_server.webhook_notifications == 0
+    assert "Не удалось доставить уведомления (webhook, 3 шт.)" in capsys.readouterr().out
+
+
+def test_failed_batch_is_retried():
+    sink = RecordingSink(failures=2)
+    dispatcher = NotificationDispatcher([sink], flush_interval=0.01, max_retries=3, retry_delay=0.001)
+    dispatcher.publish(make_events(5))
+    dispatcher.close()
+
+    assert sink.attempts == 3
+    assert sink.delivered == list(range(5))
+    assert sink.closed
+
+
+def test_full_queue_drops_instead_of_blocking():
+    sink = RecordingSink()
+    sink.gate.clear()  # Получатель завис на первой пачке
+    dispatcher = NotificationDispatcher([sink], queue_size=5, batch_size=1, flush_interval=0, put_timeout=0.01)
+
+    started = time.perf_counter()
+    dropped = dispatcher.publish(make_events(20))
+    assert time.perf_counter() - started < 1
+
+    # В очереди 5 уведомлений и, возможно, одно уже у получателя
+    assert dropped in (14, 15)
+    sink.gate.set()
+    dispatcher.close()
+    assert sink.delivered == list(range(20 - dropped))
+
+
+def test_slow_sink_does_not_delay_others(tmp_path):
+    slow, fast = RecordingSink(), JsonlSink(tmp_path / "notifications.jsonl")
+    slow.gate.clear()
+    dispatcher = NotificationDispatcher([slow, fast], flush_interval=0.01)
+    dispatcher.publish(make_events(4))
+
+    deadline = time.monotonic() + 5
+    while not fast.path.exists() or len(fast.path.read_text(encoding="utf-8").splitlines()) < 4:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert slow.delivered == []
+
+    slow.gate.set()
+    dispatcher.close()
+    assert slow.delivered == list(range(4))
@@ -0,0 +1,62 @@
+"""Прореживание рядов LTTB."""
+
+import math
+import random
+
+import pytest
+
+from src.utils.downsample import lttb
+
+
+def reference_lttb(xs, ys, threshold):
+    """Прямолинейная реализация LTTB по описанию алгоритма (с площадью треугольника)."""
+    count = len(xs)
+    if threshold < 3 or count <= threshold:
+        return list(xs), list(ys)
+    every = (count - 2) / (threshold - 2)
+    selected, result = 0, [0]
+    for bucket in range(threshold - 2):
+        start, end = int(bucket * every) + 1, int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, count)
+        average_x = sum(xs[end:next_end]) / (next_end - end)
+        average_y = sum(ys[end:next_end]) / (next_end - end)
+        areas = [
+            abs(
+                (xs[selected] - average_x) * (ys[i] - ys[selected])
+                - (xs[selected] - xs[i]) * (average_y - ys[selected])
+            )
+            / 2
+            for i in range(start, end)
+        ]
+        selected = start + areas.index(max(areas))
+        result.append(selected)
+    result.append(count - 1)
+    return [xs[i] for i in result], [ys[i] for i in result]
+
+
+@pytest.mark.parametrize(("count", "threshold"), [(10, 3), (1000, 100), (1001, 37), (5000, 1000)])
+def test_matches_reference(count, threshold):
+    rng = random.Random(count)
+    xs = sorted(rng.uniform(0, 1e6) for _ in range(count))
+    ys = [math.sin(x / 1e4) * 10 + rng.gauss(0, 1) for x in xs]
+
+    sampled = lttb(xs, ys, threshold)
+    assert sampled == reference_lttb(xs, ys, threshold)
+    assert len(sampled[0]) == threshold
+    assert sampled[0][0] == xs[0] and sampled[0][-1] == xs[-1]
+    assert sampled[0] == sorted(sampled[0])
+
+
+def test_short_series_is_returned_as_is():
+    xs, ys = [1.0, 2.0, 3.0], [5.0, 6.0, 7.0]
+    assert lttb(xs, ys, 10) == (xs, ys)
+    assert lttb(xs * 2, ys * 2, 2) == (xs * 2, ys * 2)
+
+
+def test_spike_survives_downsampling():
+    xs = [float(i) for i in range(10_000)]
+    ys = [0.0] * 10_000
+    ys[4321] = 100.0
+    sampled_x, sampled_y = lttb(xs, ys, 50)
+    assert 100.0 in sampled_y
+    assert sampled_x[sampled_y.index(100.0)] == 4321.0
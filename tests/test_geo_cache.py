@@ -0,0 +1,122 @@
+"""Кэш погоды по ячейкам сетки и запросы погоды по координатам."""
+
+import json
+import time
+
+import pytest
+
+from benchmarks.bench_json_parse import make_current
+from src.core.config_loader import Config
+from src.core.data_parser import WeatherData
+from src.core.geo_cache import CellWeather, GeoWeatherCache
+from src.database.models import WeatherRecord
+from tests.conftest import make_record, save_records
+
+
+def entry(fetched_at: float | None = None) -> CellWeather:
+    weather_data = WeatherData(
+        temperature=1.0, feels_like=0.0, humidity=50, pressure=1000, description="ясно", wind_speed=1.0, city="Москва"
+    )
+    return CellWeather(
+        weather_data, WeatherRecord(city="Москва"), [], time.monotonic() if fetched_at is None else fetched_at
+    )
+
+
+def test_points_of_one_cell_share_entry():
+    cache = GeoWeatherCache(cell_degrees=0.05, ttl_seconds=60)
+    cell = cache.cell(55.751, 37.617)
+    assert cache.cell(55.7999, 37.6499) == cell
+    assert cache.cell(55.7501, 37.6501) != cell
+    assert cache.center(cell) == (55.775, 37.625)
+
+    cached = entry()
+    cache.put(cell, cached)
+    assert cache.get(cache.cell(55.76, 37.63)) is cached
+
+
+def test_entry_expires_after_ttl():
+    cache = GeoWeatherCache(cell_degrees=0.05, ttl_seconds=60)
+    cache.put((1, 1), entry(time.monotonic() - 61))
+    assert cache.get((1, 1)) is None
+
+
+def test_least_recently_used_cell_is_evicted():
+    cache = GeoWeatherCache(cell_degrees=0.05, ttl_seconds=60, max_cells=2)
+    cache.put((1, 1), entry())
+    cache.put((2, 2), entry())
+    cache.get((1, 1))
+    cache.put((3, 3), entry())
+
+    assert len(cache) == 2
+    assert cache.get((2, 2)) is None
+    assert cache.get((1, 1)) is not None
+
+
+@pytest.mark.parametrize("cell_degrees", [0.05, 0.07, 0.3, 0.7, 1 / 3])
+def test_cells_at_poles_and_antimeridian(cell_degrees):
+    cache = GeoWeatherCache(cell_degrees=cell_degrees, ttl_seconds=60)
+    for latitude in (-90, -89.99, 0, 89.99, 90):
+        assert cache.cell(latitude, 180) == cache.cell(latitude, -180)
+        for longitude in (-180, -179.99, 0, 179.99, 180):
+            cell = cache.cell(latitude, longitude)
+            center_latitude, center_longitude = cache.center(cell)
+            # Центр лежит на Земле и в своей же ячейке: по нему запрашивается API
+            assert -90 <= center_latitude <= 90
+            assert -180 <= center_longitude <= 180
+            assert abs(center_latitude - latitude) <= cell_degrees / 2 + 1e-6
+            assert cache.cell(center_latitude, center_longitude) == cell
+
+
+def test_nearest_record_across_antimeridian(db):
+    (history_id,) = save_records(db, [make_record(0, city="Провидения")])
+    db.save_observation_location(history_id, 65.0, 179.999)
+
+    record, distance = db.find_nearest_record(65.0, -179.999, radius_km=5)
+    assert record.id == history_id
+    assert distance < 0.1
+    assert db.find_nearest_record(65.0, 179.9, radius_km=5)[0].id == history_id
+    assert db.find_nearest_record(65.0, -179.0, radius_km=5) is None
+
+
+@pytest.fixture
+def service(shared_db, monkeypatch):
+    """Сервис погоды, у которого вместо API — счетчик запросов с готовым ответом."""
+    from src.core.weather_service import WeatherService
+
+    service = WeatherService(Config(api_key="test", slow_request_ms=0, geo_cache_seconds=600))
+    service.api_calls = []
+
+    def fetch_weather_raw(city=None, coordinates=None):
+        service.api_calls.append(coordinates)
+        return json.dumps(make_current(len(service.api_calls))).encode()
+
+    monkeypatch.setattr(service.api_client, "fetch_weather_raw", fetch_weather_raw)
+    return service
+
+
+def test_cell_is_requested_once(service, capsys):
+    weather_data, record, _, cached = service.get_weather_at(55.751, 37.617)
+    assert not cached
+    assert service.api_calls == [(55.775, 37.625)]  # Запрос идет по центру ячейки
+
+    again, again_record, _, cached = service.get_weather_at(55.76, 37.63)
+    assert cached
+    assert again == weather_data
+    assert again_record.id == record.id
+    assert len(service.api_calls) == 1
+
+    service.get_weather_at(55.70, 37.63)  # Соседняя ячейка
+    assert len(service.api_calls) == 2
+    capsys.readouterr()
+
+
+def test_cell_is_taken_from_history_of_other_process(service, capsys):
+    _, record, _, _ = service.get_weather_at(55.751, 37.617)
+    service.geo_cache = GeoWeatherCache(service.config.geo_cell_degrees, service.config.geo_cache_seconds)
+
+    weather_data, stored, _, cached = service.get_weather_at(55.76, 37.63)
+    assert cached
+    assert stored.id == record.id
+    assert weather_data.temperature == record.temperature
+    assert len(service.api_calls) == 1
+    capsys.readouterr()
@@ -0,0 +1,140 @@
+"""Keyset-пагинация истории: в БД и в ленивой модели таблицы GUI."""
+
+import pytest
+
+from src.database.db_manager import HISTORY_SORT_COLUMNS, history_sort_key
+from tests.conftest import make_record, save_records
+
+SORT_KEYS = {
+    "timestamp": lambda record: (record.timestamp, record.id),
+    "temperature": lambda record: (record.temperature, record.id),
+    "description": lambda record: (record.description, record.id),
+}
+
+
+def fill(db, count: int) -> None:
+    save_records(db, [make_record(i, city=("Москва", "Сочи")[i % 2]) for i in range(count)])
+
+
+def read_pages(db, limit: int, order_by: str, descending: bool) -> list[int]:
+    """id всех записей, прочитанных страницами по limit."""
+    ids, after = [], None
+    while True:
+        page = db.get_records_page(limit, after, order_by, descending)
+        ids.extend(record.id for record in page)
+        if len(page) < limit:
+            return ids
+        after = history_sort_key(page[-1], order_by)
+
+
+@pytest.mark.parametrize("order_by", list(HISTORY_SORT_COLUMNS))
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_cover_history_once(db, order_by, descending):
+    fill(db, 103)
+    records = db.get_recent_records(limit=0)
+    expected = [record.id for record in sorted(records, key=SORT_KEYS[order_by], reverse=descending)]
+
+    assert read_pages(db, 10, order_by, descending) == expected
+
+
+@pytest.mark.parametrize("order_by", list(HISTORY_SORT_COLUMNS))
+def test_pages_of_snapshot_ignore_new_records(db, order_by):
+    fill(db, 103)
+    expected = read_pages(db, 10, order_by, descending=True)
+    max_id = db.get_max_history_id()
+
+    ids, after, written = [], None, 103
+    while True:
+        page = db.get_records_page(10, after, order_by, True, max_id=max_id)
+        ids.extend(record.id for record in page)
+        if len(page) < 10:
+            break
+        after = history_sort_key(page[-1], order_by)
+        # Другой процесс сохраняет записи с любым временем, в том числе старше прочитанных
+        save_records(db, [make_record(written), make_record(-written)])
+        written += 1
+
+    assert ids == expected
+    assert db.get_max_history_id() > max_id
+
+
+def test_unknown_sort_column_is_rejected(db):
+    with pytest.raises(ValueError):
+        db.get_records_page(10, order_by="city; DROP TABLE weather_history")
+
+
+@pytest.fixture
+def model(shared_db, qt_app, monkeypatch):
+    """Модель таблицы истории с маленькими страницами и кэшем на две страницы."""
+    from src.gui import history_model
+
+    monkeypatch.setattr(history_model, "HISTORY_PAGE_SIZE", 10)
+    monkeypatch.setattr(history_model, "HISTORY_MAX_CACHED_PAGES", 2)
+    fill(shared_db, 45)
+    model = history_model.HistoryTableModel()
+    model.refresh()
+    return model
+
+
+def scroll(model) -> list[int]:
+    """Подгружает все строки и читает их по порядку, как при прокрутке таблицы."""
+    from PyQt6.QtCore import QModelIndex
+
+    while model.canFetchMore(QModelIndex()):
+        model.fetchMore(QModelIndex())
+    return [model.record_at(row).id for row in range(model.rowCount())]
+
+
+def test_model_reloads_evicted_pages(model, shared_db):
+    expected = [record.id for record in shared_db.get_recent_records(limit=0)]
+
+    assert scroll(model) == expected
+    assert len(model._pages) == 2
+    # Первые страницы давно вытеснены и перечитываются по ключу начала
+    assert scroll(model) == expected
+
+
+def test_model_sorts_in_sqlite(model, shared_db):
+    from PyQt6.QtCore import Qt
+
+    model.sort(1, Qt.SortOrder.AscendingOrder)
+    records = shared_db.get_recent_records(limit=0)
+
+    assert scroll(model) == [record.id for record in sorted(records, key=SORT_KEYS["temperature"])]
+
+
+def test_model_ignores_records_of_other_processes(model, shared_db):
+    expected = scroll(model)
+    # Демон или загрузка архива сохраняет записи новее и старше уже показанных
+    save_records(shared_db, [make_record(100 + i) for i in range(15)] + [make_record(-1 - i) for i in range(15)])
+
+    assert model.rowCount() == len(expected)
+    assert scroll(model) == expected
+
+
+def test_prepend_after_eviction(model, shared_db):
+    from src.gui import history_model
+
+    scroll(model)
+    cached = list(model._pages)
+    assert 0 not in cached  # Первая страница вытеснена
+
+    new_ids = []
+    for i in range(history_model.HISTORY_PAGE_SIZE + 3):
+        record = make_record(100 + i)
+        save_records(shared_db, [record])
+        model.prepend_record(record)
+        model.prepend_record(record)  # Повторное добавление той же записи игнорируется
+        new_ids.append(record.id)
+        if i == 0:
+            assert list(model._pages) == cached  # Добавление не перечитывает страницы
+        if i == 2:
+            save_records(shared_db, [make_record(-50)])  # Запись другого процесса (загрузка архива)
+
+    # Таблица показывает снимок последней перезагрузки и добавленные после нее записи
+    shown = {record.id for record in model._head}
+    expected = [r.id for r in shared_db.get_recent_records(limit=0) if r.id <= model._max_id or r.id in shown]
+    rows = scroll(model)
+    assert rows == expected
+    assert len(rows) == len(set(rows))
+    assert set(new_ids) <= set(rows)
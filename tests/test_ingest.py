@@ -0,0 +1,72 @@
+"""Загрузка архивов ответов API: позиция в файле и продолжение после сбоя."""
+
+import json
+from datetime import datetime
+
+import pytest
+
+from benchmarks.bench_json_parse import make_current, make_group
+from src.core.ingest import ArchiveIngestor
+
+ROWS = 50
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """JSONL-архив из ROWS ответов /weather и одной испорченной строки."""
+    path = tmp_path / "archive.jsonl"
+    lines = [json.dumps(make_current(i)) for i in range(ROWS)]
+    lines.insert(ROWS // 2, "{не json")
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def make_ingestor(db) -> ArchiveIngestor:
+    return ArchiveIngestor(db, workers=1, chunk_lines=7, batch_rows=10)
+
+
+def test_archive_files_are_loaded(db, archive, tmp_path):
+    (tmp_path / "group.json").write_text(json.dumps(make_group(3)))
+
+    stats = make_ingestor(db).ingest([tmp_path])
+    assert (stats.files, stats.rows, stats.errors) == (2, ROWS + 3, 1)
+    assert db.get_record_count() == ROWS + 3
+
+    # Время записи — из поля dt ответа, а не время загрузки
+    first = min(db.get_recent_records(limit=0), key=lambda record: record.timestamp)
+    assert first.timestamp == datetime.fromtimestamp(make_current(0)["dt"])
+    assert db.get_ingest_checkpoint(str(archive.resolve())) == archive.stat().st_size
+
+
+def test_interrupted_ingest_resumes_after_last_batch(db, archive, monkeypatch):
+    ingestor = make_ingestor(db)
+    flush = ingestor._flush
+    flushes = 0
+
+    def failing_flush(batch, source, byte_offset):
+        nonlocal flushes
+        flushes += 1
+        if flushes == 3:
+            raise KeyboardInterrupt  # Загрузку прервали посреди файла
+        return flush(batch, source, byte_offset)
+
+    monkeypatch.setattr(ingestor, "_flush", failing_flush)
+    with pytest.raises(KeyboardInterrupt):
+        ingestor.ingest([archive])
+
+    source = str(archive.resolve())
+    saved = db.get_record_count()
+    offset = db.get_ingest_checkpoint(source)
+    assert 0 < saved < ROWS
+    assert 0 < offset < archive.stat().st_size
+
+    # Повторный запуск продолжает с сохраненной позиции: записи не дублируются и не теряются
+    stats = make_ingestor(db).ingest([archive])
+    assert stats.rows == ROWS - saved
+    assert db.get_record_count() == ROWS
+    assert len({(r.city, r.timestamp) for r in db.get_recent_records(limit=0)}) == ROWS
+
+    # Загруженный файл пропускается, а --restart загружает его заново
+    assert make_ingestor(db).ingest([archive]).rows == 0
+    assert make_ingestor(db).ingest([archive], restart=True).rows == ROWS
+    assert db.get_record_count() == 2 * ROWS
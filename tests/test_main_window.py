@@ -0,0 +1,133 @@
+"""Отмена фонового запроса погоды в главном окне."""
+
+import json
+import threading
+import time
+
+import pytest
+
+from benchmarks.bench_json_parse import make_current
+from src.core.config_loader import Config
+
+
+@pytest.fixture
+def window(shared_db, qt_app, monkeypatch):
+    """Главное окно без демона; API отвечает, когда тест откроет release."""
+    from src.core.weather_service import WeatherService
+    from src.gui import main_window
+
+    release = threading.Event()
+
+    def make_service():
+        service = WeatherService(Config(api_key="test", slow_request_ms=0))
+
+        def fetch_weather_raw(city=None, coordinates=None):
+            release.wait(5)
+            return json.dumps(make_current()).encode()
+
+        service.api_client.fetch_weather_raw = fetch_weather_raw
+        return service
+
+    monkeypatch.setattr(main_window, "get_daemon_client", lambda: None)
+    monkeypatch.setattr(main_window, "WeatherService", make_service)
+    window = main_window.WeatherWindow()
+    window.release = release
+    yield window
+    release.set()
+    window.thread_pool.waitForDone(5000)
+
+
+def wait_until(qt_app, condition) -> None:
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        qt_app.processEvents()
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_cancel_waits_for_worker(window, qt_app, shared_db, capsys):
+    from src.gui.constants import STATUS_CANCELLED
+
+    window.on_get_weather_clicked()
+    worker = window.active_worker
+    window.on_cancel_clicked()
+
+    # Поток еще ждет ответа сервера: новый запрос нельзя запустить поверх него
+    assert window.active_worker is worker
+    assert not window.get_weather_btn.isEnabled()
+    assert not window.cancel_btn.isEnabled()
+    window.on_get_weather_clicked()
+    assert window.active_worker is worker
+
+    window.release.set()
+    wait_until(qt_app, lambda: window.active_worker is None)
+    assert window.get_weather_btn.isEnabled()
+    assert window.status_label.text() == STATUS_CANCELLED
+    assert shared_db.get_record_count() == 0  # Отмена до сохранения: запись не сохранена
+    capsys.readouterr()
+
+
+def test_record_saved_before_cancel_reaches_table(window, qt_app, shared_db, monkeypatch, capsys):
+    from src.gui.constants import STATUS_CANCELLED
+
+    window.release.set()
+    saving = threading.Event()
+    saved = threading.Event()
+    process_weather_data = window.weather_service.process_weather_data
+
+    def slow_process(weather_data, response_time):
+        saving.set()
+        saved.wait(5)
+        return process_weather_data(weather_data, response_time)
+
+    monkeypatch.setattr(window.weather_service, "process_weather_data", slow_process)
+    window.on_get_weather_clicked()
+    assert saving.wait(5)
+    window.on_cancel_clicked()
+    saved.set()
+
+    wait_until(qt_app, lambda: window.active_worker is None)
+    assert window.status_label.text() == STATUS_CANCELLED
+    assert shared_db.get_record_count() == 1
+    assert window.history_total == 1
+    assert window.history_model.rowCount() == 1
+    capsys.readouterr()
+
+
+def test_refreshed_record_reaches_table(window, qt_app, capsys):
+    from src.gui.constants import STATUS_SUCCESS
+
+    window.release.set()
+    window.on_get_weather_clicked()
+    wait_until(qt_app, lambda: window.active_worker is None)
+    assert window.history_model.rowCount() == 1
+
+    # Ответ из истории показывается сразу, свежая запись приходит после фонового обновления
+    window.weather_service.config.stale_max_seconds = 3600
+    window.on_get_weather_clicked()
+    wait_until(qt_app, lambda: window.history_model.rowCount() == 2)
+    assert window.history_total == 2
+    assert window.status_label.text() == STATUS_SUCCESS
+    capsys.readouterr()
+
+
+def test_geo_cache_hit_returns_cached_record(window, qt_app, capsys):
+    from src.gui.constants import STATUS_CACHED
+
+    window.release.set()
+    window.weather_service.config.latitude, window.weather_service.config.longitude = 55.751, 37.617
+    results = []
+    on_fetch_finished = window.on_fetch_finished
+    window.on_fetch_finished = lambda result: (results.append(result), on_fetch_finished(result))
+    for _ in range(2):
+        window.on_get_weather_clicked()
+        wait_until(qt_app, lambda: window.active_worker is None)
+
+    first, second = results
+    assert not first.cached
+    assert second.cached
+    assert second.record.id == first.record.id
+    assert window.status_label.text() == STATUS_CACHED
+    assert window.history_model.rowCount() == 1
+    assert window.history_total == 1
+    capsys.readouterr()
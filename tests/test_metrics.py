@@ -0,0 +1,91 @@
+"""Метрики этапов: накопление между процессами и экспорт в формате Prometheus."""
+
+import math
+
+import pytest
+
+from src.utils.metrics import (
+    MetricsRegistry,
+    estimate_quantile,
+    load_state,
+    merge_states,
+    render_prometheus,
+    trace,
+)
+
+
+def make_registry(directory) -> MetricsRegistry:
+    """Включенный реестр без сохранения при выходе из процесса."""
+    registry = MetricsRegistry()
+    registry.enabled = True
+    registry._directory = directory
+    return registry
+
+
+def test_disabled_metrics_collect_nothing_but_trace_stages():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Запросы")
+    parse = registry.histogram("parse_seconds", "Разбор", buckets=(0.1, 1.0))
+    requests.inc()
+    parse.observe(0.5)
+    assert registry.snapshot() == {"counters": {}, "histograms": {}}
+
+    # Этапы запроса для журнала медленных запросов запоминаются и без метрик
+    with trace() as request_trace:
+        parse.observe(0.2)
+        parse.observe(0.3)
+    assert request_trace.stages == {"parse_seconds": pytest.approx(0.5)}
+    assert registry.snapshot()["histograms"] == {}
+
+
+def test_saves_of_several_processes_add_up(tmp_path):
+    for calls in (3, 4):
+        registry = make_registry(tmp_path)  # Каждый процесс начинает с пустого реестра
+        requests = registry.counter("requests_total", "Запросы")
+        parse = registry.histogram("parse_seconds", "Разбор", buckets=(0.1, 1.0))
+        for _ in range(calls):
+            requests.inc(source="cli")
+            parse.observe(0.05)
+        parse.observe(5.0)
+        registry.save()
+        registry.save()  # Повторное сохранение не задваивает значения
+
+    state = load_state(tmp_path)
+    assert state["counters"]["requests_total"]["values"] == [[{"source": "cli"}, 7]]
+    histogram = state["histograms"]["parse_seconds"]
+    assert histogram["counts"] == [7, 0, 2]
+    assert histogram["sum"] == pytest.approx(7 * 0.05 + 2 * 5.0)
+    assert (tmp_path / "weather.prom").read_text() == render_prometheus(state)
+
+
+def test_histogram_with_new_buckets_starts_over():
+    old = {"counters": {}, "histograms": {"x": {"help": "", "buckets": [1.0], "counts": [5, 1], "sum": 9.0}}}
+    new = {"counters": {}, "histograms": {"x": {"help": "", "buckets": [0.5, 1.0], "counts": [1, 0, 0], "sum": 0.1}}}
+    assert merge_states(old, new)["histograms"]["x"] == new["histograms"]["x"]
+
+
+def test_prometheus_text_format():
+    state = {
+        "counters": {"errors_total": {"help": "Ошибки", "values": [[{"kind": 'say "hi"\n'}, 2]]}},
+        "histograms": {"http_seconds": {"help": "HTTP", "buckets": [0.1, 1.0], "counts": [1, 2, 3], "sum": 12.5}},
+    }
+    assert render_prometheus(state).splitlines() == [
+        "# HELP weather_errors_total Ошибки",
+        "# TYPE weather_errors_total counter",
+        'weather_errors_total{kind="say \\"hi\\"\\n"} 2',
+        "# HELP weather_http_seconds HTTP",
+        "# TYPE weather_http_seconds histogram",
+        'weather_http_seconds_bucket{le="0.1"} 1',
+        'weather_http_seconds_bucket{le="1.0"} 3',
+        'weather_http_seconds_bucket{le="+Inf"} 6',
+        "weather_http_seconds_sum 12.500000",
+        "weather_http_seconds_count 6",
+    ]
+
+
+def test_quantile_interpolates_within_bucket():
+    buckets, counts = [0.1, 0.2, 0.4], [0, 10, 10, 0]
+    assert estimate_quantile(buckets, counts, 0.5) == pytest.approx(0.2)
+    assert estimate_quantile(buckets, counts, 0.75) == pytest.approx(0.3)
+    assert estimate_quantile(buckets, [0, 0, 0, 4], 0.5) == 0.4  # В корзине +Inf известна только нижняя граница
+    assert math.isnan(estimate_quantile(buckets, [0, 0, 0, 0], 0.5))
@@ -0,0 +1,158 @@
+"""Кольцевые буферы последних наблюдений: порядок, вытеснение и сверка с SQLite."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.database.db_manager import DatabaseManager
+from src.database.recent import ObservationRing, RecentObservations, from_micros, to_micros
+from tests.conftest import START, make_record, save_records
+
+
+def fields(records):
+    return [
+        (r.id, r.city, r.timestamp, r.temperature, r.humidity, r.pressure, r.description, r.created_at) for r in records
+    ]
+
+
+def select_newest(db: DatabaseManager, limit: int, city: str | None = None):
+    """Последние записи прямым запросом, без буферов."""
+    with db._get_connection() as conn:
+        return db._select_recent_records(conn, limit, city)
+
+
+def test_micros_round_trip():
+    timestamp = datetime(2024, 5, 17, 13, 45, 12, 345678)
+    assert from_micros(to_micros(timestamp)) == timestamp
+
+
+def test_ring_keeps_newest_records_in_order():
+    ring = ObservationRing(4)
+    for i in range(10):
+        record = make_record(i)
+        record.id, record.description_id = i + 1, 1
+        assert ring.append(record, 0, to_micros(record.timestamp))
+
+    assert len(ring) == 4 and ring.is_full
+    assert [ring.ids[slot] for slot in ring.newest_slots(10)] == [10, 9, 8, 7]
+    assert ring.oldest_timestamp == to_micros(make_record(6).timestamp)
+
+    timestamps, values = ring.series("humidity", to_micros(make_record(8).timestamp))
+    assert list(timestamps) == [to_micros(make_record(i).timestamp) for i in (8, 9)]
+    assert list(values) == [make_record(i).humidity for i in (8, 9)]
+
+
+def test_ring_rejects_older_observation():
+    ring = ObservationRing(4)
+    newer, older = make_record(5), make_record(2)
+    newer.id, older.id = 1, 2
+    newer.description_id = older.description_id = 1
+    assert ring.append(newer, 0, to_micros(newer.timestamp))
+    assert not ring.append(older, 0, to_micros(older.timestamp))
+    assert len(ring) == 1
+
+
+@pytest.mark.parametrize(("value", "message"), [("abc", "Должно быть целым числом"), ("-1", "неотрицательным")])
+def test_invalid_buffer_size_is_rejected(tmp_path, monkeypatch, value, message):
+    monkeypatch.setenv("RECENT_HISTORY_SIZE", value)
+    with pytest.raises(ValueError, match=message):
+        DatabaseManager(str(tmp_path / "weather.db"))
+
+
+def test_zero_buffer_size_reads_sqlite(tmp_path, monkeypatch):
+    monkeypatch.setenv("RECENT_HISTORY_SIZE", "0")
+    db = DatabaseManager(str(tmp_path / "weather.db"))
+    assert db.recent is None
+    db.save_weather_record(make_record(0))
+    assert fields(db.get_recent_records(5)) == fields(select_newest(db, 5))
+
+
+def test_evicted_cities_release_their_names():
+    recent = RecentObservations(capacity=2, max_cities=3, describe=str)
+    records = []
+    for i in range(100):
+        record = make_record(i, city=f"Город {i}")
+        record.id, record.description_id = i + 1, 1
+        records.append(record)
+        recent.load_city(record.city, [record])
+        if i == 0:
+            single_city_memory = recent.memory_bytes()
+    recent.load_all(records[:-3:-1])
+
+    # Живых городов не больше max_cities + capacity, таблица не растет с каждым новым городом
+    assert len(recent.city_names) <= 2 * (3 + 2) + 2
+    assert recent.memory_bytes() > single_city_memory
+    assert [r.city for r in recent.records(recent.get_all(), 2)] == ["Город 99", "Город 98"]
+    for i in (97, 98, 99):
+        assert [r.city for r in recent.records(recent.get_city(f"Город {i}"), 1)] == [f"Город {i}"]
+
+    recent.clear()
+    assert recent.city_names == []
+
+
+def test_recent_records_match_sqlite(tmp_path, monkeypatch):
+    monkeypatch.setenv("RECENT_HISTORY_SIZE", "8")
+    db = DatabaseManager(str(tmp_path / "weather.db"))
+    for i in range(30):
+        db.save_weather_record(make_record(i, city=("Москва", "Сочи")[i % 2]))
+
+    assert fields(db.get_recent_records(5)) == fields(select_newest(db, 5))
+    assert fields(db.get_recent_city_records("Сочи", 8)) == fields(select_newest(db, 8, "Сочи"))
+
+    # Новые записи попадают в уже загруженные буферы
+    for i in range(30, 35):
+        db.save_weather_record(make_record(i, city="Сочи"))
+    assert fields(db.get_recent_records(8)) == fields(select_newest(db, 8))
+    assert fields(db.get_recent_city_records("Сочи", 8)) == fields(select_newest(db, 8, "Сочи"))
+
+
+def test_same_time_records_keep_sqlite_order(tmp_path, monkeypatch):
+    monkeypatch.setenv("RECENT_HISTORY_SIZE", "8")
+    db = DatabaseManager(str(tmp_path / "weather.db"))
+    same_time = [make_record(0, city=city) for city in ("Москва", "Сочи", "Казань")]
+    save_records(db, same_time)  # Опрос городов подписок: одно время у нескольких записей
+    db.get_recent_records(8)
+    save_records(db, [make_record(0, city="Омск")])
+
+    from_memory = db.get_recent_records(8)
+    assert [r.city for r in from_memory] == ["Омск", "Казань", "Сочи", "Москва"]
+    assert fields(from_memory) == fields(db.get_recent_records(0))
+    assert all(r.created_at is not None for r in from_memory)
+
+
+def test_older_record_resets_buffers(tmp_path, monkeypatch):
+    monkeypatch.setenv("RECENT_HISTORY_SIZE", "8")
+    db = DatabaseManager(str(tmp_path / "weather.db"))
+    for i in range(10, 20):
+        db.save_weather_record(make_record(i))
+    db.get_recent_records(8)
+
+    # Запись из архива старше всех в буфере: буфер перечитывается из базы
+    db.save_weather_record(make_record(0))
+    assert fields(db.get_recent_records(8)) == fields(select_newest(db, 8))
+
+
+def test_writes_from_other_connection_are_noticed(tmp_path, monkeypatch):
+    monkeypatch.setenv("RECENT_HISTORY_SIZE", "8")
+    monkeypatch.setattr("src.database.db_manager.RECENT_SYNC_SECONDS", 0)
+    path = str(tmp_path / "weather.db")
+    db, other = DatabaseManager(path), DatabaseManager(path)
+    for i in range(5):
+        db.save_weather_record(make_record(i))
+    db.get_recent_records(8)
+
+    other.save_weather_record(make_record(5))
+    assert db.get_recent_records(1)[0].timestamp == make_record(5).timestamp
+
+
+def test_recent_series_covers_window(tmp_path, monkeypatch):
+    monkeypatch.setenv("RECENT_HISTORY_SIZE", "16")
+    db = DatabaseManager(str(tmp_path / "weather.db"))
+    for i in range(40):
+        db.save_weather_record(make_record(i))
+
+    since = START + timedelta(minutes=10 * 30)
+    assert db.get_recent_series("Москва", "pressure", since) == db.get_history_series("Москва", "pressure", since)
+    # Период длиннее буфера читается из базы
+    since = START + timedelta(minutes=10 * 5)
+    assert db.get_recent_series("Москва", "pressure", since) == db.get_history_series("Москва", "pressure", since)
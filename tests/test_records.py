@@ -0,0 +1,42 @@
+"""Позиционное декодирование строк истории и правил в записи со слотами."""
+
+from dataclasses import fields
+
+from src.database.db_manager import RULE_COLUMNS, WEATHER_COLUMNS, decode_rule_row
+from src.database.models import NotificationRule, WeatherRecord
+from tests.conftest import make_record, save_records
+
+
+def test_history_rows_decode_to_saved_records(db):
+    records = [make_record(i, city=("Москва", "Сочи")[i % 2]) for i in range(20)]
+    save_records(db, records)
+
+    decoded = {record.id: record for record in db.get_recent_records(limit=0)}
+    assert decoded.keys() == {record.id for record in records}
+    for record in records:
+        got = decoded[record.id]
+        assert got.created_at is not None
+        got.created_at = None
+        assert got == record
+
+
+def test_decoded_strings_are_shared(db):
+    save_records(db, [make_record(i) for i in range(10)])
+    records = db.get_recent_records(limit=0)
+
+    # Город интернируется, описание берется из словаря: одинаковые строки — один объект
+    assert all(record.city is records[0].city for record in records)
+    by_text = {}
+    for record in records:
+        assert by_text.setdefault(record.description, record.description) is record.description
+
+
+def test_column_lists_match_models(db):
+    assert len(WEATHER_COLUMNS.split(",")) == len(fields(WeatherRecord)) - 1  # Текст описания — из словаря
+    assert len(RULE_COLUMNS.split(",")) == len(fields(NotificationRule))
+
+    rules = db.get_active_notification_rules()
+    with db._get_connection() as conn:
+        row = conn.execute(f"SELECT {RULE_COLUMNS} FROM notification_rules WHERE id = ?", (rules[0].id,)).fetchone()  # noqa: S608
+    assert decode_rule_row(tuple(row)) == rules[0]
+    assert rules[0].is_active is True
@@ -0,0 +1,173 @@
+"""Дублирование медленных запросов и circuit breaker клиента API."""
+
+import itertools
+import threading
+import time
+
+import pytest
+
+from src.core.api_client import OpenWeatherMapApiClient
+from src.core.config_loader import Config
+from src.core.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    HEDGE_MIN_DELAY_SECONDS,
+    LATENCY_MIN_SAMPLES,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyTracker,
+)
+
+
+def test_hedge_delay_is_percentile_of_recent_latencies():
+    latencies = LatencyTracker(window=100)
+    for i in range(LATENCY_MIN_SAMPLES - 1):
+        latencies.add(1.0 + i)
+    assert latencies.hedge_delay(95) is None  # Мало ответов для перцентиля
+
+    latencies = LatencyTracker(window=100)
+    for i in range(250):
+        latencies.add(i / 100)  # В окне остаются последние 100: от 1.5 до 2.49 с
+    assert latencies.hedge_delay(90) == pytest.approx(2.4)
+    assert latencies.hedge_delay(100) == pytest.approx(2.49)
+
+
+def test_hedge_delay_has_lower_bound():
+    latencies = LatencyTracker()
+    for _ in range(LATENCY_MIN_SAMPLES):
+        latencies.add(0.001)
+    assert latencies.hedge_delay(99) == HEDGE_MIN_DELAY_SECONDS
+
+
+def request(breaker: CircuitBreaker, failed: bool) -> None:
+    breaker.record(failed, breaker.before_request())
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(10):
+        request(breaker, failed=True)
+
+
+def test_breaker_opens_on_error_rate():
+    breaker = CircuitBreaker(error_rate=0.5, open_seconds=60)
+    for failed in [False, True] * 4:
+        request(breaker, failed)
+    assert breaker.state == CLOSED  # Меньше BREAKER_MIN_REQUESTS запросов
+
+    request(breaker, failed=True)
+    request(breaker, failed=False)
+    assert breaker.state == OPEN  # 5 ошибок из 10
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_breaker_lets_one_trial_through_after_pause():
+    breaker = CircuitBreaker(error_rate=0.5, open_seconds=0.05)
+    open_breaker(breaker)
+    time.sleep(0.06)
+
+    trial = breaker.before_request()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()  # Пока идет пробный запрос, остальные отклоняются
+
+    breaker.record(True, trial)
+    assert breaker.state == OPEN  # Пробный запрос не удался: пауза начинается заново
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    time.sleep(0.06)
+    request(breaker, failed=False)
+    assert breaker.state == CLOSED
+    breaker.before_request()
+
+
+def test_breaker_ignores_requests_from_previous_state():
+    breaker = CircuitBreaker(error_rate=0.5, open_seconds=0.05)
+    slow = breaker.before_request()  # Запрос начался, пока breaker был замкнут
+    open_breaker(breaker)
+    breaker.record(False, slow)  # Завершился после размыкания
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    trial = breaker.before_request()
+    breaker.record(False, slow)  # Успех старого запроса не замыкает breaker вместо пробного
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    breaker.record(True, trial)
+    assert breaker.state == OPEN
+
+
+class FakeResponse:
+    """Ответ API с нужным статусом и телом."""
+
+    def __init__(self, status_code: int = 200, content: bytes = b"{}"):
+        self.status_code = status_code
+        self.content = content
+        self.ok = status_code < 400
+        self.elapsed = type("Elapsed", (), {"total_seconds": staticmethod(lambda: 0.0)})()
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            from requests import HTTPError
+
+            raise HTTPError(f"{self.status_code}", response=self)
+
+
+def test_hedged_request_returns_first_response(monkeypatch):
+    client = OpenWeatherMapApiClient(Config(api_key="test", hedge_percentile=95))
+    for _ in range(LATENCY_MIN_SAMPLES):
+        client.latencies.add(0.01)
+    calls = itertools.count()
+    released = threading.Event()
+
+    def attempt(url, params):
+        if next(calls) == 0:
+            released.wait(5)  # Основной запрос завис
+            return FakeResponse(content=b"primary")
+        return FakeResponse(content=b"hedge")
+
+    monkeypatch.setattr(client, "_attempt", attempt)
+    started = time.perf_counter()
+    try:
+        assert client.fetch_weather_raw("Moscow") == b"hedge"
+        assert time.perf_counter() - started < 1
+    finally:
+        released.set()
+
+
+def test_fast_response_is_not_hedged(monkeypatch):
+    client = OpenWeatherMapApiClient(Config(api_key="test", hedge_percentile=95))
+    for _ in range(LATENCY_MIN_SAMPLES):
+        client.latencies.add(1.0)
+    calls = []
+    monkeypatch.setattr(client, "_attempt", lambda url, params: calls.append(url) or FakeResponse())
+
+    client.fetch_weather_raw("Moscow")
+    assert len(calls) == 1
+
+
+def test_only_successful_responses_set_hedge_delay(monkeypatch):
+    client = OpenWeatherMapApiClient(Config(api_key="test"))
+    statuses = iter([200, 429, 503, 404, 200])
+    monkeypatch.setattr("src.core.api_client.requests.get", lambda url, params, timeout: FakeResponse(next(statuses)))
+
+    for _ in range(5):
+        client._attempt("url", {})
+    assert len(client.latencies._samples) == 2
+
+
+def test_client_breaker_rejects_without_request(monkeypatch):
+    client = OpenWeatherMapApiClient(Config(api_key="test", breaker_error_rate=0.5, breaker_open_seconds=60))
+    calls = []
+    monkeypatch.setattr(client, "_attempt", lambda url, params: calls.append(url) or FakeResponse(503))
+
+    for _ in range(10):
+        with pytest.raises(Exception, match="503"):
+            client.fetch_weather_raw("Moscow")
+    with pytest.raises(CircuitOpenError):
+        client.fetch_weather_raw("Moscow")
+    assert len(calls) == 10
@@ -0,0 +1,45 @@
+"""Часовые и суточные сводки истории, которые ведут триггеры SQLite."""
+
+import math
+
+from tests.conftest import make_record
+from tests.test_row_counters import assert_consistent, fill
+
+
+def test_rollups_follow_updates(db):
+    fill(db)
+    with db._get_connection() as conn:
+        # Исправление значений и перенос записей в другой час и другой город
+        conn.execute("UPDATE weather_history SET temperature = temperature + 3, pressure = 1000 WHERE id % 4 = 0")
+        conn.execute("UPDATE weather_history SET timestamp = datetime(timestamp, '+90 minutes') WHERE id % 5 = 0")
+        conn.execute("UPDATE weather_history SET city = 'Самара' WHERE city = 'Казань' AND id % 2 = 0")
+        conn.execute("UPDATE weather_history SET response_time_ms = 1")  # Не меняет сводки
+
+    assert_consistent(db)
+
+
+def test_rollup_minimum_and_maximum(db):
+    fill(db, 300)
+    starts, means, minima, maxima = db.get_history_rollup(
+        "Москва", "temperature", make_record(0).timestamp, make_record(299).timestamp
+    )
+    series = db.get_history_series("Москва", "temperature", make_record(0).timestamp)
+    by_hour: dict = {}
+    for timestamp, value in zip(*series, strict=True):
+        by_hour.setdefault(timestamp.replace(minute=0, second=0), []).append(value)
+
+    assert starts == sorted(by_hour)
+    for start, mean, minimum, maximum in zip(starts, means, minima, maxima, strict=True):
+        values = by_hour[start]
+        assert math.isclose(mean, sum(values) / len(values))
+        assert (minimum, maximum) == (min(values), max(values))
+
+
+def test_daily_rollup_combines_hours(db):
+    fill(db, 600)
+    since, until = make_record(0).timestamp, make_record(599).timestamp
+    days = db.get_history_rollup("Сочи", "pressure", since, until, bucket="day")
+    hours = db.get_history_rollup("Сочи", "pressure", since, until, bucket="hour")
+
+    assert [start.hour for start in days[0]] == [0] * len(days[0])
+    assert min(days[2]) == min(hours[2]) and max(days[3]) == max(hours[3])
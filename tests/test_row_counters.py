@@ -0,0 +1,114 @@
+"""Счетчики строк и часовые сводки истории, которые ведут триггеры SQLite."""
+
+import pytest
+
+from src.database.db_manager import ROLLUP_FIELDS, DatabaseManager
+from tests.conftest import make_record, save_records
+
+
+def fill(db: DatabaseManager, count: int = 60) -> None:
+    save_records(db, [make_record(i, city=("Москва", "Сочи", "Казань")[i % 3]) for i in range(count)])
+
+
+def stored_rollups(db: DatabaseManager) -> dict[tuple[str, str], tuple]:
+    """Сводки из weather_rollups: (город, час) -> (число, суммы полей)."""
+    sums = ", ".join(f"{field}_sum" for field in ROLLUP_FIELDS)
+    with db._get_connection() as conn:
+        rows = conn.execute(f"SELECT city, hour, samples, {sums} FROM weather_rollups")  # noqa: S608
+        return {(row[0], row[1]): tuple(row[2:]) for row in rows}
+
+
+def actual_rollups(db: DatabaseManager) -> dict[tuple[str, str], tuple]:
+    """Те же сводки, посчитанные по записям истории."""
+    sums = ", ".join(f"SUM({field})" for field in ROLLUP_FIELDS)
+    with db._get_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT city, strftime('%Y-%m-%d %H:00:00', timestamp) AS hour, COUNT(*), {sums}
+            FROM weather_history GROUP BY city, hour
+        """)  # noqa: S608
+        return {(row[0], row[1]): tuple(row[2:]) for row in rows}
+
+
+def assert_consistent(db: DatabaseManager) -> None:
+    assert db.check_row_counters(repair=False) == []
+    stored, actual = stored_rollups(db), actual_rollups(db)
+    assert stored.keys() == actual.keys()
+    for key, values in actual.items():
+        assert stored[key] == pytest.approx(values), key
+
+
+def test_counters_follow_inserts(db):
+    fill(db)
+    assert db.get_record_count() == 60
+    assert db.get_record_count("Сочи") == 20
+    assert db.get_history_cities() == ["Казань", "Москва", "Сочи"]
+    assert_consistent(db)
+
+
+def test_counters_follow_deletes(db):
+    fill(db)
+    with db._get_connection() as conn:
+        conn.execute("DELETE FROM weather_history WHERE city = 'Сочи' AND id % 2 = 0")
+        conn.execute("DELETE FROM weather_history WHERE city = 'Казань'")
+
+    assert db.get_record_count() == 60 - 10 - 20
+    assert db.get_record_count("Казань") == 0
+    assert db.get_history_cities() == ["Москва", "Сочи"]
+    assert_consistent(db)
+
+
+def test_counters_follow_city_update(db):
+    fill(db)
+    with db._get_connection() as conn:
+        conn.execute("UPDATE weather_history SET city = 'Самара' WHERE city = 'Казань' AND id % 2 = 0")
+
+    assert db.get_record_count() == 60
+    assert db.get_record_count("Самара") == 10
+    assert db.get_record_count("Казань") == 10
+    assert db.check_row_counters(repair=False) == []
+
+
+def test_repair_fixes_drifted_counters(db):
+    fill(db)
+    with db._get_connection() as conn:
+        conn.execute("UPDATE row_counters SET row_count = 999 WHERE city = 'Москва'")
+        conn.execute("DELETE FROM weather_rollups WHERE city = 'Сочи'")
+
+    mismatches = db.check_row_counters(repair=True)
+    assert mismatches == [("weather_history", "Москва", 999, 20)]
+    assert_consistent(db)
+
+
+def test_counters_built_for_existing_database(tmp_path):
+    path = str(tmp_path / "weather.db")
+    db = DatabaseManager(path)
+    fill(db)
+    # База прошлой версии: без счетчиков и сводок
+    with db._get_connection() as conn:
+        conn.execute("DROP TABLE row_counters")
+        conn.execute("DROP TABLE weather_rollups")
+
+    assert_consistent(DatabaseManager(path))
+
+
+def test_clear_history_resets_counters_and_keeps_triggers(db):
+    fill(db)
+    db.save_observation_location(db.get_recent_records(limit=1)[0].id, 55.75, 37.62)
+    with db._get_connection() as conn:
+        triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+
+    assert db.clear_history()
+    assert db.get_record_count() == 0
+    assert db.get_history_cities() == []
+    assert stored_rollups(db) == {}
+    assert db.find_nearest_record(55.75, 37.62, 10) is None
+    with db._get_connection() as conn:
+        assert {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")} == triggers
+    assert_consistent(db)
+
+    # Триггеры снова ведут счетчики и сводки
+    fill(db, 30)
+    with db._get_connection() as conn:
+        conn.execute("DELETE FROM weather_history WHERE city = 'Сочи'")
+    assert db.get_record_count() == 20
+    assert_consistent(db)
@@ -0,0 +1,120 @@
+"""Индекс правил (RuleIndex) должен находить те же правила, что и перебор ConditionEvaluator."""
+
+import random
+
+import pytest
+
+from src.database.models import NotificationRule
+from src.notifications.evaluator import ConditionEvaluator
+from src.notifications.rule_index import LINEAR_SCAN_MAX_RULES, KeywordMatcher, RuleIndex
+
+# Условие -> диапазон порогов (давление в мм рт. ст., как в правилах)
+NUMERIC_RANGES = {
+    "temperature": (-30, 35),
+    "feels_like": (-35, 30),
+    "humidity": (10, 100),
+    "wind_speed": (0, 25),
+    "pressure": (720, 790),
+    "temperature_humidity": (0, 40),
+    "pressure:delta:3h": (-6, 6),
+    "temperature:anomaly:1d": (-8, 8),
+}
+OPERATORS = ("gt", "gte", "lt", "lte", "eq")
+DESCRIPTIONS = ("ясно", "небольшой дождь", "сильный дождь", "снег с дождем", "туман", "гроза", "пасмурно")
+KEYWORDS = ("дождь", "снег", "туман", "гроза", "ясно", "сильный", "дождем", "", "ь")
+
+
+def make_rules(count: int, rng: random.Random) -> list[NotificationRule]:
+    rules = []
+    for rule_id in range(1, count + 1):
+        roll = rng.random()
+        if roll < 0.2:
+            condition_type, operator, threshold = "description", "contains", rng.choice(KEYWORDS)
+        elif roll < 0.25:
+            condition_type, operator, threshold = "description", "eq", rng.choice(DESCRIPTIONS).upper()
+        elif roll < 0.27:
+            # Вне индекса: сравнение описаний и нечисловые пороги
+            condition_type, operator, threshold = rng.choice(
+                [("description", "gt", "м"), ("temperature", "gt", "тепло"), ("humidity", "lt", "nan")]
+            )
+        else:
+            condition_type = rng.choice(tuple(NUMERIC_RANGES))
+            operator = rng.choice(OPERATORS)
+            low, high = NUMERIC_RANGES[condition_type]
+            threshold = str(rng.randint(low, high) if operator == "eq" else round(rng.uniform(low, high), 1))
+        rules.append(
+            NotificationRule(
+                id=rule_id,
+                name=f"Правило {rule_id}",
+                condition_type=condition_type,
+                operator=operator,
+                threshold_value=threshold,
+                priority=rng.randint(1, 3),
+            )
+        )
+    rules.sort(key=lambda rule: (rule.priority, rule.id))
+    return rules
+
+
+def make_observation(rng: random.Random) -> dict:
+    return {
+        "city": "Moscow",
+        # Целые значения часто попадают точно на порог: проверяются границы операторов
+        "temperature": rng.choice([rng.randint(-30, 35), round(rng.uniform(-30, 35), 1)]),
+        "feels_like": rng.randint(-35, 30),
+        "humidity": rng.randint(10, 100),
+        "wind_speed": rng.choice([rng.randint(0, 25), round(rng.uniform(0, 25), 1)]),
+        "pressure": rng.randint(960, 1050),
+        "description": rng.choice(DESCRIPTIONS),
+        "pressure:delta:3h": rng.choice([None, rng.randint(-6, 6), round(rng.uniform(-6, 6), 2)]),
+        "temperature:anomaly:1d": rng.choice([None, round(rng.uniform(-8, 8), 2)]),
+    }
+
+
+def evaluate_all(rules: list[NotificationRule], weather_data: dict) -> list[NotificationRule]:
+    fired = []
+    for rule in rules:
+        try:
+            if ConditionEvaluator.evaluate(rule, weather_data):
+                fired.append(rule)
+        except (ValueError, TypeError):
+            continue
+    return fired
+
+
+@pytest.mark.parametrize("count", [10, LINEAR_SCAN_MAX_RULES + 1, 500, 3000])
+def test_index_matches_evaluator(count, capsys):
+    rng = random.Random(count)
+    rules = make_rules(count, rng)
+    index = RuleIndex(rules)
+
+    for _ in range(300):
+        weather_data = make_observation(rng)
+        assert index.match(weather_data) == evaluate_all(rules, weather_data)
+    capsys.readouterr()  # Ошибки в нечисловых порогах печатаются, но не прерывают проверку
+
+
+def test_index_collects_window_conditions():
+    rules = make_rules(200, random.Random(1))
+    index = RuleIndex(rules)
+
+    expected = {rule.condition_type for rule in rules if ":" in rule.condition_type}
+    assert set(index.window_conditions) == expected
+    assert index.window_conditions["pressure:delta:3h"].seconds == 3 * 3600
+
+
+def test_fixed_operators_of_combined_conditions():
+    # "Ощущается как" всегда сравнивается через "<", индекс духоты — через ">", как в ConditionEvaluator
+    rules = [
+        NotificationRule(id=i, condition_type=condition_type, operator="eq", threshold_value="10")
+        for i, condition_type in enumerate(["feels_like", "temperature_humidity"] * 20)
+    ]
+    index = RuleIndex(rules)
+    for weather_data in ({"feels_like": 5, "temperature": 30, "humidity": 50}, {"feels_like": 15}):
+        assert index.match(weather_data) == evaluate_all(rules, weather_data)
+
+
+@pytest.mark.parametrize("text", ["сильный дождь с градом", "снег", "", "ааааб", "ababcabc"])
+def test_keyword_matcher_finds_all_occurrences(text):
+    keywords = ["дождь", "ждь", "снег", "а", "аб", "ааб", "abc", "bca", "c", ""]
+    assert KeywordMatcher(keywords).find(text) == {keyword for keyword in keywords if keyword in text}
@@ -0,0 +1,111 @@
+"""Базовые правила уведомлений и их паузы."""
+
+from datetime import timedelta
+
+import pytest
+
+from src import cli
+from src.database.models import NotificationRule
+from src.notifications import rule_index
+from src.notifications.engine import NotificationEngine
+from src.notifications.evaluator import ConditionEvaluator
+from src.notifications.rule_index import LINEAR_SCAN_MAX_RULES, RuleIndex
+from tests.conftest import START
+
+
+def test_base_rules_have_no_cooldown_by_default(db):
+    rules = db.get_active_notification_rules()
+    assert rules
+    assert {rule.cooldown_minutes for rule in rules} == {0}
+    assert {rule.hysteresis for rule in rules} == {0}
+
+
+def test_cooldown_is_opt_in(db):
+    assert db.set_rule_cooldown(1, cooldown_minutes=60)
+    cooldowns = {rule.id: rule.cooldown_minutes for rule in db.get_active_notification_rules()}
+    assert cooldowns[1] == 60
+    assert cooldowns[2] == 0
+
+    # Повторная инициализация базы не меняет заданные паузы
+    type(db)(db.db_path)
+    assert {rule.id: rule.cooldown_minutes for rule in db.get_active_notification_rules()} == cooldowns
+
+
+def test_trend_rules_are_disabled_by_default(db):
+    trend_rules = {rule.id for rule in db.get_inactive_notification_rules()}
+    assert trend_rules == {17, 18}
+    assert not trend_rules & {rule.id for rule in db.get_active_notification_rules()}
+
+    # Включенное правило остается включенным после повторной инициализации базы
+    assert db.set_rule_active(17, True)
+    type(db)(db.db_path)
+    assert {rule.id for rule in db.get_inactive_notification_rules()} == {18}
+    assert not db.set_rule_active(999, True)
+
+
+def test_rules_command_enables_rule(shared_db, monkeypatch, capsys):
+    monkeypatch.setattr(cli, "load_dotenv", lambda: None)
+    cli.main(["rules"])
+    assert "Выключены" in capsys.readouterr().out
+
+    cli.main(["rules", "17", "--enable"])
+    assert 17 in {rule.id for rule in shared_db.get_active_notification_rules()}
+    cli.main(["rules", "17", "--disable"])
+    assert 17 not in {rule.id for rule in shared_db.get_active_notification_rules()}
+    capsys.readouterr()
+
+
+def make_rules(count: int) -> list[NotificationRule]:
+    return [
+        NotificationRule(id=i, name=f"r{i}", condition_type="temperature", operator="gt", threshold_value=str(i % 40))
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("count", [LINEAR_SCAN_MAX_RULES, 4 * LINEAR_SCAN_MAX_RULES])
+def test_skipped_rules_are_not_matched(count):
+    index = RuleIndex(make_rules(count))
+    weather_data = {"temperature": 20.5}
+    skip = {rule.id for rule in index.rules[::3]}
+
+    expected = [rule for rule in index.match(weather_data) if rule.id not in skip]
+    assert expected
+    assert index.match(weather_data, skip=skip) == expected
+
+
+def test_rules_on_cooldown_are_not_evaluated(db, monkeypatch):
+    evaluated = []
+
+    def evaluate_safely(rule, weather_data):
+        evaluated.append(rule.id)
+        return ConditionEvaluator.evaluate(rule, weather_data)
+
+    monkeypatch.setattr(rule_index, "_evaluate_safely", evaluate_safely)
+    db.set_rule_cooldown(1, cooldown_minutes=60)  # "Холодно"
+    engine = NotificationEngine(db)
+
+    def process(minutes: int) -> set[int]:
+        evaluated.clear()
+        weather_data = {
+            "city": "Москва",
+            "timestamp": START + timedelta(minutes=minutes),
+            "temperature": -3.0,
+            "feels_like": -6.0,
+            "humidity": 50,
+            "pressure": 1013,
+            "description": "ясно",
+            "wind_speed": 2.0,
+        }
+        history_id, _ = engine.process_weather_data(weather_data)
+        return {notification.rule_id for notification in db.get_notifications_for_record(history_id)}
+
+    assert {1, 2} <= process(0)
+    assert 1 in evaluated
+
+    # На паузе правило не проверяется вовсе, остальные правила проверяются как обычно
+    fired = process(10)
+    assert 1 not in fired and 2 in fired
+    assert 1 not in evaluated and 2 in evaluated
+
+    assert {1, 2} <= process(70)
+    assert 1 in evaluated
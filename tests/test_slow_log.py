@@ -0,0 +1,70 @@
+"""Журнал медленных запросов: порог и содержимое записи."""
+
+import json
+import time
+
+import pytest
+
+from benchmarks.bench_json_parse import make_current
+from src.core.config_loader import Config
+from src.utils.metrics import RequestTrace
+from src.utils.slow_log import SlowRequestLog
+
+
+def make_trace(elapsed_ms: float) -> RequestTrace:
+    request_trace = RequestTrace()
+    request_trace.elapsed = elapsed_ms / 1000
+    request_trace.add_stage("http_request_seconds", 0.25)
+    request_trace.add_stage("sqlite_lock_wait_seconds", 0.002)
+    request_trace.attributes["city"] = "Москва"
+    return request_trace
+
+
+def read_entries(path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()] if path.exists() else []
+
+
+@pytest.mark.parametrize(
+    ("threshold_ms", "elapsed_ms", "written"), [(300, 299.9, False), (300, 300, True), (0, 1e6, False)]
+)
+def test_threshold(tmp_path, capsys, threshold_ms, elapsed_ms, written):
+    log = SlowRequestLog(threshold_ms, tmp_path / "slow.jsonl")
+    assert log.record(make_trace(elapsed_ms)) is written
+    assert len(read_entries(log.path)) == written
+    capsys.readouterr()
+
+
+def test_entry_has_stages_and_attributes(tmp_path, capsys):
+    log = SlowRequestLog(100, tmp_path / "slow.jsonl")
+    log.record(make_trace(400))
+    log.record(make_trace(500))
+
+    entries = read_entries(log.path)
+    assert [entry["total_ms"] for entry in entries] == [400, 500]
+    assert entries[0]["threshold_ms"] == 100
+    assert entries[0]["stages_ms"] == {"http_request": 250, "sqlite_lock_wait": 2}
+    assert entries[0]["sqlite_wait_ms"] == 2
+    assert entries[0]["city"] == "Москва"
+    assert "Медленный запрос" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize(("slow_request_ms", "written"), [(20, True), (60_000, False)])
+def test_service_logs_slow_requests(shared_db, tmp_path, monkeypatch, capsys, slow_request_ms, written):
+    from src.core.weather_service import WeatherService
+
+    service = WeatherService(Config(api_key="test", slow_request_ms=slow_request_ms))
+    service.slow_log.path = tmp_path / "slow.jsonl"
+
+    def fetch_weather_raw(city=None, coordinates=None):
+        time.sleep(0.03)
+        return json.dumps(make_current()).encode()
+
+    monkeypatch.setattr(service.api_client, "fetch_weather_raw", fetch_weather_raw)
+    service.get_weather_with_notifications()
+
+    entries = read_entries(service.slow_log.path)
+    assert len(entries) == written
+    if written:
+        assert entries[0]["total_ms"] >= 30
+        assert entries[0]["stages_ms"]
+    capsys.readouterr()
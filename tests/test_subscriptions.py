@@ -0,0 +1,98 @@
+"""Подписки пользователей: одна проверка наблюдения города на всех подписчиков."""
+
+from src.database.models import NotificationRule
+from src.notifications.engine import NotificationEngine
+from src.notifications.rule_index import RuleIndex
+from src.notifications.subscriptions import SubscriptionIndex
+from tests.conftest import START
+
+
+def make_observation(city: str, temperature: float) -> dict:
+    return {
+        "city": city,
+        "timestamp": START,
+        "temperature": temperature,
+        "feels_like": temperature - 3,
+        "humidity": 50,
+        "pressure": 1013,
+        "description": "ясно",
+        "wind_speed": 2.0,
+    }
+
+
+def test_city_is_evaluated_once_for_all_subscribers(db, monkeypatch):
+    alice, bob, carol = (db.get_or_create_user(name) for name in ("alice", "bob", "carol"))
+    shared = db.get_or_create_rule_set("общий")
+    personal = db.get_or_create_rule_set("личный", carol)
+    cold = next(rule for rule in db.get_rule_set_rules(personal) if rule.name == "Холодно")
+    db.set_rule_threshold(cold.id, "-10")  # Порог carol не задевает других подписчиков
+
+    for user_id, city, rule_set_id in [
+        (alice, "Москва", shared),
+        (bob, "Москва", shared),
+        (bob, "Казань", shared),
+        (carol, "Москва", personal),
+    ]:
+        assert db.subscribe(user_id, city, rule_set_id)
+    assert not db.subscribe(alice, "Москва", shared)
+
+    matches = []
+    match = RuleIndex.match
+
+    def counting_match(index, weather_data, skip=()):
+        matches.append(weather_data["city"])
+        return match(index, weather_data, skip)
+
+    monkeypatch.setattr(RuleIndex, "match", counting_match)
+    engine = NotificationEngine(db)
+    issued = engine.process_subscriptions(
+        {"Москва": (make_observation("Москва", -3.0), 100), "Казань": (make_observation("Казань", 20.0), 100)}
+    )
+    assert sorted(matches) == ["Казань", "Москва"]
+
+    moscow = issued[0].history_id
+    fired = {
+        user_id: {n.rule_id for n in db.get_notifications_for_record(moscow, user_id)}
+        for user_id in (alice, bob, carol)
+    }
+    rule_names = {
+        rule.id: rule.name for rule_set_id in (shared, personal) for rule in db.get_rule_set_rules(rule_set_id)
+    }
+    assert fired[alice] == fired[bob]
+    assert "Холодно" in {rule_names[rule_id] for rule_id in fired[alice]}
+    assert "Холодно" not in {rule_names[rule_id] for rule_id in fired[carol]}
+    assert len([n for n in issued if n.history_id == moscow]) == sum(map(len, fired.values()))
+    assert db.get_notifications_for_record(moscow) == []  # Общие правила по подпискам не выдаются
+
+    # Город без подписок не сохраняется и не проверяется
+    matches.clear()
+    assert engine.process_subscriptions({"Сочи": (make_observation("Сочи", -3.0), 100)}) == []
+    assert matches == []
+
+
+def test_cities_with_same_rule_sets_share_index():
+    rules = {
+        rule_set_id: [
+            NotificationRule(
+                id=rule_set_id * 10 + i, condition_type="temperature", threshold_value="0", rule_set_id=rule_set_id
+            )
+            for i in range(3)
+        ]
+        for rule_set_id in (1, 2)
+    }
+    index = SubscriptionIndex({"Москва": {1: [1, 2], 2: [3]}, "Казань": {1: [2], 2: [4]}, "Сочи": {1: [5]}}, rules)
+
+    assert index.index_count == 2
+    assert index.city_indexes["Москва"] is index.city_indexes["Казань"]
+    assert len(index.city_indexes["Москва"]) == 6
+    assert len(index.city_indexes["Сочи"]) == 3
+    assert index.subscribers("Москва", rules[1][0]) == [1, 2]
+    assert index.subscribers("Сочи", rules[2][0]) == []
+
+
+def test_new_subscription_rebuilds_index(db):
+    engine = NotificationEngine(db)
+    assert engine.get_subscription_index().cities == []
+
+    db.subscribe(db.get_or_create_user("alice"), "Москва", db.get_or_create_rule_set("общий"))
+    assert engine.get_subscription_index().cities == ["Москва"]
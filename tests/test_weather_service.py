@@ -0,0 +1,95 @@
+"""Режим stale-while-revalidate: последнее наблюдение сразу, свежая погода в фоне."""
+
+import json
+import threading
+
+import pytest
+
+from benchmarks.bench_json_parse import make_current
+from src.core.config_loader import Config
+
+
+@pytest.fixture
+def service(shared_db, monkeypatch):
+    """Сервис погоды в режиме SWR; API отвечает, когда тест откроет release."""
+    from src.core.weather_service import WeatherService
+
+    service = WeatherService(Config(api_key="test", slow_request_ms=0, stale_max_seconds=3600))
+    service.api_calls = []
+    service.release = threading.Event()
+    service.release.set()
+
+    def fetch_weather_raw(city=None, coordinates=None):
+        service.release.wait(5)
+        service.api_calls.append(city)
+        return json.dumps(make_current(len(service.api_calls))).encode()
+
+    monkeypatch.setattr(service.api_client, "fetch_weather_raw", fetch_weather_raw)
+    return service
+
+
+def test_first_request_goes_to_api(service, capsys):
+    weather_data, _ = service.get_weather_with_notifications()
+    assert weather_data.age_seconds is None
+    assert len(service.api_calls) == 1
+    capsys.readouterr()
+
+
+def test_stored_observation_is_returned_and_refreshed(service, shared_db, capsys):
+    first, _ = service.get_weather_with_notifications()
+
+    service.release.clear()
+    stale, _ = service.get_weather_with_notifications()
+    assert stale.temperature == first.temperature
+    assert stale.age_seconds is not None
+    assert len(service.api_calls) == 1  # Ответ не ждал API
+
+    service.release.set()
+    service.wait_for_refreshes(5)
+    assert not service._refreshing
+    assert len(service.api_calls) == 2
+    assert shared_db.get_record_count() == 2
+    capsys.readouterr()
+
+
+def test_old_observation_is_not_served(service, capsys):
+    service.get_weather_with_notifications()
+    service.config.stale_max_seconds = 0
+    assert service.get_stale_weather() is None
+    capsys.readouterr()
+
+
+def test_refresh_is_deduplicated_per_city(service, capsys):
+    service.get_weather_with_notifications()
+    service.release.clear()
+    received = []
+
+    def on_refreshed(weather_data, record, notifications):
+        received.append(record)
+
+    assert service.refresh_in_background("Moscow", on_refreshed)
+    assert not service.refresh_in_background(" moscow ", on_refreshed)  # Тот же город в другом написании
+    ((thread, _),) = service._refreshing.values()
+    assert thread.daemon
+
+    service.release.set()
+    service.wait_for_refreshes(5)
+    assert len(service.api_calls) == 2  # Один фоновый запрос на оба вызова
+    assert len(received) == 2
+    assert received[0].id == received[1].id
+    capsys.readouterr()
+
+
+def test_stale_answer_delivers_refreshed_record(service, shared_db, capsys):
+    service.get_weather_with_notifications()
+    received = []
+
+    weather_data, record, _ = service.get_stale_weather(on_refreshed=lambda *result: received.append(result))
+    assert weather_data.age_seconds is not None
+    service.wait_for_refreshes(5)
+
+    ((fresh_data, fresh_record, _),) = received
+    assert fresh_record.id > record.id
+    assert fresh_data.age_seconds is None
+    assert shared_db.get_recent_records(limit=1)[0].id == fresh_record.id
+    capsys.readouterr()
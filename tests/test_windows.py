@@ -0,0 +1,162 @@
+"""Скользящие окна и экспоненциальное сглаживание для условий на тенденцию."""
+
+import math
+import random
+from datetime import timedelta
+
+import pytest
+
+from src.notifications.windows import (
+    MAX_WINDOW_SECONDS,
+    Ewma,
+    SlidingWindow,
+    WindowSpec,
+    WindowStatistics,
+    parse_window_condition,
+    sample_value,
+)
+from tests.conftest import make_record, save_records
+
+MICROS = 1_000_000
+
+
+@pytest.mark.parametrize(
+    ("condition_type", "expected"),
+    [
+        ("pressure:delta:3h", WindowSpec("pressure", "delta", 3 * 3600)),
+        ("temperature:ewma:7d", WindowSpec("temperature", "ewma", 7 * 86400)),
+        ("wind_speed:max:90m", WindowSpec("wind_speed", "max", 90 * 60)),
+        ("temperature", None),
+        ("description:mean:1h", None),
+        ("pressure:median:1h", None),
+        ("pressure:delta:0h", None),
+        (f"pressure:delta:{MAX_WINDOW_SECONDS // 86400 + 1}d", None),
+    ],
+)
+def test_parse_window_condition(condition_type, expected):
+    assert parse_window_condition(condition_type) == expected
+
+
+def brute_force(samples: list[tuple[int, float]], now: int, seconds: int, stat: str) -> float | None:
+    window = [value for micros, value in samples if now - seconds * MICROS <= micros <= now]
+    if stat in ("delta", "anomaly") and len(window) < 2:
+        return None
+    mean = sum(window) / len(window)
+    return {
+        "mean": mean,
+        "min": min(window),
+        "max": max(window),
+        "delta": window[-1] - window[0],
+        "anomaly": window[-1] - mean,
+    }[stat]
+
+
+@pytest.mark.parametrize("stat", ["mean", "min", "max", "delta", "anomaly"])
+def test_sliding_window_matches_brute_force(stat):
+    rng = random.Random(stat)
+    window = SlidingWindow(3600)
+    samples, micros = [], 0
+    for _ in range(2000):
+        micros += rng.choice([1, 60, 300, 600, 5400]) * MICROS  # Неравномерные интервалы и паузы дольше окна
+        value = rng.choice([rng.uniform(-10, 10), 0.0, 5.0])  # Повторы проверяют монотонные очереди
+        samples.append((micros, value))
+        window.add(micros, value)
+        expected = brute_force(samples, micros, 3600, stat)
+        got = window.value(stat)
+        assert got == expected if expected is None else math.isclose(got, expected, abs_tol=1e-9)
+
+
+def test_ewma_follows_irregular_series():
+    average = Ewma(600)
+    average.add(0, 10.0)
+    assert average.value == 10.0
+    # Пауза в одну постоянную времени: вес нового значения 1 - 1/e
+    average.add(600 * MICROS, 20.0)
+    assert math.isclose(average.value, 10 + 10 * (1 - math.exp(-1)))
+    # Долгая пауза: старое значение почти забыто
+    average.add(600 * MICROS * 50, 0.0)
+    assert abs(average.value) < 1e-9
+
+
+def test_statistics_restored_from_history_match_incremental(db):
+    conditions = {
+        condition_type: parse_window_condition(condition_type)
+        for condition_type in ("pressure:delta:3h", "temperature:anomaly:1d", "humidity:min:2h", "wind_speed:ewma:1h")
+    }
+    records = [make_record(i) for i in range(400)]
+    save_records(db, records)
+    data = [
+        {field: getattr(r, field) for field in ("temperature", "humidity", "pressure", "wind_speed")} for r in records
+    ]
+
+    incremental = WindowStatistics(db)
+    for record, weather_data in zip(records[:300], data[:300], strict=True):
+        incremental.observe(record.city, record.timestamp, weather_data, conditions)
+
+    for record, weather_data in zip(records[300:], data[300:], strict=True):
+        got = incremental.observe(record.city, record.timestamp, weather_data, conditions)
+        # Новый экземпляр восстанавливает окна из истории на момент наблюдения
+        restored = WindowStatistics(db).observe(record.city, record.timestamp, weather_data, conditions)
+        for condition_type in conditions:
+            if condition_type.endswith(":ewma:1h"):
+                # Восстановление по 5 постоянным времени истории: отличие меньше e^-5 от размаха значений
+                assert math.isclose(got[condition_type], restored[condition_type], abs_tol=0.15)
+            else:
+                assert math.isclose(got[condition_type], restored[condition_type], abs_tol=1e-9)
+
+    last = records[-1].timestamp
+    _, pressures = db.get_history_series("Москва", "pressure", last - timedelta(hours=3), last)
+    assert math.isclose(got["pressure:delta:3h"], sample_value("pressure", pressures[-1] - pressures[0]))
+
+
+def test_older_observation_is_not_remembered(db):
+    conditions = {"temperature:mean:1h": parse_window_condition("temperature:mean:1h")}
+    records = [make_record(i) for i in range(20)]
+    save_records(db, records)
+
+    windows = WindowStatistics(db)
+    windows.observe("Москва", records[-1].timestamp, {"temperature": records[-1].temperature}, conditions)
+    # Наблюдение из прошлого (загрузка архива) считается по истории на свой момент
+    old = windows.observe("Москва", records[5].timestamp, {"temperature": records[5].temperature}, conditions)
+    expected = [
+        r.temperature
+        for r in records
+        if records[5].timestamp - timedelta(hours=1) <= r.timestamp <= records[5].timestamp
+    ]
+    assert math.isclose(old["temperature:mean:1h"], sum(expected) / len(expected))
+
+
+def test_windows_of_other_rule_index_are_kept(db, monkeypatch):
+    global_rules = {"pressure:delta:3h": parse_window_condition("pressure:delta:3h")}
+    subscriptions = {"temperature:mean:1h": parse_window_condition("temperature:mean:1h")}
+    records = [make_record(i) for i in range(40)]
+    save_records(db, records)
+
+    windows = WindowStatistics(db)
+    reads = []
+    series = db.get_history_series
+    monkeypatch.setattr(
+        db, "get_history_series", lambda *args, **kwargs: reads.append(args[1]) or series(*args, **kwargs)
+    )
+
+    # Общие правила и наборы подписок наблюдают город по очереди: каждое окно восстанавливается один раз
+    for record in records[20:]:
+        weather_data = {"pressure": record.pressure, "temperature": record.temperature}
+        got = windows.observe(record.city, record.timestamp, weather_data, global_rules, rules_version=1)
+        got.update(windows.observe(record.city, record.timestamp, weather_data, subscriptions, rules_version=1))
+    assert sorted(reads) == ["pressure", "temperature"]
+
+    restored = WindowStatistics(db).observe(
+        record.city, record.timestamp, weather_data, {**global_rules, **subscriptions}
+    )
+    assert got == pytest.approx(restored)
+    reads.clear()
+
+    # Индекс, перестроенный по старой версии правил, не сбрасывает окна
+    windows.observe(record.city, record.timestamp, weather_data, global_rules, rules_version=0)
+    assert reads == []
+
+    # После смены правил остаются только окна, нужные новым правилам
+    windows.observe(record.city, record.timestamp, weather_data, global_rules, rules_version=2)
+    assert reads == ["pressure"]
+    assert set(windows._cities[record.city].windows) == {global_rules["pressure:delta:3h"].key}